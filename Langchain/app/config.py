@@ -22,4 +22,103 @@ class Settings(BaseSettings):
     # Configuración para Milvus (Desarrollo)
     MILVUS_URI: Optional[str] = Field(default=None, validation_alias="MILVUS_URI")
 
+    # Ingesta de documentos
+    INGESTION_STREAMING: bool = Field(default=True, validation_alias="INGESTION_STREAMING")  # Procesa el PDF página a página
+    INGESTION_BATCH_SIZE: int = Field(default=32, validation_alias="INGESTION_BATCH_SIZE")  # Chunks por micro-batch (embedding + insert)
+    INGESTION_PROCESS_WORKERS: int = Field(default=2, validation_alias="INGESTION_PROCESS_WORKERS")  # Procesos para parsear PDFs (0 = en el event loop)
+    INGESTION_PAGES_PER_TASK: int = Field(default=8, validation_alias="INGESTION_PAGES_PER_TASK")  # Páginas por tarea enviada al pool
+    INGESTION_MAX_CONCURRENT_FILES: int = Field(default=4, validation_alias="INGESTION_MAX_CONCURRENT_FILES")
+    INGESTION_MAX_CONCURRENT_INSERTS: int = Field(default=2, validation_alias="INGESTION_MAX_CONCURRENT_INSERTS")
+
+    # Backend de vectores: "milvus" o "numpy" (en el proceso, búsqueda exacta; sin deduplicación de contenido)
+    VECTOR_STORE_BACKEND: str = Field(default="milvus", validation_alias="VECTOR_STORE_BACKEND")
+    NUMPY_STORE_PATH: Optional[str] = Field(default=None, validation_alias="NUMPY_STORE_PATH")  # Directorio de los .npy (None = solo en memoria)
+
+    # Representación de los vectores (cambiarla sobre una colección existente requiere app.db.migrate_vectors)
+    EMBEDDING_DIMENSION: int = Field(default=3072, validation_alias="EMBEDDING_DIMENSION")  # 3072, 1536 o 768 (Matryoshka, re-normalizado)
+    MILVUS_VECTOR_TYPE: str = Field(default="FLOAT_VECTOR", validation_alias="MILVUS_VECTOR_TYPE")  # FLOAT_VECTOR, FLOAT16_VECTOR o BFLOAT16_VECTOR
+    MILVUS_INDEX_PROFILE: str = Field(default="hnsw", validation_alias="MILVUS_INDEX_PROFILE")  # Perfil de índice de las colecciones nuevas (app/db/index_profiles.py)
+
+    # Partition key: pdf_id reparte los chunks en particiones y las búsquedas filtradas solo recorren las de sus PDFs
+    # Desactivada por defecto: las colecciones existentes no la tienen; activarla exige migrarlas (app/db/migrate_vectors.py)
+    MILVUS_PARTITION_KEY: bool = Field(default=False, validation_alias="MILVUS_PARTITION_KEY")
+    MILVUS_NUM_PARTITIONS: int = Field(default=64, validation_alias="MILVUS_NUM_PARTITIONS")
+
+    # Arranque: carga las colecciones y hace una búsqueda de prueba antes de recibir consultas
+    MILVUS_WARMUP: bool = Field(default=True, validation_alias="MILVUS_WARMUP")
+
+    # Búsqueda
+    MILVUS_RETRIEVAL_MODE: str = Field(default="hnsw", validation_alias="MILVUS_RETRIEVAL_MODE")  # "hnsw", "binary_rescore" (Hamming + rescoring exacto) o "hybrid" (denso + BM25)
+    MILVUS_SEARCH_LIMIT: int = Field(default=5, validation_alias="MILVUS_SEARCH_LIMIT")  # Chunks devueltos por búsqueda (k final)
+    MILVUS_SEARCH_MAX_CONCURRENCY: int = Field(default=8, validation_alias="MILVUS_SEARCH_MAX_CONCURRENCY")  # Búsquedas por documento en paralelo (sin group_by)
+    MILVUS_RESCORE_CANDIDATES: int = Field(default=100, validation_alias="MILVUS_RESCORE_CANDIDATES")  # Candidatos de la búsqueda binaria
+    MILVUS_VECTOR_FILE: Optional[str] = Field(default=None, validation_alias="MILVUS_VECTOR_FILE")  # Vectores completos locales (app.db.export_vectors)
+
+    # Búsqueda híbrida (MILVUS_RETRIEVAL_MODE=hybrid): densa + BM25 sobre text_chunk en un solo hybrid_search
+    MILVUS_HYBRID_RANKER: str = Field(default="rrf", validation_alias="MILVUS_HYBRID_RANKER")  # "rrf" o "weighted"
+    MILVUS_HYBRID_RRF_K: int = Field(default=60, validation_alias="MILVUS_HYBRID_RRF_K")
+    MILVUS_HYBRID_DENSE_WEIGHT: float = Field(default=0.6, validation_alias="MILVUS_HYBRID_DENSE_WEIGHT")  # Ranker weighted: BM25 pesa 1 - este valor
+    MILVUS_HYBRID_CANDIDATES: int = Field(default=20, validation_alias="MILVUS_HYBRID_CANDIDATES")  # Resultados de cada búsqueda antes de fusionarlas
+
+    # Inserts en Milvus
+    MILVUS_INSERT_MAX_BATCH_BYTES: int = Field(default=8 * 1024 * 1024, validation_alias="MILVUS_INSERT_MAX_BATCH_BYTES")  # Tamaño máximo de cada request de insert
+    MILVUS_INSERT_MAX_BATCH_ROWS: int = Field(default=1000, validation_alias="MILVUS_INSERT_MAX_BATCH_ROWS")
+    MILVUS_INSERT_MAX_IN_FLIGHT: int = Field(default=4, validation_alias="MILVUS_INSERT_MAX_IN_FLIGHT")  # Inserts en curso a la vez (por cliente)
+    MILVUS_INSERT_MAX_RETRIES: int = Field(default=3, validation_alias="MILVUS_INSERT_MAX_RETRIES")
+
+    # Splitter
+    SPLITTER_MODE: str = Field(default="chars", validation_alias="SPLITTER_MODE")  # "chars" (1500 caracteres) o "tokens"
+    SPLITTER_CHUNK_TOKENS: int = Field(default=400, validation_alias="SPLITTER_CHUNK_TOKENS")  # Tokens objetivo por chunk (modo tokens)
+    SPLITTER_CHUNK_OVERLAP_TOKENS: int = Field(default=50, validation_alias="SPLITTER_CHUNK_OVERLAP_TOKENS")
+    SPLITTER_TOKEN_ENCODING: str = Field(default="cl100k_base", validation_alias="SPLITTER_TOKEN_ENCODING")  # Tokenizer local (tiktoken)
+
+    # Scheduler de embeddings (compartido por todas las ingestas)
+    EMBEDDING_MAX_BATCH_SIZE: int = Field(default=100, validation_alias="EMBEDDING_MAX_BATCH_SIZE")  # Máximo de textos por request de Gemini
+    EMBEDDING_MAX_BATCH_TOKENS: int = Field(default=20000, validation_alias="EMBEDDING_MAX_BATCH_TOKENS")
+    EMBEDDING_MAX_CONCURRENCY: int = Field(default=4, validation_alias="EMBEDDING_MAX_CONCURRENCY")  # Batches en vuelo a la vez
+    EMBEDDING_REQUESTS_PER_MINUTE: int = Field(default=3000, validation_alias="EMBEDDING_REQUESTS_PER_MINUTE")  # 0 = sin límite
+    EMBEDDING_TOKENS_PER_MINUTE: int = Field(default=1000000, validation_alias="EMBEDDING_TOKENS_PER_MINUTE")  # 0 = sin límite
+    EMBEDDING_MAX_RETRIES: int = Field(default=5, validation_alias="EMBEDDING_MAX_RETRIES")
+
+    # Cache persistente de embeddings (SQLite, vectores float32)
+    EMBEDDING_CACHE_ENABLED: bool = Field(default=True, validation_alias="EMBEDDING_CACHE_ENABLED")
+    EMBEDDING_CACHE_PATH: Optional[str] = Field(default=None, validation_alias="EMBEDDING_CACHE_PATH")  # Por defecto app/cache/embeddings.sqlite3
+    EMBEDDING_CACHE_MAX_MB: int = Field(default=1024, validation_alias="EMBEDDING_CACHE_MAX_MB")
+
+    # Cache de embeddings de consultas (en memoria; las constantes se precalculan al arrancar)
+    QUERY_EMBEDDING_CACHE_SIZE: int = Field(default=1024, validation_alias="QUERY_EMBEDDING_CACHE_SIZE")
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = Field(default=3600, validation_alias="QUERY_EMBEDDING_CACHE_TTL_SECONDS")
+    QUERY_EMBEDDING_CACHE_PERSIST: bool = Field(default=True, validation_alias="QUERY_EMBEDDING_CACHE_PERSIST")  # También en el cache persistente (SQLite)
+
+    # Reranker (Voyage AI): si tarda más que el timeout se usa el orden de la búsqueda vectorial
+    RERANK_TIMEOUT_SECONDS: float = Field(default=3.0, validation_alias="RERANK_TIMEOUT_SECONDS")
+    RERANK_MAX_CONCURRENCY: int = Field(default=8, validation_alias="RERANK_MAX_CONCURRENCY")
+    RERANK_CACHE_SIZE: int = Field(default=1024, validation_alias="RERANK_CACHE_SIZE")
+    RERANK_CACHE_TTL_SECONDS: int = Field(default=600, validation_alias="RERANK_CACHE_TTL_SECONDS")
+
+    # Judge por niveles: pre-check local de groundedness; solo la banda ambigua va al LLM judge
+    GROUNDEDNESS_PRECHECK: bool = Field(default=True, validation_alias="GROUNDEDNESS_PRECHECK")
+    GROUNDEDNESS_PASS_THRESHOLD: float = Field(default=0.78, validation_alias="GROUNDEDNESS_PASS_THRESHOLD")
+    GROUNDEDNESS_FAIL_THRESHOLD: float = Field(default=0.5, validation_alias="GROUNDEDNESS_FAIL_THRESHOLD")
+    GROUNDEDNESS_SEMANTIC_WEIGHT: float = Field(default=0.7, validation_alias="GROUNDEDNESS_SEMANTIC_WEIGHT")
+
+    # Historial de chat en el prompt: últimos turnos textuales dentro del presupuesto y resumen incremental de los anteriores
+    CHAT_HISTORY_MAX_TURNS: int = Field(default=6, validation_alias="CHAT_HISTORY_MAX_TURNS")
+    CHAT_HISTORY_TOKEN_BUDGET: int = Field(default=2000, validation_alias="CHAT_HISTORY_TOKEN_BUDGET")
+    CHAT_HISTORY_SUMMARY_WORDS: int = Field(default=200, validation_alias="CHAT_HISTORY_SUMMARY_WORDS")  # Largo máximo del resumen
+
+    # Cache semántico de respuestas por notebook (mismos pdf_ids, pregunta igual o casi igual)
+    ANSWER_CACHE_ENABLED: bool = Field(default=True, validation_alias="ANSWER_CACHE_ENABLED")
+    ANSWER_CACHE_SIMILARITY: float = Field(default=0.92, validation_alias="ANSWER_CACHE_SIMILARITY")
+    ANSWER_CACHE_TTL_SECONDS: int = Field(default=86400, validation_alias="ANSWER_CACHE_TTL_SECONDS")
+    ANSWER_CACHE_MAX_ENTRIES: int = Field(default=4096, validation_alias="ANSWER_CACHE_MAX_ENTRIES")
+    ANSWER_CACHE_MAX_PER_NOTEBOOK: int = Field(default=128, validation_alias="ANSWER_CACHE_MAX_PER_NOTEBOOK")
+
+    # Chat models compartidos: una llamada mínima a cada modelo al arrancar para abrir las conexiones
+    CHAT_MODEL_WARMUP: bool = Field(default=True, validation_alias="CHAT_MODEL_WARMUP")
+    CHAT_MODEL_WARMUP_TIMEOUT_SECONDS: float = Field(default=10.0, validation_alias="CHAT_MODEL_WARMUP_TIMEOUT_SECONDS")
+
+    # Jobs en segundo plano (creación de notebooks)
+    JOBS_TTL_SECONDS: int = Field(default=3600, validation_alias="JOBS_TTL_SECONDS")  # Tiempo que se conserva un job terminado
+
 conf = Settings()
\ No newline at end of file
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Optional
+
+import grpc
+from pymilvus.exceptions import DataNotMatchException, DataTypeNotMatchException, MilvusException, MilvusUnavailableException, ParamError
+
+from ..config import conf
+
+
+# Errores de los datos: reintentar el mismo batch no puede funcionar
+_NON_RETRYABLE = (ParamError, DataNotMatchException, DataTypeNotMatchException)
+
+# Máximo de filas que devuelve un query de Milvus: si las filas de los pdf_ids del batch no entran,
+# no se puede saber qué guardó un intento ambiguo
+_ROLLBACK_QUERY_LIMIT = 16384
+
+
+def failed_before_write(error: Exception) -> bool:
+    """El insert seguro no llegó a escribirse (conexión rechazada, servidor no disponible o rate limit)."""
+    if isinstance(error, (ConnectionRefusedError, MilvusUnavailableException)):
+        return True
+
+    if isinstance(error, grpc.RpcError) and hasattr(error, "code"):
+        return error.code() in (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.RESOURCE_EXHAUSTED)
+
+    if isinstance(error, MilvusException):
+        return "rate limit exceeded" in str(error.message).lower()
+
+    return False
+
+
+def row_key(row: dict) -> tuple:
+    """Identidad de una fila por su contenido (la clave primaria es auto_id: no se conoce hasta que el insert responde)."""
+    return row.get("pdf_id"), row.get("text_chunk"), json.dumps(row.get("metadata"), sort_keys=True, ensure_ascii=False)
+
+
+class BulkInsertError(Exception):
+    """Algún batch no pudo insertarse después de los reintentos. `report` indica cuáles sí se insertaron."""
+
+    def __init__(self, report: dict):
+        self.report = report
+        super().__init__(f"{report['rows'] - report['inserted']} of {report['rows']} rows could not be inserted: {report['failed']}")
+
+
+def estimate_row_bytes(row: dict) -> int:
+    """Tamaño aproximado de una fila en el request de insert (float32 por componente de vector, UTF-8 para textos)."""
+    size = 0
+
+    for value in row.values():
+        if isinstance(value, (bytes, bytearray)):
+            size += len(value)  # Vectores ya codificados (FLOAT16/BFLOAT16, binary_vector)
+        elif isinstance(value, (list, tuple)):
+            size += 4 * len(value)
+        elif isinstance(value, str):
+            size += len(value.encode("utf-8"))
+        elif isinstance(value, (int, float)):
+            size += 8
+        elif value is not None:
+            size += len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+    return size
+
+
+def slice_by_bytes(data: list[dict], max_batch_bytes: int, max_batch_rows: int) -> list[tuple[int, int, int]]:
+    """
+    Agrupa las filas (en orden) en rangos [start, end) que no superan max_batch_bytes ni max_batch_rows.
+    Una fila más grande que el límite va sola en su batch. Devuelve (start, end, bytes) por batch.
+    """
+    batches = []
+    start = 0
+    size = 0
+
+    for i, row in enumerate(data):
+        row_bytes = estimate_row_bytes(row)
+
+        if i > start and (i - start >= max_batch_rows or size + row_bytes > max_batch_bytes):
+            batches.append((start, i, size))
+            start = i
+            size = 0
+
+        size += row_bytes
+
+    if start < len(data):
+        batches.append((start, len(data), size))
+
+    return batches
+
+
+class BulkInserter:
+    """
+    Inserta listas grandes de filas en Milvus por batches acotados en bytes.
+
+    - Cada batch respeta max_batch_bytes (y max_batch_rows), así ningún request de gRPC
+      lleva el documento entero.
+    - Como máximo max_in_flight inserts están en curso a la vez, compartidos por todos los
+      que usan el mismo inserter: cuando Milvus se atrasa, los productores esperan.
+    - Un batch que falla se reintenta solo (con backoff); los que ya se insertaron no se
+      vuelven a enviar. Si el error es ambiguo (el insert pudo haberse guardado), antes de
+      reintentar se buscan las filas del batch por contenido y, si el intento se guardó entero,
+      se borran por clave primaria; si no se puede determinar qué se guardó, no se reintenta.
+    - Devuelve un reporte con las filas insertadas, los bytes y el tiempo de cada batch,
+      y los rangos que fallaron después de agotar los reintentos.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        max_batch_bytes: int = conf.MILVUS_INSERT_MAX_BATCH_BYTES,
+        max_batch_rows: int = conf.MILVUS_INSERT_MAX_BATCH_ROWS,
+        max_in_flight: int = conf.MILVUS_INSERT_MAX_IN_FLIGHT,
+        max_retries: int = conf.MILVUS_INSERT_MAX_RETRIES,
+        base_delay: float = 0.5,
+        max_delay: float = 10.0,
+    ):
+        self.client = client
+        self.max_batch_bytes = max(1, max_batch_bytes)
+        self.max_batch_rows = max(1, max_batch_rows)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._semaphore = asyncio.Semaphore(max(1, max_in_flight))
+
+    async def insert(self, collection_name: str, data: list[dict]) -> dict:
+        """
+        Inserta `data` en `collection_name` y devuelve el reporte:
+        {"rows", "inserted", "bytes", "seconds", "batches": [...], "failed": [...]}.
+        Cada batch informa start, end, rows, bytes, attempts, seconds, inserted y error.
+        """
+        started = time.perf_counter()
+        slices = slice_by_bytes(data, max_batch_bytes=self.max_batch_bytes, max_batch_rows=self.max_batch_rows)
+
+        # Claves primarias de los batches que ya se insertaron: no se confunden con las de un intento ambiguo
+        inserted_ids: set = set()
+
+        batches = await asyncio.gather(*(
+            self._insert_batch(collection_name, data, start, end, size, inserted_ids) for start, end, size in slices
+        ))
+
+        return {
+            "rows": len(data),
+            "inserted": sum(batch["inserted"] for batch in batches),
+            "bytes": sum(batch["bytes"] for batch in batches),
+            "seconds": time.perf_counter() - started,
+            "batches": batches,
+            "failed": [{"start": b["start"], "end": b["end"], "error": b["error"]} for b in batches if b["error"] is not None],
+        }
+
+    async def _insert_batch(self, collection_name: str, data: list[dict], start: int, end: int, size: int, inserted_ids: set) -> dict:
+        result = {"start": start, "end": end, "rows": end - start, "bytes": size, "attempts": 0, "seconds": 0.0, "inserted": 0, "error": None}
+        error: Optional[Exception] = None
+        rows = data[start:end]
+
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                result["attempts"] += 1
+                attempt_started = time.perf_counter()
+
+                try:
+                    res = await self.client.insert(collection_name=collection_name, data=rows)
+                    result["seconds"] = time.perf_counter() - attempt_started
+                    result["inserted"] = res.get("insert_count", end - start) if isinstance(res, dict) else end - start
+                    inserted_ids.update(res.get("ids", []) if isinstance(res, dict) else [])
+                    return result
+
+                except _NON_RETRYABLE as e:
+                    error = e
+                    break
+
+                except Exception as e:
+                    error = e
+
+                    # Falla ambigua: el intento pudo haberse guardado, se borran sus filas antes de seguir
+                    if not failed_before_write(e) and not await self._discard_batch(collection_name, rows, inserted_ids):
+                        break
+
+            if attempt < self.max_retries:
+                # Backoff exponencial con "full jitter", fuera del semáforo para no frenar a los demás batches
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                print(f"   [MILVUS] Insert de filas [{start}, {end}) falló ({error}), reintento {attempt + 1}/{self.max_retries} en {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        result["error"] = str(error)
+        print(f"   [MILVUS] Insert de filas [{start}, {end}) en {collection_name} falló definitivamente: {error}")
+
+        return result
+
+    async def _discard_batch(self, collection_name: str, rows: list[dict], inserted_ids: set) -> bool:
+        """
+        Deshace un intento ambiguo: busca (con lectura Strong) las filas de los pdf_ids del batch que
+        no son de otros batches y coinciden en contenido. Si están todas, se borran por clave primaria;
+        si no hay ninguna, el intento no se guardó. En cualquier otro caso (guardado parcial, filas
+        iguales de antes, sin pdf_id) devuelve False y el batch no se reintenta.
+        """
+        pdf_ids = sorted({row.get("pdf_id") for row in rows}, key=str)
+        if None in pdf_ids:
+            return False
+
+        expected = Counter(row_key(row) for row in rows)
+
+        try:
+            stored = await self.client.query(
+                collection_name=collection_name,
+                filter=f"pdf_id in {json.dumps(pdf_ids)}",
+                output_fields=["id", "pdf_id", "text_chunk", "metadata"],
+                limit=_ROLLBACK_QUERY_LIMIT,
+                consistency_level="Strong"  # Tiene que ver el insert que quizá se guardó
+            )
+
+            if len(stored) >= _ROLLBACK_QUERY_LIMIT:
+                return False
+
+            matches = [row for row in stored if row["id"] not in inserted_ids and row_key(row) in expected]
+
+            if not matches:
+                return True
+
+            if Counter(row_key(row) for row in matches) != expected:
+                print(f"   [MILVUS] Insert ambiguo de {len(rows)} filas: no se puede determinar qué se guardó, no se reintenta")
+                return False
+
+            await self.client.delete(collection_name=collection_name, ids=[row["id"] for row in matches])
+            return True
+
+        except Exception as e:
+            print(f"   [MILVUS] No se pudieron buscar o borrar las filas de un insert ambiguo antes de reintentar: {e}")
+            return False
@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import os
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from .milvus import Async_Milvus_Client
+
+
+def hash_content(data: bytes) -> str:
+    """SHA-256 (hex) de los bytes de un PDF: identifica el contenido independientemente del nombre o del source_id."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 (hex) de un archivo, leído por bloques."""
+    digest = hashlib.sha256()
+
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def hash_pdf(pdf, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 (hex) de un PDF dado como ruta, bytes o file-like (que queda rebobinado para parsearlo)."""
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return hash_content(pdf)
+
+    if isinstance(pdf, (str, os.PathLike)):
+        return hash_file(pdf, block_size=block_size)
+
+    digest = hashlib.sha256()
+
+    pdf.seek(0)
+    for block in iter(lambda: pdf.read(block_size), b""):
+        digest.update(block)
+    pdf.seek(0)
+
+    return digest.hexdigest()
+
+
+class ContentStore:
+    """
+    Content-addressed mapping between sources and the vectors stored in documents_collection.
+
+    Every source (UsersAPI source id) gets a row in sources_collection with the hash of its
+    PDF bytes and the pdf_id under which the chunks of that content are stored. The first
+    source that uploads a given content owns the vectors (pdf_id == source_id); later uploads
+    of identical bytes only add a mapping row and reuse them. The number of rows pointing to
+    a pdf_id is its refcount, so the vectors are purged only when the last source is released.
+
+    Sources ingested before this mapping existed have no row and resolve to themselves.
+    """
+
+    def __init__(self, client_milvus: "Async_Milvus_Client", collection_name: str = "sources_collection"):
+        self.client = client_milvus.client
+        self.collection_name = collection_name
+        self._locks: dict[str, tuple[asyncio.Lock, int]] = {}
+        self._allocation_lock = asyncio.Lock()
+        self._next_fresh_pdf_id: Optional[int] = None
+
+    @asynccontextmanager
+    async def lock(self, content_hash: str):
+        """Serializa las ingestas concurrentes del mismo contenido (evita embeberlo dos veces)."""
+        lock, users = self._locks.get(content_hash, (asyncio.Lock(), 0))
+        self._locks[content_hash] = (lock, users + 1)
+
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[content_hash]
+            if users == 1:
+                del self._locks[content_hash]
+            else:
+                self._locks[content_hash] = (lock, users - 1)
+
+    async def find_by_hash(self, content_hash: str) -> Optional[int]:
+        """Devuelve el pdf_id que ya almacena este contenido, o None si nunca se ingirió."""
+        res = await self.client.query(
+            collection_name=self.collection_name,
+            filter=f'content_hash == "{content_hash}"',
+            output_fields=["pdf_id"],
+            limit=1
+        )
+
+        return res[0]["pdf_id"] if res else None
+
+    async def register(self, source_id: int, content_hash: str, pdf_id: int):
+        """Asocia un source a un contenido ya almacenado bajo pdf_id."""
+        await self.client.upsert(
+            collection_name=self.collection_name,
+            data=[{
+                "source_id": source_id,
+                "content_hash": content_hash,
+                "pdf_id": pdf_id,
+                "placeholder_vector": [0.0, 0.0],
+            }]
+        )
+
+    async def references(self, pdf_id: int) -> list[dict]:
+        """Filas (source_id, content_hash) de los sources que usan los vectores guardados bajo pdf_id."""
+        return await self.client.query(
+            collection_name=self.collection_name,
+            filter=f"pdf_id == {pdf_id}",
+            output_fields=["source_id", "content_hash"]
+        )
+
+    async def allocate_pdf_id(self) -> int:
+        """
+        pdf_id nuevo que no corresponde a ningún source (negativo: los source ids de UsersAPI son positivos),
+        para guardar una versión compartida cuando el pdf_id de todas sus fuentes ya está ocupado.
+        """
+        async with self._allocation_lock:
+            if self._next_fresh_pdf_id is None:
+                res = await self.client.query(
+                    collection_name=self.collection_name,
+                    filter="pdf_id < 0",
+                    output_fields=["pdf_id"],
+                    consistency_level="Strong"
+                )
+                self._next_fresh_pdf_id = min((row["pdf_id"] for row in res), default=0) - 1
+
+            pdf_id = self._next_fresh_pdf_id
+            self._next_fresh_pdf_id -= 1
+
+            return pdf_id
+
+    async def resolve(self, source_ids: list[int]) -> dict[int, int]:
+        """Traduce source ids al pdf_id con el que están guardados sus chunks."""
+        if not source_ids:
+            return {}
+
+        res = await self.client.query(
+            collection_name=self.collection_name,
+            filter=f"source_id in {list(source_ids)}",
+            output_fields=["source_id", "pdf_id"]
+        )
+
+        mapping = {row["source_id"]: row["pdf_id"] for row in res}
+
+        return {source_id: mapping.get(source_id, source_id) for source_id in source_ids}
+
+    async def _mapping_rows(self, source_ids: list[int]) -> list[dict]:
+        return await self.client.query(
+            collection_name=self.collection_name,
+            filter=f"source_id in {list(source_ids)}",
+            output_fields=["source_id", "content_hash", "pdf_id"],
+            consistency_level="Strong"
+        )
+
+    async def release(self, source_ids: list[int]) -> list[int]:
+        """
+        Elimina la referencia de cada source a su contenido.
+        Devuelve los pdf_ids que quedaron sin referencias y cuyos vectores deben borrarse.
+
+        Se toma el lock de cada contenido afectado (el mismo que la ingesta), así una ingesta
+        concurrente del mismo contenido no mapea un source nuevo a un pdf_id que se está por purgar.
+        """
+        if not source_ids:
+            return []
+
+        while True:
+            content_hashes = sorted({row["content_hash"] for row in await self._mapping_rows(source_ids)})
+
+            async with AsyncExitStack() as stack:
+                for content_hash in content_hashes:  # Orden fijo: dos releases no se bloquean mutuamente
+                    await stack.enter_async_context(self.lock(content_hash))
+
+                rows = await self._mapping_rows(source_ids)
+                if sorted({row["content_hash"] for row in rows}) != content_hashes:
+                    continue  # Un source cambió de contenido mientras se esperaba el lock
+
+                mapping = {row["source_id"]: row["pdf_id"] for row in rows}
+
+                await self.client.delete(
+                    collection_name=self.collection_name,
+                    filter=f"source_id in {list(source_ids)}"
+                )
+
+                orphaned = []
+
+                # Los sources legacy (sin fila) apuntan a sí mismos
+                for pdf_id in sorted({mapping.get(source_id, source_id) for source_id in source_ids}):
+                    # Strong: el conteo tiene que ver el delete recién hecho
+                    res = await self.client.query(
+                        collection_name=self.collection_name,
+                        filter=f"pdf_id == {pdf_id}",
+                        output_fields=["count(*)"],
+                        consistency_level="Strong"
+                    )
+
+                    if not res or res[0]["count(*)"] == 0:
+                        orphaned.append(pdf_id)
+
+                return orphaned
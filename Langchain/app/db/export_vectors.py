@@ -0,0 +1,63 @@
+"""
+Exporta los vectores de precisión completa de una colección a un archivo local memory-mapped.
+
+Con MILVUS_RETRIEVAL_MODE=binary_rescore el rescoring lee los vectores de los candidatos de
+este archivo (configurado en MILVUS_VECTOR_FILE) en lugar de pedírselos a Milvus. Los chunks
+insertados después de exportar se siguen leyendo de Milvus; conviene re-exportar cada tanto.
+
+Uso (desde el directorio Langchain):
+    python -m app.db.export_vectors --output app/cache/vectors
+"""
+import argparse
+import time
+
+from .milvus import Milvus_Sync_Client
+from .rescoring import VectorFile
+from .vector_codec import VectorCodec
+
+
+def export(collection_name: str, output: str, batch_size: int):
+    sync_client = Milvus_Sync_Client()
+    client = sync_client.client
+
+    try:
+        field = next(f for f in client.describe_collection(collection_name=collection_name)["fields"] if f["name"] == "vector_chunk")
+        codec = VectorCodec(vector_type=field["type"].name, dim=int(field["params"]["dim"]))
+        count = client.query(collection_name=collection_name, filter="", output_fields=["count(*)"])[0]["count(*)"]
+
+        def rows():
+            iterator = client.query_iterator(collection_name=collection_name, batch_size=batch_size, filter="", output_fields=["vector_chunk"])
+
+            try:
+                while True:
+                    batch = iterator.next()
+                    if not batch:
+                        return
+
+                    for row in batch:
+                        yield row["id"], codec.decode(row["vector_chunk"])
+            finally:
+                iterator.close()
+
+        started = time.perf_counter()
+        written = VectorFile.write(path=output, rows=rows(), dim=codec.dim, count=count)
+
+        print(f"[EXPORT] {written} vectores de {collection_name} exportados a {output}.*.npy en {time.perf_counter() - started:.1f}s")
+        print(f"[EXPORT] Configurá MILVUS_VECTOR_FILE={output}")
+
+    finally:
+        sync_client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", default="documents_collection", help="Colección a exportar")
+    parser.add_argument("--output", required=True, help="Prefijo de los archivos .npy de salida")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Filas leídas por batch")
+    args = parser.parse_args()
+
+    export(collection_name=args.collection, output=args.output, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
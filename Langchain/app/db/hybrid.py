@@ -0,0 +1,54 @@
+from typing import Union
+
+from pymilvus import AnnSearchRequest, DataType, Function, FunctionType, RRFRanker, WeightedRanker
+
+from ..config import conf
+
+HYBRID_RANKERS = ("rrf", "weighted")
+
+
+def add_bm25_fields(schema):
+    """
+    Agrega sparse_vector al esquema y la función BM25 de Milvus que lo genera a partir de text_chunk
+    en cada insert (text_chunk tiene que tener enable_analyzer=True). No se inserta desde la ingesta.
+    """
+    schema.add_field(field_name="sparse_vector", datatype=DataType.SPARSE_FLOAT_VECTOR)
+    schema.add_function(Function(
+        name="text_chunk_bm25",
+        function_type=FunctionType.BM25,
+        input_field_names=["text_chunk"],
+        output_field_names=["sparse_vector"]
+    ))
+
+
+def add_bm25_index(index_params):
+    index_params.add_index(
+        field_name="sparse_vector",
+        index_type="SPARSE_INVERTED_INDEX",
+        index_name="sparse_index",
+        metric_type="BM25",
+        params={"inverted_index_algo": "DAAT_MAXSCORE"}
+    )
+
+
+def make_ranker(
+    kind: str = conf.MILVUS_HYBRID_RANKER,
+    rrf_k: int = conf.MILVUS_HYBRID_RRF_K,
+    dense_weight: float = conf.MILVUS_HYBRID_DENSE_WEIGHT
+) -> Union[RRFRanker, WeightedRanker]:
+    """RRF (solo usa la posición en cada lista) o suma ponderada de los scores normalizados (denso, BM25)."""
+    if kind == "rrf":
+        return RRFRanker(rrf_k)
+
+    if kind == "weighted":
+        return WeightedRanker(dense_weight, 1.0 - dense_weight)
+
+    raise ValueError(f"Unknown hybrid ranker '{kind}'. Use one of {list(HYBRID_RANKERS)}")
+
+
+def hybrid_requests(dense_vector, query_text: str, filter: str, candidates: int, dense_search_params: dict) -> list[AnnSearchRequest]:
+    """Búsqueda densa sobre vector_chunk y BM25 sobre sparse_vector (el texto se tokeniza en Milvus), con el mismo filtro."""
+    return [
+        AnnSearchRequest(data=[dense_vector], anns_field="vector_chunk", param=dense_search_params, limit=candidates, expr=filter or None),
+        AnnSearchRequest(data=[query_text], anns_field="sparse_vector", param={"metric_type": "BM25"}, limit=candidates, expr=filter or None),
+    ]
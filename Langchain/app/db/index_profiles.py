@@ -0,0 +1,55 @@
+from typing import Optional
+
+
+# Perfiles de índice para vector_chunk: tipo de índice, parámetros de construcción y de búsqueda.
+# Se eligen por colección al crearla (MILVUS_INDEX_PROFILE por defecto); benchmarks/bench_index_profiles.py
+# mide recall, latencia, tiempo de construcción y memoria de cada uno.
+INDEX_PROFILES = {
+    # Grafo HNSW: el default histórico (M=16, efConstruction=256), ahora con ef explícito al buscar
+    "hnsw": {"index_type": "HNSW", "params": {"M": 16, "efConstruction": 256}, "search_params": {"ef": 64}},
+    # Menos vecinos por nodo: grafo más chico y construcción más rápida, algo menos de recall
+    "hnsw_fast": {"index_type": "HNSW", "params": {"M": 8, "efConstruction": 128}, "search_params": {"ef": 32}},
+    # Más vecinos y ef más alto: mejor recall a cambio de memoria y latencia
+    "hnsw_accurate": {"index_type": "HNSW", "params": {"M": 32, "efConstruction": 400}, "search_params": {"ef": 128}},
+    # HNSW con cuantización escalar a 8 bits de los vectores del índice
+    "hnsw_sq": {"index_type": "HNSW_SQ", "params": {"M": 16, "efConstruction": 256, "sq_type": "SQ8"}, "search_params": {"ef": 64}},
+    # Listas invertidas con vectores completos / cuantizados a 8 bits
+    "ivf_flat": {"index_type": "IVF_FLAT", "params": {"nlist": 1024}, "search_params": {"nprobe": 16}},
+    "ivf_sq8": {"index_type": "IVF_SQ8", "params": {"nlist": 1024}, "search_params": {"nprobe": 16}},
+    # Índice en disco (Vamana): en memoria solo quedan códigos PQ, los vectores se leen del SSD
+    "diskann": {"index_type": "DISKANN", "params": {}, "search_params": {"search_list": 100}},
+}
+
+# Parámetro de búsqueda que tiene que ser >= limit en cada tipo de índice
+_MIN_LIMIT_PARAMS = {"HNSW": "ef", "HNSW_SQ": "ef", "DISKANN": "search_list"}
+
+
+def get_profile(name: str) -> dict:
+    if name not in INDEX_PROFILES:
+        raise ValueError(f"Unknown index profile '{name}'. Use one of {list(INDEX_PROFILES)}")
+
+    return INDEX_PROFILES[name]
+
+
+def find_profile(index_type: str, params: dict) -> Optional[str]:
+    """Perfil que corresponde a un índice existente (según describe_index), o None si no coincide ninguno."""
+    for name, profile in INDEX_PROFILES.items():
+        if profile["index_type"] != index_type:
+            continue
+
+        if all(str(params.get(key)) == str(value) for key, value in profile["params"].items()):
+            return name
+
+    return None
+
+
+def search_params(name: str, limit: int, metric_type: str = "COSINE") -> dict:
+    """search_params para buscar con un perfil, ajustando ef / search_list para que no queden por debajo de limit."""
+    profile = get_profile(name)
+    params = dict(profile["search_params"])
+
+    key = _MIN_LIMIT_PARAMS.get(profile["index_type"])
+    if key is not None:
+        params[key] = max(params[key], limit)
+
+    return {"metric_type": metric_type, "params": params}
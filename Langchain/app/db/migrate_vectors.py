@@ -0,0 +1,159 @@
+"""
+Migra vector_chunk de una colección existente a otra representación (dimensión, tipo de vector y perfil de índice),
+agregando o quitando binary_vector para la búsqueda en dos etapas (MILVUS_RETRIEVAL_MODE=binary_rescore),
+la partition key sobre pdf_id (MILVUS_PARTITION_KEY) y sparse_vector con BM25 para la búsqueda híbrida
+(MILVUS_RETRIEVAL_MODE=hybrid).
+
+Copia todas las filas a una colección nueva con el esquema pedido: cada vector se trunca a la
+dimensión destino (Matryoshka), se re-normaliza y se guarda en el tipo destino, sin volver a
+llamar al proveedor de embeddings. Al terminar verifica la cantidad de filas y reemplaza la
+colección original (que se conserva como respaldo con --keep-old).
+
+Correrlo con el servicio detenido: lo que se inserte durante la copia no se migra.
+Solo se puede reducir la dimensión: pasar a más dimensiones requiere volver a embeber los textos.
+Después de migrar hay que configurar EMBEDDING_DIMENSION / MILVUS_VECTOR_TYPE / MILVUS_INDEX_PROFILE
+(y MILVUS_RETRIEVAL_MODE / MILVUS_PARTITION_KEY) con los mismos valores, así los embeddings nuevos coinciden con los guardados.
+
+Uso (desde el directorio Langchain):
+    python -m app.db.migrate_vectors --dim 1536 --vector-type FLOAT16_VECTOR --index hnsw
+"""
+import argparse
+import time
+
+from .milvus import Milvus_Sync_Client
+from .index_profiles import INDEX_PROFILES
+from .rescoring import binary_encode
+from .vector_codec import VECTOR_TYPES, VectorCodec, truncate_and_normalize
+from ..config import conf
+
+
+def _vector_field(client, collection_name: str) -> tuple[int, str]:
+    for field in client.describe_collection(collection_name=collection_name)["fields"]:
+        if field["name"] == "vector_chunk":
+            return int(field["params"]["dim"]), field["type"].name
+
+    raise ValueError(f"{collection_name} has no vector_chunk field")
+
+
+def migrate(collection_name: str, dim: int, vector_type: str, index_profile: str, binary: bool, partition_key: bool, num_partitions: int, hybrid: bool, batch_size: int, keep_old: bool):
+    sync_client = Milvus_Sync_Client()
+    client = sync_client.client
+
+    try:
+        source_dim, source_type = _vector_field(client, collection_name)
+
+        if dim > source_dim:
+            raise ValueError(f"Cannot migrate {source_dim} -> {dim} dimensions: increasing the dimension requires re-embedding")
+
+        source_codec = VectorCodec(vector_type=source_type, dim=source_dim)
+        target_codec = VectorCodec(vector_type=vector_type, dim=dim)
+        target_name = f"{collection_name}_migrating"
+
+        if target_name in client.list_collections():
+            client.drop_collection(collection_name=target_name)  # Restos de una migración interrumpida
+
+        sync_client.create_milvus_collection(
+            target_name, dim=dim, vector_type=vector_type, index_profile=index_profile, binary_vector=binary,
+            partition_key=partition_key, num_partitions=num_partitions, hybrid=hybrid
+        )
+
+        print(f"[MIGRATE] {collection_name}: {source_type}/{source_dim} -> {vector_type}/{dim} ({index_profile}{', binary_vector' if binary else ''}{f', partition key pdf_id x{num_partitions}' if partition_key else ''}{', BM25' if hybrid else ''})")
+
+        started = time.perf_counter()
+        copied = 0
+        iterator = client.query_iterator(collection_name=collection_name, batch_size=batch_size, filter="", output_fields=["*"])
+
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+
+                data = []
+                for row in rows:
+                    row = dict(row)
+                    row.pop("id", None)  # auto_id: la colección nueva asigna sus propias claves
+
+                    vector = truncate_and_normalize(source_codec.decode(row["vector_chunk"]), dim)
+                    row["vector_chunk"] = target_codec.encode(vector)
+
+                    row.pop("sparse_vector", None)  # Salida de la función BM25: Milvus la recalcula al insertar
+                    row.pop("binary_vector", None)
+                    if binary:
+                        row["binary_vector"] = binary_encode(vector)
+                    data.append(row)
+
+                client.insert(collection_name=target_name, data=data)
+                copied += len(data)
+                print(f"[MIGRATE] {copied} filas copiadas")
+        finally:
+            iterator.close()
+
+        client.flush(collection_name=target_name)
+        source_rows = client.query(collection_name=collection_name, filter="", output_fields=["count(*)"])[0]["count(*)"]
+        target_rows = client.query(collection_name=target_name, filter="", output_fields=["count(*)"])[0]["count(*)"]
+
+        if source_rows != target_rows:
+            raise RuntimeError(f"Row count mismatch after copying: {source_rows} in {collection_name}, {target_rows} in {target_name}")
+
+        # Reemplazo de la colección original
+        if keep_old:
+            backup_name = f"{collection_name}_backup_{int(time.time())}"
+            client.rename_collection(old_name=collection_name, new_name=backup_name)
+            print(f"[MIGRATE] Colección original conservada como {backup_name}")
+        else:
+            client.drop_collection(collection_name=collection_name)
+
+        client.rename_collection(old_name=target_name, new_name=collection_name)
+
+        before = source_codec.bytes_per_vector
+        after = target_codec.bytes_per_vector
+        print(
+            f"[MIGRATE] {target_rows} filas migradas en {time.perf_counter() - started:.1f}s. "
+            f"Vector por chunk: {before} -> {after} bytes ({after / before:.0%})"
+        )
+        print(f"[MIGRATE] Configurá EMBEDDING_DIMENSION={dim} MILVUS_VECTOR_TYPE={vector_type} MILVUS_INDEX_PROFILE={index_profile} MILVUS_PARTITION_KEY={partition_key}")
+
+    finally:
+        sync_client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", default="documents_collection", help="Colección a migrar")
+    parser.add_argument("--dim", type=int, default=conf.EMBEDDING_DIMENSION, help="Dimensión destino")
+    parser.add_argument("--vector-type", default=conf.MILVUS_VECTOR_TYPE, choices=list(VECTOR_TYPES), help="Tipo de vector destino")
+    parser.add_argument("--index", default=conf.MILVUS_INDEX_PROFILE, choices=list(INDEX_PROFILES), help="Perfil de índice destino")
+    parser.add_argument(
+        "--binary", action=argparse.BooleanOptionalAction, default=conf.MILVUS_RETRIEVAL_MODE == "binary_rescore",
+        help="Agrega binary_vector para la búsqueda en dos etapas"
+    )
+    parser.add_argument(
+        "--partition-key", action=argparse.BooleanOptionalAction, default=conf.MILVUS_PARTITION_KEY,
+        help="Usa pdf_id como partition key"
+    )
+    parser.add_argument(
+        "--hybrid", action=argparse.BooleanOptionalAction, default=conf.MILVUS_RETRIEVAL_MODE == "hybrid",
+        help="Agrega sparse_vector (BM25 sobre text_chunk) para la búsqueda híbrida"
+    )
+    parser.add_argument("--num-partitions", type=int, default=conf.MILVUS_NUM_PARTITIONS, help="Particiones de la partition key")
+    parser.add_argument("--batch-size", type=int, default=500, help="Filas copiadas por batch")
+    parser.add_argument("--keep-old", action="store_true", help="Conserva la colección original renombrada como respaldo")
+    args = parser.parse_args()
+
+    migrate(
+        collection_name=args.collection,
+        dim=args.dim,
+        vector_type=args.vector_type,
+        index_profile=args.index,
+        binary=args.binary,
+        partition_key=args.partition_key,
+        num_partitions=args.num_partitions,
+        hybrid=args.hybrid,
+        batch_size=args.batch_size,
+        keep_old=args.keep_old
+    )
+
+
+if __name__ == "__main__":
+    main()
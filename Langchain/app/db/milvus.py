@@ -1,7 +1,19 @@
+import asyncio
+import time
+from typing import Optional
+
 from pymilvus import MilvusClient, DataType, AsyncMilvusClient
 
+from .bulk_insert import BulkInserter, BulkInsertError
+from .vector_codec import VectorCodec
+from .rescoring import BinaryRescoreSearcher, VectorFile, binary_encode
+from .index_profiles import find_profile, get_profile, search_params
+from .hybrid import add_bm25_fields, add_bm25_index, hybrid_requests, make_ranker
 from ..config import conf
 
+DOCUMENTS_COLLECTION = "documents_collection"
+SOURCES_COLLECTION = "sources_collection"
+
 
 def _get_milvus_connection():
     uri = (conf.ZILLIZ_URI or "").strip() or (conf.MILVUS_URI or "").strip()
@@ -18,24 +30,171 @@ class Async_Milvus_Client:
         
         # Uncomment the following line to use Milvus local (desarrollo) and comment the line above.
         # self.client = AsyncMilvusClient(uri=conf.MILVUS_URI, db_name="estudia_db")
+
+        # Inserts por batches acotados en bytes, compartidos por todos los que usan este cliente
+        self.bulk_inserter = BulkInserter(client=self.client)
+
+        # Formato de vector_chunk (dimensión y tipo configurados)
+        self.codec = VectorCodec()
+
+        # Búsqueda en dos etapas: binary_vector (Hamming) + rescoring con los vectores completos
+        self.binary_rescore = conf.MILVUS_RETRIEVAL_MODE == "binary_rescore"
+        self.rescore_searcher = BinaryRescoreSearcher(
+            client=self.client,
+            codec=self.codec,
+            candidates=conf.MILVUS_RESCORE_CANDIDATES,
+            vector_file=VectorFile(conf.MILVUS_VECTOR_FILE) if conf.MILVUS_VECTOR_FILE else None
+        ) if self.binary_rescore else None
+
+        # Búsqueda híbrida: densa + BM25 (sparse_vector lo genera Milvus desde text_chunk) fusionadas con RRF o pesos
+        self.hybrid = conf.MILVUS_RETRIEVAL_MODE == "hybrid"
+        self.hybrid_ranker = make_ranker() if self.hybrid else None
+
+        # Perfil de índice de cada colección (se resuelve con describe_index la primera vez que se busca)
+        self._index_profiles: dict[str, str] = {}
+
+    async def bootstrap(
+        self,
+        documents_collection: str = DOCUMENTS_COLLECTION,
+        sources_collection: str = SOURCES_COLLECTION,
+        warmup: bool = conf.MILVUS_WARMUP
+    ) -> dict:
+        """
+        Paso explícito de arranque: crea el esquema si falta y precalienta las colecciones.
+        Es idempotente y no bloquea el event loop. Devuelve los segundos de cada etapa.
+        """
+        timings = {}
+
+        started = time.perf_counter()
+        await asyncio.to_thread(bootstrap_collections, documents_collection, sources_collection)
+        timings["provision"] = time.perf_counter() - started
+
+        if warmup:
+            started = time.perf_counter()
+            await self.warm_up(documents_collection, sources_collection)
+            timings["warmup"] = time.perf_counter() - started
+
+        print("[MILVUS] Bootstrap: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()))
+        return timings
+
+    async def warm_up(self, documents_collection: str = DOCUMENTS_COLLECTION, sources_collection: str = SOURCES_COLLECTION):
+        """
+        Carga las colecciones en memoria y hace una búsqueda de prueba, así la primera consulta
+        de un usuario no paga la conexión, la carga de segmentos ni la lectura del índice.
+        """
+        await asyncio.gather(
+            self.client.load_collection(collection_name=documents_collection),
+            self.client.load_collection(collection_name=sources_collection)
+        )
+
+        await self.index_profile(documents_collection)
+
+        probe = [0.0] * self.codec.dim
+        probe[0] = 1.0
+        await self.get_document(query_vector=probe, collection_name=documents_collection, limit=1)
+
+    async def close(self):
+        await self.client.close()
+
+    async def index_profile(self, collection_name: str) -> str:
+        """Perfil del índice de vector_chunk de una colección, para buscar con sus search_params."""
+        if collection_name not in self._index_profiles:
+            profile = None
+
+            try:
+                index = await self.client.describe_index(collection_name=collection_name, index_name="vector_index")
+                profile = find_profile(index.get("index_type"), {**index, **index.get("params", {})})
+            except Exception as e:
+                print(f"No se pudo leer el índice de {collection_name}: {e}")
+
+            self._index_profiles[collection_name] = profile or conf.MILVUS_INDEX_PROFILE
+
+        return self._index_profiles[collection_name]
     
     async def delete_documents(self, collection_name: str, ids: list[int]):
+        """Elimina todos los chunks de los pdf_ids indicados."""
         return await self.client.delete(
             collection_name=collection_name,
-            ids=ids
+            filter=f"pdf_id in {list(ids)}"
         )
 
-    async def upload_document(self,data: list[dict], collection_name : str,  ):
-        
-        res = await self.client.insert(
-            collection_name = collection_name,
-            data = data
+    async def query_chunks(self, collection_name: str, pdf_id: int, output_fields: list[str], page_size: int = 1000) -> list[dict]:
+        """
+        Devuelve todos los chunks guardados para un pdf_id, paginando la consulta.
+        (Milvus limita offset + limit a 16384 filas por consulta.)
+        """
+        rows = []
+        offset = 0
+
+        while True:
+            page = await self.client.query(
+                collection_name=collection_name,
+                filter=f"pdf_id == {pdf_id}",
+                output_fields=output_fields,
+                limit=page_size,
+                offset=offset
+            )
+
+            rows.extend(page)
+
+            if len(page) < page_size:
+                return rows
+
+            offset += page_size
+
+    async def get_chunks(self, collection_name: str, ids: list[int], output_fields: list[str]) -> list[dict]:
+        """Obtiene chunks por su clave primaria."""
+        if not ids:
+            return []
+
+        return await self.client.get(
+            collection_name=collection_name,
+            ids=list(ids),
+            output_fields=output_fields
         )
-    
-        print(f"resultado de la insercion: {res}, en la coleccion: {collection_name}")
 
+    async def delete_chunks(self, collection_name: str, ids: list[int]):
+        """Elimina chunks puntuales por su clave primaria."""
+        if not ids:
+            return None
+
+        return await self.client.delete(
+            collection_name=collection_name,
+            ids=list(ids)
+        )
+
+    async def bulk_insert(self, data: list[dict], collection_name: str) -> dict:
+        """
+        Inserta las filas por batches acotados en bytes, con inserts en vuelo limitados y
+        reintento de los batches que fallan. Devuelve el reporte de la ingesta (ver BulkInserter).
+        """
+        return await self.bulk_inserter.insert(collection_name=collection_name, data=data)
+
+    async def upload_document(self, data: list[dict], collection_name: str) -> dict:
+        """Inserta las filas con bulk_insert; si algún batch no se pudo insertar lanza BulkInsertError."""
+        data = [self._encode_row(row) for row in data]
+
+        report = await self.bulk_insert(data=data, collection_name=collection_name)
 
-    async def get_document(self, query_vector: list[float], collection_name: str, filter: str = "", ids: list[int] = None):
+        if report["failed"]:
+            raise BulkInsertError(report)
+
+        return report
+
+
+    def _encode_row(self, row: dict) -> dict:
+        """Codifica vector_chunk con el tipo configurado y agrega binary_vector si la búsqueda es en dos etapas."""
+        row = {**row, "vector_chunk": self.codec.encode(row["vector_chunk"])}
+
+        if self.binary_rescore:
+            row["binary_vector"] = binary_encode(self.codec.decode(row["vector_chunk"]))
+
+        return row
+
+    async def get_document(
+        self, query_vector: list[float], collection_name: str, filter: str = "", ids: list[int] = None, limit: int = conf.MILVUS_SEARCH_LIMIT,
+        query_text: Optional[str] = None
+    ):
         
         # Construir filtro por IDs si se proporcionan
         if ids and len(ids) > 0:
@@ -44,13 +203,48 @@ class Async_Milvus_Client:
             final_filter = f"({filter}) and ({ids_filter})" if filter else ids_filter
         else:
             final_filter = filter
+
+        if self.binary_rescore:
+            lista = await self.rescore_searcher.search(
+                query_vector=query_vector,
+                collection_name=collection_name,
+                filter=final_filter,
+                limit=limit,
+                output_fields=["text_chunk", "pdf_id"]
+            )
+
+            print(f"Documentos encontrados con filtro '{final_filter}' (binario + rescoring): {len(lista)}")
+            return lista
         
+        profile = await self.index_profile(collection_name)
+
+        if self.hybrid and query_text:
+            candidates = max(limit, conf.MILVUS_HYBRID_CANDIDATES)
+
+            res = await self.client.hybrid_search(
+                collection_name=collection_name,
+                reqs=hybrid_requests(
+                    dense_vector=self.codec.encode(query_vector),
+                    query_text=query_text,
+                    filter=final_filter,
+                    candidates=candidates,
+                    dense_search_params=search_params(profile, limit=candidates)
+                ),
+                ranker=self.hybrid_ranker,
+                limit=limit,
+                output_fields=["text_chunk", "pdf_id"]
+            )
+
+            lista = [hit for hits in res for hit in hits]
+            print(f"Documentos encontrados con filtro '{final_filter}' (híbrida): {len(lista)}")
+            return lista
+
         res = await self.client.search(
             collection_name=collection_name,
             anns_field = "vector_chunk",
-            data = [query_vector],
-            limit = 5,
-            search_params={"metric_type":"COSINE"},
+            data = [self.codec.encode(query_vector)],
+            limit = limit,
+            search_params=search_params(profile, limit=limit),
             filter = final_filter,
             output_fields = ["text_chunk", "pdf_id"]
         )
@@ -64,6 +258,65 @@ class Async_Milvus_Client:
         print(f"Documentos encontrados con filtro '{final_filter}': {len(lista)}")     
         return lista
 
+    async def get_documents_by_pdf(
+        self, query_vector: list[float], collection_name: str, pdf_ids: list[int], per_document: int = conf.MILVUS_SEARCH_LIMIT,
+        query_text: Optional[str] = None
+    ) -> dict[int, list]:
+        """
+        Top-`per_document` chunks de cada pdf_id en una sola búsqueda agrupada por pdf_id (group_by_field),
+        en lugar de una búsqueda por documento. Si el índice no soporta agrupar, o el modo de búsqueda no
+        es la densa sobre vector_chunk (binary_rescore, o hybrid con query_text), hace una búsqueda por
+        documento con get_document y concurrencia acotada (MILVUS_SEARCH_MAX_CONCURRENCY).
+        """
+        pdf_ids = list(dict.fromkeys(pdf_ids))
+        if not pdf_ids:
+            return {}
+
+        # La búsqueda agrupada es densa: los otros modos se respetan buscando por documento
+        if self.binary_rescore or (self.hybrid and query_text):
+            return await self._search_each_document(query_vector, collection_name, pdf_ids, per_document, query_text)
+
+        profile = await self.index_profile(collection_name)
+        grouped = {pdf_id: [] for pdf_id in pdf_ids}
+
+        try:
+            res = await self.client.search(
+                collection_name=collection_name,
+                anns_field="vector_chunk",
+                data=[self.codec.encode(query_vector)],
+                limit=len(pdf_ids),  # Con group_by_field limit es la cantidad de grupos
+                search_params=search_params(profile, limit=len(pdf_ids) * per_document),
+                filter=f"pdf_id in {pdf_ids}",
+                output_fields=["text_chunk", "pdf_id"],
+                group_by_field="pdf_id",
+                group_size=per_document,
+                strict_group_size=False
+            )
+        except Exception as e:
+            print(f"Búsqueda agrupada por pdf_id no disponible ({e}); se busca por documento")
+            return await self._search_each_document(query_vector, collection_name, pdf_ids, per_document, query_text)
+
+        for hits in res:
+            for hit in hits:
+                grouped.setdefault(hit["entity"]["pdf_id"], []).append(hit)
+
+        print(f"Documentos encontrados agrupados por pdf_id ({len(pdf_ids)} PDFs): {sum(len(hits) for hits in grouped.values())}")
+        return grouped
+
+    async def _search_each_document(
+        self, query_vector: list[float], collection_name: str, pdf_ids: list[int], per_document: int, query_text: Optional[str]
+    ) -> dict[int, list]:
+        """Una búsqueda por pdf_id con get_document (mismo modo de búsqueda que el chat), con concurrencia acotada."""
+        semaphore = asyncio.Semaphore(conf.MILVUS_SEARCH_MAX_CONCURRENCY)
+
+        async def search_one(pdf_id: int) -> list:
+            async with semaphore:
+                return await self.get_document(
+                    query_vector=query_vector, collection_name=collection_name, ids=[pdf_id], limit=per_document, query_text=query_text
+                )
+
+        return dict(zip(pdf_ids, await asyncio.gather(*(search_one(pdf_id) for pdf_id in pdf_ids))))
+
                       
 class Milvus_Sync_Client:   
     def __init__(self):
@@ -73,12 +326,23 @@ class Milvus_Sync_Client:
         # Uncomment the following line to use Milvus local (desarrollo) and comment the line above.
         # self.client = MilvusClient(uri=conf.MILVUS_URI, db_name="estudia_db") 
               
-    def create_milvus_collection(self,name: str):
+    def create_milvus_collection(
+        self,
+        name: str,
+        dim: int = conf.EMBEDDING_DIMENSION,
+        vector_type: str = conf.MILVUS_VECTOR_TYPE,
+        index_profile: str = conf.MILVUS_INDEX_PROFILE,
+        binary_vector: bool = conf.MILVUS_RETRIEVAL_MODE == "binary_rescore",
+        partition_key: bool = conf.MILVUS_PARTITION_KEY,
+        num_partitions: int = conf.MILVUS_NUM_PARTITIONS,
+        hybrid: bool = conf.MILVUS_RETRIEVAL_MODE == "hybrid"
+    ):
         """"Crea una coleccion en Milvus con el esquema e indices definidos."""
         
         if name in self.client.list_collections():
             
             print(f"La coleccion {name} ya existe")
+            self.check_schema(name=name, dim=dim, vector_type=vector_type, binary_vector=binary_vector, partition_key=partition_key, hybrid=hybrid)
             return None
         
         # <-- Esquema -->
@@ -88,26 +352,45 @@ class Milvus_Sync_Client:
         )
 
         schema.add_field(field_name="id", datatype=DataType.INT64, is_primary=True, auto_id=True)
-        schema.add_field(field_name="vector_chunk", datatype=DataType.FLOAT_VECTOR, dim=3072) ##dim 1536 | recomendada para Gemini
-        schema.add_field(field_name="text_chunk", datatype=DataType.VARCHAR, max_length=2000)
-        schema.add_field(field_name="pdf_id", datatype=DataType.INT64)  # Campo para filtrar por PDF
+        # Con búsqueda en dos etapas los vectores completos solo se leen para el rescoring: quedan en disco (mmap)
+        schema.add_field(field_name="vector_chunk", datatype=VectorCodec(vector_type=vector_type, dim=dim).data_type, dim=dim, mmap_enabled=binary_vector) ##dim 1536 | recomendada para Gemini
+        schema.add_field(field_name="text_chunk", datatype=DataType.VARCHAR, max_length=2000, enable_analyzer=hybrid)  # El analyzer tokeniza para BM25
+        # Campo para filtrar por PDF. Como partition key, las búsquedas con pdf_id == / in [...] solo recorren
+        # las particiones de esos PDFs en lugar de filtrar sobre el índice de toda la colección
+        schema.add_field(field_name="pdf_id", datatype=DataType.INT64, is_partition_key=partition_key)
         schema.add_field(field_name="metadata", datatype=DataType.JSON, nullable=True) ##Datos adicionales que sirven para filtrar la busqueda
 
+        if binary_vector:
+            schema.add_field(field_name="binary_vector", datatype=DataType.BINARY_VECTOR, dim=dim)  # 1 bit por dimensión, búsqueda gruesa
+
+        if hybrid:
+            add_bm25_fields(schema)  # sparse_vector + función BM25 sobre text_chunk
+
         ## <-- Indices -->
         index_params = self.client.prepare_index_params()
 
+        profile = get_profile(index_profile)  # Perfiles en index_profiles.py (benchmarks/bench_index_profiles.py los compara)
 
         index_params.add_index(
             field_name="vector_chunk", 
-            index_type="HNSW",  ##Prepara un grafo con los vecinos mas cercanos | Pesadito (hay que evaluarlo)
+            index_type=profile["index_type"],
             index_name="vector_index", 
             metric_type="COSINE",
-            params={
-                "M": 16, 
-                "efConstruction": 256
-            } 
+            params=profile["params"]
         )
+
+        if binary_vector:
+            index_params.add_index(
+                field_name="binary_vector",
+                index_type="BIN_IVF_FLAT",
+                index_name="binary_index",
+                metric_type="HAMMING",
+                params={"nlist": 1024}
+            )
         
+        if hybrid:
+            add_bm25_index(index_params)
+
         index_params.add_index(
             field_name="text_chunk",
             index_type="INVERTED"  # Recomendado para VARCHAR
@@ -117,9 +400,16 @@ class Milvus_Sync_Client:
         collection = self.client.create_collection(
             collection_name=name,
             schema=schema,
-            index_params=index_params
+            index_params=index_params,
+            **({"num_partitions": num_partitions} if partition_key else {})
         )
 
+        if binary_vector:
+            # El índice de vector_chunk también se mapea desde disco: en memoria queda solo el binario
+            self.client.release_collection(collection_name=name)
+            self.client.alter_index_properties(collection_name=name, index_name="vector_index", properties={"mmap.enabled": True})
+            self.client.load_collection(collection_name=name)
+
         ##Cargamos la coleccion en memoria
         res = self.client.get_load_state(
             collection_name=name
@@ -127,6 +417,80 @@ class Milvus_Sync_Client:
 
         print(res)
         
+    def check_schema(self, name: str, dim: int, vector_type: str, binary_vector: bool = False, partition_key: bool = False, hybrid: bool = False) -> bool:
+        """Avisa de todas las diferencias de vector_chunk, binary_vector, sparse_vector o la partition key entre una colección existente y la configuración."""
+        fields = self.client.describe_collection(collection_name=name)["fields"]
+        mismatches = []
+
+        if hybrid and not any(field["name"] == "sparse_vector" for field in fields):
+            mismatches.append(
+                f"{name} no tiene sparse_vector (BM25) y MILVUS_RETRIEVAL_MODE=hybrid lo necesita. "
+                f"Migrala con: python -m app.db.migrate_vectors --collection {name} --hybrid"
+            )
+
+        stored_partition_key = any(field["name"] == "pdf_id" and field.get("is_partition_key", False) for field in fields)
+        if stored_partition_key != partition_key:
+            mismatches.append(
+                f"{name}.pdf_id {'es' if stored_partition_key else 'no es'} partition key y MILVUS_PARTITION_KEY={partition_key}. "
+                f"Migrala con: python -m app.db.migrate_vectors --collection {name} {'--partition-key' if partition_key else '--no-partition-key'}"
+            )
+
+        if binary_vector and not any(field["name"] == "binary_vector" for field in fields):
+            mismatches.append(
+                f"{name} no tiene binary_vector y MILVUS_RETRIEVAL_MODE=binary_rescore lo necesita. "
+                f"Migrala con: python -m app.db.migrate_vectors --collection {name} --binary"
+            )
+
+        for field in fields:
+            if field["name"] != "vector_chunk":
+                continue
+
+            stored_dim = int(field.get("params", {}).get("dim", 0))
+            stored_type = field["type"].name
+
+            if stored_dim != dim or stored_type != vector_type:
+                mismatches.append(
+                    f"{name}.vector_chunk es {stored_type}/{stored_dim} pero la configuración pide {vector_type}/{dim}. "
+                    f"Migrala con: python -m app.db.migrate_vectors --collection {name}"
+                )
+
+        for mismatch in mismatches:
+            print(f"ADVERTENCIA: {mismatch}")
+
+        return not mismatches
+
+    def create_sources_collection(self, name: str):
+        """Crea la coleccion que mapea cada source al contenido (hash del PDF) y al pdf_id que guarda sus vectores."""
+
+        if name in self.client.list_collections():
+
+            print(f"La coleccion {name} ya existe")
+            return None
+
+        schema = MilvusClient.create_schema(
+            auto_id=False,
+            enable_dynamic_field=False,
+        )
+
+        schema.add_field(field_name="source_id", datatype=DataType.INT64, is_primary=True)
+        schema.add_field(field_name="content_hash", datatype=DataType.VARCHAR, max_length=64)  # SHA-256 de los bytes del PDF
+        schema.add_field(field_name="pdf_id", datatype=DataType.INT64)  # pdf_id con el que se guardaron los chunks en documents_collection
+        schema.add_field(field_name="placeholder_vector", datatype=DataType.FLOAT_VECTOR, dim=2)  # Milvus exige al menos un campo vectorial
+
+        index_params = self.client.prepare_index_params()
+
+        index_params.add_index(field_name="placeholder_vector", index_type="FLAT", metric_type="L2")
+        index_params.add_index(field_name="content_hash", index_type="INVERTED")
+        index_params.add_index(field_name="pdf_id", index_type="INVERTED")
+
+        self.client.create_collection(
+            collection_name=name,
+            schema=schema,
+            index_params=index_params
+        )
+
+        print(self.client.get_load_state(collection_name=name))
+
     def remove_collection(self, name_collection: str):
          self.client.drop_collection(
             collection_name=name_collection
@@ -156,11 +520,19 @@ def check_database_exist():
     #     print(f"La base de datos {"estudia_db"} ya existe")
     
     client.close() 
-    
 
-##Instancias de clientes y verificacion de base de datos
-check_database_exist()
 
-syncClient = Milvus_Sync_Client()
-syncClient.create_milvus_collection("documents_collection")
-syncClient.close()
\ No newline at end of file
+def bootstrap_collections(documents_collection: str = DOCUMENTS_COLLECTION, sources_collection: str = SOURCES_COLLECTION):
+    """
+    Verifica la base de datos y crea las colecciones que falten (idempotente: las existentes solo se validan).
+    Usa el cliente síncrono y bloquea: el servicio lo corre en un thread desde Async_Milvus_Client.bootstrap.
+    """
+    check_database_exist()
+
+    sync_client = Milvus_Sync_Client()
+
+    try:
+        sync_client.create_milvus_collection(documents_collection)
+        sync_client.create_sources_collection(sources_collection)
+    finally:
+        sync_client.close()
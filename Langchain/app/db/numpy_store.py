@@ -0,0 +1,341 @@
+import json
+import os
+import re
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+from ..config import conf
+
+# El journal se compacta en rows.json cuando tiene más filas que la colección (y al menos estas):
+# cada insert/delete solo agrega una línea, y reescribir el snapshot queda amortizado en O(1) por fila
+_COMPACT_MIN_ROWS = 1024
+
+# Filtros que entiende el backend en memoria (los que usan los grafos): pdf_id == N y pdf_id in [...]
+_PDF_ID_FILTER = re.compile(r"^\s*\(?\s*pdf_id\s*(?:==\s*(-?\d+)|in\s*\[([-\d\s,]*)\])\s*\)?\s*$")
+
+
+def parse_pdf_id_filter(filter: str) -> Optional[list[int]]:
+    """pdf_ids de un filtro `pdf_id == N` / `pdf_id in [...]`, o None si el filtro está vacío."""
+    if not filter or not filter.strip():
+        return None
+
+    match = _PDF_ID_FILTER.match(filter)
+    if match is None:
+        raise ValueError(f"Unsupported filter for the numpy vector store: '{filter}'. Only pdf_id == N and pdf_id in [...] are supported")
+
+    if match.group(1) is not None:
+        return [int(match.group(1))]
+
+    return [int(value) for value in match.group(2).split(",") if value.strip()]
+
+
+def cosine_top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Posiciones y scores de las `k` filas más similares a query (filas y query ya normalizadas).
+    argpartition selecciona el top-k en O(n) y solo esas k filas se ordenan.
+    """
+    scores = matrix @ query
+    k = min(k, len(scores))
+
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+
+    return top, scores[top]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class _Collection:
+    """
+    Chunks de una colección: vectores float32 normalizados en una matriz contigua (memory-mapped si
+    hay path) más los campos escalares por fila y un índice pdf_id -> filas para filtrar.
+    Las filas vivas ocupan vectors[:count]; la matriz crece duplicando su capacidad.
+
+    Los campos escalares se persisten como un snapshot (rows.json) más un journal append-only
+    (rows.log, una línea JSON por insert o delete) que se re-aplica al abrir y se compacta en el
+    snapshot cuando crece o al cerrar.
+    """
+
+    def __init__(self, dim: int, path: Optional[str] = None):
+        self.dim = dim
+        self.path = path
+        self.count = 0
+        self.next_id = 1
+        self.records: list[dict] = []  # {"id", "pdf_id", "text_chunk", "metadata"} por fila
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.id_to_row: dict[int, int] = {}
+        self.pdf_rows: dict[int, list[int]] = {}
+        self.journal_rows = 0  # Filas insertadas o borradas en el journal desde el último snapshot
+
+        if path is not None and os.path.exists(f"{path}.vectors.npy"):
+            self._load()
+
+    def _load(self):
+        if os.path.exists(f"{self.path}.rows.json"):
+            with open(f"{self.path}.rows.json", encoding="utf-8") as f:
+                state = json.load(f)
+
+            self.next_id = state["next_id"]
+            self.records = state["records"]
+
+        self.vectors = np.load(f"{self.path}.vectors.npy", mmap_mode="r+")
+        self._replay()
+        self.count = len(self.records)
+        self._reindex()
+
+    def _replay(self):
+        """Re-aplica sobre el snapshot las operaciones del journal (en el mismo orden en que se compactó la matriz)."""
+        if not os.path.exists(f"{self.path}.rows.log"):
+            return
+
+        with open(f"{self.path}.rows.log", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # Línea cortada por una caída a mitad de escritura: es la última
+
+                if "insert" in entry:
+                    self.records.extend(entry["insert"])
+                    self.next_id = max(self.next_id, max(record["id"] for record in entry["insert"]) + 1)
+                    self.journal_rows += len(entry["insert"])
+                else:
+                    deleted = set(entry["delete"])
+                    self.records = [record for record in self.records if record["id"] not in deleted]
+                    self.journal_rows += len(deleted)
+
+    def _append(self, entry: dict, rows: int):
+        """Agrega una operación al journal; si ya tiene más filas que la colección, compacta en el snapshot."""
+        if self.path is None:
+            return
+
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+
+        with open(f"{self.path}.rows.log", "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+        self.journal_rows += rows
+        if self.journal_rows > max(_COMPACT_MIN_ROWS, self.count):
+            self.save()
+
+    def save(self):
+        """Compacta: escribe el snapshot de los campos escalares y vacía el journal (los vectores ya viven en el archivo memory-mapped)."""
+        if self.path is None:
+            return
+
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+
+        tmp_path = f"{self.path}.rows.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"next_id": self.next_id, "records": self.records}, f, ensure_ascii=False)
+        os.replace(tmp_path, f"{self.path}.rows.json")
+
+        if os.path.exists(f"{self.path}.rows.log"):
+            os.remove(f"{self.path}.rows.log")
+        self.journal_rows = 0
+
+    def _reindex(self):
+        self.id_to_row = {record["id"]: row for row, record in enumerate(self.records)}
+        self.pdf_rows = {}
+        for row, record in enumerate(self.records):
+            self.pdf_rows.setdefault(record["pdf_id"], []).append(row)
+
+    def _reserve(self, rows: int):
+        """Garantiza capacidad para `rows` filas, duplicando la matriz (o el archivo) si no alcanza."""
+        capacity = len(self.vectors)
+        if rows <= capacity:
+            return
+
+        capacity = max(rows, 2 * capacity, 1024)
+
+        if self.path is None:
+            vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            vectors[:self.count] = self.vectors[:self.count]
+            self.vectors = vectors
+            return
+
+        tmp_path = f"{self.path}.vectors.tmp.npy"
+        vectors = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(capacity, self.dim))
+        vectors[:self.count] = self.vectors[:self.count]
+        vectors.flush()
+        del vectors
+
+        self.vectors = None
+        os.replace(tmp_path, f"{self.path}.vectors.npy")
+        self.vectors = np.load(f"{self.path}.vectors.npy", mmap_mode="r+")
+
+    def insert(self, data: list[dict]) -> int:
+        if not data:
+            return 0
+
+        vectors = np.asarray([row["vector_chunk"] for row in data], dtype=np.float32)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"vector_chunk has {vectors.shape[1]} dimensions, the store expects {self.dim}")
+
+        self._reserve(self.count + len(data))
+        self.vectors[self.count:self.count + len(data)] = _normalize(vectors)
+
+        inserted = []
+        for row in data:
+            record = {"id": self.next_id, "pdf_id": int(row["pdf_id"]), "text_chunk": row["text_chunk"], "metadata": row.get("metadata")}
+            self.next_id += 1
+
+            self.id_to_row[record["id"]] = self.count
+            self.pdf_rows.setdefault(record["pdf_id"], []).append(self.count)
+            self.records.append(record)
+            inserted.append(record)
+            self.count += 1
+
+        self._append({"insert": inserted}, len(inserted))
+        return len(data)
+
+    def delete_rows(self, rows: Sequence[int]) -> int:
+        """Borra filas compactando la matriz: las que quedan se corren al principio."""
+        if not len(rows):
+            return 0
+
+        keep = np.ones(self.count, dtype=bool)
+        keep[list(rows)] = False
+        deleted = [self.records[row]["id"] for row in rows]
+
+        self.vectors[:int(keep.sum())] = self.vectors[:self.count][keep]
+        self.records = [record for record, kept in zip(self.records, keep) if kept]
+        self.count = len(self.records)
+        self._reindex()
+
+        self._append({"delete": deleted}, len(deleted))
+        return len(rows)
+
+    def rows_for(self, pdf_ids: Optional[list[int]]) -> Optional[np.ndarray]:
+        """Filas de los pdf_ids pedidos (None = toda la colección)."""
+        if pdf_ids is None:
+            return None
+
+        rows = [row for pdf_id in sorted(set(pdf_ids)) for row in self.pdf_rows.get(pdf_id, [])]
+        return np.asarray(rows, dtype=np.int64)
+
+    def row_output(self, row: int, output_fields: list[str]) -> dict:
+        record = self.records[row]
+        output = {"id": record["id"]}
+
+        for field in output_fields:
+            if field == "vector_chunk":
+                output[field] = self.vectors[row].tolist()
+            elif field in record:
+                output[field] = record[field]
+
+        return output
+
+
+class NumpyVectorStore:
+    """
+    VectorStore en el proceso, sin Milvus: búsqueda exacta por coseno (fuerza bruta vectorizada)
+    sobre matrices float32 contiguas, con un índice pdf_id -> filas para los filtros por documento.
+
+    Con `path` cada colección se guarda en `<path>/<colección>.vectors.npy` (memory-mapped),
+    `<path>/<colección>.rows.json` con su journal `<path>/<colección>.rows.log`; sin path vive solo
+    en memoria. Pensado para despliegues chicos, los tests y como baseline exacto para medir el
+    recall de los índices ANN. Todas las operaciones corren en el event loop, así que no necesitan locks.
+    """
+
+    def __init__(self, path: Optional[str] = None, dim: int = conf.EMBEDDING_DIMENSION):
+        self.path = path
+        self.dim = dim
+        self._collections: dict[str, _Collection] = {}
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def _collection(self, collection_name: str) -> _Collection:
+        if collection_name not in self._collections:
+            path = os.path.join(self.path, collection_name) if self.path is not None else None
+            self._collections[collection_name] = _Collection(dim=self.dim, path=path)
+
+        return self._collections[collection_name]
+
+    async def bootstrap(self, documents_collection: str = "documents_collection") -> dict:
+        started = time.perf_counter()
+        collection = self._collection(documents_collection)
+        timings = {"load": time.perf_counter() - started}
+
+        print(f"[NUMPY] {documents_collection}: {collection.count} chunks cargados en {timings['load']:.2f}s")
+        return timings
+
+    async def upload_document(self, data: list[dict], collection_name: str) -> dict:
+        started = time.perf_counter()
+        inserted = self._collection(collection_name).insert(data)
+
+        return {
+            "rows": len(data),
+            "inserted": inserted,
+            "bytes": inserted * self.dim * 4,
+            "seconds": time.perf_counter() - started,
+            "batches": 1 if data else 0,
+            "failed": [],
+        }
+
+    async def get_document(
+        self, query_vector: list[float], collection_name: str, filter: str = "", ids: Optional[list[int]] = None, limit: int = conf.MILVUS_SEARCH_LIMIT,
+        query_text: Optional[str] = None
+    ) -> list[dict]:
+        """Búsqueda densa exacta (query_text se ignora: este backend no tiene BM25)."""
+        collection = self._collection(collection_name)
+
+        pdf_ids = parse_pdf_id_filter(filter)
+        if ids:
+            pdf_ids = [pdf_id for pdf_id in ids if pdf_ids is None or pdf_id in pdf_ids]
+
+        rows = collection.rows_for(pdf_ids)
+        matrix = collection.vectors[:collection.count] if rows is None else collection.vectors[rows]
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+
+        positions, scores = cosine_top_k(matrix, query, limit)
+
+        lista = []
+        for position, score in zip(positions, scores):
+            row = int(position) if rows is None else int(rows[position])
+            record = collection.records[row]
+            lista.append({"id": record["id"], "distance": float(score), "entity": {"text_chunk": record["text_chunk"], "pdf_id": record["pdf_id"]}})
+
+        return lista
+
+    async def get_documents_by_pdf(
+        self, query_vector: list[float], collection_name: str, pdf_ids: list[int], per_document: int = conf.MILVUS_SEARCH_LIMIT,
+        query_text: Optional[str] = None
+    ) -> dict[int, list[dict]]:
+        """Top-k exacto de cada pdf_id (el índice pdf_id -> filas hace que cada documento recorra solo sus filas; query_text se ignora)."""
+        return {
+            pdf_id: await self.get_document(query_vector=query_vector, collection_name=collection_name, ids=[pdf_id], limit=per_document)
+            for pdf_id in dict.fromkeys(pdf_ids)
+        }
+
+    async def delete_documents(self, collection_name: str, ids: list[int]):
+        collection = self._collection(collection_name)
+        return {"delete_count": collection.delete_rows(collection.rows_for(list(ids)))}
+
+    async def query_chunks(self, collection_name: str, pdf_id: int, output_fields: list[str]) -> list[dict]:
+        collection = self._collection(collection_name)
+        return [collection.row_output(row, output_fields) for row in collection.pdf_rows.get(pdf_id, [])]
+
+    async def get_chunks(self, collection_name: str, ids: list[int], output_fields: list[str]) -> list[dict]:
+        collection = self._collection(collection_name)
+        return [collection.row_output(collection.id_to_row[id], output_fields) for id in ids if id in collection.id_to_row]
+
+    async def delete_chunks(self, collection_name: str, ids: list[int]):
+        collection = self._collection(collection_name)
+        rows = [collection.id_to_row[id] for id in ids if id in collection.id_to_row]
+        return {"delete_count": collection.delete_rows(rows)}
+
+    async def close(self):
+        for collection in self._collections.values():
+            collection.save()
@@ -0,0 +1,130 @@
+import os
+from typing import Any, Iterable, Optional, Sequence
+
+import numpy as np
+
+from .vector_codec import VectorCodec
+
+
+def binary_encode(vector: Sequence[float]) -> bytes:
+    """Cuantización binaria: un bit por dimensión (1 si el componente es positivo), dim / 8 bytes."""
+    return np.packbits(np.asarray(vector, dtype=np.float32) > 0).tobytes()
+
+
+def rescore(query_vector: Sequence[float], candidates: list[dict], vectors: dict[int, Sequence[float]], limit: int) -> list[dict]:
+    """
+    Reordena los candidatos por similitud coseno exacta con los vectores de precisión completa
+    y devuelve los `limit` mejores, con el mismo formato que los hits de Milvus.
+    Los candidatos sin vector (borrados entre la búsqueda y el rescoring) se descartan.
+    """
+    candidates = [hit for hit in candidates if hit["id"] in vectors]
+    if not candidates:
+        return []
+
+    query = np.asarray(query_vector, dtype=np.float32)
+    matrix = np.asarray([vectors[hit["id"]] for hit in candidates], dtype=np.float32)
+
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    scores = matrix @ query / np.where(norms > 0, norms, 1.0)
+
+    order = np.argsort(-scores)[:limit]
+
+    return [{"id": candidates[i]["id"], "distance": float(scores[i]), "entity": candidates[i]["entity"]} for i in order]
+
+
+class VectorFile:
+    """
+    Archivo local de vectores float32 de precisión completa, abierto con memory-map.
+
+    `<path>.vectors.npy` guarda los vectores en el orden en que se exportaron y
+    `<path>.ids.npy` / `<path>.rows.npy` las claves primarias ordenadas con la fila de
+    cada una; solo se leen del disco las filas que se piden. Es una copia exportada
+    (app.db.export_vectors): los chunks insertados después no están y se piden a Milvus.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.ids = np.load(f"{path}.ids.npy", mmap_mode="r")
+        self.rows = np.load(f"{path}.rows.npy", mmap_mode="r")
+        self.vectors = np.load(f"{path}.vectors.npy", mmap_mode="r")
+
+    @staticmethod
+    def write(path: str, rows: Iterable[tuple[int, Sequence[float]]], dim: int, count: int) -> int:
+        """
+        Escribe el archivo a partir de hasta `count` pares (id, vector), sin cargar todos
+        los vectores en memoria. Devuelve la cantidad de vectores escritos.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        vectors = np.lib.format.open_memmap(f"{path}.vectors.npy", mode="w+", dtype=np.float32, shape=(count, dim))
+        ids = np.empty(count, dtype=np.int64)
+        written = 0
+
+        for id, vector in rows:
+            if written == count:
+                break
+
+            ids[written] = id
+            vectors[written] = np.asarray(vector, dtype=np.float32)[:dim]
+            written += 1
+
+        vectors.flush()
+        del vectors
+
+        order = np.argsort(ids[:written])
+        np.save(f"{path}.ids.npy", ids[:written][order])
+        np.save(f"{path}.rows.npy", order.astype(np.int64))
+
+        return written
+
+    def get(self, ids: list[int]) -> dict[int, np.ndarray]:
+        """Vectores de las claves pedidas que están en el archivo."""
+        if not len(self.ids) or not ids:
+            return {}
+
+        wanted = np.asarray(ids, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.ids, wanted), len(self.ids) - 1)
+        found = self.ids[positions] == wanted
+
+        return {int(id): np.asarray(self.vectors[self.rows[position]]) for id, position in zip(wanted[found], positions[found])}
+
+
+class BinaryRescoreSearcher:
+    """
+    Búsqueda en dos etapas para notebooks grandes.
+
+    1. Búsqueda gruesa por distancia de Hamming sobre binary_vector (1 bit por dimensión, el
+       único índice que tiene que estar en memoria), pidiendo `candidates` resultados.
+    2. Rescoring exacto por coseno de esos candidatos con los vectores de precisión completa,
+       leídos del archivo local memory-mapped si hay uno o de vector_chunk en Milvus.
+    """
+
+    def __init__(self, client: Any, codec: VectorCodec, candidates: int, nprobe: int = 64, vector_file: Optional[VectorFile] = None):
+        self.client = client
+        self.codec = codec
+        self.candidates = max(1, candidates)
+        self.nprobe = nprobe
+        self.vector_file = vector_file
+
+    async def search(self, query_vector: list[float], collection_name: str, filter: str, limit: int, output_fields: list[str]) -> list[dict]:
+        res = await self.client.search(
+            collection_name=collection_name,
+            anns_field="binary_vector",
+            data=[binary_encode(query_vector)],
+            limit=max(limit, self.candidates),
+            search_params={"metric_type": "HAMMING", "params": {"nprobe": self.nprobe}},
+            filter=filter,
+            output_fields=output_fields
+        )
+
+        candidates = [hit for hits in res for hit in hits]
+        ids = [hit["id"] for hit in candidates]
+
+        vectors = self.vector_file.get(ids) if self.vector_file is not None else {}
+        missing = [id for id in ids if id not in vectors]
+
+        if missing:
+            rows = await self.client.get(collection_name=collection_name, ids=missing, output_fields=["vector_chunk"])
+            vectors.update({row["id"]: self.codec.decode(row["vector_chunk"]) for row in rows})
+
+        return rescore(query_vector=query_vector, candidates=candidates, vectors=vectors, limit=limit)
@@ -0,0 +1,95 @@
+from typing import Any, Sequence, Union
+
+import numpy as np
+from pymilvus import DataType
+
+from ..config import conf
+
+
+# Bytes por componente de cada tipo de vector soportado para vector_chunk
+VECTOR_TYPES = {
+    "FLOAT_VECTOR": 4,
+    "FLOAT16_VECTOR": 2,
+    "BFLOAT16_VECTOR": 2,
+}
+
+# Dimensiones de gemini-embedding-001 (Matryoshka: los primeros N componentes son un embedding válido)
+SUPPORTED_DIMENSIONS = (768, 1536, 3072)
+
+
+def truncate_and_normalize(vector: Union[Sequence[float], np.ndarray], dim: int) -> np.ndarray:
+    """Se queda con los primeros `dim` componentes y re-normaliza (norma L2 = 1) para que COSINE/IP sigan siendo comparables."""
+    values = np.asarray(vector, dtype=np.float32)[:dim]
+    norm = np.linalg.norm(values)
+
+    return values / norm if norm > 0 else values
+
+
+def float32_to_bfloat16_bytes(values: np.ndarray) -> bytes:
+    """bfloat16 = 16 bits altos del float32, con redondeo al par más cercano."""
+    bits = np.ascontiguousarray(values, dtype=np.float32).view(np.uint32)
+    rounded = (bits + 0x7FFF + ((bits >> 16) & 1)) >> 16
+
+    return rounded.astype(np.uint16).tobytes()
+
+
+def bfloat16_bytes_to_float32(data: bytes) -> np.ndarray:
+    return (np.frombuffer(data, dtype=np.uint16).astype(np.uint32) << 16).view(np.float32)
+
+
+class VectorCodec:
+    """
+    Convierte los vectores de la aplicación (listas de float32) al formato guardado en
+    vector_chunk según la configuración: FLOAT_VECTOR se envía como lista y los tipos de
+    media precisión (FLOAT16_VECTOR / BFLOAT16_VECTOR) como bytes, la mitad de tamaño
+    en el request y en Milvus.
+    """
+
+    def __init__(self, vector_type: str = conf.MILVUS_VECTOR_TYPE, dim: int = conf.EMBEDDING_DIMENSION):
+        if vector_type not in VECTOR_TYPES:
+            raise ValueError(f"Unknown vector type '{vector_type}'. Use one of {list(VECTOR_TYPES)}")
+
+        self.vector_type = vector_type
+        self.dim = dim
+
+    @property
+    def data_type(self) -> DataType:
+        return getattr(DataType, self.vector_type)
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return VECTOR_TYPES[self.vector_type] * self.dim
+
+    def encode(self, vector: Any) -> Union[list[float], bytes]:
+        """Vector de la aplicación -> valor para insertar o buscar. Los bytes ya codificados pasan sin cambios."""
+        if isinstance(vector, list) and len(vector) == 1 and isinstance(vector[0], bytes):
+            vector = vector[0]  # Formato en que pymilvus devuelve algunos vectores binarios
+
+        if isinstance(vector, bytes):
+            return vector
+
+        if self.vector_type == "FLOAT_VECTOR":
+            return vector if isinstance(vector, list) else np.asarray(vector, dtype=np.float32).tolist()
+
+        values = np.asarray(vector, dtype=np.float32)
+
+        if self.vector_type == "FLOAT16_VECTOR":
+            return values.astype(np.float16).tobytes()
+
+        return float32_to_bfloat16_bytes(values)
+
+    def decode(self, value: Any) -> list[float]:
+        """Valor leído de Milvus -> lista de float32."""
+        if isinstance(value, list) and len(value) == 1 and isinstance(value[0], bytes):
+            value = value[0]
+
+        if not isinstance(value, bytes):
+            return np.asarray(value, dtype=np.float32).tolist()
+
+        if self.vector_type == "FLOAT16_VECTOR":
+            return np.frombuffer(value, dtype=np.float16).astype(np.float32).tolist()
+
+        if self.vector_type == "BFLOAT16_VECTOR":
+            return bfloat16_bytes_to_float32(value).tolist()
+
+        return np.frombuffer(value, dtype=np.float32).tolist()
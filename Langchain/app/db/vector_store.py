@@ -0,0 +1,73 @@
+from typing import Optional, Protocol, runtime_checkable
+
+from ..config import conf
+
+VECTOR_STORE_BACKENDS = ("milvus", "numpy")
+
+
+@runtime_checkable
+class VectorStore(Protocol):
+    """
+    Operaciones sobre los chunks de los documentos que usan la ingesta, los grafos y los endpoints.
+
+    Implementaciones: Async_Milvus_Client (app/db/milvus.py) y NumpyVectorStore (app/db/numpy_store.py),
+    que corre en el proceso sin un cluster de Milvus. Las búsquedas devuelven hits con el formato de
+    Milvus: {"id", "distance", "entity": {"text_chunk", "pdf_id"}}.
+    """
+
+    async def bootstrap(self) -> dict:
+        """Prepara las colecciones antes de recibir consultas. Devuelve los segundos de cada etapa."""
+        ...
+
+    async def upload_document(self, data: list[dict], collection_name: str) -> dict:
+        """Inserta filas {text_chunk, metadata, vector_chunk, pdf_id}. Devuelve el reporte de la ingesta."""
+        ...
+
+    async def get_document(
+        self, query_vector: list[float], collection_name: str, filter: str = "", ids: Optional[list[int]] = None, limit: int = conf.MILVUS_SEARCH_LIMIT,
+        query_text: Optional[str] = None
+    ) -> list[dict]:
+        """
+        Top-`limit` chunks por similitud coseno, opcionalmente filtrados por pdf_id.
+        query_text es el texto de la consulta, para los backends que combinan la búsqueda densa con BM25.
+        """
+        ...
+
+    async def get_documents_by_pdf(
+        self, query_vector: list[float], collection_name: str, pdf_ids: list[int], per_document: int = conf.MILVUS_SEARCH_LIMIT,
+        query_text: Optional[str] = None
+    ) -> dict[int, list[dict]]:
+        """Top-`per_document` chunks de cada pdf_id, en una sola búsqueda. Devuelve pdf_id -> hits (query_text como en get_document)."""
+        ...
+
+    async def delete_documents(self, collection_name: str, ids: list[int]):
+        """Elimina todos los chunks de los pdf_ids indicados."""
+        ...
+
+    async def query_chunks(self, collection_name: str, pdf_id: int, output_fields: list[str]) -> list[dict]:
+        """Todos los chunks guardados para un pdf_id."""
+        ...
+
+    async def get_chunks(self, collection_name: str, ids: list[int], output_fields: list[str]) -> list[dict]:
+        """Chunks por su clave primaria."""
+        ...
+
+    async def delete_chunks(self, collection_name: str, ids: list[int]):
+        """Elimina chunks puntuales por su clave primaria."""
+        ...
+
+    async def close(self):
+        ...
+
+
+def create_vector_store(backend: str = conf.VECTOR_STORE_BACKEND) -> VectorStore:
+    """Instancia el backend configurado (VECTOR_STORE_BACKEND)."""
+    if backend == "milvus":
+        from .milvus import Async_Milvus_Client
+        return Async_Milvus_Client()
+
+    if backend == "numpy":
+        from .numpy_store import NumpyVectorStore
+        return NumpyVectorStore(path=conf.NUMPY_STORE_PATH)
+
+    raise ValueError(f"Unknown vector store backend '{backend}'. Use one of {list(VECTOR_STORE_BACKENDS)}")
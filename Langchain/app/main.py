@@ -1,30 +1,44 @@
 from fastapi import FastAPI, UploadFile, File, Form, status, Security, HTTPException
+from fastapi.responses import StreamingResponse
 import os
-import shutil
+import time
+import asyncio
 import traceback
 from contextlib import asynccontextmanager
 from typing import List
 import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 from .utils.aux_functions.format_generated_text import format_generated_text
+from .utils.aux_functions.format_sse import format_sse
 from .utils.embbedings import EmbeddingGenerator
+from .utils.embedding_cache import EmbeddingCache
 from .utils.splitter import Splitter
+from .utils.ingestion import IngestionPipeline
+from .utils.jobs import Job, JobRegistry
 
 from .schemas.dtos.rag_dtos_schemas import RAGRequest, RAGResponse, ContextRequest
-from .schemas.dtos.notebook_dtos_schemas import NotebookResponse
+from .schemas.dtos.notebook_dtos_schemas import NotebookResponse, JobCreatedResponse
 from .schemas.dtos.flashcards_dtos_schemas import FlashcardResponse, Flashcard
 from .schemas.dtos.base_request_schema import BaseRequest
 
 from .utils.reranker import Reranker
+from .utils.models import ModelRegistry
+from .utils.answer_cache import SemanticAnswerCache
 
-from .utils.graphs.graph import create_rag_graph
-from .utils.graphs.creation_graph import create_creation_graph
+from .utils.graphs.graph import create_rag_graph, history_update
+from .utils.graphs.creation_graph import create_creation_graph, OVERVIEW_QUERY
 
-from .db.milvus import Async_Milvus_Client
+from .db.vector_store import create_vector_store
+from .db.content_store import ContentStore
 from .security import verify_api_key
+from .config import conf
 
-UPLOAD_DIRECTORY = os.path.join(os.path.dirname(__file__), "uploaded_files")
-os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
+EMBEDDING_CACHE_PATH = conf.EMBEDDING_CACHE_PATH or os.path.join(os.path.dirname(__file__), "cache", "embeddings.sqlite3")
+
+# Etapas de un job de creación de notebook
+NOTEBOOK_JOB_STAGES = ("parsed", "embedded", "indexed", "metadata_generated")
 
 
 ## Object initialization
@@ -32,29 +46,99 @@ os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
 async def lifespan(app: FastAPI):
     
     ## Object instances (helpers)
-    global splitter, embedding_generator, reranker, client_milvus, rag_graph, creation_graph
+    global splitter, embedding_cache, embedding_generator, reranker, model_registry, answer_cache, client_milvus, content_store, ingestion_pipeline, rag_graph, creation_graph, job_registry
+
+    startup_started = time.perf_counter()
+
+    ## Vector store (VECTOR_STORE_BACKEND): schema provisioning + warm-up in the background while the rest of the objects are created
+    client_milvus = create_vector_store()
+    milvus_bootstrap = asyncio.create_task(client_milvus.bootstrap())
 
     splitter = Splitter()
-    embedding_generator = EmbeddingGenerator()
+
+    ## Persistent chunk-level embedding cache (only misses go to Gemini)
+    embedding_cache = None
+    if conf.EMBEDDING_CACHE_ENABLED:
+        embedding_cache = EmbeddingCache(path=EMBEDDING_CACHE_PATH, max_bytes=conf.EMBEDDING_CACHE_MAX_MB * 1024 * 1024)
+
+    embedding_generator = EmbeddingGenerator(cache=embedding_cache)
+    query_precompute = asyncio.create_task(embedding_generator.precompute_queries([OVERVIEW_QUERY]))  # Constant queries
     reranker = Reranker()
-    client_milvus = Async_Milvus_Client()
+    content_store = None
+    if conf.VECTOR_STORE_BACKEND == "milvus":
+        content_store = ContentStore(client_milvus=client_milvus)  # source -> content hash -> shared vectors (sources_collection)
+
+    ## Process pool for CPU-bound PDF parsing/splitting (spawn: the parent holds gRPC/HTTP clients)
+    process_pool = None
+    if conf.INGESTION_PROCESS_WORKERS > 0:
+        process_pool = ProcessPoolExecutor(
+            max_workers=conf.INGESTION_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    ## Ingestion pipeline (streaming page by page + micro-batches)
+    ingestion_pipeline = IngestionPipeline(
+        splitter=splitter,
+        embedding_generator=embedding_generator,
+        client_milvus=client_milvus,
+        process_pool=process_pool,
+        content_store=content_store
+    )
     
+    ## Chat models and prompt chains built once and shared by both graphs (one connection pool per model)
+    model_registry = ModelRegistry()
+
+    ## Semantic cache of validated answers per notebook (invalidated when its sources change)
+    answer_cache = SemanticAnswerCache() if conf.ANSWER_CACHE_ENABLED else None
+
     ## Create RAG graph with local dependencies (without internal HTTP requests)
     rag_graph = create_rag_graph(
         embedding_generator=embedding_generator,
         reranker=reranker,
-        client_milvus=client_milvus
+        client_milvus=client_milvus,
+        content_store=content_store,
+        model_registry=model_registry,
+        answer_cache=answer_cache
     )
     
     # Create Creation graph with local dependencies
     creation_graph = create_creation_graph(
         embedding_generator=embedding_generator,
-        client_milvus=client_milvus
+        client_milvus=client_milvus,
+        content_store=content_store,
+        model_registry=model_registry
     )
 
+    ## Warm-up of the chat models (opens their connections) while the vector store finishes its bootstrap
+    models_warmup = asyncio.create_task(model_registry.warm_up()) if conf.CHAT_MODEL_WARMUP else None
+
+
+    ## Background jobs (notebook creation)
+    job_registry = JobRegistry(ttl_seconds=conf.JOBS_TTL_SECONDS)
+
+    ## Ready only once the collections exist and are loaded
+    milvus_timings = await milvus_bootstrap
+    await query_precompute
+    if models_warmup is not None:
+        models_timings = await models_warmup
+        print("[STARTUP] Chat models warm-up: " + ", ".join(f"{model} {seconds:.2f}s" for model, seconds in models_timings.items()))
+    print(
+        f"[STARTUP] Service ready in {time.perf_counter() - startup_started:.2f}s "
+        f"({conf.VECTOR_STORE_BACKEND}: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in milvus_timings.items()) + ")"
+    )
     
     yield
 
+    await job_registry.shutdown()
+
+    if process_pool is not None:
+        process_pool.shutdown(wait=False, cancel_futures=True)
+
+    if embedding_cache is not None:
+        embedding_cache.close()
+
+    await client_milvus.close()
+
 
 app = FastAPI(lifespan=lifespan, openapi_url="/api/v1")
     
@@ -69,6 +153,23 @@ async def healthcheck():
     return {"status": "ok", "message": "Service is healthy"}
 
 
+@app.get("/metrics", status_code=status.HTTP_200_OK)
+async def metrics(api_key: str = Security(verify_api_key)):
+    """
+    Endpoint with the internal counters of the service (caches, etc.)
+    """
+    return {
+        "embedding_cache": embedding_cache.stats() if embedding_cache is not None else None,
+        "embedding_scheduler": embedding_generator.scheduler.stats(),
+        "query_embedding_cache": embedding_generator.query_cache.stats(),
+        "reranker": reranker.stats(),
+        "models": model_registry.stats(),
+        "judge": rag_graph.groundedness.stats() if rag_graph.groundedness is not None else None,
+        "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+        "chat_history": rag_graph.history_window.stats()
+    }
+
+
 @app.post("/upload_document") 
 async def upload_document_app(file: UploadFile, api_key: str = Security(verify_api_key)):
     try:
@@ -76,28 +177,18 @@ async def upload_document_app(file: UploadFile, api_key: str = Security(verify_a
         if not file.filename.endswith('.pdf'):
             return {"error": "Only PDF files are allowed"}
         
-        # Guardar temporalmente el archivo
-        file_path = os.path.join(UPLOAD_DIRECTORY, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Procesar el documento directamente desde memoria
+        pdf = await file.read()
+        text_chunks = await asyncio.to_thread(splitter.split_document, pdf=pdf)  # pypdf fuera del event loop
+        texts = [chunk['text'] for chunk in text_chunks]
         
-        try:
-            # Procesar el documento
-            text_chunks = splitter.split_document(file_path=file_path)
-            texts = [chunk['text'] for chunk in text_chunks]
-            
-            vector_chunks = await embedding_generator.get_document_embedding(text=texts)
-            
-            formatted_data = embedding_generator.format_database(text_chunks=text_chunks, vector_chunks=vector_chunks, pdf_id=file.filename)
-            
-            await client_milvus.upload_document(data=formatted_data, collection_name="documents_collection")
-            
-            return {"status": "success", "message": f"Document {file.filename} uploaded successfully", "chunks": len(texts)}
-            
-        finally:
-            # Limpiar archivo temporal después de procesar
-            if os.path.exists(file_path):
-                os.remove(file_path)
+        vector_chunks = await embedding_generator.get_document_embedding(text=texts)
+        
+        formatted_data = embedding_generator.format_database(text_chunks=text_chunks, vector_chunks=vector_chunks, pdf_id=file.filename)
+        
+        report = await client_milvus.upload_document(data=formatted_data, collection_name="documents_collection")
+        
+        return {"status": "success", "message": f"Document {file.filename} uploaded successfully", "chunks": len(texts), "insert_report": report}
         
     except Exception as e:
         traceback.print_exc()
@@ -123,6 +214,35 @@ async def upload_document_app(
         return {"error": str(e)}
 
 
+@app.post("/reupload-pdf", status_code=status.HTTP_200_OK)
+async def reupload_pdf(
+    file: UploadFile = File(...),
+    source_id: int = Form(...),
+    api_key: str = Security(verify_api_key)
+):
+    """
+    Endpoint to replace an existing source with a new version of its PDF.
+    Only the new or changed chunks are embedded; removed chunks are deleted.
+    """
+    validate_uploaded_files(files=[file], source_ids=[source_id])
+
+    pdfs = await read_uploaded_files(files=[file])
+
+    try:
+        report = await ingestion_pipeline.reingest_file(pdf=pdfs[0], source_id=source_id)
+        invalidate_answers(source_ids=[source_id])
+
+        return {"source_id": source_id, **report}
+
+    except Exception as e:
+        traceback.print_exc()
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while re-uploading the document: {str(e)}"
+        )
+
+
 @app.get("/get_context") ## De prueba / depuracion 
 async def get_context_app(request: ContextRequest, api_key: str = Security(verify_api_key) ):
     """
@@ -131,9 +251,9 @@ async def get_context_app(request: ContextRequest, api_key: str = Security(verif
     try:
         query_vector = await embedding_generator.get_query_embedding(text=request.query)
         
-        results = await client_milvus.get_document(query_vector=query_vector, collection_name="documents_collection", filter="")
+        results = await client_milvus.get_document(query_vector=query_vector, collection_name="documents_collection", filter="", query_text=request.query)
         
-        results_reranked = reranker.rerank(query=request.query, document=[results])
+        results_reranked = await reranker.rerank(query=request.query, document=[results])
         
         return results_reranked
     
@@ -142,6 +262,27 @@ async def get_context_app(request: ContextRequest, api_key: str = Security(verif
         return {"error": str(e)}
 
 
+def rag_initial_state(request: RAGRequest) -> dict:
+    """
+    Initial state of the RAG graph for a chat request
+    """
+    return {
+        "question": request.question,
+        "query": request.question,
+        "context": "",
+        "context_chunks": [],
+        "pdf_ids": request.pdf_ids,
+        "generation": "",
+        "is_valid": False,
+        "refinement_attempts": 0,
+        "retrieval_attempts": 0,
+        "chatHistory": request.chatHistory or [],
+        "chatSummary": request.chatSummary or "",
+        "history": [],
+        "summarized_until": None
+    }
+
+
 @app.post("/chat/rag", response_model=RAGResponse)
 async def rag_endpoint(request: RAGRequest, api_key: str = Security(verify_api_key)):
     """
@@ -149,28 +290,17 @@ async def rag_endpoint(request: RAGRequest, api_key: str = Security(verify_api_k
     and refines query if necessary
     """
     try:
-        # Initial state of the graph
-        initial_state = {
-            "question": request.question,
-            "query": request.question,
-            "context": "",
-            "pdf_ids": request.pdf_ids,
-            "generation": "",
-            "is_valid": False,
-            "refinement_attempts": 0,
-            "retrieval_attempts": 0,
-            "chatHistory": request.chatHistory or []
-        }
-        
         # Invoke the graph (async wrapper on graph app)
-        result = await rag_graph.invoke(initial_state)
+        result = await rag_graph.invoke(rag_initial_state(request))
         
         return RAGResponse(
             question=result["question"],
             generation=result["generation"],
             context=result["context"],
             is_valid=result["is_valid"],
-            refinement_attempts=result["refinement_attempts"]
+            refinement_attempts=result["refinement_attempts"],
+            cached=result.get("cached", False),
+            **history_update(result)
         )
         
     except Exception as e:
@@ -185,6 +315,29 @@ async def rag_endpoint(request: RAGRequest, api_key: str = Security(verify_api_k
         }
     
 
+@app.post("/chat/rag/stream")
+async def rag_stream_endpoint(request: RAGRequest, api_key: str = Security(verify_api_key)):
+    """
+    Streaming version of /chat/rag (server-sent events): the answer is sent token by token as it is
+    generated, then a final "end" event carries the full generation, validity and context.
+    A "retry" event means the judge rejected the answer and a refined one follows (discard the tokens received so far).
+    """
+    async def events():
+        try:
+            async for event, data in rag_graph.stream(rag_initial_state(request)):
+                yield format_sse(event, data)
+
+        except Exception as e:
+            traceback.print_exc()
+            yield format_sse("error", {"error": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # No buffering in reverse proxies (nginx)
+    )
+
+
 @app.post("/create-notebook", response_model=NotebookResponse)
 async def create_notebook(
     files: List[UploadFile] = File(...),
@@ -197,26 +350,7 @@ async def create_notebook(
     try:
         await upload_documents(files=files, source_ids=source_ids)
         
-        # Generate title, icon, and description using the graph
-        initial_state = {
-            "option": "notebook",
-            "pdf_ids": source_ids,
-            "context": "",
-            "generation": ""
-        }
-
-        result = await creation_graph.invoke(initial_state)
-
-        # Clean the response from markdown code blocks if they exist
-        generation_text = format_generated_text(result["generation"])
-            
-        result_json = json.loads(generation_text)
-            
-        return NotebookResponse(
-            title=result_json["title"],
-            icon=result_json["icon"],
-            description=result_json["description"]
-        )
+        return await generate_notebook_metadata(source_ids=source_ids)
         
     except Exception as e:
         traceback.print_exc()
@@ -227,6 +361,58 @@ async def create_notebook(
         )
 
 
+@app.post("/create-notebook/jobs", response_model=JobCreatedResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_notebook_job(
+    files: List[UploadFile] = File(...),
+    source_ids: List[int] = Form(...),
+    api_key: str = Security(verify_api_key)
+):
+    """
+    Endpoint to create a notebook in the background. The files are read into memory and the
+    job id is returned immediately; ingestion and metadata generation are reported by GET /jobs/{job_id}.
+    """
+    validate_uploaded_files(files=files, source_ids=source_ids)
+
+    job = job_registry.create(kind="create-notebook", stages=NOTEBOOK_JOB_STAGES)
+
+    # El job conserva los bytes de sus PDFs: no hay archivos compartidos en disco que limpiar
+    pdfs = await read_uploaded_files(files=files)
+
+    async def run(job: Job) -> dict:
+        await ingestion_pipeline.ingest_files(
+            files=list(zip(pdfs, source_ids)),
+            progress=job.advance
+        )
+        invalidate_answers(source_ids=source_ids)
+
+        for stage in ("parsed", "embedded", "indexed"):
+            job.complete_stage(stage)
+
+        job.set_total("metadata_generated", 1)
+        notebook = await generate_notebook_metadata(source_ids=source_ids)
+        job.advance("metadata_generated")
+        job.complete_stage("metadata_generated")
+
+        return notebook.model_dump()
+
+    job_registry.start(job, run)
+
+    return JobCreatedResponse(job_id=job.id, status=job.status)
+
+
+@app.get("/jobs/{job_id}", status_code=status.HTTP_200_OK)
+async def get_job(job_id: str, api_key: str = Security(verify_api_key)):
+    """
+    Endpoint with the status and per-stage progress of a background job
+    """
+    job = job_registry.get(job_id)
+
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+
+    return job.to_dict()
+
+
 @app.post("/delete-pdfs", status_code=status.HTTP_200_OK)
 async def delete_pdfs(request: dict, api_key: str = Security(verify_api_key)):
     """
@@ -241,18 +427,20 @@ async def delete_pdfs(request: dict, api_key: str = Security(verify_api_key)):
                 detail="pdf_ids must be a non-empty list"
             )
         
-        res = await client_milvus.delete_documents(
-            collection_name="documents_collection",
-            ids=pdf_ids
-        )
-        
-        if not res:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="No documents were deleted. Please check the provided IDs."
+        # Release the sources; vectors are purged only when no other source references them
+        purged_ids = await content_store.release(source_ids=pdf_ids) if content_store is not None else pdf_ids
+
+        if purged_ids:
+            await client_milvus.delete_documents(
+                collection_name="documents_collection",
+                ids=purged_ids
             )
 
-        return {"status": "success", "message": f"Documents with IDs {pdf_ids} deleted successfully"}
+        invalidate_answers(source_ids=pdf_ids)
+
+        return {"status": "success", "message": f"Documents with IDs {pdf_ids} deleted successfully", "purged_ids": purged_ids}
+    except HTTPException:
+        raise
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(
@@ -386,45 +574,16 @@ async def upload_documents(files: List[UploadFile] = File(...), source_ids: List
     Helper function to upload multiple PDF documents and process them.
     """
     try:
-        # Validate that the number of files matches the number of IDs
-        if len(files) != len(source_ids):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="The number of files and source_ids must match"
-            )
-        
-        # Save all files temporarily
-        for file in files:
-            if not file.filename.endswith('.pdf'):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Only PDF files are allowed"
-                )
-            
-            file_path = os.path.join(UPLOAD_DIRECTORY, file.filename)
-            
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-        
-        try:
-            # Process each file with its corresponding ID
-            for file, source_id in zip(files, source_ids):
-                file_path = os.path.join(UPLOAD_DIRECTORY, file.filename)
-                text_chunks = splitter.split_document(file_path=file_path)
-
-                texts = [chunk['text'] for chunk in text_chunks]
-            
-                vector_chunks = await embedding_generator.get_document_embedding(text=texts)
-            
-                formatted_data = embedding_generator.format_database(text_chunks=text_chunks, vector_chunks=vector_chunks, pdf_id=source_id)
-            
-                await client_milvus.upload_document(data=formatted_data, collection_name="documents_collection")
-        finally:
-                # Clean up temporary files after processing
-                for file in files:
-                    file_path = os.path.join(UPLOAD_DIRECTORY, file.filename)
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
+        validate_uploaded_files(files=files, source_ids=source_ids)
+
+        # Read the PDFs into memory (no round-trip through the disk)
+        pdfs = await read_uploaded_files(files=files)
+
+        # Process the files concurrently, each one with its corresponding ID
+        await ingestion_pipeline.ingest_files(
+            files=list(zip(pdfs, source_ids))
+        )
+        invalidate_answers(source_ids=source_ids)
         
     except Exception as e:
         traceback.print_exc()
@@ -432,4 +591,63 @@ async def upload_documents(files: List[UploadFile] = File(...), source_ids: List
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An error occurred while uploading documents: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+def invalidate_answers(source_ids: List[int]):
+    """
+    Helper function to drop the cached answers of every notebook that uses these sources (added, replaced or deleted)
+    """
+    if answer_cache is not None:
+        answer_cache.invalidate(source_ids)
+
+
+def validate_uploaded_files(files: List[UploadFile], source_ids: List[int]):
+    """
+    Helper function to validate that every upload is a PDF with its corresponding source ID.
+    """
+    # Validate that the number of files matches the number of IDs
+    if len(files) != len(source_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The number of files and source_ids must match"
+        )
+
+    for file in files:
+        if not file.filename.endswith('.pdf'):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Only PDF files are allowed"
+            )
+
+
+async def read_uploaded_files(files: List[UploadFile]) -> List[bytes]:
+    """
+    Helper function to read the uploaded PDFs into memory. Returns their bytes, in order.
+    """
+    return [await file.read() for file in files]
+
+
+async def generate_notebook_metadata(source_ids: List[int]) -> NotebookResponse:
+    """
+    Helper function to generate the title, icon, and description of a notebook using the graph.
+    """
+    initial_state = {
+        "option": "notebook",
+        "pdf_ids": source_ids,
+        "context": "",
+        "generation": ""
+    }
+
+    result = await creation_graph.invoke(initial_state)
+
+    # Clean the response from markdown code blocks if they exist
+    generation_text = format_generated_text(result["generation"])
+        
+    result_json = json.loads(generation_text)
+        
+    return NotebookResponse(
+        title=result_json["title"],
+        icon=result_json["icon"],
+        description=result_json["description"]
+    )
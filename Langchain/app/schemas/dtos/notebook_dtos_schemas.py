@@ -9,4 +9,8 @@ class SourceRequest(BaseModel):
 class NotebookResponse(BaseModel):
     title: str
     icon: str
-    description: str
\ No newline at end of file
+    description: str
+
+class JobCreatedResponse(BaseModel):
+    job_id: str
+    status: str
\ No newline at end of file
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 from .base_request_schema import BaseRequest
@@ -10,6 +12,7 @@ class ContextRequest(BaseModel):
 class RAGRequest(BaseRequest):
     question: str
     chatHistory: list[dict]
+    chatSummary: str = ""  # Resumen guardado de los mensajes anteriores a chatHistory
 
 
 class RAGResponse(BaseModel):
@@ -18,3 +21,6 @@ class RAGResponse(BaseModel):
     context: str
     is_valid: bool
     refinement_attempts: int
+    cached: bool = False
+    chat_summary: Optional[str] = None  # Resumen actualizado del historial (solo si cambió)
+    summarized_until: Optional[int] = None  # Id del último mensaje que cubre chat_summary
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from .base_graph_state_schema import BaseGraphState
 
 class ConversationGraphState(BaseGraphState):
@@ -5,4 +7,8 @@ class ConversationGraphState(BaseGraphState):
     ConversationGraph state for managing conversation context
     """
     question: str  # Pregunta original
-    query: str  # Query refinada (puede cambiar)
\ No newline at end of file
+    query: str  # Query refinada (puede cambiar)
+    context_chunks: list[str]  # Chunks del contexto (rerankeados) para el pre-check de groundedness
+    chatSummary: str  # Resumen de los turnos anteriores al historial recibido
+    history: list  # Mensajes (HumanMessage/AIMessage) del historial acotado al presupuesto de tokens
+    summarized_until: Optional[int]  # Id del último mensaje agregado al resumen en esta pregunta (None si no cambió)
@@ -0,0 +1,198 @@
+## Cache semántico de respuestas por notebook
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from ..config import conf
+
+# Preguntas que dependen del historial ("¿y eso para qué sirve?", "explicalo mejor"): no se responden desde el cache
+_FOLLOW_UP = re.compile(
+    r"^\s*¿?\s*(?:y|pero|entonces|además|o sea)\b"
+    r"|\b(?:eso|esto|esa|ese|esos|esas|anterior|anteriormente|dijiste|mencionaste|recién|lo mismo|otra vez|más detalle|explic\w* mejor)\b",
+    re.IGNORECASE
+)
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+MIN_QUESTION_WORDS = 2  # Palabras de contenido (4+ letras) para considerar la pregunta autocontenida
+
+
+def is_follow_up(question: str) -> bool:
+    """Heurística: la pregunta retoma la conversación (referencias, conectores o muy corta) y su respuesta depende del historial."""
+    content_words = [word for word in _WORD.findall(question) if len(word) >= 4]
+    return len(content_words) < MIN_QUESTION_WORDS or _FOLLOW_UP.search(question) is not None
+
+
+def _unit(vector: list[float]) -> Optional[np.ndarray]:
+    """Vector normalizado, o None si tiene norma 0 (o no finita) y no se puede comparar por coseno."""
+    query = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(query)
+
+    if not np.isfinite(norm) or norm == 0:
+        return None
+
+    return query / norm
+
+
+class _Scope:
+    """Respuestas de un conjunto de pdf_ids: preguntas normalizadas en una matriz para buscar con un solo producto."""
+
+    def __init__(self, dim: int):
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.entries: list[tuple[float, dict]] = []  # (expires_at, respuesta) en el orden de las filas
+
+    def keep(self, mask: np.ndarray):
+        self.vectors = self.vectors[mask]
+        self.entries = [entry for entry, kept in zip(self.entries, mask) if kept]
+
+
+class SemanticAnswerCache:
+    """
+    Respuestas validadas por el judge, reutilizadas para preguntas iguales o casi iguales
+    (similitud coseno >= similarity_threshold) sobre el mismo conjunto de pdf_ids.
+
+    - Un scope por conjunto de pdf_ids: agregar o quitar una fuente del notebook cambia el conjunto.
+    - invalidate(pdf_ids) descarta los scopes que incluyen esas fuentes (re-subida o borrado) y sube su
+      versión: una respuesta generada mientras cambiaba una fuente no se guarda.
+    - TTL por entrada, máximo de entradas por notebook y en total (se desalojan las más viejas del
+      notebook usado menos recientemente).
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = conf.ANSWER_CACHE_SIMILARITY,
+        ttl_seconds: float = conf.ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = conf.ANSWER_CACHE_MAX_ENTRIES,
+        max_per_notebook: int = conf.ANSWER_CACHE_MAX_PER_NOTEBOOK
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_per_notebook = max_per_notebook
+
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.stores = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+        self._scopes: OrderedDict[frozenset[int], _Scope] = OrderedDict()
+        self._versions: dict[int, int] = {}
+        self._entries = 0
+
+    def versions(self, pdf_ids: list[int]) -> tuple[int, ...]:
+        """Versión actual de cada fuente; se toma antes de generar y se compara al guardar."""
+        return tuple(self._versions.get(pdf_id, 0) for pdf_id in sorted(set(pdf_ids)))
+
+    def skip(self):
+        """Registra una consulta que no usó el cache (pregunta de seguimiento)."""
+        self.skipped += 1
+
+    def lookup(self, pdf_ids: list[int], vector: list[float]) -> Optional[dict]:
+        """Respuesta cacheada más similar a la pregunta (con su similitud), o None."""
+        key = frozenset(pdf_ids)
+        scope = self._scopes.get(key)
+
+        if scope is not None:
+            self._expire(key, scope)
+
+        query = _unit(vector)
+
+        if scope is None or not scope.entries or query is None:
+            self.misses += 1
+            return None
+
+        similarities = scope.vectors @ query
+        best = int(np.argmax(similarities))
+
+        if similarities[best] < self.similarity_threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._scopes.move_to_end(key)
+        return {**scope.entries[best][1], "similarity": float(similarities[best])}
+
+    def put(self, pdf_ids: list[int], vector: list[float], answer: dict, versions: tuple[int, ...]):
+        """Guarda una respuesta validada, salvo que alguna fuente haya cambiado mientras se generaba."""
+        query = _unit(vector)
+        if versions != self.versions(pdf_ids) or query is None:
+            return
+
+        key = frozenset(pdf_ids)
+
+        scope = self._scopes.get(key)
+        if scope is not None:
+            self._expire(key, scope)
+
+        scope = self._scopes.get(key)
+        if scope is None:
+            scope = self._scopes[key] = _Scope(dim=len(query))
+
+        scope.vectors = np.vstack([scope.vectors, query])
+        scope.entries.append((time.monotonic() + self.ttl_seconds, answer))
+        self._scopes.move_to_end(key)
+        self._entries += 1
+        self.stores += 1
+
+        if len(scope.entries) > self.max_per_notebook:
+            self._drop_oldest(key, scope, len(scope.entries) - self.max_per_notebook)
+
+        # Las vencidas no ocupan lugar: se barren antes de desalojar respuestas vigentes
+        if self._entries > self.max_entries:
+            for expired_key, expired_scope in list(self._scopes.items()):
+                self._expire(expired_key, expired_scope)
+
+        while self._entries > self.max_entries:
+            oldest_key, oldest_scope = next(iter(self._scopes.items()))
+            self._drop_oldest(oldest_key, oldest_scope, 1)
+
+    def invalidate(self, pdf_ids: list[int]):
+        """Descarta las respuestas de todos los notebooks que usan alguna de estas fuentes."""
+        changed = set(pdf_ids)
+
+        for pdf_id in changed:
+            self._versions[pdf_id] = self._versions.get(pdf_id, 0) + 1
+
+        for key in [key for key in self._scopes if key & changed]:
+            scope = self._scopes.pop(key)
+            self._entries -= len(scope.entries)
+            self.invalidations += len(scope.entries)
+
+    def _drop_oldest(self, key: frozenset[int], scope: _Scope, count: int):
+        scope.keep(np.arange(len(scope.entries)) >= count)
+        self._entries -= count
+        self.evictions += count
+
+        if not scope.entries:
+            del self._scopes[key]
+
+    def _expire(self, key: frozenset[int], scope: _Scope):
+        now = time.monotonic()
+        alive = np.array([expires_at > now for expires_at, _ in scope.entries], dtype=bool)
+
+        if not alive.all():
+            self._entries -= int((~alive).sum())
+            scope.keep(alive)
+
+        if not scope.entries:
+            del self._scopes[key]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+
+        return {
+            "entries": self._entries,
+            "notebooks": len(self._scopes),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped_follow_ups": self.skipped,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,8 @@
+import json
+
+
+def format_sse(event: str, data: dict) -> str:
+    """
+    Helper function to serialize a server-sent event (the JSON payload stays on a single data line).
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
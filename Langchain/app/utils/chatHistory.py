@@ -1,6 +1,15 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from langchain_core.messages import HumanMessage, AIMessage
 
+from ..config import conf
+
+CHARS_PER_TOKEN = 4  # Estimación local de tokens (sin tokenizer): alcanza para acotar el tamaño del prompt
+FOLD_RATIO = 0.5  # Al resumir quedan los turnos que entran en esta fracción del presupuesto (el resumen no se rehace en cada turno)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
 
 class ChatHistory:
     
@@ -19,6 +28,7 @@ class ChatHistory:
                 conversations.append({
                     "user_question": messagesList[i]["text"],
                     "llm_response": messagesList[i + 1]["text"],
+                    "message_id": messagesList[i + 1].get("id"),  # Último mensaje del turno (hasta dónde se resumió)
                 })
                 i += 2
             else:
@@ -39,3 +49,93 @@ class ChatHistory:
         return messages
 
 
+class ChatHistoryWindow:
+    """
+    Historial acotado para el prompt: los últimos turnos textuales (hasta max_turns y token_budget)
+    más un resumen incremental de los anteriores.
+
+    Cuando los turnos no entran, los más viejos se agregan al resumen previo y quedan solo los que
+    entran en FOLD_RATIO del presupuesto: el resumen se actualiza cada varios turnos. UsersAPI guarda
+    el resumen y hasta qué mensaje cubre, y solo envía los mensajes posteriores, así que cada turno se
+    resume una sola vez y el payload y el prompt no crecen con la conversación.
+    """
+
+    def __init__(self, summarizer, max_turns: int = conf.CHAT_HISTORY_MAX_TURNS, token_budget: int = conf.CHAT_HISTORY_TOKEN_BUDGET):
+        """
+        Args:
+            summarizer: Chain que recibe {"summary", "conversation"} y devuelve el resumen actualizado
+            max_turns: Máximo de turnos (pregunta + respuesta) textuales en el prompt
+            token_budget: Máximo de tokens (estimados) de esos turnos
+        """
+        self.summarizer = summarizer
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+
+        self.folds = 0
+        self.folded_turns = 0
+        self.failed_folds = 0
+
+    @staticmethod
+    def _turn_tokens(conversation: Dict[str, any]) -> int:
+        return estimate_tokens(conversation["user_question"]) + estimate_tokens(conversation["llm_response"])
+
+    @classmethod
+    def _tail(cls, conversations: List[Dict[str, any]], max_turns: int, token_budget: int) -> int:
+        """Cantidad de turnos finales que entran en max_turns y token_budget."""
+        kept, tokens = 0, 0
+
+        for conversation in reversed(conversations[-max_turns:] if max_turns > 0 else []):
+            tokens += cls._turn_tokens(conversation)
+            if tokens > token_budget:
+                break
+            kept += 1
+
+        return kept
+
+    def split(self, conversations: List[Dict[str, any]]) -> tuple[List[Dict[str, any]], List[Dict[str, any]]]:
+        """(turnos a resumir, turnos textuales)"""
+        if self._tail(conversations, self.max_turns, self.token_budget) == len(conversations):
+            return [], conversations
+
+        kept = self._tail(conversations, max(1, int(self.max_turns * FOLD_RATIO)), int(self.token_budget * FOLD_RATIO))
+        if kept == 0:
+            kept = self._tail(conversations, 1, self.token_budget)  # El último turno queda textual si entra en el presupuesto
+        return conversations[:len(conversations) - kept], conversations[len(conversations) - kept:]
+
+    async def prepare(self, messagesList: List[Dict[str, any]], summary: str = "") -> Dict[str, any]:
+        """
+        Mensajes del prompt y resumen (actualizado si se resumieron turnos).
+
+        Returns:
+            {"messages": HumanMessage/AIMessage de los turnos textuales, "summary": resumen a usar,
+             "summarized_until": id del último mensaje resumido o None si el resumen no cambió}
+        """
+        folded, window = self.split(ChatHistory.parse_conversations(messagesList))
+        result = {"messages": ChatHistory.getChatHistory(window), "summary": summary, "summarized_until": None}
+
+        if not folded:
+            return result
+
+        conversation = "\n\n".join(f"Usuario: {turn['user_question']}\nAsistente: {turn['llm_response']}" for turn in folded)
+
+        try:
+            result["summary"] = await self.summarizer.ainvoke({"summary": summary or "(sin resumen previo)", "conversation": conversation})
+            result["summarized_until"] = folded[-1]["message_id"]
+            self.folds += 1
+            self.folded_turns += len(folded)
+            print(f"  [HISTORY] {len(folded)} turnos agregados al resumen, {len(window)} textuales")
+        except Exception as e:
+            # Sin resumen nuevo: se usa el anterior y UsersAPI vuelve a enviar estos turnos en el próximo mensaje
+            self.failed_folds += 1
+            print(f"  [HISTORY] Error al resumir el historial: {str(e)}")
+
+        return result
+
+    def stats(self) -> Dict[str, any]:
+        return {
+            "max_turns": self.max_turns,
+            "token_budget": self.token_budget,
+            "folds": self.folds,
+            "folded_turns": self.folded_turns,
+            "failed_folds": self.failed_folds,
+        }
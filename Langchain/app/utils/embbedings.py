@@ -1,24 +1,289 @@
+import asyncio
+import random
+import re
+import time
+from typing import Awaitable, Callable, Optional
+
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 
+from .embedding_cache import EmbeddingCache, MemoryCache
+from ..db.vector_codec import truncate_and_normalize
 from ..config import conf
 
 
+class TokenBucket:
+    """Token bucket que se recarga a `rate_per_minute` unidades por minuto (hasta `capacity`). Con rate <= 0 no limita."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = max(0.0, rate_per_minute) / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount: float = 1.0):
+        """Espera hasta que haya `amount` unidades disponibles y las consume (en orden de llegada)."""
+        if self.rate == 0:
+            return
+
+        amount = min(amount, self.capacity)
+
+        async with self._lock:
+            self._refill()
+
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+
+            self.tokens -= amount
+
+
+_RETRYABLE_CODES = (429, 503)
+_RETRYABLE_STATUSES = ("RESOURCE_EXHAUSTED", "UNAVAILABLE")
+# Solo el código HTTP seguido de su status ("429 RESOURCE_EXHAUSTED", "(503): UNAVAILABLE"), no un número suelto en el texto
+_RETRYABLE_MESSAGE = re.compile(r"\b(?:429\W{1,3}RESOURCE_EXHAUSTED|503\W{1,3}UNAVAILABLE)\b")
+_THROTTLED_MESSAGE = re.compile(r"\b429\W{1,3}RESOURCE_EXHAUSTED\b")
+
+
+def _matches_error(error: Exception, codes: tuple, statuses: tuple, message: re.Pattern) -> bool:
+    for e in (error, error.__cause__):
+        if e is None:
+            continue
+
+        if getattr(e, "code", None) in codes or getattr(e, "status_code", None) in codes:
+            return True
+
+        if getattr(e, "status", None) in statuses:
+            return True
+
+        if message.search(str(e)):
+            return True
+
+    return False
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Errores de throttling (429 / RESOURCE_EXHAUSTED) o de indisponibilidad temporal (503) del proveedor."""
+    return _matches_error(error, _RETRYABLE_CODES, _RETRYABLE_STATUSES, _RETRYABLE_MESSAGE)
+
+
+def _is_throttled(error: Exception) -> bool:
+    """Solo throttling (429 / RESOURCE_EXHAUSTED), sin los 503 de indisponibilidad."""
+    return _matches_error(error, (429,), ("RESOURCE_EXHAUSTED",), _THROTTLED_MESSAGE)
+
+
+class EmbeddingBatchScheduler:
+    """
+    Scheduler compartido para las llamadas de embeddings de documentos.
+
+    - Divide los textos en batches que respetan el máximo de textos y de tokens por request.
+    - Ejecuta como máximo `max_concurrency` batches a la vez (entre todas las ingestas).
+    - Respeta token buckets de requests por minuto y tokens por minuto.
+    - Reintenta los batches throttleados con backoff exponencial con jitter; mientras dura
+      el backoff el resto de los batches también espera, para no seguir golpeando el límite.
+    - Devuelve los vectores en el mismo orden que los textos.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = conf.EMBEDDING_MAX_BATCH_SIZE,
+        max_batch_tokens: int = conf.EMBEDDING_MAX_BATCH_TOKENS,
+        max_concurrency: int = conf.EMBEDDING_MAX_CONCURRENCY,
+        requests_per_minute: int = conf.EMBEDDING_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = conf.EMBEDDING_TOKENS_PER_MINUTE,
+        max_retries: int = conf.EMBEDDING_MAX_RETRIES,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_tokens = max(1, max_batch_tokens)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._requests_bucket = TokenBucket(requests_per_minute)
+        self._tokens_bucket = TokenBucket(tokens_per_minute)
+        self._paused_until = 0.0
+
+        self.batches = 0
+        self.retries = 0
+        self.throttled = 0
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Estimación rápida de tokens (~4 caracteres por token)."""
+        return len(text) // 4 + 1
+
+    def make_batches(self, texts: list[str]) -> list[tuple[int, int]]:
+        """Agrupa los textos (en orden) en rangos [start, end) que respetan los límites por request."""
+        batches = []
+        start = 0
+        tokens = 0
+
+        for i, text in enumerate(texts):
+            text_tokens = self.estimate_tokens(text)
+
+            if i > start and (i - start >= self.max_batch_size or tokens + text_tokens > self.max_batch_tokens):
+                batches.append((start, i))
+                start = i
+                tokens = 0
+
+            tokens += text_tokens
+
+        if start < len(texts):
+            batches.append((start, len(texts)))
+
+        return batches
+
+    async def run(self, texts: list[str], embed_fn: Callable[[list[str]], Awaitable[list[list[float]]]]) -> list[list[float]]:
+        """Embebe `texts` usando `embed_fn` por batches, respetando concurrencia y rate limits."""
+        results: list[Optional[list[float]]] = [None] * len(texts)
+
+        async def run_batch(start: int, end: int):
+            async with self._semaphore:
+                results[start:end] = await self._call_with_retry(texts[start:end], embed_fn)
+
+        await asyncio.gather(*(run_batch(start, end) for start, end in self.make_batches(texts)))
+
+        return results
+
+    async def _call_with_retry(self, batch: list[str], embed_fn: Callable[[list[str]], Awaitable[list[list[float]]]]) -> list[list[float]]:
+        tokens = sum(self.estimate_tokens(text) for text in batch)
+
+        for attempt in range(self.max_retries + 1):
+            # Respetar la pausa global si algún batch fue throttleado
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+
+            await self._requests_bucket.acquire(1)
+            await self._tokens_bucket.acquire(tokens)
+
+            try:
+                self.batches += 1
+                return await embed_fn(batch)
+
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+
+                self.retries += 1
+                if _is_throttled(e):
+                    self.throttled += 1
+
+                # Backoff exponencial con "full jitter"
+                delay = random.uniform(self.base_delay, min(self.max_delay, self.base_delay * 2 ** (attempt + 1)))
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+                print(f"   [EMBED] Batch de {len(batch)} textos {'throttleado' if _is_throttled(e) else 'no disponible'}, reintento {attempt + 1}/{self.max_retries} en {delay:.1f}s")
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "retries": self.retries,
+            "throttled": self.throttled,
+        }
+
+
 class EmbeddingGenerator:
-    def __init__(self):
-        self.embeddings =  GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001", google_api_key=conf.GOOGLE_API_KEY)
-    
-    async def get_document_embedding(self,text: list[str]) -> list[list[float]]:
+    def __init__(
+        self,
+        cache: Optional[EmbeddingCache] = None,
+        scheduler: Optional[EmbeddingBatchScheduler] = None,
+        query_cache: Optional[MemoryCache] = None
+    ):
+        self.model = "models/gemini-embedding-001"
+        self.output_dimensionality = conf.EMBEDDING_DIMENSION  # La dim 3072 ya esta normalizada; 1536/768 (Matryoshka) se re-normalizan
+        self.embeddings =  GoogleGenerativeAIEmbeddings(model=self.model, google_api_key=conf.GOOGLE_API_KEY)
+        self.cache = cache  # Cache persistente de embeddings por chunk (opcional)
+        self.scheduler = scheduler or EmbeddingBatchScheduler()  # Compartido por todas las ingestas
+        # Cache en memoria de embeddings de consultas (LRU + TTL, consultas iguales en vuelo comparten la llamada)
+        self.query_cache = query_cache or MemoryCache(
+            max_entries=conf.QUERY_EMBEDDING_CACHE_SIZE,
+            ttl_seconds=conf.QUERY_EMBEDDING_CACHE_TTL_SECONDS
+        )
+
+    def _normalize(self, vector: list[float]) -> list[float]:
+        """Gemini solo normaliza los embeddings de 3072 dimensiones: los truncados se re-normalizan."""
+        if self.output_dimensionality >= 3072:
+            return vector
+
+        return truncate_and_normalize(vector, self.output_dimensionality).tolist()
+
+    async def _embed_documents(self, text: list[str]) -> list[list[float]]:
+        """Embebe documentos a través del scheduler (batches, concurrencia, rate limits y reintentos)."""
+        vectors = await self.scheduler.run(
+            texts=text,
+            embed_fn=lambda batch: self.embeddings.aembed_documents(texts=batch, task_type="RETRIEVAL_DOCUMENT", output_dimensionality=self.output_dimensionality )
+        )
+
+        return [self._normalize(vector) for vector in vectors]
+
+    async def get_document_embedding(self,text: list[str], use_cache: bool = True) -> list[list[float]]:
         """Genera embeddings para una lista de textos (documentos)"""
-        """Un embedding por string en la lista"""
-        return await self.embeddings.aembed_documents(texts=text, task_type="RETRIEVAL_DOCUMENT", output_dimensionality=3072 )
+        """Un embedding por string en la lista (use_cache=False para textos que no se repiten)"""
+        if self.cache is None or not use_cache:
+            return await self._embed_documents(text=text)
+
+        # Solo los textos que no están en el cache van al proveedor (una vez por texto distinto)
+        keys = [EmbeddingCache.make_key(self.model, "RETRIEVAL_DOCUMENT", self.output_dimensionality, t) for t in text]
+        vectors = await self.cache.aget_many(keys)
+
+        missing = {}
+        for key, t in zip(keys, text):
+            if key not in vectors:
+                missing.setdefault(key, t)
+
+        if missing:
+            new_vectors = await self._embed_documents(text=list(missing.values()))
+            computed = dict(zip(missing.keys(), new_vectors))
+
+            await self.cache.aput_many(computed)
+            vectors.update(computed)
+
+        return [vectors[key] for key in keys]
     
+
+    async def _embed_query(self, text: str, key: bytes) -> list[float]:
+        """Embebe una consulta, pasando por el cache persistente si está habilitado para consultas."""
+        persist = self.cache is not None and conf.QUERY_EMBEDDING_CACHE_PERSIST
+
+        if persist:
+            found = await self.cache.aget_many([key])
+            if key in found:
+                return found[key]
+
         # SEMANTIC_SIMILARITY : incrustaciones optimizadas para evaluar la similitud del texto.
-        # La dim 3072 ya esta normalizada
+        vector = await self.embeddings.aembed_query(text=text, task_type="SEMANTIC_SIMILARITY", output_dimensionality=self.output_dimensionality )
+        vector = self._normalize(vector)
+
+        if persist:
+            await self.cache.aput_many({key: vector})
+
+        return vector
+
+    async def get_query_embedding(self, text: str, pinned: bool = False) -> list[float]:
+        """Embedding de una consulta: memoria -> cache persistente -> Gemini. pinned lo conserva sin TTL."""
+        key = EmbeddingCache.make_key(self.model, "SEMANTIC_SIMILARITY", self.output_dimensionality, text)
+
+        return await self.query_cache.get_or_compute(key, lambda: self._embed_query(text=text, key=key), pinned=pinned)
 
+    async def precompute_queries(self, texts: list[str]):
+        """Calcula al arrancar los embeddings de las consultas constantes y los fija en el cache."""
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self.get_query_embedding(text=text, pinned=True) for text in texts), return_exceptions=True)
 
-    async def get_query_embedding(self,text: str) -> list[float]:
+        failed = [text for text, result in zip(texts, results) if isinstance(result, Exception)]
+        print(f"   [EMBED] {len(texts) - len(failed)}/{len(texts)} consultas constantes precalculadas en {time.perf_counter() - started:.2f}s")
 
-        return await self.embeddings.aembed_query(text=text, task_type="SEMANTIC_SIMILARITY", output_dimensionality=3072 )
+        for text in failed:
+            print(f"   [EMBED] No se pudo precalcular '{text}': se calcula en la primera consulta")
 
     
     def format_database (self, text_chunks:list[dict], vector_chunks:list[list[float]], pdf_id: int) -> list[dict]:
@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+
+class EmbeddingCache:
+    """
+    Persistent chunk-level embedding cache on local disk.
+
+    Entries are keyed by (model, task_type, output_dimensionality, text) hashed with SHA-256
+    and stored in SQLite as float32 blobs (4 bytes per dimension). When the stored vectors
+    exceed max_bytes the least recently used entries are evicted. Hit/miss counters are
+    kept in memory for the /metrics endpoint.
+    """
+
+    _SELECT_CHUNK = 500  # Límite de parámetros por consulta en SQLite
+
+    def __init__(self, path: str, max_bytes: int):
+        """
+        Args:
+            path: SQLite file where the cache is stored
+            max_bytes: Maximum size of the stored vectors before evicting
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+        self._entries, self._bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+
+    @staticmethod
+    def make_key(model: str, task_type: str, output_dimensionality: int, text: str) -> bytes:
+        """Clave del cache: SHA-256 de (modelo, task_type, dimensión, texto)."""
+        return hashlib.sha256(f"{model}\0{task_type}\0{output_dimensionality}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, keys: list[bytes]) -> dict[bytes, list[float]]:
+        """Devuelve los vectores cacheados para las claves pedidas (las ausentes no aparecen)."""
+        unique_keys = list(dict.fromkeys(keys))
+        found = {}
+
+        with self._lock:
+            for start in range(0, len(unique_keys), self._SELECT_CHUNK):
+                chunk = unique_keys[start:start + self._SELECT_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(unique_keys) - len(found)
+
+        return found
+
+    def put_many(self, items: dict[bytes, list[float]]):
+        """Guarda vectores nuevos y aplica la política de desalojo por tamaño."""
+        if not items:
+            return
+
+        now = time.time()
+
+        with self._lock:
+            for key, vector in items.items():
+                blob = array("f", vector).tobytes()
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", (key, blob, now)
+                )
+
+                if cursor.rowcount:
+                    self._entries += 1
+                    self._bytes += len(blob)
+
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Elimina las entradas menos usadas recientemente hasta volver al límite (con un 10% de margen)."""
+        if self._bytes <= self.max_bytes or not self._entries:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        average = self._bytes / self._entries
+        to_remove = max(1, int((self._bytes - target) / average) + 1)
+
+        rows = self._conn.execute(
+            "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used ASC LIMIT ?", (to_remove,)
+        ).fetchall()
+
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", [(key,) for key, _ in rows])
+
+        self._entries -= len(rows)
+        self._bytes -= sum(size for _, size in rows)
+        self.evictions += len(rows)
+
+    async def aget_many(self, keys: list[bytes]) -> dict[bytes, list[float]]:
+        return await asyncio.to_thread(self.get_many, keys)
+
+    async def aput_many(self, items: dict[bytes, list[float]]):
+        await asyncio.to_thread(self.put_many, items)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+
+        return {
+            "entries": self._entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MemoryCache:
+    """
+    In-memory LRU + TTL cache with request coalescing (query embeddings, rerank results).
+
+    Concurrent lookups of the same key share a single computation (singleflight) instead
+    of calling the provider once each. Pinned entries (constant queries precomputed at
+    startup) never expire nor count towards max_entries.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        """
+        Args:
+            max_entries: Maximum number of (unpinned) entries before evicting the least recently used
+            ttl_seconds: Seconds an entry is valid after being computed
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+        self._entries: OrderedDict[bytes, tuple[float, Any]] = OrderedDict()  # key -> (expires_at, value)
+        self._pinned: dict[bytes, Any] = {}
+        self._in_flight: dict[bytes, asyncio.Task] = {}
+
+    def get(self, key: bytes):
+        """Valor cacheado y vigente para la clave, o None."""
+        if key in self._pinned:
+            return self._pinned[key]
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, vector = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return vector
+
+    def put(self, key: bytes, vector: Any, pinned: bool = False):
+        if pinned:
+            self._pinned[key] = vector
+            self._entries.pop(key, None)
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, vector)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key: bytes, compute: Callable[[], Awaitable[Any]], pinned: bool = False) -> Any:
+        """Devuelve el valor cacheado o lo calcula una sola vez aunque lo pidan varias consultas a la vez (los errores no se cachean)."""
+        vector = self.get(key)
+        if vector is not None:
+            self.hits += 1
+            if pinned:
+                self.put(key, vector, pinned=True)
+            return vector
+
+        if key in self._in_flight:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(compute())
+            task.add_done_callback(lambda task: self._finish(key, task, pinned))
+            self._in_flight[key] = task
+
+        # El cálculo corre en su propia task: cancelar una consulta (cliente desconectado) solo cancela su espera
+        return await asyncio.shield(self._in_flight[key])
+
+    def _finish(self, key: bytes, task: asyncio.Task, pinned: bool):
+        """Cachea el resultado de un cálculo compartido (corre antes de despertar a quienes lo esperan)."""
+        del self._in_flight[key]
+
+        # task.exception() la marca como leída: si nadie esperaba no se reporta como no recuperada
+        if not task.cancelled() and task.exception() is None:
+            self.put(key, task.result(), pinned=pinned)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+
+        return {
+            "entries": len(self._entries),
+            "pinned": len(self._pinned),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
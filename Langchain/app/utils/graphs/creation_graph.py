@@ -2,12 +2,97 @@ from langgraph.graph import StateGraph, END
 from typing import TypedDict, Literal
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain.chat_models import init_chat_model
 
 from ..embbedings import EmbeddingGenerator
-from ...db.milvus import Async_Milvus_Client
+from ..models import ModelRegistry
+from ...db.vector_store import VectorStore
+from ...db.content_store import ContentStore
 from ...schemas.graphs.creation_graph_state_schema import CreationGraphState
 
+# Generic query to get an overview of the document (constant: its embedding is precomputed at startup)
+OVERVIEW_QUERY = "Main content and topics of the document"
+
+# Generator model (the instance is shared across requests through the ModelRegistry)
+GENERATOR_MODEL = "google_genai:gemini-2.5-flash-lite"
+
+QUESTIONS_AND_ANSWERS_PROMPT = ChatPromptTemplate.from_messages([
+    ("user", """Eres un agente especializado en analizar documentos PDF y generar preguntas y respuestas para cuestionarios.
+
+Tarea: Analiza los documentos adjuntos y genera exclusivamente un objeto JSON válido.
+
+Estructura del JSON: Debe contener dos claves:
+- "title": Título que resuma el tema del cuestionario (máximo 255 caracteres).
+- "question_and_answers": Un array de 5 objetos, donde cada objeto tiene:
+  - "question": Pregunta sobre el contenido (máximo 255 caracteres).
+  - "answer": Respuesta correcta detallada (máximo 255 caracteres).
+  - "incorrec_answer_1": Respuesta incorrecta plausible (máximo 255 caracteres).
+  - "incorrec_answer_2": Respuesta incorrecta plausible (máximo 255 caracteres).
+  - "incorrec_answer_3": Respuesta incorrecta plausible (máximo 255 caracteres).
+
+Restricciones críticas:
+- No incluyas introducciones, explicaciones ni bloques de código Markdown (como ```json).
+- Solo devuelve el texto plano del JSON.
+- Asegúrate de que los caracteres especiales estén escapados correctamente para no romper el formato JSON.
+- La respuesta debe basarse estrictamente en los documentos proporcionados.
+- Usa EXCLUSIVAMENTE la información del contexto proporcionado
+- NO inventes información que no esté en los documentos
+- Si el contenido es insuficiente o inadecuado, devuelve: {{"message": "No puedo realizar la acción con la información provista."}}
+- El JSON debe ser válido y poder parsearse directamente
+
+Contexto de los documentos:
+{context}
+
+Responde únicamente con el JSON:""")
+])
+
+NOTEBOOK_PROMPT = ChatPromptTemplate.from_messages([
+    ("user", """Eres un agente especializado en analizar documentos PDF y generar metadatos para notebooks automáticamente.
+
+Tu tarea es analizar el contenido de uno o más documentos y generar ÚNICAMENTE un JSON válido con los siguientes campos:
+- title: Título conciso que refleje el contenido principal de los documentos (máximo 255 caracteres, sin comillas ni detalles excesivos)
+- icon: Un emoji representativo del tema de los documentos
+- description: Descripción clara y concisa del contenido (máximo 1024 caracteres)
+
+Instrucciones obligatorias:
+1. Si hay múltiples documentos, crea un título y descripción que unifique sus temas
+2. Usa EXCLUSIVAMENTE la información del contexto proporcionado
+3. NO inventes información que no esté en los documentos
+4. Si el contenido es insuficiente o inadecuado, devuelve: {{"message": "No puedo realizar la acción con la información provista."}}
+5. Responde SOLO con el JSON, sin texto adicional ni explicaciones
+6. El JSON debe ser válido y poder parsearse directamente
+
+Contexto de los documentos:
+{context}
+
+Responde únicamente con el JSON:""")
+])
+
+FLASHCARDS_PROMPT = ChatPromptTemplate.from_messages([
+    ("user", """Eres un agente especializado en analizar documentos PDF y generar preguntas y respuestas para flashcards.
+
+Tarea: Analiza los documentos adjuntos y genera exclusivamente un objeto JSON válido.
+
+Estructura del JSON: Debe contener una única clave llamada "preguntas" cuyo valor sea un array de 5 objetos. Cada objeto debe tener:
+- "question": Pregunta sobre el contenido (máximo 255 caracteres).
+- "answer": Respuesta detallada (máximo 1024 caracteres).
+
+Restricciones críticas:
+- No incluyas introducciones, explicaciones ni bloques de código Markdown (como ```json).
+- Solo devuelve el texto plano del JSON.
+- Asegúrate de que los caracteres especiales estén escapados correctamente para no romper el formato JSON.
+- La respuesta debe basarse estrictamente en los documentos proporcionados.
+- Usa EXCLUSIVAMENTE la información del contexto proporcionado
+- NO inventes información que no esté en los documentos
+- Si el contenido es insuficiente o inadecuado, devuelve: {{"message": "No puedo realizar la acción con la información provista."}}
+- El JSON debe ser válido y poder parsearse directamente
+
+Contexto de los documentos:
+{context}
+
+Responde únicamente con el JSON:""")
+])
+
+
 class CreationGraph:
     """
     Graph for entity creation based on one or more PDFs
@@ -16,15 +101,28 @@ class CreationGraph:
     START: Literal["start"] = "start"
     END: Literal["end"] = "end"
 
-    def __init__(self, embedding_generator: EmbeddingGenerator, client_milvus: Async_Milvus_Client):
+    def __init__(
+        self, embedding_generator: EmbeddingGenerator, client_milvus: VectorStore, content_store: ContentStore = None,
+        model_registry: ModelRegistry = None
+    ):
         """
         Initializes the graph with the necessary nodes and transitions
         """
         self.embedding_generator = embedding_generator
         self.client_milvus = client_milvus
+        self.content_store = content_store
+        self.models = model_registry or ModelRegistry()
         self.workflow = None
         self.app = None
 
+        # Model and chains built once: the generator nodes only invoke them
+        model = self.models.chat_model(GENERATOR_MODEL)
+        self.questions_and_answers_chain = self.models.chain(
+            "creation.questions_and_answers", lambda: QUESTIONS_AND_ANSWERS_PROMPT | model | StrOutputParser()
+        )
+        self.notebook_chain = self.models.chain("creation.notebook", lambda: NOTEBOOK_PROMPT | model | StrOutputParser())
+        self.flashcards_chain = self.models.chain("creation.flashcards", lambda: FLASHCARDS_PROMPT | model | StrOutputParser())
+
     async def retrieve_context(self, state: CreationGraphState) -> CreationGraphState:
         """
         Automatically retrieves all context from one or more PDFs.
@@ -37,35 +135,32 @@ class CreationGraph:
         all_contexts = []
         
         try:
-            # Generic query to get an overview of the document
-            generic_query = "Main content and topics of the document"
+            # Embedding of the generic overview query (cached since startup)
+            query_vector = await self.embedding_generator.get_query_embedding(text=OVERVIEW_QUERY, pinned=True)
             
-            # Generate embedding for the generic query
-            query_vector = await self.embedding_generator.get_query_embedding(text=generic_query)
-            
-            # Iterate over each PDF ID and retrieve its context
+            # Map each source to the pdf_id that stores its vectors (shared content)
+            stored_ids = {pdf_id: pdf_id for pdf_id in pdf_ids}
+            if self.content_store is not None:
+                stored_ids = await self.content_store.resolve(pdf_ids)
+
+            # One search grouped by pdf_id for every document (sources with identical content share a group)
+            results_by_stored_id = await self.client_milvus.get_documents_by_pdf(
+                query_vector=query_vector,
+                collection_name="documents_collection",
+                pdf_ids=list(stored_ids.values()),
+                query_text=OVERVIEW_QUERY  # Para la búsqueda híbrida (BM25), igual que en el chat
+            )
+
             for pdf_id in pdf_ids:
-                print(f"   [RETRIEVE] Processing PDF ID: {pdf_id}")
-                
-                # Filter by specific pdf_id
-                filter_expr = f'pdf_id == {pdf_id}'
-                
-                results = await self.client_milvus.get_document(
-                    query_vector=query_vector, 
-                    collection_name="documents_collection", 
-                    filter=filter_expr
-                )
+                results = results_by_stored_id.get(stored_ids[pdf_id], [])
                 
                 # Process results for this PDF
-                if isinstance(results, list) and len(results) > 0:
+                if len(results) > 0:
                     pdf_context = "\n\n".join([str(doc) for doc in results])
                     all_contexts.append(f"--- Document {pdf_id} ---\n{pdf_context}")
                     print(f"   [RETRIEVE] Retrieved {len(results)} fragments from PDF {pdf_id}")
-                elif isinstance(results, list) and len(results) == 0:
-                    print(f"   [RETRIEVE] No documents found for pdf_id: {pdf_id}")
                 else:
-                    if results:
-                        all_contexts.append(f"--- Document {pdf_id} ---\n{str(results)}")
+                    print(f"   [RETRIEVE] No documents found for pdf_id: {pdf_id}")
             
             # Combine all contexts
             context = "\n\n".join(all_contexts) if all_contexts else ""
@@ -98,43 +193,9 @@ class CreationGraph:
                 "generation": error_json
             }
         
-        model = init_chat_model("google_genai:gemini-2.5-flash-lite")
-        
-        generator_prompt = ChatPromptTemplate.from_messages([
-            ("user", """Eres un agente especializado en analizar documentos PDF y generar preguntas y respuestas para cuestionarios.
-
-Tarea: Analiza los documentos adjuntos y genera exclusivamente un objeto JSON válido.
-
-Estructura del JSON: Debe contener dos claves:
-- "title": Título que resuma el tema del cuestionario (máximo 255 caracteres).
-- "question_and_answers": Un array de 5 objetos, donde cada objeto tiene:
-  - "question": Pregunta sobre el contenido (máximo 255 caracteres).
-  - "answer": Respuesta correcta detallada (máximo 255 caracteres).
-  - "incorrec_answer_1": Respuesta incorrecta plausible (máximo 255 caracteres).
-  - "incorrec_answer_2": Respuesta incorrecta plausible (máximo 255 caracteres).
-  - "incorrec_answer_3": Respuesta incorrecta plausible (máximo 255 caracteres).
-
-Restricciones críticas:
-- No incluyas introducciones, explicaciones ni bloques de código Markdown (como ```json).
-- Solo devuelve el texto plano del JSON.
-- Asegúrate de que los caracteres especiales estén escapados correctamente para no romper el formato JSON.
-- La respuesta debe basarse estrictamente en los documentos proporcionados.
-- Usa EXCLUSIVAMENTE la información del contexto proporcionado
-- NO inventes información que no esté en los documentos
-- Si el contenido es insuficiente o inadecuado, devuelve: {{"message": "No puedo realizar la acción con la información provista."}}
-- El JSON debe ser válido y poder parsearse directamente
-
-Contexto de los documentos:
-{context}
-
-Responde únicamente con el JSON:""")
-        ])
-        
-        generator_chain = generator_prompt | model | StrOutputParser()
-        
         print(f"\n  [GENERATE] Invoking model with context of {len(context)} characters")
         
-        generation = await generator_chain.ainvoke({
+        generation = await self.questions_and_answers_chain.ainvoke({
             "context": context
         })
         
@@ -163,35 +224,9 @@ Responde únicamente con el JSON:""")
                 "generation": error_json
             }
         
-        model = init_chat_model("google_genai:gemini-2.5-flash-lite")
-        
-        generator_prompt = ChatPromptTemplate.from_messages([
-            ("user", """Eres un agente especializado en analizar documentos PDF y generar metadatos para notebooks automáticamente.
-
-Tu tarea es analizar el contenido de uno o más documentos y generar ÚNICAMENTE un JSON válido con los siguientes campos:
-- title: Título conciso que refleje el contenido principal de los documentos (máximo 255 caracteres, sin comillas ni detalles excesivos)
-- icon: Un emoji representativo del tema de los documentos
-- description: Descripción clara y concisa del contenido (máximo 1024 caracteres)
-
-Instrucciones obligatorias:
-1. Si hay múltiples documentos, crea un título y descripción que unifique sus temas
-2. Usa EXCLUSIVAMENTE la información del contexto proporcionado
-3. NO inventes información que no esté en los documentos
-4. Si el contenido es insuficiente o inadecuado, devuelve: {{"message": "No puedo realizar la acción con la información provista."}}
-5. Responde SOLO con el JSON, sin texto adicional ni explicaciones
-6. El JSON debe ser válido y poder parsearse directamente
-
-Contexto de los documentos:
-{context}
-
-Responde únicamente con el JSON:""")
-        ])
-        
-        generator_chain = generator_prompt | model | StrOutputParser()
-        
         print(f"\n  [GENERATE] Invoking model with context of {len(context)} characters")
         
-        generation = await generator_chain.ainvoke({
+        generation = await self.notebook_chain.ainvoke({
             "context": context
         })
         
@@ -220,38 +255,9 @@ Responde únicamente con el JSON:""")
                 "generation": error_json
             }
         
-        model = init_chat_model("google_genai:gemini-2.5-flash-lite")
-        
-        generator_prompt = ChatPromptTemplate.from_messages([
-            ("user", """Eres un agente especializado en analizar documentos PDF y generar preguntas y respuestas para flashcards.
-
-Tarea: Analiza los documentos adjuntos y genera exclusivamente un objeto JSON válido.
-
-Estructura del JSON: Debe contener una única clave llamada "preguntas" cuyo valor sea un array de 5 objetos. Cada objeto debe tener:
-- "question": Pregunta sobre el contenido (máximo 255 caracteres).
-- "answer": Respuesta detallada (máximo 1024 caracteres).
-
-Restricciones críticas:
-- No incluyas introducciones, explicaciones ni bloques de código Markdown (como ```json).
-- Solo devuelve el texto plano del JSON.
-- Asegúrate de que los caracteres especiales estén escapados correctamente para no romper el formato JSON.
-- La respuesta debe basarse estrictamente en los documentos proporcionados.
-- Usa EXCLUSIVAMENTE la información del contexto proporcionado
-- NO inventes información que no esté en los documentos
-- Si el contenido es insuficiente o inadecuado, devuelve: {{"message": "No puedo realizar la acción con la información provista."}}
-- El JSON debe ser válido y poder parsearse directamente
-
-Contexto de los documentos:
-{context}
-
-Responde únicamente con el JSON:""")
-        ])
-        
-        generator_chain = generator_prompt | model | StrOutputParser()
-        
         print(f"\n  [GENERATE] Invoking model with context of {len(context)} characters")
         
-        generation = await generator_chain.ainvoke({
+        generation = await self.flashcards_chain.ainvoke({
             "context": context
         })
         
@@ -316,14 +322,19 @@ Responde únicamente con el JSON:""")
         return await self.app.ainvoke(initial_state)
 
 
-def create_creation_graph(embedding_generator: EmbeddingGenerator, client_milvus:Async_Milvus_Client):
+def create_creation_graph(
+    embedding_generator: EmbeddingGenerator, client_milvus: VectorStore, content_store: ContentStore = None,
+    model_registry: ModelRegistry = None
+):
     """
     Factory function that creates an instance of CreationGraph and builds the graph
     
     Args:
         embedding_generator: Embedding generator
         client_milvus: Asynchronous Milvus client
+        content_store: Optional source -> pdf_id mapping for shared content
+        model_registry: Chat models and chains shared across requests (and with the RAG graph)
     """
-    creation_graph = CreationGraph(embedding_generator, client_milvus)
+    creation_graph = CreationGraph(embedding_generator, client_milvus, content_store, model_registry)
     creation_graph.build()
     return creation_graph
\ No newline at end of file
@@ -1,34 +1,133 @@
-from typing import Literal
+import asyncio
+from typing import AsyncIterator, Literal, Optional
 from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableConfig
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain.chat_models import init_chat_model
 from langchain_community.chat_message_histories import ChatMessageHistory
 import json
 
 from ..embbedings import EmbeddingGenerator
 from ..reranker import Reranker
-from ...db.milvus import Async_Milvus_Client
-from ..chatHistory import ChatHistory
+from ..models import ModelRegistry
+from ..groundedness import GroundednessChecker
+from ..answer_cache import SemanticAnswerCache, is_follow_up
+from ...db.vector_store import VectorStore
+from ...db.content_store import ContentStore
+from ..chatHistory import ChatHistoryWindow
+from ..aux_functions.format_generated_text import format_generated_text
+from ...config import conf
 
 from ...schemas.graphs.conversation_graph_state_schema import ConversationGraphState
 
 
+# Modelos de los nodos (las instancias se comparten entre requests a través del ModelRegistry)
+GENERATOR_MODEL = "google_genai:gemini-2.5-flash-lite"
+JUDGE_MODEL = "google_genai:gemini-2-pro"
+
+GENERATOR_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """Eres un asistente/profesor útil y conciso que ayuda a los usuarios a estudiar usando **únicamente** el PDF previamente subido como contexto.  
+
+- Usa exclusivamente la información presente en `{context}`.  
+- Resumen de la conversación anterior al historial: {summary}
+- El historial de chat: {history} (si está presente, úsalo para mantener coherencia, pero no dependas de él para responder), (si te preguntan por el historial o resumen del chat puedes proveerlo para recordarle al usuario la charla que mantienen, hazle un pequeño listado de pregutnas que te hizo, solo si lo pide).
+- **No inventes** información. Si la respuesta no puede responderse con lo provisto, responde exactamente: "No puedo responder eso con la información provista." y, si es posible, sugiere 1–2 acciones para obtener la respuesta.
+- **No reveles razonamiento interno** (no escribir chain-of-thought). En lugar de eso, entrega:  
+  1) **Respuesta** — respuesta clara y directa (1–3 frases);  
+  2) **Justificación en base al texto** — hasta 3 bullets que indiquen qué partes del `{context}` sustentan la respuesta;"""),
+    ("human", "{question}")
+])
+
+JUDGE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """Eres un juez experto que evalúa si una respuesta es de buena calidad.
+
+Analiza si:
+1. La respuesta está fundamentada en el contexto proporcionado
+2. La respuesta es precisa y relevante a la pregunta
+3. La respuesta no contiene información inventada fuera del contexto
+4. Si dice "No puedo responder...", determina si es una respuesta válida a falta de información
+
+Responde con un JSON con este formato EXACTO:
+{{
+    "is_valid": true/false,
+    "reasoning": "explicación breve"
+}}
+
+NO agregues más texto, SOLO el JSON."""),
+    ("human", """Pregunta: {question}
+
+Contexto: {context}
+
+Respuesta: {generation}
+
+¿Es una buena respuesta?""")
+])
+
+REFINER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """Eres un experto en reformular preguntas para mejorar la recuperación de información.
+
+La pregunta original no obtuvo una respuesta satisfactoria. Reformúlala usando:
+- Sinónimos más específicos
+- Términos técnicos relevantes
+- Diferentes ángulos de la pregunta
+- Descomposición en sub-preguntas si es necesario
+
+Responde SOLO con la pregunta reformulada, sin explicaciones adicionales."""),
+    ("human", "Pregunta original: {question}\n\nRespuesta insatisfactoria: {generation}")
+])
+
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """Mantienes el resumen de una conversación de estudio entre un usuario y un asistente sobre sus PDFs.
+
+Actualiza el resumen previo agregando los nuevos turnos:
+- Conserva los temas consultados, las definiciones y datos clave de las respuestas y lo que el usuario quiere aprender
+- Descarta saludos, repeticiones y formato
+- Máximo {max_words} palabras, en prosa o bullets breves
+
+Responde SOLO con el resumen actualizado."""),
+    ("human", "Resumen previo:\n{summary}\n\nNuevos turnos:\n{conversation}")
+])
+
+
 class RAGGraph:
-    def __init__(self, embedding_generator: EmbeddingGenerator, reranker: Reranker, client_milvus:Async_Milvus_Client):
+    def __init__(
+        self, embedding_generator: EmbeddingGenerator, reranker: Reranker, client_milvus: VectorStore, content_store: ContentStore = None,
+        model_registry: ModelRegistry = None, answer_cache: SemanticAnswerCache = None
+    ):
         """
         Inicializar el grafo RAG
         
         Args:
             embedding_generator: Generador de embeddings para queries
             reranker: Reranker para ordenar resultados
-            client_milvus: Cliente asíncrono de Milvus
+            client_milvus: Vector store (Milvus o el backend NumPy en el proceso)
+            content_store: Mapeo source -> pdf_id con los vectores compartidos (opcional)
+            model_registry: Chat models y chains compartidos (si no se pasa se crea uno propio)
+            answer_cache: Cache semántico de respuestas validadas por notebook (opcional)
         """
         self.embedding_generator = embedding_generator
         self.reranker = reranker
         self.client_milvus = client_milvus
+        self.content_store = content_store
+        self.models = model_registry or ModelRegistry()
+        self.groundedness = GroundednessChecker(embedding_generator) if conf.GROUNDEDNESS_PRECHECK else None
+        self.answer_cache = answer_cache
         self.workflow = None
         self.app = None
+
+        # Modelos y chains construidos una sola vez: los nodos solo los invocan
+        self.generator_chain = self.models.chain(
+            "rag.generate", lambda: GENERATOR_PROMPT | self.models.chat_model(GENERATOR_MODEL) | StrOutputParser()
+        )
+        self.judge_model = self.models.chat_model(JUDGE_MODEL)
+        self.refiner_chain = self.models.chain(
+            "rag.refine", lambda: REFINER_PROMPT | self.models.chat_model(GENERATOR_MODEL) | StrOutputParser()
+        )
+        self.history_window = ChatHistoryWindow(self.models.chain(
+            "rag.summarize",
+            lambda: SUMMARY_PROMPT.partial(max_words=str(conf.CHAT_HISTORY_SUMMARY_WORDS)) | self.models.chat_model(GENERATOR_MODEL) | StrOutputParser()
+        ))
     
     async def retrieve_context(self, state: ConversationGraphState) -> ConversationGraphState:
         """
@@ -36,19 +135,27 @@ class RAGGraph:
         """
         print(f"\n [RETRIEVE] Buscando contexto para: '{state['query']}'")
         
+        context_chunks = []
         try:
             # Generar embedding de la query
             query_vector = await self.embedding_generator.get_query_embedding(text=state["query"])
             
+            # Traducir los sources a los pdf_ids que guardan sus vectores (contenido compartido)
+            pdf_ids = state["pdf_ids"]
+            if self.content_store is not None:
+                pdf_ids = sorted(set((await self.content_store.resolve(pdf_ids)).values()))
+
             # Obtener documentos de Milvus
             results = await self.client_milvus.get_document(
                 query_vector=query_vector, 
                 collection_name="documents_collection", 
-                ids=state["pdf_ids"]
+                ids=pdf_ids,
+                query_text=state["query"]  # Búsqueda híbrida: términos exactos por BM25
             )
             
             # Reranking
-            context = self.reranker.rerank(query=state["query"], document=[results])
+            context = await self.reranker.rerank(query=state["query"], document=[results])
+            context_chunks = list(context)
             
             # Convertir a string si es necesario
             context = str(context) if not isinstance(context, str) else context
@@ -60,50 +167,79 @@ class RAGGraph:
         return {
             **state,
             "context": context,
+            "context_chunks": context_chunks,
             "retrieval_attempts": 1
         }
 
-    async def generate_answer(self, state: ConversationGraphState) -> ConversationGraphState:
+    def prepare_history(self, state: ConversationGraphState) -> asyncio.Task:
         """
-        Nodo 2: Genera respuesta usando el contexto y el historial de chat
+        Arranca en segundo plano el armado del historial acotado (una vez por pregunta, antes del grafo):
+        si hay que resumir turnos, la llamada al modelo corre en paralelo con el retrieve y el rerank.
+        La task no va en el estado del grafo: la tiene quien la arranca y la descarta con discard_history
         """
-        print("\n  [GENERATE] Generando respuesta...")
-        
-        model = init_chat_model("google_genai:gemini-2.5-flash-lite")
-        
-        # Parsear chat history si existe
-        contexto_inicial = []
-        if state.get("chatHistory") and len(state["chatHistory"]) > 0:
-            try:
-                conversations = ChatHistory.parse_conversations(state["chatHistory"])
-                contexto_inicial = ChatHistory.getChatHistory(conversations)
-                print(f"  Chat history cargado: {len(contexto_inicial)} mensajes")
-            except Exception as e:
-                print(f"  Error al procesar historial de chat: {str(e)}")
-        
-        # Crear ChatMessageHistory con el contexto inicial
-        history = ChatMessageHistory(messages=contexto_inicial)
-        print(history.messages)
-        
-        generator_prompt = ChatPromptTemplate.from_messages([
-            ("system", """Eres un asistente/profesor útil y conciso que ayuda a los usuarios a estudiar usando **únicamente** el PDF previamente subido como contexto.  
+        return asyncio.create_task(
+            self.history_window.prepare(state.get("chatHistory") or [], state.get("chatSummary") or "")
+        )
 
-- Usa exclusivamente la información presente en `{context}`.  
-- El historial de chat: {history} (si está presente, úsalo para mantener coherencia, pero no dependas de él para responder), (si te preguntan por el historial o resumen del chat puedes proveerlo para recordarle al usuario la charla que mantienen, hazle un pequeño listado de pregutnas que te hizo, solo si lo pide).
-- **No inventes** información. Si la respuesta no puede responderse con lo provisto, responde exactamente: "No puedo responder eso con la información provista." y, si es posible, sugiere 1–2 acciones para obtener la respuesta.
-- **No reveles razonamiento interno** (no escribir chain-of-thought). En lugar de eso, entrega:  
-  1) **Respuesta** — respuesta clara y directa (1–3 frases);  
-  2) **Justificación en base al texto** — hasta 3 bullets que indiquen qué partes del `{context}` sustentan la respuesta;"""),
-            ("human", "{question}")
-        ])
-        
-        generator_chain = generator_prompt | model | StrOutputParser() ##chain
+    async def resolve_history(self, state: ConversationGraphState, task: Optional[asyncio.Task]) -> ConversationGraphState:
+        """
+        Espera el historial arrancado por prepare_history: últimos turnos textuales y resumen de los
+        anteriores, actualizado si hubo que resumir turnos
+        """
+        if task is None:
+            return state
+
+        try:
+            window = await task
+        except Exception as e:
+            print(f"  Error al procesar historial de chat: {str(e)}")
+            return {**state, "history": [], "summarized_until": None}
+
+        print(f"  Chat history cargado: {len(window['messages'])} mensajes")
+
+        return {
+            **state,
+            "history": window["messages"],
+            "chatSummary": window["summary"],
+            "summarized_until": window["summarized_until"]
+        }
+
+    @staticmethod
+    def discard_history(task: asyncio.Task):
+        """
+        Cancela el armado del historial si nadie lo esperó (hit del cache, error antes de generar o
+        cliente SSE desconectado) y consume su error si terminó fallando, para que no quede suelto
+        """
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()
+
+    def _generator_inputs(self, state: ConversationGraphState) -> dict:
+        """
+        Variables del prompt del generador: contexto, pregunta, historial acotado y resumen
+        """
+        # Crear ChatMessageHistory con el historial ya acotado (resolve_history)
+        history = ChatMessageHistory(messages=state.get("history") or [])
+        print(history.messages)
         
-        generation = await generator_chain.ainvoke({
+        return {
             "context": state["context"],
             "question": state["question"],
+            "summary": state.get("chatSummary") or "(sin resumen)",
             "history": history.messages  
-        })
+        }
+
+    async def generate_answer(self, state: ConversationGraphState, config: Optional[RunnableConfig] = None) -> ConversationGraphState:
+        """
+        Nodo 2: Genera respuesta usando el contexto y el historial de chat
+        (la task del historial llega por config["configurable"]["history_task"], fuera del estado)
+        """
+        print("\n  [GENERATE] Generando respuesta...")
+        
+        task = ((config or {}).get("configurable") or {}).get("history_task")
+        state = await self.resolve_history(state, task)
+        generation = await self.generator_chain.ainvoke(self._generator_inputs(state))
         
         return {
             **state,
@@ -112,47 +248,32 @@ class RAGGraph:
 
     async def judge_answer(self, state: ConversationGraphState) -> ConversationGraphState:
         """
-        Nodo 3: LLM as Judge - Evalúa si la respuesta es buena usando un modelo más grande
+        Nodo 3: Judge por niveles - Pre-check local de groundedness y, solo si es ambiguo,
+        LLM as Judge con un modelo más grande
         """
         print("\n  [JUDGE] Evaluando calidad de la respuesta...")
         
-        # Usar un modelo más grande para juzgar
-        judge_model = init_chat_model("google_genai:gemini-2-pro")
-        
-        judge_prompt = ChatPromptTemplate.from_messages([
-            ("system", """Eres un juez experto que evalúa si una respuesta es de buena calidad.
-
-Analiza si:
-1. La respuesta está fundamentada en el contexto proporcionado
-2. La respuesta es precisa y relevante a la pregunta
-3. La respuesta no contiene información inventada fuera del contexto
-4. Si dice "No puedo responder...", determina si es una respuesta válida a falta de información
-
-Responde con un JSON con este formato EXACTO:
-{
-    "is_valid": true/false,
-    "reasoning": "explicación breve"
-}
-
-NO agregues más texto, SOLO el JSON."""),
-            ("human", """Pregunta: {question}
+        if self.groundedness is not None:
+            precheck = await self.groundedness.check(state["generation"], state.get("context_chunks") or [])
+            score = f"{precheck['score']:.3f}" if precheck["score"] is not None else "-"
+            print(f"  Pre-check local: {precheck['decision']} (score {score}, {precheck['reason']})")
 
-Contexto: {context}
-
-Respuesta: {generation}
-
-¿Es una buena respuesta?""")
-        ])
+            if precheck["decision"] != "escalate":
+                return {
+                    **state,
+                    "is_valid": precheck["decision"] == "pass"
+                }
         
         try:
-            result = await judge_model.ainvoke(judge_prompt.format(
+            # Usar un modelo más grande para juzgar
+            result = await self.judge_model.ainvoke(JUDGE_PROMPT.format(
                 question=state["question"],
                 context=state["context"],
                 generation=state["generation"]
             ))
             
-            # Parsear respuesta JSON
-            result_json = json.loads(result)
+            # Parsear respuesta JSON (el modelo puede envolverla en un bloque ```json)
+            result_json = json.loads(format_generated_text(result.content))
             is_valid = result_json.get("is_valid", False)
             reasoning = result_json.get("reasoning", "")
             
@@ -172,24 +293,7 @@ Respuesta: {generation}
         """
         print("\n [REFINE] Refinando query para obtener mejor contexto...")
         
-        model = init_chat_model("google_genai:gemini-2.5-flash-lite")
-        
-        refiner_prompt = ChatPromptTemplate.from_messages([
-            ("system", """Eres un experto en reformular preguntas para mejorar la recuperación de información.
-
-La pregunta original no obtuvo una respuesta satisfactoria. Reformúlala usando:
-- Sinónimos más específicos
-- Términos técnicos relevantes
-- Diferentes ángulos de la pregunta
-- Descomposición en sub-preguntas si es necesario
-
-Responde SOLO con la pregunta reformulada, sin explicaciones adicionales."""),
-            ("human", "Pregunta original: {question}\n\nRespuesta insatisfactoria: {generation}")
-        ])
-        
-        refiner_chain = refiner_prompt | model | StrOutputParser()
-        
-        refined_query = await refiner_chain.ainvoke({
+        refined_query = await self.refiner_chain.ainvoke({
             "question": state["question"],
             "generation": state["generation"]
         })
@@ -249,26 +353,160 @@ Responde SOLO con la pregunta reformulada, sin explicaciones adicionales."""),
         
         return self.app
     
+    async def _cached_answer(self, initial_state: ConversationGraphState) -> Optional[dict]:
+        """
+        Busca una respuesta validada para la misma pregunta (o casi) sobre el mismo conjunto de pdf_ids.
+
+        Devuelve {"lookup": (vector, versions), "hit": respuesta o None}, o None si no se usa el cache
+        (deshabilitado o pregunta de seguimiento cuya respuesta depende del historial).
+        """
+        if self.answer_cache is None:
+            return None
+
+        if initial_state.get("chatHistory") and is_follow_up(initial_state["question"]):
+            self.answer_cache.skip()
+            return None
+
+        # Versiones antes de generar: si una fuente cambia en el medio, la respuesta no se guarda
+        versions = self.answer_cache.versions(initial_state["pdf_ids"])
+        vector = await self.embedding_generator.get_query_embedding(text=initial_state["question"])
+        hit = self.answer_cache.lookup(initial_state["pdf_ids"], vector)
+
+        if hit is not None:
+            print(f"\n [CACHE] Respuesta cacheada (similitud {hit['similarity']:.3f})")
+
+        return {"lookup": (vector, versions), "hit": hit}
+
+    def _store_answer(self, cached: Optional[dict], state: ConversationGraphState):
+        """Guarda la respuesta en el cache si el judge la validó y tuvo contexto."""
+        if cached is None or not state.get("is_valid") or not state.get("context_chunks"):
+            return
+
+        vector, versions = cached["lookup"]
+        self.answer_cache.put(state["pdf_ids"], vector, {
+            "generation": state["generation"],
+            "context": state["context"],
+            "context_chunks": state["context_chunks"]
+        }, versions)
+
     async def invoke(self, initial_state: ConversationGraphState):
         """
-        Invoca el grafo con un estado inicial
+        Invoca el grafo con un estado inicial (o devuelve la respuesta cacheada)
         """
         if self.app is None:
             self.build()
         
-        return await self.app.ainvoke(initial_state)
+        cached = await self._cached_answer(initial_state)
+        if cached is not None and cached["hit"] is not None:
+            hit = cached["hit"]
+            return {
+                **initial_state,
+                "generation": hit["generation"],
+                "context": hit["context"],
+                "context_chunks": hit["context_chunks"],
+                "is_valid": True,
+                "refinement_attempts": 0,
+                "cached": True
+            }
+
+        history_task = self.prepare_history(initial_state)
+        try:
+            result = await self.app.ainvoke(initial_state, config={"configurable": {"history_task": history_task}})
+        finally:
+            self.discard_history(history_task)
+
+        self._store_answer(cached, result)
+        return result
+
+    async def stream(self, initial_state: ConversationGraphState) -> AsyncIterator[tuple[str, dict]]:
+        """
+        Recorre los mismos nodos que el grafo pero emite la generación token a token (para SSE).
+
+        Eventos:
+            ("token", {"text"}): fragmento de la respuesta
+            ("retry", {"refinement_attempts"}): el judge rechazó la respuesta y se regenera con la query refinada;
+                el cliente descarta los tokens recibidos hasta ahora
+            ("end", {...}): respuesta completa con validez y contexto (mismos campos que RAGResponse)
+
+        Si la respuesta está en el cache se emite completa en un solo token.
+        """
+        cached = await self._cached_answer(initial_state)
+        if cached is not None and cached["hit"] is not None:
+            hit = cached["hit"]
+            yield "token", {"text": hit["generation"]}
+            yield "end", {
+                "question": initial_state["question"],
+                "generation": hit["generation"],
+                "context": hit["context"],
+                "is_valid": True,
+                "refinement_attempts": 0,
+                "cached": True
+            }
+            return
+
+        state = initial_state
+        history_task = self.prepare_history(initial_state)
+
+        try:
+            while True:
+                state = await self.retrieve_context(state)
+
+                print("\n  [GENERATE] Generando respuesta (streaming)...")
+                chunks = []
+                state = await self.resolve_history(state, history_task)
+                async for chunk in self.generator_chain.astream(self._generator_inputs(state)):
+                    chunks.append(chunk)
+                    yield "token", {"text": chunk}
+
+                state = await self.judge_answer({**state, "generation": "".join(chunks)})
+
+                if await self.should_refine(state) == "end":
+                    break
+
+                # Los contadores se suman a mano (en el grafo lo hace el reducer operator.add)
+                refinement_attempts = state["refinement_attempts"] + 1
+                yield "retry", {"refinement_attempts": refinement_attempts}
+                state = {**await self.refine_query(state), "refinement_attempts": refinement_attempts}
+        finally:
+            # También si el cliente se desconecta (se cierra el generador) o falla un nodo
+            self.discard_history(history_task)
+
+        yield "end", {
+            "question": state["question"],
+            "generation": state["generation"],
+            "context": state["context"],
+            "is_valid": state["is_valid"],
+            "refinement_attempts": state["refinement_attempts"],
+            "cached": False,
+            **history_update(state)
+        }
+        self._store_answer(cached, state)
+
+
+def history_update(state: ConversationGraphState) -> dict:
+    """Resumen nuevo del historial para que UsersAPI lo guarde (None si no cambió)."""
+    if state.get("summarized_until") is None:
+        return {"chat_summary": None, "summarized_until": None}
+
+    return {"chat_summary": state["chatSummary"], "summarized_until": state["summarized_until"]}
 
 
 # Patron builder, crea el el objeto RAGGraph y construye el grafo (objeto) dentro de el atributo workflow
-def create_rag_graph(embedding_generator: EmbeddingGenerator, reranker: Reranker, client_milvus:Async_Milvus_Client):
+def create_rag_graph(
+    embedding_generator: EmbeddingGenerator, reranker: Reranker, client_milvus: VectorStore, content_store: ContentStore = None,
+    model_registry: ModelRegistry = None, answer_cache: SemanticAnswerCache = None
+):
     """
     Factory function que crea una instancia de RAGGraph y construye el grafo
     
     Args:
         embedding_generator: Generador de embeddings
         reranker: Reranker de resultados
-        client_milvus: Cliente asíncrono de Milvus
+        client_milvus: Vector store (Milvus o el backend NumPy en el proceso)
+        content_store: Mapeo source -> pdf_id con los vectores compartidos (opcional)
+        model_registry: Chat models y chains compartidos entre requests (y con el grafo de creación)
+        answer_cache: Cache semántico de respuestas validadas por notebook (opcional)
     """
-    rag_graph = RAGGraph(embedding_generator, reranker, client_milvus)
+    rag_graph = RAGGraph(embedding_generator, reranker, client_milvus, content_store, model_registry, answer_cache)
     rag_graph.build()
     return rag_graph
\ No newline at end of file
@@ -0,0 +1,138 @@
+## Pre-check local de groundedness (antes del LLM judge)
+import asyncio
+import re
+
+import numpy as np
+
+from .embbedings import EmbeddingGenerator
+from ..config import conf
+
+# Respuesta fija del generador cuando el contexto no alcanza: si es válida o no lo decide el LLM judge
+REFUSAL = "No puedo responder eso con la información provista"
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+_MARKDOWN = re.compile(r"[*_`#>]+|^\s*(?:[-•]|\d+\))\s*")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+MIN_SENTENCE_WORDS = 3  # Encabezados ("Respuesta", "Justificación en base al texto") y fragmentos no se evalúan
+MIN_WORD_LENGTH = 4  # Palabras de contenido para el overlap léxico (descarta artículos, preposiciones, etc.)
+
+
+def split_sentences(text: str) -> list[str]:
+    """Oraciones evaluables de la respuesta, sin markdown ni fragmentos cortos."""
+    sentences = []
+
+    for sentence in _SENTENCE_SPLIT.split(text):
+        sentence = _MARKDOWN.sub("", sentence).strip()
+        if len(_WORD.findall(sentence)) >= MIN_SENTENCE_WORDS:
+            sentences.append(sentence)
+
+    return sentences
+
+
+def content_words(text: str) -> set[str]:
+    return {word for word in _WORD.findall(text.lower()) if len(word) >= MIN_WORD_LENGTH}
+
+
+def lexical_overlap(sentences: list[str], context: str) -> np.ndarray:
+    """Fracción de las palabras de contenido de cada oración que aparecen en el contexto."""
+    vocabulary = content_words(context)
+    overlaps = np.zeros(len(sentences), dtype=np.float32)
+
+    for i, sentence in enumerate(sentences):
+        words = content_words(sentence)
+        overlaps[i] = len(words & vocabulary) / len(words) if words else 1.0
+
+    return overlaps
+
+
+def semantic_support(sentence_vectors: np.ndarray, context_vectors: np.ndarray) -> np.ndarray:
+    """Similitud coseno de cada oración con el chunk del contexto que mejor la sustenta (una multiplicación de matrices)."""
+    sentences = sentence_vectors / np.linalg.norm(sentence_vectors, axis=1, keepdims=True)
+    chunks = context_vectors / np.linalg.norm(context_vectors, axis=1, keepdims=True)
+
+    return (sentences @ chunks.T).max(axis=1)
+
+
+class GroundednessChecker:
+    """
+    Judge de primer nivel, en el proceso: puntúa qué tan sustentada está la respuesta en el contexto
+    recuperado y decide localmente los casos claros.
+
+    Por oración: semantic_weight * similitud con el mejor chunk + (1 - semantic_weight) * overlap léxico.
+    El score de la respuesta es el de su oración menos sustentada (una sola oración inventada alcanza
+    para que la respuesta no sea válida). score >= pass_threshold -> válida; score < fail_threshold ->
+    inválida; en el medio (o si no se puede puntuar) se escala al LLM judge.
+
+    Los embeddings de los chunks vienen del cache persistente (se calcularon al ingerir el PDF);
+    solo las oraciones de la respuesta van a Gemini, en una sola llamada.
+    """
+
+    def __init__(
+        self,
+        embedding_generator: EmbeddingGenerator,
+        pass_threshold: float = conf.GROUNDEDNESS_PASS_THRESHOLD,
+        fail_threshold: float = conf.GROUNDEDNESS_FAIL_THRESHOLD,
+        semantic_weight: float = conf.GROUNDEDNESS_SEMANTIC_WEIGHT
+    ):
+        self.embedding_generator = embedding_generator
+        self.pass_threshold = pass_threshold
+        self.fail_threshold = fail_threshold
+        self.semantic_weight = semantic_weight
+
+        self.passed = 0
+        self.failed = 0
+        self.escalated = 0
+
+    async def score(self, answer: str, context_chunks: list[str]) -> dict:
+        """{"decision": "pass" | "fail" | "escalate", "score", "reason"}"""
+        if REFUSAL.lower() in answer.lower():
+            return {"decision": "escalate", "score": None, "reason": "refusal"}
+
+        sentences = split_sentences(answer)
+        if not sentences or not context_chunks:
+            return {"decision": "escalate", "score": None, "reason": "nothing to score"}
+
+        # Chunks desde el cache persistente; las oraciones no se cachean (no se repiten)
+        context_vectors, sentence_vectors = await asyncio.gather(
+            self.embedding_generator.get_document_embedding(text=context_chunks),
+            self.embedding_generator.get_document_embedding(text=sentences, use_cache=False)
+        )
+
+        semantic = semantic_support(np.asarray(sentence_vectors, dtype=np.float32), np.asarray(context_vectors, dtype=np.float32))
+        lexical = lexical_overlap(sentences, "\n".join(context_chunks))
+        score = float((self.semantic_weight * semantic + (1 - self.semantic_weight) * lexical).min())
+
+        if score >= self.pass_threshold:
+            return {"decision": "pass", "score": score, "reason": "grounded"}
+        if score < self.fail_threshold:
+            return {"decision": "fail", "score": score, "reason": "ungrounded"}
+
+        return {"decision": "escalate", "score": score, "reason": "ambiguous"}
+
+    async def check(self, answer: str, context_chunks: list[str]) -> dict:
+        """score() con contadores para /metrics; un error en el pre-check escala al LLM judge."""
+        try:
+            result = await self.score(answer, context_chunks)
+        except Exception as e:
+            result = {"decision": "escalate", "score": None, "reason": f"error: {e}"}
+
+        if result["decision"] == "pass":
+            self.passed += 1
+        elif result["decision"] == "fail":
+            self.failed += 1
+        else:
+            self.escalated += 1
+
+        return result
+
+    def stats(self) -> dict:
+        turns = self.passed + self.failed + self.escalated
+
+        return {
+            "turns": turns,
+            "passed_locally": self.passed,
+            "failed_locally": self.failed,
+            "escalated": self.escalated,
+            "remote_judge_skipped_rate": round((self.passed + self.failed) / turns, 4) if turns else 0.0,
+        }
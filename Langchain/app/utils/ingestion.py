@@ -0,0 +1,419 @@
+import asyncio
+import hashlib
+import itertools
+import os
+import shutil
+import tempfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Iterator, Optional
+
+from .splitter import PdfSource, Splitter, count_pdf_pages, split_pdf_page_range
+from .embbedings import EmbeddingGenerator
+from ..db.content_store import hash_pdf
+from ..config import conf
+
+if TYPE_CHECKING:
+    from ..db.vector_store import VectorStore
+    from ..db.content_store import ContentStore
+
+
+# Callback de progreso: recibe la etapa ("parsed", "embedded", "indexed") y la cantidad de chunks
+ProgressCallback = Callable[[str, int], None]
+
+
+def _report(progress: Optional[ProgressCallback], stage: str, amount: int):
+    if progress is not None and amount:
+        progress(stage, amount)
+
+
+def _spill_to_temp_file(pdf: PdfSource):
+    """Escribe un PDF en memoria (bytes o file-like) en un NamedTemporaryFile que se borra al cerrarlo."""
+    temp_file = tempfile.NamedTemporaryFile(suffix=".pdf")
+
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        temp_file.write(pdf)
+    else:
+        pdf.seek(0)
+        shutil.copyfileobj(pdf, temp_file)
+
+    temp_file.flush()
+    return temp_file
+
+
+def _next_chunks(chunks: Iterator[dict], count: int) -> list[dict]:
+    """Hasta `count` chunks más del iterador (lista vacía cuando se agota)."""
+    return list(itertools.islice(chunks, count))
+
+
+def chunk_fingerprint(text: str) -> str:
+    """Huella estable de un chunk (SHA-256 de su texto): el mismo texto produce el mismo embedding."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IngestionPipeline:
+    """
+    Ingests PDF documents into Milvus.
+
+    In streaming mode pages are read lazily from the PDF, split incrementally and
+    embedded/inserted in bounded micro-batches, so peak memory depends on the batch
+    size instead of the document size and the first pages become searchable while
+    the rest of the document is still being processed.
+
+    When a process pool is provided, parsing and splitting (CPU-bound) run in worker
+    processes in windows of pages, keeping the event loop free. Several files can be
+    ingested concurrently; embedding requests go through the generator's shared batch
+    scheduler and inserts are bounded by a semaphore shared by every file.
+
+    With a content store, files are keyed by the hash of their bytes: uploading content
+    that is already stored only maps the new source to the existing vectors, skipping
+    parsing, embedding and insertion entirely.
+
+    Re-uploading a new version of an existing source only embeds the chunks whose
+    fingerprint is not already stored for it; unchanged chunks are kept and chunks
+    that disappeared are deleted.
+
+    An optional progress callback receives (stage, amount) every time chunks are
+    parsed, embedded or indexed, so background jobs can report per-stage progress.
+    """
+
+    def __init__(
+        self,
+        splitter: Splitter,
+        embedding_generator: EmbeddingGenerator,
+        client_milvus: "VectorStore",
+        collection_name: str = "documents_collection",
+        batch_size: int = conf.INGESTION_BATCH_SIZE,
+        streaming: bool = conf.INGESTION_STREAMING,
+        process_pool: Optional[ProcessPoolExecutor] = None,
+        pages_per_task: int = conf.INGESTION_PAGES_PER_TASK,
+        max_concurrent_files: int = conf.INGESTION_MAX_CONCURRENT_FILES,
+        max_concurrent_inserts: int = conf.INGESTION_MAX_CONCURRENT_INSERTS,
+        content_store: Optional["ContentStore"] = None,
+    ):
+        """
+        Args:
+            splitter: Splitter used to parse and chunk the PDF
+            embedding_generator: Embedding generator for the chunks
+            client_milvus: Vector store (Milvus or the in-process NumPy backend)
+            collection_name: Target Milvus collection
+            batch_size: Number of chunks embedded and inserted together
+            streaming: Process the document page by page instead of all at once
+            process_pool: Optional pool where PDF parsing and splitting run
+            pages_per_task: Pages parsed by each task sent to the pool
+            max_concurrent_files: Files ingested at the same time
+            max_concurrent_inserts: Milvus inserts in flight across all files
+            content_store: Optional source -> content mapping used to deduplicate uploads
+        """
+        self.splitter = splitter
+        self.embedding_generator = embedding_generator
+        self.client_milvus = client_milvus
+        self.collection_name = collection_name
+        self.batch_size = max(1, batch_size)
+        self.streaming = streaming
+        self.process_pool = process_pool
+        self.pages_per_task = max(1, pages_per_task)
+        self.max_concurrent_files = max(1, max_concurrent_files)
+        self.content_store = content_store
+
+        self._insert_semaphore = asyncio.Semaphore(max(1, max_concurrent_inserts))
+
+    async def ingest_files(self, files: list[tuple[PdfSource, int]], progress: Optional[ProgressCallback] = None) -> list[int]:
+        """
+        Ingests several PDFs concurrently (at most max_concurrent_files at a time).
+
+        Args:
+            files: List of (pdf, pdf_id) pairs; each pdf can be a path, the raw bytes or a file-like object
+            progress: Optional callback called with (stage, amount) as chunks advance
+
+        Returns the number of chunks inserted per file, in the same order.
+        """
+        file_semaphore = asyncio.Semaphore(self.max_concurrent_files)
+
+        async def ingest(pdf: PdfSource, pdf_id: int) -> int:
+            async with file_semaphore:
+                return await self.ingest_file(pdf=pdf, pdf_id=pdf_id, progress=progress)
+
+        return await asyncio.gather(*(ingest(pdf, pdf_id) for pdf, pdf_id in files))
+
+    async def ingest_file(self, pdf: PdfSource, pdf_id: int, progress: Optional[ProgressCallback] = None) -> int:
+        """
+        Parses, embeds and inserts a PDF. Returns the number of chunks inserted
+        (0 when the content was already stored and its vectors are reused).
+        """
+        if self.content_store is None:
+            return await self._ingest(pdf=pdf, pdf_id=pdf_id, progress=progress)
+
+        content_hash = await asyncio.to_thread(hash_pdf, pdf)
+
+        async with self.content_store.lock(content_hash):
+            stored_pdf_id = await self.content_store.find_by_hash(content_hash)
+
+            if stored_pdf_id is not None:
+                await self.content_store.register(source_id=pdf_id, content_hash=content_hash, pdf_id=stored_pdf_id)
+                print(f"   [INGEST] PDF {pdf_id}: content already stored as pdf_id {stored_pdf_id}, reusing its vectors")
+                return 0
+
+            total_chunks = await self._ingest(pdf=pdf, pdf_id=pdf_id, progress=progress)
+
+            await self.content_store.register(source_id=pdf_id, content_hash=content_hash, pdf_id=pdf_id)
+
+            return total_chunks
+
+    async def reingest_file(self, pdf: PdfSource, source_id: int) -> dict:
+        """
+        Replaces the content of an existing source with a new version of the PDF,
+        embedding only the chunks that changed.
+
+        Returns a report with the resulting pdf_id and the number of chunks kept,
+        added (embedded) and removed. The status is "unchanged" when the content is
+        identical, "reused" when another source already stores the new version and
+        "updated" when the diff was applied.
+        """
+        if self.content_store is None:
+            return await self._apply_diff(pdf=pdf, base_pdf_id=source_id, target_pdf_id=source_id)
+
+        content_hash = await asyncio.to_thread(hash_pdf, pdf)
+
+        async with self.content_store.lock(content_hash):
+            current_pdf_id = (await self.content_store.resolve([source_id]))[source_id]
+            stored_pdf_id = await self.content_store.find_by_hash(content_hash)
+
+            if stored_pdf_id == current_pdf_id:
+                print(f"   [INGEST] Source {source_id}: same content as the stored version, nothing to do")
+                return {"status": "unchanged", "pdf_id": current_pdf_id, "kept": 0, "added": 0, "removed": 0}
+
+            others = [row for row in await self.content_store.references(current_pdf_id) if row["source_id"] != source_id]
+
+            if stored_pdf_id is not None:
+                # Otra fuente ya tiene exactamente esta versión: alcanza con re-mapear
+                await self.content_store.register(source_id=source_id, content_hash=content_hash, pdf_id=stored_pdf_id)
+                await self._purge_if_unreferenced(pdf_id=current_pdf_id, references=others)
+                print(f"   [INGEST] Source {source_id}: new version already stored as pdf_id {stored_pdf_id}, reusing its vectors")
+                return {"status": "reused", "pdf_id": stored_pdf_id, "kept": 0, "added": 0, "removed": 0}
+
+            if current_pdf_id != source_id:
+                # Copy-on-write: los vectores compartidos no se tocan, la nueva versión se guarda bajo el propio source_id.
+                # Si ese pdf_id todavía guarda una versión anterior que usan otras fuentes, primero se les traspasa
+                occupants = [row for row in await self.content_store.references(source_id) if row["source_id"] != source_id]
+
+                if occupants:
+                    await self._hand_off(pdf_id=source_id, references=occupants)
+                    await self.client_milvus.delete_documents(collection_name=self.collection_name, ids=[source_id])
+
+                report = await self._apply_diff(pdf=pdf, base_pdf_id=current_pdf_id, target_pdf_id=source_id)
+                await self.content_store.register(source_id=source_id, content_hash=content_hash, pdf_id=source_id)
+                await self._purge_if_unreferenced(pdf_id=current_pdf_id, references=others)
+                return report
+
+            if others:
+                # Otras fuentes usan la versión anterior: se les traspasa una copia antes de modificarla
+                await self._hand_off(pdf_id=current_pdf_id, references=others)
+
+            report = await self._apply_diff(pdf=pdf, base_pdf_id=source_id, target_pdf_id=source_id)
+            await self.content_store.register(source_id=source_id, content_hash=content_hash, pdf_id=source_id)
+
+            return report
+
+    async def _apply_diff(self, pdf: PdfSource, base_pdf_id: int, target_pdf_id: int) -> dict:
+        """
+        Compares the chunks of the new version against those stored under base_pdf_id
+        and writes the result under target_pdf_id. When both ids are the same the diff
+        is applied in place; otherwise the kept vectors are copied to target_pdf_id.
+        """
+        stored = await self.client_milvus.query_chunks(
+            collection_name=self.collection_name, pdf_id=base_pdf_id, output_fields=["id", "text_chunk"]
+        )
+
+        # Multiconjunto de huellas: un texto repetido N veces se conserva N veces
+        stored_ids = defaultdict(list)
+        for row in stored:
+            stored_ids[chunk_fingerprint(row["text_chunk"])].append(row["id"])
+
+        kept_ids = []
+        added = []
+
+        async for chunks in self._iter_chunks(pdf=pdf):
+            for chunk in chunks:
+                ids = stored_ids.get(chunk_fingerprint(chunk["text"]))
+
+                if ids:
+                    kept_ids.append(ids.pop())
+                else:
+                    added.append(chunk)
+
+        removed_ids = [id for ids in stored_ids.values() for id in ids]
+
+        if base_pdf_id != target_pdf_id:
+            await self._copy_chunks(ids=kept_ids, target_pdf_id=target_pdf_id)
+
+        # Primero se insertan los chunks nuevos y después se borran los viejos, así el documento nunca queda vacío
+        for start in range(0, len(added), self.batch_size):
+            await self._flush(batch=added[start:start + self.batch_size], pdf_id=target_pdf_id)
+
+        if base_pdf_id == target_pdf_id:
+            await self.client_milvus.delete_chunks(collection_name=self.collection_name, ids=removed_ids)
+
+        print(f"   [INGEST] PDF {target_pdf_id}: re-upload kept {len(kept_ids)}, embedded {len(added)}, removed {len(removed_ids)} chunks")
+
+        return {
+            "status": "updated",
+            "pdf_id": target_pdf_id,
+            "kept": len(kept_ids),
+            "added": len(added),
+            "removed": len(removed_ids) if base_pdf_id == target_pdf_id else 0,
+        }
+
+    async def _hand_off(self, pdf_id: int, references: list[dict]) -> int:
+        """
+        Copies the vectors stored under pdf_id to a pdf_id that is not in use and remaps the
+        referencing sources to it, so pdf_id can be overwritten. Returns the new pdf_id.
+        """
+        heir = None
+
+        # El pdf_id propio de una fuente puede seguir guardando una versión que usan otras fuentes
+        for candidate in sorted(row["source_id"] for row in references):
+            if not await self.content_store.references(candidate):
+                heir = candidate
+                break
+
+        if heir is None:
+            heir = await self.content_store.allocate_pdf_id()
+
+        await self._copy_document(pdf_id=pdf_id, target_pdf_id=heir)
+
+        for row in references:
+            await self.content_store.register(source_id=row["source_id"], content_hash=row["content_hash"], pdf_id=heir)
+
+        print(f"   [INGEST] pdf_id {pdf_id}: handed off to pdf_id {heir} for sources {sorted(row['source_id'] for row in references)}")
+
+        return heir
+
+    async def _copy_document(self, pdf_id: int, target_pdf_id: int):
+        """Copies every chunk stored under pdf_id (vectors included) to target_pdf_id."""
+        rows = await self.client_milvus.query_chunks(collection_name=self.collection_name, pdf_id=pdf_id, output_fields=["id"])
+        await self._copy_chunks(ids=[row["id"] for row in rows], target_pdf_id=target_pdf_id)
+
+    async def _copy_chunks(self, ids: list[int], target_pdf_id: int):
+        """Copies stored chunks to target_pdf_id reusing their vectors (no embedding calls)."""
+        for start in range(0, len(ids), self.batch_size):
+            rows = await self.client_milvus.get_chunks(
+                collection_name=self.collection_name,
+                ids=ids[start:start + self.batch_size],
+                output_fields=["text_chunk", "metadata", "vector_chunk"]
+            )
+
+            data = [
+                {"text_chunk": row["text_chunk"], "metadata": row["metadata"], "vector_chunk": row["vector_chunk"], "pdf_id": target_pdf_id}
+                for row in rows
+            ]
+
+            async with self._insert_semaphore:
+                await self.client_milvus.upload_document(data=data, collection_name=self.collection_name)
+
+    async def _purge_if_unreferenced(self, pdf_id: int, references: list[dict]):
+        """Deletes the vectors of pdf_id when no other source uses them anymore."""
+        if not references:
+            await self.client_milvus.delete_documents(collection_name=self.collection_name, ids=[pdf_id])
+
+    async def _ingest(self, pdf: PdfSource, pdf_id: int, progress: Optional[ProgressCallback] = None) -> int:
+        """
+        Parses, embeds and inserts a PDF under pdf_id.
+        """
+        if not self.streaming:
+            return await self._ingest_full(pdf=pdf, pdf_id=pdf_id, progress=progress)
+
+        total_chunks = 0
+        batch = []
+
+        async for chunks in self._iter_chunks(pdf=pdf):
+            batch.extend(chunks)
+            _report(progress, "parsed", len(chunks))
+
+            while len(batch) >= self.batch_size:
+                total_chunks += await self._flush(batch=batch[:self.batch_size], pdf_id=pdf_id, progress=progress)
+                batch = batch[self.batch_size:]
+
+        if batch:
+            total_chunks += await self._flush(batch=batch, pdf_id=pdf_id, progress=progress)
+
+        print(f"   [INGEST] PDF {pdf_id}: {total_chunks} chunks inserted (streaming, batch={self.batch_size})")
+        return total_chunks
+
+    async def _iter_chunks(self, pdf: PdfSource) -> AsyncIterator[list[dict]]:
+        """
+        Yields the chunks of a PDF as they are produced.
+
+        Without a process pool pages are parsed lazily in a worker thread, batch_size
+        chunks at a time, so the event loop is never blocked by pypdf. With a pool,
+        windows of pages_per_task pages are parsed in worker processes and the next
+        window is prefetched while the current one is being embedded.
+        """
+        if self.process_pool is None:
+            chunks = self.splitter.stream_document(pdf=pdf)
+
+            while next_chunks := await asyncio.to_thread(_next_chunks, chunks, self.batch_size):
+                yield next_chunks
+            return
+
+        # Los workers abren el PDF por su cuenta: un PDF en memoria se escribe una sola vez en un
+        # archivo temporal propio del request, en lugar de enviar todos sus bytes en cada ventana
+        temp_file = None
+        if not isinstance(pdf, (str, os.PathLike)):
+            temp_file = await asyncio.to_thread(_spill_to_temp_file, pdf)
+            pdf = temp_file.name
+
+        loop = asyncio.get_running_loop()
+        next_window = None
+
+        try:
+            total_pages = await loop.run_in_executor(self.process_pool, count_pdf_pages, pdf)
+
+            windows = [(start, start + self.pages_per_task) for start in range(0, total_pages, self.pages_per_task)]
+
+            def submit(window: tuple[int, int]) -> asyncio.Future:
+                return loop.run_in_executor(self.process_pool, split_pdf_page_range, pdf, *window)
+
+            next_window = submit(windows[0]) if windows else None
+
+            for index in range(len(windows)):
+                chunks = await next_window
+                next_window = submit(windows[index + 1]) if index + 1 < len(windows) else None
+                yield chunks
+        finally:
+            if next_window is not None:
+                next_window.cancel()
+
+            if temp_file is not None:
+                temp_file.close()  # NamedTemporaryFile se borra al cerrarse
+
+    async def _ingest_full(self, pdf: PdfSource, pdf_id: int, progress: Optional[ProgressCallback] = None) -> int:
+        """
+        Original path: splits the whole document and embeds/inserts every chunk at once.
+        """
+        text_chunks = await asyncio.to_thread(self.splitter.split_document, pdf=pdf)
+        _report(progress, "parsed", len(text_chunks))
+
+        if not text_chunks:
+            return 0
+
+        return await self._flush(batch=text_chunks, pdf_id=pdf_id, progress=progress)
+
+    async def _flush(self, batch: list[dict], pdf_id: int, progress: Optional[ProgressCallback] = None) -> int:
+        """
+        Embeds a batch of chunks and inserts it into Milvus.
+        """
+        texts = [chunk['text'] for chunk in batch]
+
+        # La concurrencia y los rate limits de embeddings los controla el scheduler del generador
+        vector_chunks = await self.embedding_generator.get_document_embedding(text=texts)
+        _report(progress, "embedded", len(texts))
+
+        formatted_data = self.embedding_generator.format_database(text_chunks=batch, vector_chunks=vector_chunks, pdf_id=pdf_id)
+
+        async with self._insert_semaphore:
+            await self.client_milvus.upload_document(data=formatted_data, collection_name=self.collection_name)
+
+        _report(progress, "indexed", len(formatted_data))
+
+        return len(formatted_data)
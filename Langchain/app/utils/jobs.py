@@ -0,0 +1,141 @@
+import asyncio
+import time
+import traceback
+import uuid
+from typing import Any, Awaitable, Callable, Optional
+
+
+class Job:
+    """
+    Background job with per-stage progress.
+
+    Each stage keeps its own status (pending, running, done, failed) and a done/total
+    counter. The total of a stage may be unknown (None) while the previous stage is
+    still producing work, e.g. the number of chunks is only known once parsing ends.
+    """
+
+    def __init__(self, kind: str, stages: tuple[str, ...]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "pending"
+        self.stages = {stage: {"status": "pending", "done": 0, "total": None} for stage in stages}
+        self.result: Optional[Any] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.task: Optional[asyncio.Task] = None
+
+    def advance(self, stage: str, amount: int = 1):
+        """Suma `amount` unidades de trabajo terminadas a una etapa (y la marca como running)."""
+        state = self.stages[stage]
+        state["done"] += amount
+
+        if state["status"] == "pending":
+            state["status"] = "running"
+
+        self.updated_at = time.time()
+
+    def set_total(self, stage: str, total: int):
+        self.stages[stage]["total"] = total
+        self.updated_at = time.time()
+
+    def complete_stage(self, stage: str):
+        """Marca una etapa como terminada; si no tenía total, el total es lo hecho."""
+        state = self.stages[stage]
+        state["status"] = "done"
+
+        if state["total"] is None:
+            state["total"] = state["done"]
+
+        self.updated_at = time.time()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stages": {stage: dict(state) for stage, state in self.stages.items()},
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class JobRegistry:
+    """
+    In-memory registry of background jobs.
+
+    Jobs live in the process that runs them; finished jobs are kept for `ttl_seconds`
+    so that clients polling the status endpoint can read the result, and are then
+    discarded.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._jobs: dict[str, Job] = {}
+
+    def create(self, kind: str, stages: tuple[str, ...]) -> Job:
+        self._purge()
+
+        job = Job(kind=kind, stages=stages)
+        self._jobs[job.id] = job
+
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def start(self, job: Job, run: Callable[[Job], Awaitable[Any]], cleanup: Optional[Callable[[], None]] = None):
+        """
+        Ejecuta `run(job)` en segundo plano. Su valor de retorno queda como resultado del job;
+        una excepción marca el job (y la etapa en curso) como fallidos.
+        """
+        async def runner():
+            job.status = "running"
+            job.updated_at = time.time()
+
+            try:
+                job.result = await run(job)
+                job.status = "succeeded"
+
+            except Exception as e:
+                traceback.print_exc()
+
+                job.status = "failed"
+                job.error = str(e)
+
+                for state in job.stages.values():
+                    if state["status"] == "running":
+                        state["status"] = "failed"
+
+            finally:
+                job.updated_at = time.time()
+
+                if cleanup is not None:
+                    cleanup()
+
+            print(f"   [JOBS] Job {job.id} ({job.kind}) {job.status}")
+
+        # Se guarda la referencia a la tarea para que no sea recolectada antes de terminar
+        job.task = asyncio.create_task(runner())
+
+    def _purge(self):
+        limit = time.time() - self.ttl_seconds
+
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.updated_at < limit]:
+            del self._jobs[job_id]
+
+    async def shutdown(self):
+        """Cancela los jobs que siguen en curso (al apagar el servicio)."""
+        tasks = [job.task for job in self._jobs.values() if job.task is not None and not job.task.done()]
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
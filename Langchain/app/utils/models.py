@@ -0,0 +1,65 @@
+## Registro de chat models y chains compartidos entre requests
+import asyncio
+import time
+from typing import Callable
+
+from langchain.chat_models import init_chat_model
+from langchain_core.runnables import Runnable
+
+from ..config import conf
+
+
+class ModelRegistry:
+    """
+    Chat models y chains (prompt | modelo | parser) construidos una sola vez y compartidos por
+    todas las invocaciones de los grafos.
+
+    Cada chat model crea su propio cliente de Gemini con su pool de conexiones HTTP; con una
+    instancia por modelo todas las requests reutilizan las mismas conexiones keep-alive en lugar
+    de pagar la construcción del cliente (y un handshake TLS nuevo) en cada nodo.
+    """
+
+    def __init__(self):
+        self._models: dict[tuple, Runnable] = {}
+        self._chains: dict[str, Runnable] = {}
+
+    def chat_model(self, model: str, **kwargs) -> Runnable:
+        """Chat model compartido para (modelo, kwargs); se crea en el primer pedido."""
+        key = (model, tuple(sorted(kwargs.items())))
+
+        if key not in self._models:
+            self._models[key] = init_chat_model(model, **kwargs)
+
+        return self._models[key]
+
+    def chain(self, name: str, build: Callable[[], Runnable]) -> Runnable:
+        """Chain compartida por nombre; `build` solo se llama la primera vez."""
+        if name not in self._chains:
+            self._chains[name] = build()
+
+        return self._chains[name]
+
+    async def warm_up(self, timeout: float = conf.CHAT_MODEL_WARMUP_TIMEOUT_SECONDS) -> dict[str, float]:
+        """
+        Una llamada mínima a cada modelo para abrir las conexiones antes de la primera request.
+        Los errores solo se informan: un modelo que no responde no impide arrancar el servicio.
+        """
+        async def ping(key: tuple, model: Runnable) -> float:
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(model.ainvoke("ping"), timeout=timeout)
+            except Exception as e:
+                reason = f"timeout ({timeout}s)" if isinstance(e, asyncio.TimeoutError) else str(e)
+                print(f"[MODELS] Warm-up de {key[0]} falló: {reason}")
+            return time.perf_counter() - started
+
+        models = list(self._models.items())
+        timings = await asyncio.gather(*(ping(key, model) for key, model in models))
+
+        return {key[0]: seconds for (key, _), seconds in zip(models, timings)}
+
+    def stats(self) -> dict:
+        return {
+            "models": sorted({key[0] for key in self._models}),
+            "chains": sorted(self._chains),
+        }
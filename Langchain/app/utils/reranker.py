@@ -1,33 +1,75 @@
 ## Modulo para el reranker
-import voyageai
+import asyncio
+import hashlib
 import os
 
+import voyageai
+
+from .embedding_cache import MemoryCache
+from ..config import conf
 
 
 class Reranker:
-    def __init__(self):
-        self.client = voyageai.Client(api_key=os.getenv("VOYAGE_API_KEY"))
-    
-    def rerank(self,query: str, document: list[dict]):
-        
-        lista_chunks = []
-        
-        for i in document:
-            for j in i:
-                chunk = j['entity']['text_chunk']
-                lista_chunks.append(chunk)
-        
-        response = self.client.rerank(
-            model="rerank-2.5-lite",
-            query=query,
-            documents=lista_chunks,
-            top_k=3
-        )
-        
-        lista_response = []
-        
-        for r in response.results:
-            lista_response.append(r.document)
-            
-        return lista_response
-            
\ No newline at end of file
+    """
+    Reranker asíncrono de Voyage AI.
+
+    - Usa el cliente async: un rerank no bloquea el event loop mientras espera la respuesta HTTPS.
+    - Como máximo `max_concurrency` reranks en vuelo; la espera por un lugar cuenta para el timeout.
+    - Cachea el resultado por (query, ids de los chunks) con LRU + TTL; reranks iguales en vuelo comparten la llamada.
+    - Si el rerank tarda más de `timeout` segundos o falla, devuelve los chunks en el orden de la búsqueda vectorial.
+    """
+
+    model = "rerank-2.5-lite"
+
+    def __init__(
+        self,
+        top_k: int = 3,
+        max_concurrency: int = conf.RERANK_MAX_CONCURRENCY,
+        timeout: float = conf.RERANK_TIMEOUT_SECONDS,
+        cache: MemoryCache = None
+    ):
+        self.client = voyageai.AsyncClient(api_key=os.getenv("VOYAGE_API_KEY"))
+        self.top_k = top_k
+        self.timeout = timeout
+        self.cache = cache or MemoryCache(max_entries=conf.RERANK_CACHE_SIZE, ttl_seconds=conf.RERANK_CACHE_TTL_SECONDS)
+        self.fallbacks = 0
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _cache_key(self, query: str, hits: list[dict]) -> bytes:
+        ids = ",".join(str(hit['id']) for hit in hits)
+        return hashlib.sha256(f"{self.model}\0{self.top_k}\0{query}\0{ids}".encode("utf-8")).digest()
+
+    async def _rerank(self, query: str, lista_chunks: list[str]) -> list[str]:
+        async with self._semaphore:
+            response = await self.client.rerank(
+                model=self.model,
+                query=query,
+                documents=lista_chunks,
+                top_k=self.top_k
+            )
+
+        return [r.document for r in response.results]
+
+    async def rerank(self, query: str, document: list[list[dict]]) -> list[str]:
+        hits = [j for i in document for j in i]
+        lista_chunks = [hit['entity']['text_chunk'] for hit in hits]
+
+        if not lista_chunks:
+            return []
+
+        try:
+            # shield: si vence el timeout la llamada sigue y su resultado queda en el cache para la próxima consulta
+            return await asyncio.wait_for(
+                asyncio.shield(self.cache.get_or_compute(self._cache_key(query, hits), lambda: self._rerank(query, lista_chunks))),
+                timeout=self.timeout
+            )
+        except Exception as e:
+            # Orden de la búsqueda vectorial: mejor una respuesta sin rerank que esperar al proveedor
+            self.fallbacks += 1
+            reason = f"timeout ({self.timeout}s)" if isinstance(e, asyncio.TimeoutError) else str(e)
+            print(f"   [RERANK] Sin rerank, orden vectorial: {reason}")
+            return lista_chunks[:self.top_k]
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "fallbacks": self.fallbacks}
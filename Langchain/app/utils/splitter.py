@@ -1,33 +1,104 @@
+import io
+import os
+from typing import BinaryIO, Iterator, Optional, Union
+
+import pypdf
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader
 
+from ..config import conf
+
+SEPARATORS = ["\n\n", "\n", ". ", "? ", "! ", " ", ""] ##Crea un nuevo chunk en el primer separador que encuentre
+MAX_CHUNK_CHARS = 2000  # Largo máximo de text_chunk en la colección de Milvus
+
+# Un PDF se puede pasar como ruta, como bytes o como objeto file-like (p. ej. el buffer de un UploadFile)
+PdfSource = Union[str, os.PathLike, bytes, BinaryIO]
 
 
 ##Función para generar chunks de texto
 
 class Splitter:
     
-    def __init__ (self):
+    def __init__ (
+        self,
+        mode: str = conf.SPLITTER_MODE,
+        chunk_tokens: int = conf.SPLITTER_CHUNK_TOKENS,
+        chunk_overlap_tokens: int = conf.SPLITTER_CHUNK_OVERLAP_TOKENS,
+        encoding_name: str = conf.SPLITTER_TOKEN_ENCODING,
+    ):
+        """
+        Args:
+            mode: "chars" (chunks de 1500 caracteres) o "tokens" (chunks armados según un presupuesto de tokens)
+            chunk_tokens: Tokens objetivo por chunk en modo "tokens"
+            chunk_overlap_tokens: Solapamiento entre chunks, en tokens, en modo "tokens"
+            encoding_name: Encoding de tiktoken usado para contar tokens localmente
+        """
+        if mode not in ("chars", "tokens"):
+            raise ValueError(f"Unknown splitter mode: {mode}")
+
+        self.mode = mode
+        self.chunk_tokens = chunk_tokens
+        self.encoding = None
 
-        self.modelSplitter = RecursiveCharacterTextSplitter( ##Recibe solo objeto del tipo Document
+        self.charSplitter = RecursiveCharacterTextSplitter( ##Recibe solo objeto del tipo Document
                 chunk_size=1500,  # 1500 caracteres por chunk, aprox. seguro para 2,048 tokens del modelo Gemini que usamos en embeddings
                 chunk_overlap=200,  
                 add_start_index=True,  
-                separators=["\n\n", "\n", ". ", "? ", "! ", " ", ""] ##Crea un nuevo chunk en el primer separador que encuentre
+                separators=SEPARATORS
             )
+
+        if mode == "chars":
+            self.modelSplitter = self.charSplitter
+        else:
+            import tiktoken  # Solo necesario en modo tokens
+
+            self.encoding = tiktoken.get_encoding(encoding_name)
+
+            # Mismos separadores, pero el largo de cada chunk se mide en tokens (tokenizer local, sin llamadas a la API)
+            self.modelSplitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_tokens,
+                chunk_overlap=chunk_overlap_tokens,
+                length_function=self.count_tokens,
+                add_start_index=True,
+                separators=SEPARATORS
+            )
+
+    def count_tokens(self, text: str) -> int:
+        """Cantidad de tokens de un texto según el encoding local (solo en modo tokens)."""
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def split_pages(self, docs: list[Document]) -> list[Document]:
+        """Divide los Document en chunks. En modo tokens, un chunk que supere el largo máximo
+            de Milvus (texto con pocos caracteres por token) se vuelve a dividir por caracteres.
+        """
+        chunks = self.modelSplitter.split_documents(docs)
+
+        if self.mode == "chars":
+            return chunks
+
+        result = []
+        for chunk in chunks:
+            if len(chunk.page_content) > MAX_CHUNK_CHARS:
+                result.extend(self.charSplitter.split_documents([chunk]))
+            else:
+                result.append(chunk)
+
+        return result
     
-    def split_document(self,file_path:str) -> list[dict] :
+    def split_document(self, pdf: PdfSource) -> list[dict] :
         """Divide un texto en Document, donde cada uno es una pagina del pdf. Luego divide cada Document en chunks de texto más pequeños.
+            Acepta la ruta del PDF, sus bytes o un objeto file-like (por ejemplo el buffer de un UploadFile).
             Retorna una lista de documentos (chunks)
         """
         
-        if file_path:
-            loader = PyPDFLoader(file_path)
+        if _is_path(pdf):
+            loader = PyPDFLoader(pdf)
             docs = loader.load() ##Crea un documento por pagina del PDF
+        else:
+            docs = list(_read_pages(pdf))
         
-
-        
-        all_splits = self.modelSplitter.split_documents(docs) ##Versione futuras, se podría tokenizar el texto !
+        all_splits = self.split_pages(docs)
         
         result = []
         
@@ -35,4 +106,81 @@ class Splitter:
             dict = {'text': i.page_content, 'metadata': i.metadata}
             result.append(dict)
         
-        return result
\ No newline at end of file
+        return result
+
+    def stream_document(self, pdf: PdfSource) -> Iterator[dict]:
+        """Versión streaming de split_document: carga el PDF página a página (lazy_load)
+            y emite los chunks de cada página a medida que se generan, sin mantener el documento completo en memoria.
+        """
+
+        pages = PyPDFLoader(pdf).lazy_load() if _is_path(pdf) else _read_pages(pdf)
+
+        for page in pages: ##Un Document por página, bajo demanda
+            for chunk in self.split_pages([page]):
+                yield {'text': chunk.page_content, 'metadata': chunk.metadata}
+
+    def split_page_range(self, pdf: PdfSource, start: int, stop: int) -> list[dict]:
+        """Carga solo las páginas [start, stop) del PDF y las divide en chunks.
+            Permite repartir un documento grande en ventanas de páginas (por ejemplo, entre procesos).
+        """
+
+        result = []
+
+        for page in _read_pages(pdf, start=start, stop=stop):
+            for chunk in self.split_pages([page]):
+                result.append({'text': chunk.page_content, 'metadata': chunk.metadata})
+
+        return result
+
+
+def _is_path(pdf: PdfSource) -> bool:
+    return isinstance(pdf, (str, os.PathLike))
+
+
+def _open_pdf(pdf: PdfSource) -> pypdf.PdfReader:
+    """Abre el PDF desde una ruta, bytes o un objeto file-like (sin escribirlo a disco)."""
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return pypdf.PdfReader(io.BytesIO(pdf))
+
+    if not _is_path(pdf):
+        pdf.seek(0)
+
+    return pypdf.PdfReader(pdf)
+
+
+def _read_pages(pdf: PdfSource, start: int = 0, stop: Optional[int] = None) -> Iterator[Document]:
+    """Genera un Document por página del PDF en [start, stop), extrayendo el texto a medida que se pide."""
+    reader = _open_pdf(pdf)
+    total_pages = len(reader.pages)
+    page_labels = reader.page_labels
+
+    for page_number in range(start, min(total_pages if stop is None else stop, total_pages)):
+        yield Document(
+            page_content=reader.pages[page_number].extract_text().strip(),
+            metadata={
+                'source': str(pdf) if _is_path(pdf) else None,
+                'total_pages': total_pages,
+                'page': page_number,
+                'page_label': page_labels[page_number],
+            }
+        )
+
+
+## Funciones a nivel de módulo para ejecutar el parseo en un ProcessPoolExecutor (deben ser picklables)
+
+_process_splitter = None
+
+
+def count_pdf_pages(pdf: PdfSource) -> int:
+    """Devuelve la cantidad de páginas del PDF."""
+    return len(_open_pdf(pdf).pages)
+
+
+def split_pdf_page_range(pdf: PdfSource, start: int, stop: int) -> list[dict]:
+    """Parsea y divide las páginas [start, stop) usando un Splitter propio de cada proceso worker."""
+    global _process_splitter
+
+    if _process_splitter is None:
+        _process_splitter = Splitter()
+
+    return _process_splitter.split_page_range(pdf=pdf, start=start, stop=stop)
@@ -0,0 +1,114 @@
+"""
+Benchmark del historial de chat a medida que crece la conversación: historial completo en cada
+mensaje (como antes) vs. ventana acotada por tokens + resumen incremental (ChatHistoryWindow).
+
+Simula una conversación de --turns turnos con el mismo ida y vuelta que UsersAPI: en el modo
+window solo se envían los mensajes posteriores al último resumido, junto con el resumen guardado.
+Cada --every turnos reporta:
+  - payload KB: JSON de chatHistory (+ chatSummary) que UsersAPI envía a /chat/rag
+  - prompt tokens: tokens estimados de historial + resumen en el prompt del generador
+  - prepare ms: parseo del historial, resumen (si toca) y armado del prompt del generador
+
+Por defecto el resumen lo hace un summarizer falso (sin red) que devuelve un texto del largo
+máximo configurado; con --live se llama a Gemini de verdad (necesita GOOGLE_API_KEY) y prepare
+incluye la latencia del resumen en los turnos que lo actualizan.
+
+Uso (desde el directorio Langchain):
+    python -m benchmarks.bench_chat_history --turns 100 --every 10
+    python -m benchmarks.bench_chat_history --live --turns 30 --every 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for key in ("API_KEY_NAME", "GOOGLE_API_KEY", "VOYAGE_API_KEY"):
+    os.environ.setdefault(key, "benchmark")
+
+from langchain_core.runnables import RunnableLambda
+from langchain_core.output_parsers import StrOutputParser
+
+from app.config import conf
+from app.utils.chatHistory import ChatHistory, ChatHistoryWindow, estimate_tokens
+from app.utils.graphs.graph import GENERATOR_MODEL, GENERATOR_PROMPT, SUMMARY_PROMPT
+from app.utils.models import ModelRegistry
+
+QUESTION = "¿Cómo se relaciona la prueba de trabajo con la cadena más larga en el turno {turn}?"
+ANSWER = (
+    "**Respuesta** La cadena más larga representa la mayor cantidad de prueba de trabajo invertida (turno {turn}).\n"
+    "**Justificación en base al texto**\n- Los nodos consideran la cadena más larga como la correcta.\n"
+    "- Modificar un bloque obliga a rehacer la prueba de trabajo de los bloques siguientes.\n"
+)
+
+
+def message(message_id: int, text: str, is_user_message: bool) -> dict:
+    return {"id": message_id, "text": text, "notebook_id": 1, "notebook_users_id": 1, "is_user_message": is_user_message}
+
+
+def fake_summarizer():
+    """Resumen del largo máximo configurado (lo que devolvería el modelo al respetar el límite)."""
+    return RunnableLambda(lambda inputs: " ".join(["tema"] * conf.CHAT_HISTORY_SUMMARY_WORDS))
+
+
+def prompt_tokens(history: list, summary: str) -> int:
+    return sum(estimate_tokens(message.content) for message in history) + (estimate_tokens(summary) if summary else 0)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=100, help="Turnos de la conversación")
+    parser.add_argument("--every", type=int, default=10, help="Cada cuántos turnos reportar")
+    parser.add_argument("--live", action="store_true", help="Resumir con Gemini de verdad en lugar del summarizer falso")
+    args = parser.parse_args()
+
+    if args.live:
+        models = ModelRegistry()
+        summarizer = SUMMARY_PROMPT.partial(max_words=str(conf.CHAT_HISTORY_SUMMARY_WORDS)) | models.chat_model(GENERATOR_MODEL) | StrOutputParser()
+    else:
+        summarizer = fake_summarizer()
+
+    window = ChatHistoryWindow(summarizer)
+    messages, summary, summarized_until = [], "", 0
+
+    print(f"Summarizer: {'Gemini (live)' if args.live else 'falso, sin red'} | ventana {window.max_turns} turnos / {window.token_budget} tokens\n")
+    print(f"{'turn':>5} | {'payload KB full':>15} | {'payload KB window':>17} | {'tokens full':>11} | {'tokens window':>13} | {'prepare ms full':>15} | {'prepare ms window':>17}")
+    print("-" * 116)
+
+    for turn in range(1, args.turns + 1):
+        messages.append(message(2 * turn - 1, QUESTION.format(turn=turn), True))
+
+        # Antes: todos los mensajes del notebook en cada pregunta
+        started = time.perf_counter()
+        full_history = ChatHistory.getChatHistory(ChatHistory.parse_conversations(messages))
+        GENERATOR_PROMPT.format_messages(context="", question=messages[-1]["text"], summary="(sin resumen)", history=full_history)
+        full_ms = (time.perf_counter() - started) * 1000
+
+        # Después: resumen guardado + mensajes posteriores al último resumido
+        sent = [m for m in messages if m["id"] > summarized_until]
+        started = time.perf_counter()
+        prepared = await window.prepare(sent, summary)
+        GENERATOR_PROMPT.format_messages(context="", question=messages[-1]["text"], summary=prepared["summary"] or "(sin resumen)", history=prepared["messages"])
+        window_ms = (time.perf_counter() - started) * 1000
+
+        if prepared["summarized_until"] is not None:
+            summary, summarized_until = prepared["summary"], prepared["summarized_until"]
+
+        if turn % args.every == 0:
+            full_kb = len(json.dumps(messages)) / 1024
+            window_kb = len(json.dumps({"chatHistory": sent, "chatSummary": summary})) / 1024
+            print(
+                f"{turn:>5} | {full_kb:>15.1f} | {window_kb:>17.1f} | {prompt_tokens(full_history, ''):>11} | "
+                f"{prompt_tokens(prepared['messages'], prepared['summary']):>13} | {full_ms:>15.2f} | {window_ms:>17.2f}"
+            )
+
+        messages.append(message(2 * turn, ANSWER.format(turn=turn), False))
+
+    print(f"\nResúmenes: {window.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+"""
+Benchmark del overhead por nodo de los grafos: modelos y chains construidos en cada invocación
+(como antes del ModelRegistry) vs. construidos una sola vez y compartidos.
+
+Para cada nodo con LLM (RAG: generate, judge, refine, summarize; creación: questions_and_answers, notebook,
+flashcards) reporta:
+  - setup: init_chat_model + ChatPromptTemplate + composición de la chain, lo que antes pagaba cada invocación
+  - node before / after: invocación del nodo con la chain construida en el momento vs. la compartida
+
+Por defecto la llamada al modelo se reemplaza por un chat model falso (sin red), así que la
+diferencia es solo el overhead de construcción. Con --live se llama a Gemini de verdad (necesita
+GOOGLE_API_KEY) y la medición incluye además el costo de abrir conexiones nuevas por cada cliente
+en lugar de reutilizar el pool del modelo compartido.
+
+Uso (desde el directorio Langchain):
+    python -m benchmarks.bench_graph_nodes --repeat 50
+    python -m benchmarks.bench_graph_nodes --live --repeat 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for key in ("API_KEY_NAME", "GOOGLE_API_KEY", "VOYAGE_API_KEY"):
+    os.environ.setdefault(key, "benchmark")
+
+from langchain.chat_models import init_chat_model
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from app.utils.graphs import graph, creation_graph
+
+INPUTS = {
+    "context": "Bitcoin es un sistema de efectivo electrónico peer-to-peer. " * 20,
+    "question": "¿Qué problema resuelve la prueba de trabajo?",
+    "history": [],
+    "summary": "(sin resumen)",
+    "conversation": "Usuario: ¿Qué es un bloque?\nAsistente: Un conjunto de transacciones con el hash del bloque anterior.",
+    "max_words": "200",
+    "generation": "La prueba de trabajo evita el doble gasto.",
+}
+
+
+# (nodo, modelo, prompt, variables del prompt)
+NODES = [
+    ("rag.generate", graph.GENERATOR_MODEL, graph.GENERATOR_PROMPT, ("context", "question", "summary", "history")),
+    ("rag.judge", graph.JUDGE_MODEL, graph.JUDGE_PROMPT, ("question", "context", "generation")),
+    ("rag.refine", graph.GENERATOR_MODEL, graph.REFINER_PROMPT, ("question", "generation")),
+    ("rag.summarize", graph.GENERATOR_MODEL, graph.SUMMARY_PROMPT, ("summary", "conversation", "max_words")),
+    ("creation.questions_and_answers", creation_graph.GENERATOR_MODEL, creation_graph.QUESTIONS_AND_ANSWERS_PROMPT, ("context",)),
+    ("creation.notebook", creation_graph.GENERATOR_MODEL, creation_graph.NOTEBOOK_PROMPT, ("context",)),
+    ("creation.flashcards", creation_graph.GENERATOR_MODEL, creation_graph.FLASHCARDS_PROMPT, ("context",)),
+]
+
+_ROLES = {"SystemMessagePromptTemplate": "system", "HumanMessagePromptTemplate": "human"}
+
+
+def rebuild_prompt(prompt: ChatPromptTemplate) -> ChatPromptTemplate:
+    """Vuelve a parsear el prompt desde sus templates, como hacían los nodos en cada invocación."""
+    return ChatPromptTemplate.from_messages([(_ROLES[type(m).__name__], m.prompt.template) for m in prompt.messages])
+
+
+def fake_model() -> FakeListChatModel:
+    return FakeListChatModel(responses=["La prueba de trabajo evita el doble gasto."])
+
+
+async def time_node(build_chain, variables: dict, repeat: int) -> list[float]:
+    """Tiempos por invocación de build_chain() + ainvoke (build_chain devuelve una chain ya construida en el modo after)."""
+    await build_chain().ainvoke(variables)  # Calentamiento (imports y primer cliente)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await build_chain().ainvoke(variables)
+        timings.append(time.perf_counter() - started)
+
+    return timings
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50, help="Invocaciones por nodo y modo")
+    parser.add_argument("--live", action="store_true", help="Llamar a Gemini de verdad en lugar del modelo falso")
+    args = parser.parse_args()
+
+    print(f"Modelo: {'Gemini (live)' if args.live else 'falso, sin red'} | {args.repeat} invocaciones por nodo y modo\n")
+    print(f"{'node':>30} | {'setup ms':>8} | {'before p50':>10} | {'after p50':>9} | {'overhead ms':>11}")
+    print("-" * 82)
+
+    for name, model_name, prompt, keys in NODES:
+        variables = {key: INPUTS[key] for key in keys}
+
+        # Construcción que antes pagaba cada invocación (clientes reales, sin llamar al modelo)
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            rebuild_prompt(prompt) | init_chat_model(model_name) | StrOutputParser()
+        setup = (time.perf_counter() - started) / args.repeat
+
+        if args.live:
+            before_chain = lambda: rebuild_prompt(prompt) | init_chat_model(model_name) | StrOutputParser()
+            shared = prompt | init_chat_model(model_name) | StrOutputParser()
+        else:
+            before_chain = lambda: rebuild_prompt(prompt) | (init_chat_model(model_name), fake_model())[1] | StrOutputParser()
+            shared = prompt | fake_model() | StrOutputParser()
+
+        try:
+            before = statistics.median(await time_node(before_chain, variables, args.repeat))
+            after = statistics.median(await time_node(lambda: shared, variables, args.repeat))
+        except Exception as e:
+            print(f"{name:>30} | {setup * 1000:>8.2f} | error: {e}")
+            continue
+
+        print(f"{name:>30} | {setup * 1000:>8.2f} | {before * 1000:>10.2f} | {after * 1000:>9.2f} | {(before - after) * 1000:>11.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,234 @@
+"""
+Harness de perfiles de índice (app/db/index_profiles.py) contra una instancia local de Milvus.
+
+Para cada perfil crea una colección temporal, carga el corpus de vectores, construye el índice
+y ejecuta el set de consultas de a una. Reporta:
+  - recall@k contra la búsqueda exacta (fuerza bruta con NumPy)
+  - latencia p50 / p95 / p99 por consulta
+  - tiempo de construcción del índice (create_index hasta terminar de indexar y cargar)
+  - memoria estimada del índice (tamaño de los vectores / códigos y del grafo según el tipo)
+
+La primera fila es el baseline exacto del backend NumPy (app/db/numpy_store.py, VECTOR_STORE_BACKEND=numpy):
+fuerza bruta en el proceso, recall 1 por construcción, para comparar la latencia de cada índice ANN.
+
+Vectores: embeddings reales del cache persistente (--cache) o sintéticos (ver bench_vectors).
+
+Milvus Lite (pip install milvus-lite) sirve para probar el harness, pero solo implementa índices
+planos: los números comparables entre perfiles se obtienen con Milvus standalone.
+
+Uso (desde el directorio Langchain):
+    python -m benchmarks.bench_index_profiles --uri http://localhost:19530 --cache app/cache/embeddings.sqlite3
+    python -m benchmarks.bench_index_profiles --uri ./bench_milvus.db --profiles hnsw ivf_flat --vectors 2000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for key in ("API_KEY_NAME", "GOOGLE_API_KEY", "VOYAGE_API_KEY"):
+    os.environ.setdefault(key, "benchmark")
+
+from pymilvus import DataType, MilvusClient
+
+from app.db.index_profiles import INDEX_PROFILES, get_profile, search_params
+from app.db.numpy_store import NumpyVectorStore
+from app.db.vector_codec import truncate_and_normalize
+from benchmarks.bench_vectors import load_cached_vectors, synthetic_vectors
+
+INSERT_BATCH = 500
+
+
+def estimate_index_bytes(profile: dict, n: int, dim: int) -> int:
+    """Memoria aproximada del índice cargado: vectores (o sus códigos) más la estructura del índice."""
+    params = profile["params"]
+    index_type = profile["index_type"]
+
+    if index_type in ("HNSW", "HNSW_SQ"):
+        bytes_per_component = 1 if index_type == "HNSW_SQ" else 4
+        return n * (dim * bytes_per_component + params["M"] * 2 * 4)  # Vecinos del nivel 0 (ids de 4 bytes)
+
+    if index_type in ("IVF_FLAT", "IVF_SQ8"):
+        bytes_per_component = 1 if index_type == "IVF_SQ8" else 4
+        return n * dim * bytes_per_component + params["nlist"] * dim * 4  # Vectores + centroides
+
+    if index_type == "DISKANN":
+        return int(n * dim * 4 * 0.125)  # Códigos PQ (PQCodeBudgetGBRatio = 0.125); el grafo y los vectores quedan en disco
+
+    return n * dim * 4
+
+
+def wait_for_index(client: MilvusClient, collection_name: str, rows: int, timeout: float = 1800.0):
+    """Espera a que el índice termine de construirse sobre todas las filas."""
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        index = client.describe_index(collection_name=collection_name, index_name="vector_index")
+
+        if index.get("state") in (None, "Finished") and index.get("pending_index_rows", 0) == 0 and index.get("indexed_rows", rows) >= rows:
+            return
+
+        time.sleep(0.5)
+
+    raise TimeoutError(f"Index of {collection_name} not built after {timeout:.0f}s")
+
+
+def latency_percentiles(latencies: list[float]) -> dict:
+    percentiles = statistics.quantiles(latencies, n=100)
+    return {"p50": percentiles[49], "p95": percentiles[94], "p99": percentiles[98]}
+
+
+def run_numpy_baseline(corpus: np.ndarray, queries: np.ndarray, expected: np.ndarray, k: int) -> dict:
+    """Búsqueda exacta con el backend NumPy en memoria (mismo formato de resultado que run_profile)."""
+    store = NumpyVectorStore(dim=corpus.shape[1])
+
+    async def run() -> dict:
+        started = time.perf_counter()
+        await store.upload_document(
+            data=[{"text_chunk": "", "metadata": None, "vector_chunk": vector, "pdf_id": 0} for vector in corpus],
+            collection_name="bench"
+        )
+        build_seconds = time.perf_counter() - started
+
+        latencies = []
+        found = []
+        for query in queries:
+            started = time.perf_counter()
+            hits = await store.get_document(query_vector=query, collection_name="bench", limit=k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            found.append([hit["id"] - 1 for hit in hits])  # Las claves del store empiezan en 1
+
+        return {
+            "recall": float(np.mean([len(set(e) & set(f)) / k for e, f in zip(expected, found)])),
+            **latency_percentiles(latencies),
+            "build": build_seconds,
+            "memory": corpus.nbytes,
+        }
+
+    return asyncio.run(run())
+
+
+def run_profile(client: MilvusClient, name: str, corpus: np.ndarray, queries: np.ndarray, expected: np.ndarray, k: int) -> dict:
+    profile = get_profile(name)
+    collection_name = f"bench_index_{name}"
+    dim = corpus.shape[1]
+
+    if client.has_collection(collection_name=collection_name):
+        client.drop_collection(collection_name=collection_name)
+
+    schema = MilvusClient.create_schema(auto_id=False, enable_dynamic_field=False)
+    schema.add_field(field_name="id", datatype=DataType.INT64, is_primary=True)
+    schema.add_field(field_name="vector", datatype=DataType.FLOAT_VECTOR, dim=dim)
+    client.create_collection(collection_name=collection_name, schema=schema)
+
+    try:
+        for start in range(0, len(corpus), INSERT_BATCH):
+            rows = [{"id": i, "vector": corpus[i].tolist()} for i in range(start, min(start + INSERT_BATCH, len(corpus)))]
+            client.insert(collection_name=collection_name, data=rows)
+        client.flush(collection_name=collection_name)
+
+        # Construcción del índice
+        index_params = client.prepare_index_params()
+        index_params.add_index(
+            field_name="vector",
+            index_type=profile["index_type"],
+            index_name="vector_index",
+            metric_type="COSINE",
+            params=profile["params"]
+        )
+
+        started = time.perf_counter()
+        client.create_index(collection_name=collection_name, index_params=index_params)
+        wait_for_index(client, collection_name, rows=len(corpus))
+        client.load_collection(collection_name=collection_name)
+        build_seconds = time.perf_counter() - started
+
+        params = search_params(name, limit=k)
+
+        def search(query: np.ndarray) -> list[int]:
+            res = client.search(collection_name=collection_name, anns_field="vector", data=[query.tolist()], limit=k, search_params=params)
+            return [hit["id"] for hit in res[0]]
+
+        for query in queries[:10]:  # Calentamiento
+            search(query)
+
+        latencies = []
+        found = []
+        for query in queries:
+            started = time.perf_counter()
+            found.append(search(query))
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        recall = float(np.mean([len(set(e) & set(f)) / k for e, f in zip(expected, found)]))
+
+        return {
+            "recall": recall,
+            **latency_percentiles(latencies),
+            "build": build_seconds,
+            "memory": estimate_index_bytes(profile, len(corpus), dim),
+        }
+
+    finally:
+        client.drop_collection(collection_name=collection_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="http://localhost:19530", help="Milvus standalone (http://...) o archivo de Milvus Lite (*.db)")
+    parser.add_argument("--token", default=None, help="Token de Milvus (si tiene autenticación)")
+    parser.add_argument("--profiles", nargs="+", default=list(INDEX_PROFILES), choices=list(INDEX_PROFILES), help="Perfiles a comparar")
+    parser.add_argument("--cache", default=None, help="SQLite del cache de embeddings con vectores de 3072 dimensiones")
+    parser.add_argument("--vectors", type=int, default=20000, help="Vectores del corpus")
+    parser.add_argument("--queries", type=int, default=500, help="Consultas (se sacan del corpus)")
+    parser.add_argument("--dim", type=int, default=3072, help="Dimensión (Matryoshka, truncada y re-normalizada)")
+    parser.add_argument("-k", type=int, default=5, help="Resultados por consulta (recall@k)")
+    args = parser.parse_args()
+
+    vectors = load_cached_vectors(args.cache, args.vectors + args.queries) if args.cache else np.empty((0, 3072))
+    source = f"cache {args.cache}"
+
+    if len(vectors) < args.queries + args.k:
+        vectors = synthetic_vectors(args.vectors + args.queries)
+        source = "sintéticos"
+
+    if args.dim < vectors.shape[1]:
+        vectors = np.array([truncate_and_normalize(vector, args.dim) for vector in vectors], dtype=np.float32)
+
+    queries, corpus = vectors[:args.queries], vectors[args.queries:]
+    expected = np.argsort(-(queries @ corpus.T), axis=1)[:, :args.k]  # Fuerza bruta: top-k exacto por coseno
+
+    client = MilvusClient(uri=args.uri, token=args.token or "")
+
+    print(f"Milvus: {args.uri} | corpus {len(corpus)} x {corpus.shape[1]} ({source}) | {len(queries)} consultas, k={args.k}\n")
+    print(f"{'profile':<14} | {'index':<9} | {'recall@k':>8} | {'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7} | {'build s':>8} | {'est. MB':>8} | {'B/chunk':>7}")
+    print("-" * 98)
+
+    def report(name: str, index_type: str, result: dict):
+        print(
+            f"{name:<14} | {index_type:<9} | {result['recall']:>8.3f} | {result['p50']:>7.2f} | "
+            f"{result['p95']:>7.2f} | {result['p99']:>7.2f} | {result['build']:>8.1f} | "
+            f"{result['memory'] / 1024 ** 2:>8.1f} | {result['memory'] / len(corpus):>7.0f}"
+        )
+
+    report("numpy", "exact", run_numpy_baseline(corpus, queries, expected, args.k))
+
+    try:
+        for name in args.profiles:
+            try:
+                result = run_profile(client, name, corpus, queries, expected, args.k)
+            except Exception as e:
+                print(f"{name:<14} | {get_profile(name)['index_type']:<9} | error: {e}")
+                continue
+
+            report(name, get_profile(name)["index_type"], result)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark de ingesta multi-PDF: camino secuencial vs. pool de procesos + ingesta concurrente.
+
+Usa el PDF de app/fixture y simula la latencia de red de Gemini (embeddings) y de Milvus (insert),
+por lo que no necesita credenciales ni una base de datos corriendo.
+
+Uso (desde el directorio Langchain):
+    python -m benchmarks.bench_ingestion --files 8 --workers 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for key in ("API_KEY_NAME", "GOOGLE_API_KEY", "VOYAGE_API_KEY"):
+    os.environ.setdefault(key, "benchmark")
+
+from app.utils.splitter import Splitter, split_pdf_page_range
+from app.utils.ingestion import IngestionPipeline
+
+FIXTURE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app', 'fixture', 'bitcoin_es.pdf'))
+
+
+class FakeEmbeddingGenerator:
+    """Simula la llamada a Gemini con una latencia fija por request."""
+
+    def __init__(self, latency: float, dim: int = 3072):
+        self.latency = latency
+        self.dim = dim
+
+    async def get_document_embedding(self, text: list[str]) -> list[list[float]]:
+        await asyncio.sleep(self.latency)
+        return [[0.0] * self.dim for _ in text]
+
+    def format_database(self, text_chunks: list[dict], vector_chunks: list[list[float]], pdf_id: int) -> list[dict]:
+        return [
+            {"text_chunk": c["text"], "metadata": c["metadata"], "vector_chunk": v, "pdf_id": pdf_id}
+            for c, v in zip(text_chunks, vector_chunks)
+        ]
+
+
+class FakeMilvusClient:
+    """Simula el insert en Milvus con una latencia fija por request."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.rows = 0
+
+    async def upload_document(self, data: list[dict], collection_name: str):
+        await asyncio.sleep(self.latency)
+        self.rows += len(data)
+
+
+async def run_sequential(files: list[tuple[str, int]], embed_latency: float, insert_latency: float) -> float:
+    """Camino anterior: un archivo detrás de otro, parseo en el event loop."""
+    pipeline = IngestionPipeline(
+        splitter=Splitter(),
+        embedding_generator=FakeEmbeddingGenerator(embed_latency),
+        client_milvus=FakeMilvusClient(insert_latency),
+    )
+
+    start = time.perf_counter()
+    for file_path, pdf_id in files:
+        await pipeline.ingest_file(file_path=file_path, pdf_id=pdf_id)
+    return time.perf_counter() - start
+
+
+async def run_concurrent(files: list[tuple[str, int]], embed_latency: float, insert_latency: float, pool: ProcessPoolExecutor) -> float:
+    """Camino nuevo: parseo en el pool de procesos y archivos en paralelo."""
+    pipeline = IngestionPipeline(
+        splitter=Splitter(),
+        embedding_generator=FakeEmbeddingGenerator(embed_latency),
+        client_milvus=FakeMilvusClient(insert_latency),
+        process_pool=pool,
+    )
+
+    start = time.perf_counter()
+    await pipeline.ingest_files(files=files)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, nargs="+", default=[1, 4, 8], help="Cantidad de PDFs por corrida")
+    parser.add_argument("--workers", type=int, default=4, help="Procesos del pool")
+    parser.add_argument("--pdf", default=FIXTURE, help="PDF a ingestar (se repite N veces)")
+    parser.add_argument("--embed-latency", type=float, default=0.15, help="Latencia simulada por batch de embeddings (s)")
+    parser.add_argument("--insert-latency", type=float, default=0.03, help="Latencia simulada por insert en Milvus (s)")
+    args = parser.parse_args()
+
+    pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    try:
+        # Calentamiento: arranca los procesos del pool (e importa el splitter) antes de medir
+        list(pool.map(split_pdf_page_range, [args.pdf] * args.workers, [0] * args.workers, [1] * args.workers))
+
+        print(f"{'files':>6} | {'sequential (s)':>15} | {'concurrent (s)':>15} | {'speedup':>8}")
+        print("-" * 54)
+
+        for n in args.files:
+            files = [(args.pdf, i) for i in range(n)]
+
+            sequential = asyncio.run(run_sequential(files, args.embed_latency, args.insert_latency))
+            concurrent = asyncio.run(run_concurrent(files, args.embed_latency, args.insert_latency, pool))
+
+            print(f"{n:>6} | {sequential:>15.3f} | {concurrent:>15.3f} | {sequential / concurrent:>7.2f}x")
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
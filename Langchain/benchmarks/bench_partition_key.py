@@ -0,0 +1,219 @@
+"""
+Benchmark de búsqueda filtrada por pdf_id con y sin partition key (MILVUS_PARTITION_KEY).
+
+Para cada tamaño de corpus crea dos colecciones temporales con el mismo contenido (chunks agrupados
+por PDF, como documents_collection): una con pdf_id como partition key y otra con pdf_id escalar.
+Las consultas filtran por `pdf_id in [...]` con algunos PDFs al azar, igual que el chat de un notebook.
+Reporta por colección:
+  - latencia p50 / p95 / p99 por consulta
+  - recall@k contra el top-k exacto dentro de los PDFs del filtro
+
+Sin partition key el filtro se evalúa sobre el índice de toda la colección; con partition key Milvus
+solo busca en las particiones de esos PDFs, así que la diferencia crece con el tamaño del corpus.
+
+Los vectores de cada PDF se generan de forma determinista a partir de su pdf_id: el top-k exacto
+se calcula regenerando solo los PDFs del filtro, sin guardar el corpus completo en memoria.
+
+Milvus Lite no soporta partition key: el benchmark necesita Milvus standalone.
+
+Uso (desde el directorio Langchain):
+    python -m benchmarks.bench_partition_key --uri http://localhost:19530
+    python -m benchmarks.bench_partition_key --sizes 10000 100000 --pdfs-per-query 1 --profile ivf_flat
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for key in ("API_KEY_NAME", "GOOGLE_API_KEY", "VOYAGE_API_KEY"):
+    os.environ.setdefault(key, "benchmark")
+
+from pymilvus import DataType, MilvusClient
+
+from app.config import conf
+from app.db.index_profiles import INDEX_PROFILES, get_profile, search_params
+from benchmarks.bench_index_profiles import wait_for_index
+
+INSERT_BATCH = 1000
+
+
+def pdf_vectors(pdf_id: int, chunks: int, dim: int) -> np.ndarray:
+    """Chunks normalizados de un PDF: un tema propio más ruido, siempre los mismos para el mismo pdf_id."""
+    rng = np.random.default_rng(pdf_id)
+    vectors = rng.standard_normal(dim) + 0.8 * rng.standard_normal((chunks, dim))
+
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def build_collection(
+    client: MilvusClient, collection_name: str, rows: int, dim: int, chunks_per_pdf: int,
+    profile_name: str, partition_key: bool, num_partitions: int
+) -> float:
+    """Crea la colección, inserta `rows` chunks, construye el índice y la carga. Devuelve los segundos de carga."""
+    profile = get_profile(profile_name)
+
+    if client.has_collection(collection_name=collection_name):
+        client.drop_collection(collection_name=collection_name)
+
+    schema = MilvusClient.create_schema(auto_id=False, enable_dynamic_field=False)
+    schema.add_field(field_name="id", datatype=DataType.INT64, is_primary=True)
+    schema.add_field(field_name="pdf_id", datatype=DataType.INT64, is_partition_key=partition_key)
+    schema.add_field(field_name="vector", datatype=DataType.FLOAT_VECTOR, dim=dim)
+
+    client.create_collection(
+        collection_name=collection_name,
+        schema=schema,
+        **({"num_partitions": num_partitions} if partition_key else {})
+    )
+
+    started = time.perf_counter()
+    batch = []
+
+    for pdf_id in range((rows + chunks_per_pdf - 1) // chunks_per_pdf):
+        chunks = min(chunks_per_pdf, rows - pdf_id * chunks_per_pdf)
+
+        for j, vector in enumerate(pdf_vectors(pdf_id, chunks, dim)):
+            batch.append({"id": pdf_id * chunks_per_pdf + j, "pdf_id": pdf_id, "vector": vector.tolist()})
+
+        if len(batch) >= INSERT_BATCH:
+            client.insert(collection_name=collection_name, data=batch)
+            batch = []
+
+    if batch:
+        client.insert(collection_name=collection_name, data=batch)
+    client.flush(collection_name=collection_name)
+
+    index_params = client.prepare_index_params()
+    index_params.add_index(
+        field_name="vector",
+        index_type=profile["index_type"],
+        index_name="vector_index",
+        metric_type="COSINE",
+        params=profile["params"]
+    )
+    client.create_index(collection_name=collection_name, index_params=index_params)
+    wait_for_index(client, collection_name, rows=rows)
+    client.load_collection(collection_name=collection_name)
+
+    return time.perf_counter() - started
+
+
+def make_queries(rows: int, dim: int, chunks_per_pdf: int, pdfs_per_query: int, count: int, k: int, seed: int = 0) -> list[dict]:
+    """Consultas cerca de un chunk de uno de los PDFs del filtro, con su top-k exacto dentro del filtro."""
+    rng = np.random.default_rng(seed)
+    pdfs = (rows + chunks_per_pdf - 1) // chunks_per_pdf
+    queries = []
+
+    for _ in range(count):
+        pdf_ids = sorted(int(pdf_id) for pdf_id in rng.choice(pdfs, size=min(pdfs_per_query, pdfs), replace=False))
+
+        ids = []
+        vectors = []
+        for pdf_id in pdf_ids:
+            chunks = min(chunks_per_pdf, rows - pdf_id * chunks_per_pdf)
+            vectors.append(pdf_vectors(pdf_id, chunks, dim))
+            ids.extend(pdf_id * chunks_per_pdf + j for j in range(chunks))
+
+        candidates = np.concatenate(vectors)
+        query = candidates[rng.integers(len(candidates))] + 0.5 * rng.standard_normal(dim) / np.sqrt(dim)
+        query = (query / np.linalg.norm(query)).astype(np.float32)
+
+        expected = [ids[i] for i in np.argsort(-(candidates @ query))[:k]]
+        queries.append({"vector": query, "pdf_ids": pdf_ids, "expected": expected})
+
+    return queries
+
+
+def run_queries(client: MilvusClient, collection_name: str, queries: list[dict], profile_name: str, k: int) -> dict:
+    params = search_params(profile_name, limit=k)
+
+    def search(query: dict) -> list[int]:
+        res = client.search(
+            collection_name=collection_name,
+            anns_field="vector",
+            data=[query["vector"].tolist()],
+            limit=k,
+            search_params=params,
+            filter=f"pdf_id in {query['pdf_ids']}"
+        )
+        return [hit["id"] for hit in res[0]]
+
+    for query in queries[:10]:  # Calentamiento
+        search(query)
+
+    latencies = []
+    found = []
+    for query in queries:
+        started = time.perf_counter()
+        found.append(search(query))
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    percentiles = statistics.quantiles(latencies, n=100)
+
+    return {
+        "recall": float(np.mean([len(set(q["expected"]) & set(f)) / k for q, f in zip(queries, found)])),
+        "p50": percentiles[49],
+        "p95": percentiles[94],
+        "p99": percentiles[98],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="http://localhost:19530", help="Milvus standalone (http://...)")
+    parser.add_argument("--token", default=None, help="Token de Milvus (si tiene autenticación)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="Chunks por colección")
+    parser.add_argument("--dim", type=int, default=256, help="Dimensión de los vectores (chica para que 1M de chunks entre en memoria)")
+    parser.add_argument("--chunks-per-pdf", type=int, default=100, help="Chunks de cada PDF")
+    parser.add_argument("--pdfs-per-query", type=int, default=3, help="PDFs en el filtro pdf_id in [...] de cada consulta")
+    parser.add_argument("--num-partitions", type=int, default=conf.MILVUS_NUM_PARTITIONS, help="Particiones de la partition key")
+    parser.add_argument("--profile", default="hnsw", choices=list(INDEX_PROFILES), help="Perfil de índice")
+    parser.add_argument("--queries", type=int, default=300, help="Consultas por colección")
+    parser.add_argument("-k", type=int, default=5, help="Resultados por consulta (recall@k)")
+    args = parser.parse_args()
+
+    client = MilvusClient(uri=args.uri, token=args.token or "")
+
+    print(
+        f"Milvus: {args.uri} | dim {args.dim}, {args.chunks_per_pdf} chunks por PDF, {args.pdfs_per_query} PDFs por consulta | "
+        f"perfil {args.profile}, {args.queries} consultas, k={args.k}\n"
+    )
+    print(f"{'chunks':>9} | {'pdf_id':<22} | {'recall@k':>8} | {'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7} | {'load s':>7}")
+    print("-" * 84)
+
+    try:
+        for rows in args.sizes:
+            queries = make_queries(rows, args.dim, args.chunks_per_pdf, args.pdfs_per_query, args.queries, args.k)
+
+            for partition_key in (False, True):
+                collection_name = f"bench_partition_{rows}_{'key' if partition_key else 'scalar'}"
+                label = f"partition key x{args.num_partitions}" if partition_key else "escalar"
+
+                try:
+                    load_seconds = build_collection(
+                        client, collection_name, rows, args.dim, args.chunks_per_pdf,
+                        args.profile, partition_key, args.num_partitions
+                    )
+                    result = run_queries(client, collection_name, queries, args.profile, args.k)
+                except Exception as e:
+                    print(f"{rows:>9} | {label:<22} | error: {e}")
+                    continue
+                finally:
+                    if client.has_collection(collection_name=collection_name):
+                        client.drop_collection(collection_name=collection_name)
+
+                print(
+                    f"{rows:>9} | {label:<22} | {result['recall']:>8.3f} | {result['p50']:>7.2f} | "
+                    f"{result['p95']:>7.2f} | {result['p99']:>7.2f} | {load_seconds:>7.1f}"
+                )
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
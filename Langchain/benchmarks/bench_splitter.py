@@ -0,0 +1,87 @@
+"""
+Benchmark del Splitter: modo por caracteres vs. modo por tokens.
+
+Divide el PDF de app/fixture con cada modo y reporta la cantidad de chunks, cuánto se llena
+el presupuesto de tokens por chunk (tokens del chunk / tokens objetivo), la dispersión de
+tokens entre chunks y el throughput del split. Los tokens se cuentan con el mismo encoding
+local (tiktoken) para ambos modos, así la comparación es directa.
+
+Uso (desde el directorio Langchain):
+    python -m benchmarks.bench_splitter --chunk-tokens 400 --overlap-tokens 50 --repeat 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for key in ("API_KEY_NAME", "GOOGLE_API_KEY", "VOYAGE_API_KEY"):
+    os.environ.setdefault(key, "benchmark")
+
+import tiktoken
+from langchain_community.document_loaders import PyPDFLoader
+
+from app.utils.splitter import Splitter
+
+FIXTURE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app', 'fixture', 'bitcoin_es.pdf'))
+
+
+def run(splitter: Splitter, pages: list, repeat: int) -> tuple[list, float]:
+    """Divide las páginas ya parseadas `repeat` veces y devuelve los chunks y el tiempo medio por split."""
+    chunks = splitter.split_pages(pages)  # Calentamiento
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        chunks = splitter.split_pages(pages)
+
+    return chunks, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", default=FIXTURE, help="PDF a dividir")
+    parser.add_argument("--chunk-tokens", type=int, default=400, help="Tokens objetivo por chunk (modo tokens)")
+    parser.add_argument("--overlap-tokens", type=int, default=50, help="Solapamiento en tokens (modo tokens)")
+    parser.add_argument("--encoding", default="cl100k_base", help="Encoding de tiktoken")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones para medir el throughput")
+    args = parser.parse_args()
+
+    encoding = tiktoken.get_encoding(args.encoding)
+
+    # El parseo del PDF es igual para ambos modos: se mide aparte y se hace una sola vez
+    start = time.perf_counter()
+    pages = PyPDFLoader(args.pdf).load()
+    parse_time = time.perf_counter() - start
+    total_chars = sum(len(page.page_content) for page in pages)
+
+    print(f"PDF: {os.path.basename(args.pdf)} ({len(pages)} páginas, {total_chars} caracteres, parseo {parse_time * 1000:.0f} ms)")
+    print(f"Objetivo: {args.chunk_tokens} tokens/chunk, solapamiento {args.overlap_tokens} tokens\n")
+    print(f"{'mode':>6} | {'chunks':>6} | {'avg tok':>7} | {'min':>4} | {'max':>4} | {'stdev':>6} | {'fill':>6} | {'> target':>8} | {'kchar/s':>8} | {'ms/split':>8}")
+    print("-" * 93)
+
+    for mode in ("chars", "tokens"):
+        splitter = Splitter(
+            mode=mode,
+            chunk_tokens=args.chunk_tokens,
+            chunk_overlap_tokens=args.overlap_tokens,
+            encoding_name=args.encoding
+        )
+
+        chunks, elapsed = run(splitter, pages, args.repeat)
+        tokens = [len(encoding.encode(chunk.page_content, disallowed_special=())) for chunk in chunks]
+
+        # Relleno medido sobre los chunks "llenos": el último chunk de cada página es un resto y no cuenta
+        full = [t for t, chunk, following in zip(tokens, chunks, chunks[1:]) if chunk.metadata.get('page') == following.metadata.get('page')]
+        fill = statistics.mean(full or tokens) / args.chunk_tokens
+        over = sum(t > args.chunk_tokens for t in tokens)
+
+        print(
+            f"{mode:>6} | {len(chunks):>6} | {statistics.mean(tokens):>7.1f} | {min(tokens):>4} | {max(tokens):>4} | "
+            f"{statistics.pstdev(tokens):>6.1f} | {fill:>6.1%} | {over:>8} | {total_chars / elapsed / 1000:>8.1f} | {elapsed * 1000:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
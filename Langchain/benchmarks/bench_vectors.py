@@ -0,0 +1,169 @@
+"""
+Benchmark de representaciones de vector_chunk: memoria por chunk y recall@5 contra float32/3072.
+
+Para cada combinación de dimensión (Matryoshka, truncada y re-normalizada) y formato de
+almacenamiento (FLOAT_VECTOR, FLOAT16_VECTOR, BFLOAT16_VECTOR, la cuantización SQ8 de los
+índices HNSW_SQ / IVF_SQ8 y la búsqueda binaria con rescoring de MILVUS_RETRIEVAL_MODE=binary_rescore) compara el top-5 por coseno contra el top-5 exacto con los vectores
+float32 de 3072 dimensiones. La búsqueda es exacta (sin grafo) para medir solo la pérdida de la
+representación, no la del índice aproximado.
+
+Vectores de entrada:
+  --cache: embeddings reales de 3072 dimensiones del cache persistente (app/cache/embeddings.sqlite3)
+  sin --cache (o si no tiene suficientes): vectores sintéticos con la energía concentrada en las
+  primeras dimensiones, como los embeddings Matryoshka. Sirven para comparar formatos, pero el
+  recall de las dimensiones truncadas solo es representativo con embeddings reales.
+
+Uso (desde el directorio Langchain):
+    python -m benchmarks.bench_vectors --cache app/cache/embeddings.sqlite3 --queries 200
+"""
+import argparse
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for key in ("API_KEY_NAME", "GOOGLE_API_KEY", "VOYAGE_API_KEY"):
+    os.environ.setdefault(key, "benchmark")
+
+from app.db.vector_codec import VectorCodec, truncate_and_normalize
+
+BASE_DIM = 3072
+HNSW_M = 16
+HNSW_GRAPH_BYTES = HNSW_M * 2 * 4  # Vecinos del nivel 0 del grafo HNSW (ids de 4 bytes)
+K = 5
+
+
+def load_cached_vectors(path: str, limit: int) -> np.ndarray:
+    """Vectores float32 de 3072 dimensiones guardados en el cache de embeddings."""
+    conn = sqlite3.connect(path)
+
+    try:
+        rows = conn.execute("SELECT vector FROM embeddings WHERE LENGTH(vector) = ? LIMIT ?", (BASE_DIM * 4, limit)).fetchall()
+    finally:
+        conn.close()
+
+    return np.array([np.frombuffer(blob, dtype=np.float32) for (blob,) in rows], dtype=np.float32).reshape(-1, BASE_DIM)
+
+
+def synthetic_vectors(n: int, seed: int = 0) -> np.ndarray:
+    """Vectores agrupados en temas, con varianza decreciente por dimensión (perfil Matryoshka)."""
+    rng = np.random.default_rng(seed)
+    scale = 1.0 / np.sqrt(1.0 + np.arange(BASE_DIM) / 64.0)
+
+    topics = rng.standard_normal((max(1, n // 20), BASE_DIM)) * scale
+    vectors = topics[rng.integers(0, len(topics), n)] + 0.6 * rng.standard_normal((n, BASE_DIM)) * scale
+
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def top_k(queries: np.ndarray, corpus: np.ndarray, k: int = K) -> np.ndarray:
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall(expected: np.ndarray, found: np.ndarray) -> float:
+    return float(np.mean([len(set(e) & set(f)) / len(e) for e, f in zip(expected, found)]))
+
+
+def truncate(vectors: np.ndarray, dim: int) -> np.ndarray:
+    return np.array([truncate_and_normalize(vector, dim) for vector in vectors], dtype=np.float32)
+
+
+def round_trip(vectors: np.ndarray, vector_type: str) -> np.ndarray:
+    """Vectores tal como quedan guardados en Milvus con el formato indicado."""
+    codec = VectorCodec(vector_type=vector_type, dim=vectors.shape[1])
+    return np.array([codec.decode(codec.encode(vector)) for vector in vectors], dtype=np.float32)
+
+
+def binary_rescore_top_k(queries: np.ndarray, corpus: np.ndarray, candidates: int, k: int = K) -> np.ndarray:
+    """Top-`candidates` por Hamming sobre los signos y rescoring exacto de esos candidatos."""
+    signs_q = np.where(queries > 0, 1.0, -1.0).astype(np.float32)
+    signs_c = np.where(corpus > 0, 1.0, -1.0).astype(np.float32)
+
+    coarse = np.argsort(-(signs_q @ signs_c.T), axis=1)[:, :candidates]  # Mayor producto de signos = menor Hamming
+
+    found = []
+    for query, ids in zip(queries, coarse):
+        scores = corpus[ids] @ query
+        found.append(ids[np.argsort(-scores)[:k]])
+
+    return np.array(found)
+
+
+def sq8(corpus: np.ndarray) -> np.ndarray:
+    """Cuantización escalar a 8 bits por dimensión (rango min/max del corpus), como SQ8."""
+    low = corpus.min(axis=0)
+    step = (corpus.max(axis=0) - low) / 255.0
+    step[step == 0] = 1.0
+
+    codes = np.round((corpus - low) / step)
+    return (codes * step + low).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cache", default=None, help="SQLite del cache de embeddings con vectores de 3072 dimensiones")
+    parser.add_argument("--vectors", type=int, default=5000, help="Vectores del corpus")
+    parser.add_argument("--queries", type=int, default=200, help="Consultas (se sacan del corpus)")
+    parser.add_argument("--candidates", type=int, default=100, help="Candidatos de la búsqueda binaria (MILVUS_RESCORE_CANDIDATES)")
+    parser.add_argument("--text-bytes", type=int, default=1200, help="Bytes promedio de texto y metadatos por chunk (se suman a la memoria)")
+    args = parser.parse_args()
+
+    vectors = load_cached_vectors(args.cache, args.vectors + args.queries) if args.cache else np.empty((0, BASE_DIM))
+    source = f"cache {args.cache}"
+
+    if len(vectors) < args.queries + K:
+        vectors = synthetic_vectors(args.vectors + args.queries)
+        source = "sintéticos: el recall de las dimensiones truncadas es solo orientativo"
+
+    queries, corpus = vectors[:args.queries], vectors[args.queries:]
+    expected = top_k(queries, corpus)
+
+    print(f"Vectores: {len(corpus)} en el corpus, {len(queries)} consultas ({source})")
+    print(f"Memoria por chunk = vector + grafo HNSW (M={HNSW_M}, ~{HNSW_GRAPH_BYTES} bytes) + {args.text_bytes} bytes de texto/metadatos")
+    print(f"BINARY + rescore: solo el índice binario (IVF, sin grafo) en memoria; los vectores completos se leen de disco\n")
+    print(f"{'dim':>5} | {'format':<22} | {'vector B':>8} | {'chunk B':>8} | {'vs base':>7} | {'recall@5':>8}")
+    print("-" * 72)
+
+    baseline = None
+
+    for dim in (3072, 1536, 768):
+        corpus_dim = truncate(corpus, dim) if dim < BASE_DIM else corpus
+        queries_dim = truncate(queries, dim) if dim < BASE_DIM else queries
+
+        variants = [
+            ("FLOAT_VECTOR", 4, lambda c: c),
+            ("FLOAT16_VECTOR", 2, lambda c: round_trip(c, "FLOAT16_VECTOR")),
+            ("BFLOAT16_VECTOR", 2, lambda c: round_trip(c, "BFLOAT16_VECTOR")),
+            ("FLOAT_VECTOR + SQ8", 1, sq8),
+        ]
+
+        for name, bytes_per_component, store in variants:
+            stored = store(corpus_dim)
+            # Las consultas de tipos de media precisión también viajan en ese formato
+            stored_queries = round_trip(queries_dim, name) if name in ("FLOAT16_VECTOR", "BFLOAT16_VECTOR") else queries_dim
+
+            vector_bytes = dim * bytes_per_component
+            chunk_bytes = vector_bytes + HNSW_GRAPH_BYTES + args.text_bytes
+            baseline = baseline or chunk_bytes
+
+            print(
+                f"{dim:>5} | {name:<22} | {vector_bytes:>8} | {chunk_bytes:>8} | {chunk_bytes / baseline:>7.1%} | "
+                f"{recall(expected, top_k(stored_queries, stored)):>8.3f}"
+            )
+
+        vector_bytes = dim // 8
+        chunk_bytes = vector_bytes + args.text_bytes
+        name = f"BINARY + rescore x{args.candidates}"
+
+        print(
+            f"{dim:>5} | {name:<22} | {vector_bytes:>8} | {chunk_bytes:>8} | {chunk_bytes / baseline:>7.1%} | "
+            f"{recall(expected, binary_rescore_top_k(queries_dim, corpus_dim, args.candidates)):>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch, MagicMock, AsyncMock
+import asyncio
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.answer_cache import SemanticAnswerCache, is_follow_up
+from app.utils.graphs.graph import RAGGraph
+
+ANSWER = {'generation': 'La prueba de trabajo evita el doble gasto.', 'context': "['chunk']", 'context_chunks': ['chunk']}
+
+
+class TestSemanticAnswerCache(unittest.TestCase):
+    """Tests unitarios para el cache semántico de respuestas"""
+
+    def setUp(self):
+        self.cache = SemanticAnswerCache(similarity_threshold=0.9, ttl_seconds=60, max_entries=3, max_per_notebook=2)
+
+    def test_lookup_by_similarity_and_pdf_set(self):
+        """Test: una pregunta casi igual sobre el mismo conjunto de pdf_ids es un hit; otro conjunto o pregunta es un miss"""
+        # Arrange
+        self.cache.put([1, 2], [1.0, 0.0, 0.0], ANSWER, self.cache.versions([1, 2]))
+
+        # Act
+        hit = self.cache.lookup([2, 1], [0.95, 0.1, 0.0])
+        other_notebook = self.cache.lookup([1, 2, 3], [1.0, 0.0, 0.0])
+        other_question = self.cache.lookup([1, 2], [0.0, 1.0, 0.0])
+
+        # Assert
+        self.assertEqual(hit['generation'], ANSWER['generation'])
+        self.assertGreater(hit['similarity'], 0.9)
+        self.assertIsNone(other_notebook)
+        self.assertIsNone(other_question)
+        self.assertEqual(self.cache.stats()['hit_rate'], round(1 / 3, 4))
+
+    def test_invalidation_and_limits(self):
+        """Test: cambiar una fuente descarta sus notebooks y las respuestas en vuelo; TTL y límites desalojan"""
+        # Arrange
+        stale_versions = self.cache.versions([1])
+        self.cache.put([1], [1.0, 0.0], ANSWER, stale_versions)
+        self.cache.put([2], [1.0, 0.0], ANSWER, self.cache.versions([2]))
+
+        # Act
+        self.cache.invalidate([1])
+        self.cache.put([1], [1.0, 0.0], ANSWER, stale_versions)  # Generada antes de re-subir la fuente
+
+        # Assert
+        self.assertIsNone(self.cache.lookup([1], [1.0, 0.0]))
+        self.assertIsNotNone(self.cache.lookup([2], [1.0, 0.0]))
+        self.assertEqual(self.cache.stats()['invalidations'], 1)
+
+        # Máximo por notebook y total: se desalojan las más viejas
+        for vector in ([0.0, 1.0], [1.0, 1.0]):
+            self.cache.put([2], vector, ANSWER, self.cache.versions([2]))
+        self.cache.put([3], [1.0, 0.0], ANSWER, self.cache.versions([3]))
+        self.cache.put([4], [1.0, 0.0], ANSWER, self.cache.versions([4]))
+        self.assertEqual(self.cache.stats()['entries'], 3)
+        self.assertIsNone(self.cache.lookup([2], [1.0, 0.0]))
+
+        # TTL vencido
+        with patch('app.utils.answer_cache.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(self.cache.lookup([4], [1.0, 0.0]))
+        self.assertEqual(self.cache.stats()['entries'], 2)
+
+    def test_zero_norm_and_expired_entries(self):
+        """Test: un vector de norma 0 no se compara ni se guarda; las vencidas se barren antes de desalojar vigentes"""
+        # Arrange
+        self.cache.put([1], [0.0, 0.0], ANSWER, self.cache.versions([1]))
+        self.cache.put([2], [1.0, 0.0], ANSWER, self.cache.versions([2]))
+        self.cache.put([3], [1.0, 0.0], ANSWER, self.cache.versions([3]))
+
+        self.cache.put([4], [1.0, 0.0], ANSWER, self.cache.versions([4]))
+
+        # Act - Con el cache lleno vencen las tres y entran dos nuevas
+        with patch('app.utils.answer_cache.time.monotonic', return_value=time.monotonic() + 120):
+            self.cache.put([5], [1.0, 0.0], ANSWER, self.cache.versions([5]))
+            self.cache.put([6], [1.0, 0.0], ANSWER, self.cache.versions([6]))
+
+            # Assert
+            self.assertIsNone(self.cache.lookup([2], [0.0, 0.0]))
+            self.assertIsNotNone(self.cache.lookup([5], [1.0, 0.0]))
+            self.assertIsNotNone(self.cache.lookup([6], [1.0, 0.0]))
+
+        self.assertEqual(self.cache.stats()['stores'], 5)
+        self.assertEqual(self.cache.stats()['entries'], 2)
+        self.assertEqual(self.cache.stats()['evictions'], 0)
+
+    @patch('app.utils.models.init_chat_model', return_value=MagicMock())
+    def test_graph_uses_cache(self, mock_init_chat_model):
+        """Test: la segunda pregunta igual no corre el grafo; las preguntas de seguimiento no usan el cache"""
+        # Arrange
+        embedding_generator = MagicMock(get_query_embedding=AsyncMock(return_value=[1.0, 0.0]))
+        graph = RAGGraph(embedding_generator, MagicMock(), MagicMock(), answer_cache=self.cache)
+        graph.app = MagicMock(ainvoke=AsyncMock(side_effect=lambda state, config=None: {**state, **ANSWER, 'is_valid': True}))
+        state = {'question': '¿Qué evita la prueba de trabajo?', 'pdf_ids': [1], 'chatHistory': []}
+
+        # Act
+        first = asyncio.run(graph.invoke(state))
+        second = asyncio.run(graph.invoke(state))
+        follow_up = asyncio.run(graph.invoke({**state, 'question': '¿y eso para qué sirve?', 'chatHistory': [{'question': 'q'}]}))
+
+        # Assert
+        self.assertNotIn('cached', first)
+        self.assertTrue(second['cached'])
+        self.assertEqual(second['generation'], ANSWER['generation'])
+        self.assertNotIn('cached', follow_up)
+        self.assertEqual(graph.app.ainvoke.await_count, 2)
+        self.assertEqual(self.cache.stats()['skipped_follow_ups'], 1)
+        self.assertTrue(is_follow_up('explicalo mejor'))
+        self.assertFalse(is_follow_up('¿Cuál es el mejor mecanismo de consenso?'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock, AsyncMock
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pymilvus.exceptions import ParamError
+
+from app.db.bulk_insert import BulkInserter, estimate_row_bytes, slice_by_bytes
+
+
+def _rows(n: int, dim: int = 8) -> list[dict]:
+    return [{'text_chunk': f'chunk {i}', 'metadata': {'page': i}, 'vector_chunk': [0.1] * dim, 'pdf_id': 1} for i in range(n)]
+
+
+class TestBulkInserter(unittest.TestCase):
+    """Tests unitarios para BulkInserter (inserts por batches acotados en bytes)"""
+
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.insert = AsyncMock(side_effect=lambda collection_name, data: {'insert_count': len(data)})
+        self.client.query = AsyncMock(return_value=[])
+        self.client.delete = AsyncMock(return_value={'delete_count': 0})
+
+    def test_slice_by_bytes(self):
+        """Test: los batches respetan el límite de bytes y de filas, y cubren todas las filas en orden"""
+        # Arrange
+        rows = _rows(10)
+        row_bytes = estimate_row_bytes(rows[0])
+
+        # Act
+        by_bytes = slice_by_bytes(rows, max_batch_bytes=row_bytes * 3, max_batch_rows=100)
+        by_rows = slice_by_bytes(rows, max_batch_bytes=10 ** 9, max_batch_rows=4)
+
+        # Assert
+        self.assertEqual([(start, end) for start, end, _ in by_bytes], [(0, 3), (3, 6), (6, 9), (9, 10)])
+        self.assertTrue(all(size <= row_bytes * 3 for _, _, size in by_bytes))
+        self.assertEqual([(start, end) for start, end, _ in by_rows], [(0, 4), (4, 8), (8, 10)])
+        self.assertEqual(slice_by_bytes([], max_batch_bytes=1, max_batch_rows=1), [])
+
+    def test_retries_only_failed_batch(self):
+        """Test: un batch que falla antes de escribir se reintenta sin volver a enviar los que ya se insertaron"""
+        # Arrange - El segundo batch falla una vez con la conexión rechazada
+        calls = []
+
+        async def insert(collection_name, data):
+            calls.append(data[0]['metadata']['page'])
+            if data[0]['metadata']['page'] == 2 and calls.count(2) == 1:
+                raise ConnectionRefusedError("unavailable")
+            return {'insert_count': len(data)}
+
+        self.client.insert = AsyncMock(side_effect=insert)
+        inserter = BulkInserter(self.client, max_batch_bytes=10 ** 9, max_batch_rows=2, max_in_flight=2, max_retries=2, base_delay=0)
+
+        # Act
+        report = asyncio.run(inserter.insert(collection_name='test_collection', data=_rows(6)))
+
+        # Assert
+        self.assertEqual(sorted(calls), [0, 2, 2, 4])
+        self.assertEqual(report['inserted'], 6)
+        self.assertEqual(report['failed'], [])
+        self.assertEqual([batch['attempts'] for batch in report['batches']], [1, 2, 1])
+        self.assertGreater(report['bytes'], 0)
+        self.client.delete.assert_not_awaited()
+
+    def _fake_store(self, commit_then_fail: int = 0, stored_rows: int = None):
+        """Colección falsa con auto_id: los primeros `commit_then_fail` inserts de la página 2 se guardan (solo
+        `stored_rows` filas si se indica) pero la respuesta no llega (timeout)."""
+        stored = []
+        failures = [commit_then_fail]
+
+        async def insert(collection_name, data):
+            rows = data if stored_rows is None or data[0]['metadata']['page'] != 2 or not failures[0] else data[:stored_rows]
+            ids = [len(stored) + i + 100 for i in range(len(rows))]
+            stored.extend({**row, 'id': id} for row, id in zip(rows, ids))
+            if data[0]['metadata']['page'] == 2 and failures[0]:
+                failures[0] -= 1
+                raise TimeoutError("deadline exceeded")
+            return {'insert_count': len(rows), 'ids': ids}
+
+        async def query(collection_name, filter, output_fields, limit, consistency_level):
+            return [{field: row[field] for field in output_fields} for row in stored]
+
+        async def delete(collection_name, ids):
+            stored[:] = [row for row in stored if row['id'] not in ids]
+            return {'delete_count': len(ids)}
+
+        self.client.insert = AsyncMock(side_effect=insert)
+        self.client.query = AsyncMock(side_effect=query)
+        self.client.delete = AsyncMock(side_effect=delete)
+        return stored
+
+    def test_ambiguous_failure_rolls_back_by_primary_key(self):
+        """Test: un timeout que sí guardó el batch se deshace por clave primaria antes de reintentar (sin tocar metadata)"""
+        # Arrange - Una fila de antes del mismo pdf_id, con otro texto
+        stored = self._fake_store(commit_then_fail=1)
+        stored.append({'id': 1, 'text_chunk': 'chunk previo', 'metadata': {'page': 9}, 'vector_chunk': [0.1] * 8, 'pdf_id': 1})
+        inserter = BulkInserter(self.client, max_batch_bytes=10 ** 9, max_batch_rows=2, max_in_flight=1, max_retries=2, base_delay=0)
+        rows = _rows(4)
+
+        # Act
+        report = asyncio.run(inserter.insert(collection_name='test_collection', data=rows))
+
+        # Assert - Cada fila quedó una sola vez, con su metadata original
+        self.assertEqual(sorted(row['metadata']['page'] for row in stored), [0, 1, 2, 3, 9])
+        self.assertTrue(all(set(row['metadata']) == {'page'} for row in stored))
+        self.assertEqual(self.client.delete.await_count, 1)
+        self.assertEqual(self.client.query.await_args.kwargs['filter'], 'pdf_id in [1]')
+        self.assertEqual(self.client.query.await_args.kwargs['consistency_level'], 'Strong')
+        self.assertEqual(report['inserted'], 4)
+        self.assertEqual(report['failed'], [])
+        self.assertEqual(rows[2]['metadata'], {'page': 2})
+
+    def test_ambiguous_failure_not_stored_is_retried(self):
+        """Test: si el intento ambiguo no llegó a guardarse, se reintenta sin borrar nada"""
+        # Arrange - El timeout llega antes de guardar: se simula vaciando lo guardado por el intento
+        stored = self._fake_store(commit_then_fail=1, stored_rows=0)
+        inserter = BulkInserter(self.client, max_batch_bytes=10 ** 9, max_batch_rows=2, max_retries=2, base_delay=0)
+
+        # Act
+        report = asyncio.run(inserter.insert(collection_name='test_collection', data=_rows(4)))
+
+        # Assert
+        self.assertEqual(sorted(row['metadata']['page'] for row in stored), [0, 1, 2, 3])
+        self.client.delete.assert_not_awaited()
+        self.assertEqual(report['failed'], [])
+
+    def test_ambiguous_failure_partially_stored_is_not_retried(self):
+        """Test: si no se puede determinar qué guardó el intento (guardado parcial o sin pdf_id), no se reintenta"""
+        # Arrange
+        stored = self._fake_store(commit_then_fail=1, stored_rows=1)
+        inserter = BulkInserter(self.client, max_batch_bytes=10 ** 9, max_batch_rows=2, max_retries=3, base_delay=0)
+
+        # Act
+        report = asyncio.run(inserter.insert(collection_name='test_collection', data=_rows(4)))
+        inserts = self.client.insert.await_count
+
+        self.client.insert = AsyncMock(side_effect=TimeoutError("deadline exceeded"))
+        self.client.query.reset_mock()
+        without_pdf_id = asyncio.run(inserter.insert(
+            collection_name='test_collection', data=[{'text_chunk': 'chunk', 'metadata': {'page': 2}, 'vector_chunk': [0.1] * 8}]
+        ))
+
+        # Assert
+        self.assertEqual(report['failed'], [{'start': 2, 'end': 4, 'error': 'deadline exceeded'}])
+        self.assertEqual(inserts, 2)
+        self.client.delete.assert_not_awaited()
+        self.assertEqual(len(stored), 3)
+        self.assertEqual(without_pdf_id['failed'], [{'start': 0, 'end': 1, 'error': 'deadline exceeded'}])
+        self.assertEqual(self.client.insert.await_count, 1)
+        self.client.query.assert_not_awaited()
+
+    def test_reports_failed_batches(self):
+        """Test: un error de datos no se reintenta y queda en el reporte con su rango"""
+        # Arrange
+        async def insert(collection_name, data):
+            if data[0]['metadata']['page'] == 0:
+                raise ParamError(message="invalid vector")
+            return {'insert_count': len(data)}
+
+        self.client.insert = AsyncMock(side_effect=insert)
+        inserter = BulkInserter(self.client, max_batch_bytes=10 ** 9, max_batch_rows=3, max_retries=3, base_delay=0)
+
+        # Act
+        report = asyncio.run(inserter.insert(collection_name='test_collection', data=_rows(6)))
+
+        # Assert
+        self.assertEqual(report['inserted'], 3)
+        self.assertEqual(len(report['failed']), 1)
+        self.assertEqual((report['failed'][0]['start'], report['failed'][0]['end']), (0, 3))
+        self.assertEqual(report['batches'][0]['attempts'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch, MagicMock, AsyncMock
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.chatHistory import ChatHistoryWindow, estimate_tokens
+from app.utils.graphs.graph import RAGGraph, history_update
+
+
+def conversation(turns: int, answer: str = 'Respuesta corta.') -> list[dict]:
+    """Mensajes alternados usuario/LLM con ids consecutivos, como los envía UsersAPI."""
+    messages = []
+    for turn in range(1, turns + 1):
+        messages.append({'id': 2 * turn - 1, 'text': f'Pregunta {turn}', 'is_user_message': True})
+        messages.append({'id': 2 * turn, 'text': answer, 'is_user_message': False})
+    return messages
+
+
+class TestChatHistoryWindow(unittest.TestCase):
+    """Tests unitarios para el historial acotado con resumen incremental"""
+
+    def setUp(self):
+        self.summarizer = MagicMock(ainvoke=AsyncMock(return_value='Resumen nuevo'))
+        self.window = ChatHistoryWindow(self.summarizer, max_turns=4, token_budget=200)
+
+    def test_window_within_turns_and_budget(self):
+        """Test: si todo entra no se resume; si no, quedan los turnos que entran en la mitad del presupuesto"""
+        # Act
+        short = asyncio.run(self.window.prepare(conversation(4), 'Resumen previo'))
+        long = asyncio.run(self.window.prepare(conversation(5), 'Resumen previo'))
+        verbose = asyncio.run(self.window.prepare(conversation(3, answer='palabra ' * 60), ''))
+
+        # Assert
+        self.assertEqual(len(short['messages']), 8)
+        self.assertEqual(short['summary'], 'Resumen previo')
+        self.assertIsNone(short['summarized_until'])
+
+        self.assertEqual([m.content for m in long['messages'][::2]], ['Pregunta 4', 'Pregunta 5'])
+        self.assertEqual(long['summary'], 'Resumen nuevo')
+        self.assertEqual(long['summarized_until'], 6)  # Respuesta del turno 3
+
+        # Presupuesto de tokens: cada turno ocupa ~125 tokens (más que la mitad del presupuesto), queda solo el último
+        self.assertGreater(estimate_tokens('palabra ' * 60), 100)
+        self.assertEqual(len(verbose['messages']), 2)
+        self.assertEqual(verbose['summarized_until'], 4)
+
+    def test_summary_is_incremental(self):
+        """Test: solo los turnos nuevos se agregan al resumen previo; si el resumen falla se conserva el anterior"""
+        # Act
+        asyncio.run(self.window.prepare(conversation(5), 'Resumen previo'))
+        inputs = self.summarizer.ainvoke.await_args.args[0]
+
+        self.summarizer.ainvoke.side_effect = RuntimeError('quota')
+        failed = asyncio.run(self.window.prepare(conversation(5), 'Resumen previo'))
+
+        # Assert
+        self.assertEqual(inputs['summary'], 'Resumen previo')
+        self.assertIn('Usuario: Pregunta 3', inputs['conversation'])
+        self.assertNotIn('Pregunta 4', inputs['conversation'])
+        self.assertEqual(failed['summary'], 'Resumen previo')
+        self.assertIsNone(failed['summarized_until'])
+        self.assertEqual(len(failed['messages']), 4)
+        self.assertEqual(self.window.stats()['failed_folds'], 1)
+
+    @patch('app.utils.models.init_chat_model', return_value=MagicMock())
+    def test_graph_uses_window_and_returns_summary(self, mock_init_chat_model):
+        """Test: el prompt del generador recibe la ventana y el resumen; la respuesta trae el resumen para guardarlo"""
+        # Arrange
+        graph = RAGGraph(MagicMock(), MagicMock(), MagicMock())
+        graph.history_window = self.window
+        state = {'question': 'Pregunta 6', 'context': "['chunk']", 'chatHistory': conversation(5), 'chatSummary': 'Resumen previo'}
+
+        async def run():
+            return await graph.resolve_history(state, graph.prepare_history(state))
+
+        # Act
+        prepared = asyncio.run(run())
+        inputs = graph._generator_inputs(prepared)
+
+        # Assert
+        self.assertEqual(inputs['summary'], 'Resumen nuevo')
+        self.assertEqual(len(inputs['history']), 4)
+        self.assertEqual(history_update(prepared), {'chat_summary': 'Resumen nuevo', 'summarized_until': 6})
+        self.assertEqual(history_update({**state, 'summarized_until': None}), {'chat_summary': None, 'summarized_until': None})
+
+    @patch('app.utils.models.init_chat_model', return_value=MagicMock())
+    def test_summary_runs_concurrently_with_retrieval(self, mock_init_chat_model):
+        """Test: el resumen del historial no demora el retrieve; se espera recién al armar el prompt del generador"""
+        # Arrange
+        events = []
+
+        async def summarize(inputs):
+            events.append('summary-start')
+            await asyncio.sleep(0.02)
+            events.append('summary-end')
+            return 'Resumen nuevo'
+
+        async def retrieve(state):
+            events.append('retrieve')
+            return {**state, 'context': "['chunk']"}
+
+        async def astream(inputs):
+            events.append('generate')
+            yield 'Respuesta'
+
+        self.summarizer.ainvoke = AsyncMock(side_effect=summarize)
+        graph = RAGGraph(MagicMock(), MagicMock(), MagicMock())
+        graph.history_window = self.window
+        graph.retrieve_context = AsyncMock(side_effect=retrieve)
+        graph.generator_chain = MagicMock(astream=astream)
+        graph.judge_answer = AsyncMock(side_effect=lambda state: {**state, 'is_valid': True})
+        state = {
+            'question': 'Pregunta 6', 'query': 'Pregunta 6', 'context': '', 'pdf_ids': [1], 'generation': '', 'is_valid': False,
+            'refinement_attempts': 0, 'retrieval_attempts': 0, 'chatHistory': conversation(5), 'chatSummary': 'Resumen previo'
+        }
+
+        async def collect():
+            return [event async for event in graph.stream(state)]
+
+        # Act
+        stream_events = asyncio.run(collect())
+
+        # Assert
+        self.assertLess(events.index('retrieve'), events.index('summary-end'))
+        self.assertLess(events.index('summary-end'), events.index('generate'))
+        self.assertEqual(stream_events[-1][1]['summarized_until'], 6)
+
+    @patch('app.utils.models.init_chat_model', return_value=MagicMock())
+    def test_summary_is_cancelled_when_nobody_awaits_it(self, mock_init_chat_model):
+        """Test: si el retrieve falla (grafo o streaming) o el cliente se desconecta, el resumen en curso se cancela"""
+        # Arrange
+        async def summarize(inputs):
+            await asyncio.sleep(10)
+
+        self.summarizer.ainvoke = AsyncMock(side_effect=summarize)
+        graph = RAGGraph(MagicMock(), MagicMock(), MagicMock())
+        graph.history_window = self.window
+        tasks = []
+        prepare_history = graph.prepare_history
+        graph.prepare_history = lambda state: tasks.append(prepare_history(state)) or tasks[-1]
+        graph.retrieve_context = AsyncMock(side_effect=RuntimeError('milvus down'))
+        state = {
+            'question': 'Pregunta 6', 'query': 'Pregunta 6', 'context': '', 'pdf_ids': [1], 'generation': '', 'is_valid': False,
+            'refinement_attempts': 0, 'retrieval_attempts': 0, 'chatHistory': conversation(5), 'chatSummary': 'Resumen previo'
+        }
+
+        async def failing_stream():
+            return [event async for event in graph.stream(state)]
+
+        async def disconnect():
+            # El cliente SSE se va mientras se busca el contexto: se cancela la task que consume el stream
+            async def slow_retrieve(state):
+                await asyncio.sleep(10)
+
+            graph.retrieve_context = AsyncMock(side_effect=slow_retrieve)
+            consumer = asyncio.create_task(failing_stream())
+            await asyncio.sleep(0.01)
+            consumer.cancel()
+            await asyncio.gather(consumer, return_exceptions=True)
+
+        async def scenarios():
+            # Se mide dentro del mismo event loop: al cerrarse, asyncio.run cancelaría cualquier task suelta
+            states = []
+            with self.assertRaises(RuntimeError):
+                await graph.invoke(state)
+            await asyncio.sleep(0.01)
+            states.append(tasks[-1].cancelled())
+
+            with self.assertRaises(RuntimeError):
+                await failing_stream()
+            await asyncio.sleep(0.01)
+            states.append(tasks[-1].cancelled())
+
+            await disconnect()
+            await asyncio.sleep(0.01)
+            states.append(tasks[-1].cancelled())
+            return states
+
+        # Act
+        states = asyncio.run(scenarios())
+
+        # Assert - Error en el grafo (invoke), error en el streaming y cliente desconectado
+        self.assertEqual(states, [True, True, True])
+        self.assertEqual(len(tasks), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock, AsyncMock
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.content_store import ContentStore, hash_content
+
+
+class TestContentStore(unittest.TestCase):
+    """Tests unitarios para ContentStore (mapeo source -> contenido con refcount)"""
+
+    def setUp(self):
+        self.client_milvus = MagicMock()
+        self.client_milvus.client = MagicMock()
+        self.client = self.client_milvus.client
+        self.client.delete = AsyncMock(return_value={'delete_count': 1})
+        self.client.upsert = AsyncMock(return_value={'upsert_count': 1})
+        self.store = ContentStore(self.client_milvus)
+
+    def test_hash_content(self):
+        """Test: el hash depende solo de los bytes"""
+        self.assertEqual(hash_content(b"%PDF-1.4 a"), hash_content(b"%PDF-1.4 a"))
+        self.assertNotEqual(hash_content(b"%PDF-1.4 a"), hash_content(b"%PDF-1.4 b"))
+        self.assertEqual(len(hash_content(b"")), 64)
+
+    def test_resolve_with_legacy_sources(self):
+        """Test: resolve traduce los sources mapeados y deja los legacy apuntando a sí mismos"""
+        # Arrange - El source 2 reutiliza el contenido del 1; el 3 es anterior al mapeo
+        self.client.query = AsyncMock(return_value=[{'source_id': 1, 'pdf_id': 1}, {'source_id': 2, 'pdf_id': 1}])
+
+        # Act
+        result = asyncio.run(self.store.resolve([1, 2, 3]))
+
+        # Assert
+        self.assertEqual(result, {1: 1, 2: 1, 3: 3})
+
+    def test_release_only_purges_unreferenced_content(self):
+        """Test: release solo devuelve los pdf_ids que quedaron sin referencias, con el lock del contenido y lectura Strong"""
+        # Arrange - Se liberan los sources 2 y 3: el 2 comparte contenido con el 1 (que sigue vivo)
+        locked = []
+
+        async def query(collection_name, filter, output_fields, **kwargs):
+            if filter.startswith("source_id in"):
+                return [{'source_id': 2, 'content_hash': 'x', 'pdf_id': 1}, {'source_id': 3, 'content_hash': 'y', 'pdf_id': 3}]
+            locked.append((sorted(self.store._locks), kwargs.get('consistency_level')))
+            if filter == "pdf_id == 1":
+                return [{'count(*)': 1}]
+            return [{'count(*)': 0}]
+
+        self.client.query = AsyncMock(side_effect=query)
+
+        # Act
+        orphaned = asyncio.run(self.store.release([2, 3]))
+
+        # Assert - Se borran las filas de mapeo y solo se purga el contenido del source 3
+        self.client.delete.assert_awaited_once_with(collection_name='sources_collection', filter="source_id in [2, 3]")
+        self.assertEqual(orphaned, [3])
+        self.assertEqual(locked, [(['x', 'y'], 'Strong')] * 2)
+        self.assertEqual(self.store._locks, {})
+
+    def test_lock_serializes_same_content(self):
+        """Test: dos ingestas del mismo contenido no se solapan y el lock se libera al terminar"""
+        events = []
+
+        async def worker(name):
+            async with self.store.lock("abc"):
+                events.append(f"start-{name}")
+                await asyncio.sleep(0.01)
+                events.append(f"end-{name}")
+
+        async def run():
+            await asyncio.gather(worker("a"), worker("b"))
+
+        asyncio.run(run())
+
+        self.assertEqual(events, ["start-a", "end-a", "start-b", "end-b"])
+        self.assertEqual(self.store._locks, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import unittest
+import sys
+import os
+import tempfile
+import asyncio
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.embedding_cache import EmbeddingCache, MemoryCache
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    """Tests unitarios para EmbeddingCache"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "embeddings.sqlite3")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _key(self, text, task_type="RETRIEVAL_DOCUMENT", dim=4):
+        return EmbeddingCache.make_key("models/gemini-embedding-001", task_type, dim, text)
+
+    def test_put_and_get(self):
+        """Test: los vectores guardados se recuperan como float32 y se cuentan hits/misses"""
+        # Arrange
+        cache = EmbeddingCache(self.path, max_bytes=1024 * 1024)
+        cache.put_many({self._key("hola"): [0.5, 0.25, -1.0, 0.125]})
+
+        # Act
+        found = cache.get_many([self._key("hola"), self._key("chau")])
+
+        # Assert
+        self.assertEqual(found, {self._key("hola"): [0.5, 0.25, -1.0, 0.125]})
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entries"], 1)
+        self.assertEqual(stats["bytes"], 16)  # 4 dimensiones * 4 bytes
+        cache.close()
+
+    def test_key_includes_model_parameters(self):
+        """Test: el mismo texto con otro task_type o dimensión es otra entrada"""
+        self.assertNotEqual(self._key("hola"), self._key("hola", task_type="SEMANTIC_SIMILARITY"))
+        self.assertNotEqual(self._key("hola"), self._key("hola", dim=768))
+
+    def test_persistence(self):
+        """Test: el cache sobrevive a un reinicio del proceso"""
+        cache = EmbeddingCache(self.path, max_bytes=1024 * 1024)
+        cache.put_many({self._key("persistente"): [1.0, 2.0, 3.0, 4.0]})
+        cache.close()
+
+        reopened = EmbeddingCache(self.path, max_bytes=1024 * 1024)
+
+        self.assertEqual(reopened.get_many([self._key("persistente")]), {self._key("persistente"): [1.0, 2.0, 3.0, 4.0]})
+        self.assertEqual(reopened.stats()["entries"], 1)
+        reopened.close()
+
+    def test_eviction_by_size(self):
+        """Test: al superar el tamaño máximo se desalojan las entradas menos usadas"""
+        # Arrange - Cada vector ocupa 16 bytes; el límite permite 4
+        cache = EmbeddingCache(self.path, max_bytes=64)
+
+        for i in range(4):
+            cache.put_many({self._key(f"texto {i}"): [float(i)] * 4})
+
+        cache.get_many([self._key("texto 0")])  # Se usa recientemente: no debe desalojarse
+
+        # Act
+        cache.put_many({self._key("texto 4"): [4.0] * 4})
+
+        # Assert
+        stats = cache.stats()
+        self.assertLessEqual(stats["bytes"], 64)
+        self.assertGreater(stats["evictions"], 0)
+        self.assertIn(self._key("texto 0"), cache.get_many([self._key("texto 0")]))
+        self.assertIn(self._key("texto 4"), cache.get_many([self._key("texto 4")]))
+        self.assertEqual(cache.get_many([self._key("texto 1")]), {})
+        cache.close()
+
+
+
+class TestMemoryCache(unittest.TestCase):
+    """Tests unitarios para MemoryCache"""
+
+    def test_lru_ttl_and_pinned(self):
+        """Test: las entradas vencen por TTL, se desaloja la menos usada y las fijadas no vencen"""
+        # Arrange
+        cache = MemoryCache(max_entries=2, ttl_seconds=10)
+
+        with patch('app.utils.embedding_cache.time.monotonic', return_value=100.0):
+            cache.put(b"constante", [0.0], pinned=True)
+            cache.put(b"a", [1.0])
+            cache.put(b"b", [2.0])
+            cache.get(b"a")  # Se usa recientemente: no debe desalojarse
+
+            # Act
+            cache.put(b"c", [3.0])
+
+            # Assert - LRU
+            self.assertEqual(cache.get(b"a"), [1.0])
+            self.assertIsNone(cache.get(b"b"))
+            self.assertEqual(cache.stats()["evictions"], 1)
+
+        with patch('app.utils.embedding_cache.time.monotonic', return_value=111.0):
+            # Assert - TTL vencido, la fijada sigue
+            self.assertIsNone(cache.get(b"a"))
+            self.assertEqual(cache.get(b"constante"), [0.0])
+
+    def test_concurrent_requests_are_coalesced(self):
+        """Test: consultas iguales en vuelo comparten una sola llamada al proveedor"""
+        # Arrange
+        cache = MemoryCache(max_entries=10, ttl_seconds=60)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return [0.5, 0.5]
+
+        async def run():
+            results = await asyncio.gather(*(cache.get_or_compute(b"pregunta", compute) for _ in range(5)))
+            results.append(await cache.get_or_compute(b"pregunta", compute))
+            return results
+
+        # Act
+        results = asyncio.run(run())
+
+        # Assert
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [[0.5, 0.5]] * 6)
+        stats = cache.stats()
+        self.assertEqual((stats["misses"], stats["coalesced"], stats["hits"]), (1, 4, 1))
+
+    def test_cancelled_leader_does_not_fail_waiters(self):
+        """Test: si se cancela la consulta que inició el cálculo, las que esperaban el mismo valor lo reciben igual"""
+        # Arrange
+        cache = MemoryCache(max_entries=10, ttl_seconds=60)
+
+        async def compute():
+            await asyncio.sleep(0.02)
+            return [0.5, 0.5]
+
+        async def run():
+            leader = asyncio.create_task(cache.get_or_compute(b"pregunta", compute))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(cache.get_or_compute(b"pregunta", compute))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await asyncio.gather(leader, waiter, return_exceptions=True)
+
+        # Act
+        leader_result, waiter_result = asyncio.run(run())
+
+        # Assert
+        self.assertIsInstance(leader_result, asyncio.CancelledError)
+        self.assertEqual(waiter_result, [0.5, 0.5])
+        self.assertEqual(cache.get(b"pregunta"), [0.5, 0.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,10 +3,12 @@ import sys
 import os
 from unittest.mock import patch, MagicMock, AsyncMock
 import asyncio
+import tempfile
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.utils.embbedings import EmbeddingGenerator
+from app.utils.embbedings import EmbeddingGenerator, EmbeddingBatchScheduler, TokenBucket, _is_retryable
+from app.utils.embedding_cache import EmbeddingCache
 
 
 class TestEmbeddingGenerator(unittest.TestCase):
@@ -42,6 +44,32 @@ class TestEmbeddingGenerator(unittest.TestCase):
         self.assertEqual(len(result[1]), 3072)
         self.assertEqual(result, expected_embeddings)
     
+    @patch('app.utils.embbedings.GoogleGenerativeAIEmbeddings')
+    def test_get_document_embedding_with_cache(self, mock_embeddings):
+        """Test: con cache solo los textos no cacheados (y sin repetir) van al proveedor"""
+        # Arrange
+        mock_instance = MagicMock()
+        mock_instance.aembed_documents = AsyncMock(side_effect=lambda texts, **kwargs: [[float(len(t))] * 3072 for t in texts])
+        mock_embeddings.return_value = mock_instance
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = EmbeddingCache(os.path.join(tmp_dir, "embeddings.sqlite3"), max_bytes=10 * 1024 * 1024)
+            generator = EmbeddingGenerator(cache=cache)
+
+            # Act - Primera ingesta: todo es miss (el texto repetido se embebe una sola vez)
+            first = asyncio.run(generator.get_document_embedding(["uno", "dos", "uno"]))
+
+            # Act - Re-ingesta con un chunk nuevo: solo ese va al proveedor
+            second = asyncio.run(generator.get_document_embedding(["dos", "tres!", "uno"]))
+            cache.close()
+
+        # Assert
+        self.assertEqual(mock_instance.aembed_documents.await_args_list[0].kwargs['texts'], ["uno", "dos"])
+        self.assertEqual(mock_instance.aembed_documents.await_args_list[1].kwargs['texts'], ["tres!"])
+        self.assertEqual([v[0] for v in first], [3.0, 3.0, 3.0])
+        self.assertEqual([v[0] for v in second], [3.0, 5.0, 3.0])
+        self.assertEqual(len(second[1]), 3072)
+
     def test_get_query_embedding(self):
         """Test: get_query_embedding genera embedding correcto para consultas"""
         # Arrange
@@ -100,5 +128,125 @@ class TestEmbeddingGenerator(unittest.TestCase):
         self.assertEqual(empty_result, [])
 
 
+class TestEmbeddingBatchScheduler(unittest.TestCase):
+    """Tests unitarios para EmbeddingBatchScheduler"""
+
+    def test_make_batches_respects_limits(self):
+        """Test: los batches respetan el máximo de textos y de tokens estimados por request"""
+        # Arrange - 40 caracteres ~ 11 tokens por texto
+        scheduler = EmbeddingBatchScheduler(max_batch_size=3, max_batch_tokens=25)
+        texts = ["x" * 40] * 5
+
+        # Act
+        batches = scheduler.make_batches(texts)
+
+        # Assert - Máximo 2 textos por batch por el límite de tokens, cubriendo todos en orden
+        self.assertEqual(batches, [(0, 2), (2, 4), (4, 5)])
+
+    def test_run_preserves_order_with_bounded_concurrency(self):
+        """Test: los vectores vuelven en el orden de los textos y nunca hay más batches en vuelo que el límite"""
+        # Arrange
+        scheduler = EmbeddingBatchScheduler(max_batch_size=2, max_concurrency=2)
+        texts = [f"Chunk {i}" for i in range(9)]
+        in_flight = 0
+        max_in_flight = 0
+
+        async def embed_fn(batch):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            # Los batches más tempranos tardan más, para que terminen desordenados
+            await asyncio.sleep(0.01 * (10 - int(batch[0].split()[1])) / 10)
+            in_flight -= 1
+            return [[float(t.split()[1])] for t in batch]
+
+        # Act
+        result = asyncio.run(scheduler.run(texts, embed_fn))
+
+        # Assert
+        self.assertEqual(result, [[float(i)] for i in range(9)])
+        self.assertLessEqual(max_in_flight, 2)
+        self.assertEqual(scheduler.stats()['batches'], 5)
+
+    def test_run_retries_throttled_batches(self):
+        """Test: un batch que recibe 429 o 503 se reintenta, solo los 429 cuentan como throttling y los errores no recuperables se propagan"""
+        # Arrange
+        scheduler = EmbeddingBatchScheduler(max_retries=3, base_delay=0.001, max_delay=0.01)
+        calls = 0
+
+        async def embed_fn(batch):
+            nonlocal calls
+            calls += 1
+            if calls <= 2:
+                raise Exception("Error embedding content (429): RESOURCE_EXHAUSTED")
+            if calls == 3:
+                raise Exception("Error embedding content (503): UNAVAILABLE")
+            return [[1.0] for _ in batch]
+
+        async def failing_fn(batch):
+            raise ValueError("Invalid argument")
+
+        # Act
+        result = asyncio.run(scheduler.run(["a", "b"], embed_fn))
+
+        # Assert
+        self.assertEqual(result, [[1.0], [1.0]])
+        self.assertEqual(calls, 4)
+        self.assertEqual(scheduler.stats()['retries'], 3)
+        self.assertEqual(scheduler.stats()['throttled'], 2)
+
+        with self.assertRaises(ValueError):
+            asyncio.run(EmbeddingBatchScheduler(max_retries=3).run(["a"], failing_fn))
+
+    def test_retryable_errors_match_status_not_substrings(self):
+        """Test: solo se reintentan los códigos/status de throttling, no errores que mencionan 429 o 503 en el texto"""
+        # Arrange
+        class ClientError(Exception):
+            def __init__(self, code, status):
+                super().__init__(f"{code} {status}. {{}}")
+                self.code, self.status = code, status
+
+        wrapped = RuntimeError("Error embedding content")
+        wrapped.__cause__ = ClientError(429, "RESOURCE_EXHAUSTED")
+
+        # Act / Assert
+        self.assertTrue(_is_retryable(wrapped))
+        self.assertTrue(_is_retryable(ClientError(503, "UNAVAILABLE")))
+        self.assertTrue(_is_retryable(Exception("Error embedding content: 503 UNAVAILABLE. {}")))
+        self.assertFalse(_is_retryable(ClientError(400, "INVALID_ARGUMENT")))
+        self.assertFalse(_is_retryable(ValueError("Invalid argument: text 1429 exceeds 2048 tokens")))
+        self.assertFalse(_is_retryable(ValueError("Model 'embedding-503' not found")))
+
+    def test_token_bucket_without_rate_does_not_limit(self):
+        """Test: un rate de 0 (sin límite) no bloquea ni divide por cero"""
+        # Arrange
+        bucket = TokenBucket(rate_per_minute=0)
+
+        async def acquire_many():
+            for _ in range(100):
+                await bucket.acquire(1000)
+
+        # Act / Assert
+        asyncio.run(asyncio.wait_for(acquire_many(), timeout=1))
+
+    def test_token_bucket_waits_when_empty(self):
+        """Test: el token bucket bloquea hasta que se recargan las unidades pedidas"""
+        # Arrange - 600 por minuto = 10 por segundo, capacidad 1
+        bucket = TokenBucket(rate_per_minute=600, capacity=1)
+
+        async def acquire_twice():
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            await bucket.acquire(1)
+            await bucket.acquire(1)
+            return loop.time() - start
+
+        # Act
+        elapsed = asyncio.run(acquire_twice())
+
+        # Assert - La segunda unidad tarda ~0.1s en recargarse
+        self.assertGreaterEqual(elapsed, 0.08)
+
+
 if __name__ == '__main__':
     unittest.main()
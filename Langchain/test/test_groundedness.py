@@ -0,0 +1,91 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch, MagicMock, AsyncMock
+import asyncio
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.groundedness import GroundednessChecker, split_sentences, lexical_overlap, semantic_support
+from app.utils.graphs.graph import RAGGraph
+
+CONTEXT = [
+    'La prueba de trabajo consiste en buscar un valor que al aplicarle un hash como SHA-256 comience con ceros.',
+    'Los nodos siempre consideran la cadena más larga como la correcta y trabajan para extenderla.',
+]
+
+
+def fake_embeddings(text, use_cache=True):
+    """Vector por tema: los textos que hablan de la prueba de trabajo apuntan al mismo eje."""
+    vectors = []
+    for t in text:
+        if 'prueba de trabajo' in t.lower() or 'hash' in t.lower():
+            vectors.append([1.0, 0.05, 0.0])
+        elif 'cadena' in t.lower():
+            vectors.append([0.0, 1.0, 0.05])
+        else:
+            vectors.append([0.0, 0.05, 1.0])
+    return vectors
+
+
+class TestGroundedness(unittest.TestCase):
+    """Tests unitarios para el pre-check local de groundedness"""
+
+    def setUp(self):
+        self.embedding_generator = MagicMock()
+        self.embedding_generator.get_document_embedding = AsyncMock(side_effect=fake_embeddings)
+        self.checker = GroundednessChecker(self.embedding_generator, pass_threshold=0.78, fail_threshold=0.5, semantic_weight=0.7)
+
+    def test_scoring_helpers(self):
+        """Test: oraciones sin markdown ni encabezados, overlap léxico y similitud con el mejor chunk"""
+        # Act
+        sentences = split_sentences('**Respuesta**\nLa prueba de trabajo usa SHA-256. Sí.\n- Los nodos extienden la cadena más larga.')
+        overlaps = lexical_overlap(['La prueba de trabajo usa SHA-256', 'Ethereum usa prueba de participación'], ' '.join(CONTEXT))
+        support = semantic_support(np.array([[1.0, 0.0], [0.0, 2.0]]), np.array([[1.0, 0.0], [1.0, 1.0]]))
+
+        # Assert
+        self.assertEqual(sentences, ['La prueba de trabajo usa SHA-256.', 'Los nodos extienden la cadena más larga.'])
+        self.assertEqual(overlaps[0], 1.0)
+        self.assertLess(overlaps[1], 0.5)
+        np.testing.assert_allclose(support, [1.0, np.sqrt(0.5)], rtol=1e-6)
+
+    def test_local_decisions(self):
+        """Test: respuestas claramente sustentadas o no se deciden localmente; la negativa se escala"""
+        # Act
+        grounded = asyncio.run(self.checker.check('La prueba de trabajo consiste en buscar un hash SHA-256 que comience con ceros.', CONTEXT))
+        ungrounded = asyncio.run(self.checker.check('Ethereum reemplazó la minería por staking en 2022.', CONTEXT))
+        refusal = asyncio.run(self.checker.check('No puedo responder eso con la información provista.', CONTEXT))
+
+        # Assert
+        self.assertEqual(grounded['decision'], 'pass')
+        self.assertEqual(ungrounded['decision'], 'fail')
+        self.assertEqual(refusal['decision'], 'escalate')
+        self.assertEqual(self.checker.stats()['remote_judge_skipped_rate'], round(2 / 3, 4))
+        # Las oraciones de la respuesta no pasan por el cache persistente
+        self.assertFalse(self.embedding_generator.get_document_embedding.await_args_list[1].kwargs['use_cache'])
+
+    @patch('app.utils.models.init_chat_model')
+    def test_judge_skips_remote_model(self, mock_init_chat_model):
+        """Test: el LLM judge solo se llama cuando el pre-check escala"""
+        # Arrange
+        judge_model = MagicMock(ainvoke=AsyncMock(side_effect=RuntimeError('judge')))
+        mock_init_chat_model.return_value = judge_model
+        graph = RAGGraph(self.embedding_generator, MagicMock(), MagicMock())
+        graph.groundedness = self.checker
+        state = {'question': '¿Qué es la prueba de trabajo?', 'context': str(CONTEXT), 'context_chunks': CONTEXT}
+
+        # Act
+        grounded = asyncio.run(graph.judge_answer({**state, 'generation': 'La prueba de trabajo consiste en buscar un hash SHA-256 que comience con ceros.'}))
+        ungrounded = asyncio.run(graph.judge_answer({**state, 'generation': 'Ethereum reemplazó la minería por staking en 2022.'}))
+        asyncio.run(graph.judge_answer({**state, 'generation': 'No puedo responder eso con la información provista.'}))
+
+        # Assert
+        self.assertTrue(grounded['is_valid'])
+        self.assertFalse(ungrounded['is_valid'])
+        judge_model.ainvoke.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch, MagicMock, AsyncMock
+import asyncio
+
+from pymilvus import RRFRanker, WeightedRanker
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.hybrid import hybrid_requests, make_ranker
+from app.db.milvus import Async_Milvus_Client
+
+
+class TestHybridSearch(unittest.TestCase):
+    """Tests unitarios para la búsqueda híbrida densa + BM25"""
+
+    def test_requests_and_rankers(self):
+        """Test: una búsqueda densa y una BM25 con el mismo filtro, fusionadas con RRF o pesos"""
+        # Act
+        dense, sparse = hybrid_requests(
+            dense_vector=[0.1] * 8,
+            query_text='artículo 14 bis',
+            filter='pdf_id in [1, 2]',
+            candidates=20,
+            dense_search_params={'metric_type': 'COSINE', 'params': {'ef': 64}}
+        )
+
+        # Assert
+        self.assertEqual((dense.anns_field, sparse.anns_field), ('vector_chunk', 'sparse_vector'))
+        self.assertEqual(sparse.data, ['artículo 14 bis'])
+        self.assertEqual(sparse.param, {'metric_type': 'BM25'})
+        self.assertEqual((dense.expr, sparse.expr), ('pdf_id in [1, 2]', 'pdf_id in [1, 2]'))
+        self.assertEqual((dense.limit, sparse.limit), (20, 20))
+        self.assertIsInstance(make_ranker('rrf'), RRFRanker)
+        self.assertIsInstance(make_ranker('weighted', dense_weight=0.7), WeightedRanker)
+        with self.assertRaises(ValueError):
+            make_ranker('max')
+
+    def test_get_document_uses_hybrid_search(self):
+        """Test: en modo hybrid get_document hace un solo hybrid_search cuando recibe el texto de la consulta"""
+        # Arrange
+        mock_client = MagicMock()
+        with patch('app.db.milvus.AsyncMilvusClient', return_value=mock_client):
+            client = Async_Milvus_Client()
+        client.binary_rescore = False
+        client.hybrid = True
+        client.hybrid_ranker = make_ranker('rrf')
+        client._index_profiles['test_collection'] = 'hnsw'
+
+        hits = [{'id': 1, 'distance': 0.03, 'entity': {'text_chunk': 'Art. 14 bis', 'pdf_id': 1}}]
+        mock_client.hybrid_search = AsyncMock(return_value=[hits])
+        mock_client.search = AsyncMock(return_value=[[]])
+
+        # Act
+        result = asyncio.run(client.get_document(
+            query_vector=[0.1] * 8, collection_name='test_collection', ids=[1], limit=5, query_text='artículo 14 bis'
+        ))
+        asyncio.run(client.get_document(query_vector=[0.1] * 8, collection_name='test_collection', ids=[1], limit=5))
+
+        # Assert - Híbrida con texto, densa sin texto
+        kwargs = mock_client.hybrid_search.await_args.kwargs
+        self.assertEqual(result, hits)
+        self.assertEqual(kwargs['limit'], 5)
+        self.assertEqual(len(kwargs['reqs']), 2)
+        self.assertEqual(kwargs['reqs'][1].expr, 'pdf_id in [1]')
+        mock_client.hybrid_search.assert_awaited_once()
+        mock_client.search.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
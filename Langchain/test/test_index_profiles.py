@@ -0,0 +1,37 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.index_profiles import INDEX_PROFILES, find_profile, search_params
+
+
+class TestIndexProfiles(unittest.TestCase):
+    """Tests unitarios para los perfiles de índice de vector_chunk"""
+
+    def test_search_params_respect_limit(self):
+        """Test: ef / search_list nunca quedan por debajo de la cantidad de resultados pedida"""
+        self.assertEqual(search_params("hnsw", limit=5), {"metric_type": "COSINE", "params": {"ef": 64}})
+        self.assertEqual(search_params("hnsw_fast", limit=100)["params"]["ef"], 100)
+        self.assertEqual(search_params("diskann", limit=200)["params"]["search_list"], 200)
+        self.assertEqual(search_params("ivf_sq8", limit=50)["params"], {"nprobe": 16})
+
+        # Los parámetros del perfil no se modifican
+        self.assertEqual(INDEX_PROFILES["hnsw_fast"]["search_params"]["ef"], 32)
+
+    def test_find_profile_from_describe_index(self):
+        """Test: un índice existente se asocia a su perfil (describe_index devuelve los parámetros como texto)"""
+        self.assertEqual(find_profile("HNSW", {"M": "16", "efConstruction": "256", "metric_type": "COSINE"}), "hnsw")
+        self.assertEqual(find_profile("HNSW", {"M": "32", "efConstruction": "400"}), "hnsw_accurate")
+        self.assertEqual(find_profile("IVF_SQ8", {"nlist": "1024"}), "ivf_sq8")
+        self.assertIsNone(find_profile("HNSW", {"M": "48", "efConstruction": "500"}))
+
+    def test_unknown_profile(self):
+        """Test: un perfil desconocido se rechaza"""
+        with self.assertRaises(ValueError):
+            search_params("flat", limit=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,326 @@
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock, AsyncMock
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.ingestion import IngestionPipeline
+from app.utils.splitter import Splitter
+
+FIXTURE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app', 'fixture', 'bitcoin_es.pdf'))
+
+
+class TestIngestionPipeline(unittest.TestCase):
+    """Tests unitarios para IngestionPipeline"""
+
+    def setUp(self):
+        self.splitter = MagicMock()
+        self.embedding_generator = MagicMock()
+        self.client_milvus = MagicMock()
+
+        self.embedding_generator.get_document_embedding = AsyncMock(
+            side_effect=lambda text: [[0.1] * 3072 for _ in text]
+        )
+        self.embedding_generator.format_database = MagicMock(
+            side_effect=lambda text_chunks, vector_chunks, pdf_id: [
+                {'text_chunk': c['text'], 'metadata': c['metadata'], 'vector_chunk': v, 'pdf_id': pdf_id}
+                for c, v in zip(text_chunks, vector_chunks)
+            ]
+        )
+        self.client_milvus.upload_document = AsyncMock(return_value=None)
+
+    def _chunks(self, n):
+        return [{'text': f'Chunk {i}', 'metadata': {'page': i // 2}} for i in range(n)]
+
+    def test_ingest_file_streaming_batches(self):
+        """Test: en modo streaming se embebe e inserta en micro-batches acotados"""
+        # Arrange
+        self.splitter.stream_document = MagicMock(return_value=iter(self._chunks(5)))
+        pipeline = IngestionPipeline(self.splitter, self.embedding_generator, self.client_milvus, batch_size=2, streaming=True)
+
+        # Act
+        total = asyncio.run(pipeline.ingest_file(pdf="test.pdf", pdf_id=7))
+
+        # Assert - Se procesaron todos los chunks en 3 batches (2 + 2 + 1)
+        self.assertEqual(total, 5)
+        self.splitter.stream_document.assert_called_once_with(pdf="test.pdf")
+        self.assertEqual(self.embedding_generator.get_document_embedding.await_count, 3)
+        self.assertEqual(self.client_milvus.upload_document.await_count, 3)
+
+        batch_sizes = [len(call.kwargs['text']) for call in self.embedding_generator.get_document_embedding.await_args_list]
+        self.assertEqual(batch_sizes, [2, 2, 1])
+
+        # Assert - Cada insert lleva el pdf_id y la colección correctos
+        for call in self.client_milvus.upload_document.await_args_list:
+            self.assertEqual(call.kwargs['collection_name'], 'documents_collection')
+            self.assertTrue(all(row['pdf_id'] == 7 for row in call.kwargs['data']))
+
+    def test_ingest_file_reports_progress(self):
+        """Test: el callback de progreso recibe los chunks parseados, embebidos e indexados"""
+        # Arrange
+        self.splitter.stream_document = MagicMock(return_value=iter(self._chunks(5)))
+        pipeline = IngestionPipeline(self.splitter, self.embedding_generator, self.client_milvus, batch_size=2)
+        progress = {}
+
+        # Act
+        asyncio.run(pipeline.ingest_file(
+            pdf="test.pdf", pdf_id=7,
+            progress=lambda stage, amount: progress.update({stage: progress.get(stage, 0) + amount})
+        ))
+
+        # Assert
+        self.assertEqual(progress, {"parsed": 5, "embedded": 5, "indexed": 5})
+
+    def test_ingest_file_full_mode(self):
+        """Test: con streaming desactivado se procesa el documento completo en una sola llamada"""
+        # Arrange
+        self.splitter.split_document = MagicMock(return_value=self._chunks(5))
+        pipeline = IngestionPipeline(self.splitter, self.embedding_generator, self.client_milvus, batch_size=2, streaming=False)
+
+        # Act
+        total = asyncio.run(pipeline.ingest_file(pdf="test.pdf", pdf_id=7))
+
+        # Assert
+        self.assertEqual(total, 5)
+        self.embedding_generator.get_document_embedding.assert_awaited_once()
+        self.client_milvus.upload_document.assert_awaited_once()
+
+    def test_parsing_runs_off_the_event_loop(self):
+        """Test: sin process pool el PDF se parsea en un thread (streaming y modo completo), no en el event loop"""
+        # Arrange
+        parser_threads = []
+
+        def stream_document(pdf):
+            for chunk in self._chunks(5):
+                parser_threads.append(threading.get_ident())
+                yield chunk
+
+        def split_document(pdf):
+            parser_threads.append(threading.get_ident())
+            return self._chunks(5)
+
+        self.splitter.stream_document = MagicMock(side_effect=stream_document)
+        self.splitter.split_document = MagicMock(side_effect=split_document)
+        streaming = IngestionPipeline(self.splitter, self.embedding_generator, self.client_milvus, batch_size=2, streaming=True)
+        full = IngestionPipeline(self.splitter, self.embedding_generator, self.client_milvus, streaming=False)
+
+        async def ingest():
+            loop_thread = threading.get_ident()
+            totals = [await streaming.ingest_file(pdf="test.pdf", pdf_id=7), await full.ingest_file(pdf="test.pdf", pdf_id=8)]
+            return loop_thread, totals
+
+        # Act
+        loop_thread, totals = asyncio.run(ingest())
+
+        # Assert
+        self.assertEqual(totals, [5, 5])
+        self.assertEqual(len(parser_threads), 6)
+        self.assertNotIn(loop_thread, parser_threads)
+
+    def test_ingest_file_empty_document(self):
+        """Test: un PDF sin texto no genera llamadas de embedding ni inserts"""
+        # Arrange
+        self.splitter.stream_document = MagicMock(return_value=iter([]))
+        pipeline = IngestionPipeline(self.splitter, self.embedding_generator, self.client_milvus, batch_size=2)
+
+        # Act
+        total = asyncio.run(pipeline.ingest_file(pdf="empty.pdf", pdf_id=1))
+
+        # Assert
+        self.assertEqual(total, 0)
+        self.embedding_generator.get_document_embedding.assert_not_awaited()
+        self.client_milvus.upload_document.assert_not_awaited()
+
+    def test_ingest_files_concurrent(self):
+        """Test: ingest_files procesa varios archivos y devuelve los totales en el orden recibido"""
+        # Arrange
+        sizes = {"a.pdf": 3, "b.pdf": 1, "c.pdf": 4}
+        self.splitter.stream_document = MagicMock(side_effect=lambda pdf: iter(self._chunks(sizes[pdf])))
+        pipeline = IngestionPipeline(self.splitter, self.embedding_generator, self.client_milvus, batch_size=2, max_concurrent_files=2)
+
+        # Act
+        totals = asyncio.run(pipeline.ingest_files(files=[("a.pdf", 1), ("b.pdf", 2), ("c.pdf", 3)]))
+
+        # Assert
+        self.assertEqual(totals, [3, 1, 4])
+        inserted_ids = {row['pdf_id'] for call in self.client_milvus.upload_document.await_args_list for row in call.kwargs['data']}
+        self.assertEqual(inserted_ids, {1, 2, 3})
+
+    def test_ingest_file_with_pool_matches_streaming(self):
+        """Test: parsear por ventanas de páginas en un pool produce los mismos chunks que el streaming en proceso"""
+        # Arrange
+        splitter = Splitter()
+        expected = [chunk['text'] for chunk in splitter.stream_document(FIXTURE)]
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            pipeline = IngestionPipeline(splitter, self.embedding_generator, self.client_milvus, batch_size=4, process_pool=pool, pages_per_task=2)
+
+            # Act
+            total = asyncio.run(pipeline.ingest_file(pdf=FIXTURE, pdf_id=1))
+
+        # Assert - Mismos textos y en el mismo orden
+        inserted = [row['text_chunk'] for call in self.client_milvus.upload_document.await_args_list for row in call.kwargs['data']]
+        self.assertEqual(total, len(expected))
+        self.assertEqual(inserted, expected)
+
+    def test_ingest_file_with_pool_from_bytes(self):
+        """Test: un PDF en memoria se parsea en el pool igual que desde disco"""
+        # Arrange
+        splitter = Splitter()
+        expected = [chunk['text'] for chunk in splitter.stream_document(FIXTURE)]
+        with open(FIXTURE, 'rb') as f:
+            data = f.read()
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            pipeline = IngestionPipeline(splitter, self.embedding_generator, self.client_milvus, batch_size=4, process_pool=pool, pages_per_task=2)
+
+            # Act
+            total = asyncio.run(pipeline.ingest_file(pdf=data, pdf_id=1))
+
+        # Assert
+        inserted = [row['text_chunk'] for call in self.client_milvus.upload_document.await_args_list for row in call.kwargs['data']]
+        self.assertEqual(total, len(expected))
+        self.assertEqual(inserted, expected)
+
+    def test_ingest_file_reuses_stored_content(self):
+        """Test: si el contenido ya está almacenado solo se registra el mapeo, sin embeddings ni inserts"""
+        # Arrange
+        content_store = MagicMock()
+        content_store.lock = MagicMock(return_value=_NullAsyncContext())
+        content_store.find_by_hash = AsyncMock(return_value=3)
+        content_store.register = AsyncMock()
+        pipeline = IngestionPipeline(self.splitter, self.embedding_generator, self.client_milvus, content_store=content_store)
+
+        # Act
+        total = asyncio.run(pipeline.ingest_file(pdf=FIXTURE, pdf_id=9))
+
+        # Assert
+        self.assertEqual(total, 0)
+        self.embedding_generator.get_document_embedding.assert_not_awaited()
+        self.client_milvus.upload_document.assert_not_awaited()
+        content_store.register.assert_awaited_once()
+        self.assertEqual(content_store.register.await_args.kwargs['source_id'], 9)
+        self.assertEqual(content_store.register.await_args.kwargs['pdf_id'], 3)
+
+    def test_ingest_file_registers_new_content(self):
+        """Test: un contenido nuevo se ingiere bajo su propio pdf_id y luego se registra"""
+        # Arrange
+        self.splitter.stream_document = MagicMock(return_value=iter(self._chunks(3)))
+        content_store = MagicMock()
+        content_store.lock = MagicMock(return_value=_NullAsyncContext())
+        content_store.find_by_hash = AsyncMock(return_value=None)
+        content_store.register = AsyncMock()
+        pipeline = IngestionPipeline(self.splitter, self.embedding_generator, self.client_milvus, content_store=content_store)
+
+        # Act
+        total = asyncio.run(pipeline.ingest_file(pdf=FIXTURE, pdf_id=9))
+
+        # Assert
+        self.assertEqual(total, 3)
+        self.assertEqual(content_store.register.await_args.kwargs['pdf_id'], 9)
+
+    def test_reingest_file_embeds_only_changed_chunks(self):
+        """Test: al re-subir una fuente solo se embeben los chunks nuevos y se borran los que desaparecieron"""
+        # Arrange - Guardados: A, B, C. Nueva versión: A, C, D
+        self.client_milvus.query_chunks = AsyncMock(return_value=[
+            {'id': 101, 'text_chunk': 'A'}, {'id': 102, 'text_chunk': 'B'}, {'id': 103, 'text_chunk': 'C'}
+        ])
+        self.client_milvus.delete_chunks = AsyncMock()
+        self.splitter.stream_document = MagicMock(return_value=iter([
+            {'text': text, 'metadata': {'page': 0}} for text in ('A', 'C', 'D')
+        ]))
+        pipeline = IngestionPipeline(self.splitter, self.embedding_generator, self.client_milvus)
+
+        # Act
+        report = asyncio.run(pipeline.reingest_file(pdf="v2.pdf", source_id=5))
+
+        # Assert
+        self.assertEqual(report, {'status': 'updated', 'pdf_id': 5, 'kept': 2, 'added': 1, 'removed': 1})
+        self.embedding_generator.get_document_embedding.assert_awaited_once_with(text=['D'])
+        self.client_milvus.delete_chunks.assert_awaited_once_with(collection_name='documents_collection', ids=[102])
+        inserted = self.client_milvus.upload_document.await_args.kwargs['data']
+        self.assertEqual([(row['text_chunk'], row['pdf_id']) for row in inserted], [('D', 5)])
+
+    def test_reingest_file_copies_shared_vectors(self):
+        """Test: si la fuente usa vectores compartidos, la nueva versión se guarda bajo su propio id sin tocarlos"""
+        # Arrange - La fuente 9 reutiliza el contenido guardado como pdf_id 3 (cuyo dueño sigue existiendo)
+        content_store = MagicMock()
+        content_store.lock = MagicMock(return_value=_NullAsyncContext())
+        content_store.resolve = AsyncMock(return_value={9: 3})
+        content_store.find_by_hash = AsyncMock(return_value=None)
+        references = {3: [{'source_id': 3, 'content_hash': 'old'}, {'source_id': 9, 'content_hash': 'old'}], 9: []}
+        content_store.references = AsyncMock(side_effect=lambda pdf_id: references.get(pdf_id, []))
+        content_store.register = AsyncMock()
+        self.client_milvus.query_chunks = AsyncMock(return_value=[{'id': 1, 'text_chunk': 'A'}, {'id': 2, 'text_chunk': 'B'}])
+        self.client_milvus.get_chunks = AsyncMock(return_value=[
+            {'text_chunk': 'A', 'metadata': {'page': 0}, 'vector_chunk': [0.5] * 3072}
+        ])
+        self.client_milvus.delete_chunks = AsyncMock()
+        self.client_milvus.delete_documents = AsyncMock()
+        self.splitter.stream_document = MagicMock(return_value=iter([
+            {'text': text, 'metadata': {'page': 0}} for text in ('A', 'C')
+        ]))
+        pipeline = IngestionPipeline(self.splitter, self.embedding_generator, self.client_milvus, content_store=content_store)
+
+        # Act
+        report = asyncio.run(pipeline.reingest_file(pdf=FIXTURE, source_id=9))
+
+        # Assert - A se copia con su vector, solo C se embebe, y los vectores compartidos no se borran
+        self.assertEqual(report['pdf_id'], 9)
+        self.assertEqual((report['kept'], report['added']), (1, 1))
+        self.embedding_generator.get_document_embedding.assert_awaited_once_with(text=['C'])
+        self.client_milvus.delete_chunks.assert_not_awaited()
+        self.client_milvus.delete_documents.assert_not_awaited()
+        inserted = [row for call in self.client_milvus.upload_document.await_args_list for row in call.kwargs['data']]
+        self.assertEqual(sorted((row['text_chunk'], row['pdf_id']) for row in inserted), [('A', 9), ('C', 9)])
+        self.assertEqual(content_store.register.await_args.kwargs['pdf_id'], 9)
+
+    def test_reingest_file_hands_off_own_pdf_id_before_overwriting(self):
+        """Test: si el pdf_id propio de la fuente sigue guardando una versión que usa otra fuente, se le traspasa antes de escribir"""
+        # Arrange - 7 subió X (pdf 7), 9 subió X (-> pdf 7), 7 re-subió Y ya guardado como pdf 5, ahora 7 re-sube Z
+        content_store = MagicMock()
+        content_store.lock = MagicMock(return_value=_NullAsyncContext())
+        content_store.resolve = AsyncMock(return_value={7: 5})
+        content_store.find_by_hash = AsyncMock(return_value=None)
+        references = {
+            5: [{'source_id': 5, 'content_hash': 'Y'}, {'source_id': 7, 'content_hash': 'Y'}],
+            7: [{'source_id': 9, 'content_hash': 'X'}],
+        }
+        content_store.references = AsyncMock(side_effect=lambda pdf_id: references.get(pdf_id, []))
+        content_store.register = AsyncMock()
+        chunks = {7: [{'id': 71, 'text_chunk': 'X1'}], 5: [{'id': 51, 'text_chunk': 'Y1'}]}
+        self.client_milvus.query_chunks = AsyncMock(side_effect=lambda collection_name, pdf_id, output_fields: chunks[pdf_id])
+        self.client_milvus.get_chunks = AsyncMock(side_effect=lambda collection_name, ids, output_fields: [
+            {'text_chunk': {71: 'X1', 51: 'Y1'}[id], 'metadata': {'page': 0}, 'vector_chunk': [0.5] * 3072} for id in ids
+        ])
+        self.client_milvus.delete_documents = AsyncMock()
+        self.client_milvus.delete_chunks = AsyncMock()
+        self.splitter.stream_document = MagicMock(return_value=iter([{'text': 'Z1', 'metadata': {'page': 0}}]))
+        pipeline = IngestionPipeline(self.splitter, self.embedding_generator, self.client_milvus, content_store=content_store)
+
+        # Act
+        report = asyncio.run(pipeline.reingest_file(pdf=FIXTURE, source_id=7))
+
+        # Assert - X pasa a pdf 9 (la fuente 9 se re-mapea), pdf 7 se vacía y recién después recibe Z
+        self.assertEqual(report['pdf_id'], 7)
+        registered = [(call.kwargs['source_id'], call.kwargs['pdf_id']) for call in content_store.register.await_args_list]
+        self.assertEqual(registered, [(9, 9), (7, 7)])
+        self.client_milvus.delete_documents.assert_awaited_once_with(collection_name='documents_collection', ids=[7])
+        inserted = [(row['text_chunk'], row['pdf_id']) for call in self.client_milvus.upload_document.await_args_list for row in call.kwargs['data']]
+        self.assertEqual(inserted, [('X1', 9), ('Z1', 7)])
+
+
+class _NullAsyncContext:
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *args):
+        return False
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import sys
+import os
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.jobs import JobRegistry
+
+STAGES = ("parsed", "embedded", "indexed", "metadata_generated")
+
+
+class TestJobRegistry(unittest.TestCase):
+    """Tests unitarios para JobRegistry"""
+
+    def test_job_succeeds_with_stage_progress(self):
+        """Test: un job exitoso reporta el progreso por etapa y deja el resultado"""
+        # Arrange
+        registry = JobRegistry(ttl_seconds=60)
+        cleaned = []
+
+        async def run(job):
+            job.advance("parsed", 3)
+            job.complete_stage("parsed")
+            job.set_total("embedded", 3)
+            job.advance("embedded", 2)
+            return {"title": "Notebook"}
+
+        async def main():
+            job = registry.create(kind="create-notebook", stages=STAGES)
+            registry.start(job, run, cleanup=lambda: cleaned.append(True))
+            await job.task
+            return registry.get(job.id).to_dict()
+
+        # Act
+        result = asyncio.run(main())
+
+        # Assert
+        self.assertEqual(result['status'], 'succeeded')
+        self.assertEqual(result['result'], {"title": "Notebook"})
+        self.assertEqual(result['stages']['parsed'], {"status": "done", "done": 3, "total": 3})
+        self.assertEqual(result['stages']['embedded'], {"status": "running", "done": 2, "total": 3})
+        self.assertEqual(result['stages']['indexed']['status'], 'pending')
+        self.assertEqual(cleaned, [True])
+
+    def test_job_failure_marks_running_stage(self):
+        """Test: si el job falla, se guarda el error y la etapa en curso queda como fallida"""
+        # Arrange
+        registry = JobRegistry(ttl_seconds=60)
+
+        async def run(job):
+            job.advance("parsed", 1)
+            raise RuntimeError("Milvus unavailable")
+
+        async def main():
+            job = registry.create(kind="create-notebook", stages=STAGES)
+            registry.start(job, run)
+            await job.task
+            return job.to_dict()
+
+        # Act
+        result = asyncio.run(main())
+
+        # Assert
+        self.assertEqual(result['status'], 'failed')
+        self.assertEqual(result['error'], 'Milvus unavailable')
+        self.assertEqual(result['stages']['parsed']['status'], 'failed')
+        self.assertEqual(result['stages']['embedded']['status'], 'pending')
+
+    def test_finished_jobs_expire(self):
+        """Test: los jobs terminados se descartan después del TTL; los que están en curso no"""
+        # Arrange
+        registry = JobRegistry(ttl_seconds=10)
+        finished = registry.create(kind="create-notebook", stages=STAGES)
+        finished.status = "succeeded"
+        finished.updated_at -= 60
+        running = registry.create(kind="create-notebook", stages=STAGES)
+        running.status = "running"
+        running.updated_at -= 60
+
+        # Act / Assert
+        self.assertIsNone(registry.get(finished.id))
+        self.assertIs(registry.get(running.id), running)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,110 +4,250 @@ import os
 from unittest.mock import patch, MagicMock, AsyncMock
 import asyncio
 
+import numpy as np
+
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.db.milvus import upload_document, get_document, create_milvus_collection
+from app.db.milvus import Async_Milvus_Client, Milvus_Sync_Client
+from app.db.bulk_insert import estimate_row_bytes
+from app.db.vector_codec import VectorCodec
+from app.db.index_profiles import search_params
+
 
-##Para correr los test de milvus se necesita tener la bsdd de datos de milvus corriendo localmente
+##Importar app.db.milvus no abre conexiones: los clientes de Milvus se reemplazan por mocks
 class TestMilvusOperations(unittest.TestCase):
     """Tests unitarios para operaciones de Milvus"""
-    
-    @patch('app.db.milvus.async_client')
-    def test_upload_document(self, mock_async_client):
+
+    def setUp(self):
+        self.mock_client = MagicMock()
+        with patch('app.db.milvus.AsyncMilvusClient', return_value=self.mock_client):
+            self.async_client = Async_Milvus_Client()
+        self.async_client.binary_rescore = False
+        self.async_client._index_profiles['test_collection'] = 'hnsw'
+
+    def test_upload_document(self):
         """Test: upload_document inserta documentos correctamente en Milvus"""
         # Arrange
-        mock_async_client.insert = AsyncMock(return_value={'insert_count': 2})
+        self.mock_client.insert = AsyncMock(return_value={'insert_count': 2})
         test_data = [
-            {'text_chunk': 'Texto 1', 'metadata': {'page': 1}, 'vector_chunk': [0.1] * 3072},
-            {'text_chunk': 'Texto 2', 'metadata': {'page': 2}, 'vector_chunk': [0.2] * 3072}
+            {'text_chunk': 'Texto 1', 'metadata': {'page': 1}, 'vector_chunk': [0.1] * 8},
+            {'text_chunk': 'Texto 2', 'metadata': {'page': 2}, 'vector_chunk': [0.2] * 8}
         ]
-        
+
         # Act
-        asyncio.run(upload_document(data=test_data, collection_name='test_collection'))
-        
-        # Assert - Llamada correcta al método insert
-        mock_async_client.insert.assert_called_once_with(
-            collection_name='test_collection',
-            data=test_data
-        )
-        
-        # Assert - Caso edge: datos vacíos
-        mock_async_client.reset_mock()
-        mock_async_client.insert = AsyncMock(return_value={'insert_count': 0})
-        asyncio.run(upload_document(data=[], collection_name='test_collection'))
-        mock_async_client.insert.assert_called_once_with(
-            collection_name='test_collection',
-            data=[]
-        )
-    
-    @patch('app.db.milvus.async_client')
-    def test_get_document(self, mock_async_client):
+        report = asyncio.run(self.async_client.upload_document(data=test_data, collection_name='test_collection'))
+
+        # Assert - Una llamada a insert con todas las filas
+        self.mock_client.insert.assert_awaited_once()
+        self.assertEqual(self.mock_client.insert.await_args.kwargs['collection_name'], 'test_collection')
+        self.assertEqual(len(self.mock_client.insert.await_args.kwargs['data']), 2)
+        self.assertEqual(report['inserted'], 2)
+        self.assertEqual(report['failed'], [])
+
+    def test_upload_document_with_half_precision_vectors(self):
+        """Test: las filas con vector_chunk codificado como bytes (FLOAT16) pasan por el bulk insert"""
+        # Arrange
+        self.async_client.codec = VectorCodec(vector_type='FLOAT16_VECTOR', dim=8)
+        self.mock_client.insert = AsyncMock(side_effect=lambda collection_name, data: {'insert_count': len(data)})
+        test_data = [{'text_chunk': f'Texto {i}', 'metadata': {'page': i}, 'vector_chunk': [0.1] * 8, 'pdf_id': 1} for i in range(3)]
+
+        # Act
+        report = asyncio.run(self.async_client.upload_document(data=test_data, collection_name='test_collection'))
+
+        # Assert - 2 bytes por componente en el request y en el reporte
+        rows = self.mock_client.insert.await_args.kwargs['data']
+        self.assertEqual(rows[0]['vector_chunk'], np.asarray([0.1] * 8, dtype=np.float16).tobytes())
+        self.assertEqual(report['inserted'], 3)
+        self.assertEqual(report['failed'], [])
+        self.assertEqual(estimate_row_bytes(rows[0]) - estimate_row_bytes({**rows[0], 'vector_chunk': b''}), 16)
+
+    def test_upload_document_with_binary_rescore(self):
+        """Test: en modo binary_rescore cada fila lleva binary_vector (bytes) y el bulk insert la acepta"""
+        # Arrange
+        self.async_client.binary_rescore = True
+        self.mock_client.insert = AsyncMock(side_effect=lambda collection_name, data: {'insert_count': len(data)})
+        test_data = [{'text_chunk': f'Texto {i}', 'metadata': {'page': i}, 'vector_chunk': [0.1, -0.2] * 8, 'pdf_id': 1} for i in range(3)]
+
+        # Act
+        report = asyncio.run(self.async_client.upload_document(data=test_data, collection_name='test_collection'))
+
+        # Assert - Un bit por dimensión
+        rows = self.mock_client.insert.await_args.kwargs['data']
+        self.assertEqual(rows[0]['binary_vector'], bytes([0b10101010, 0b10101010]))
+        self.assertEqual(report['inserted'], 3)
+        self.assertEqual(report['failed'], [])
+
+    def test_get_document(self):
         """Test: get_document busca y retorna documentos correctamente"""
         # Arrange
         mock_hit1 = MagicMock()
         mock_hit2 = MagicMock()
-        mock_async_client.search = AsyncMock(return_value=[[mock_hit1, mock_hit2]])
-        query_vector = [0.5] * 3072
-        filter_expr = "metadata['page'] > 5"
-        
+        self.mock_client.search = AsyncMock(return_value=[[mock_hit1, mock_hit2]])
+        query_vector = [0.5] * 8
+
         # Act
-        result = asyncio.run(get_document(
+        result = asyncio.run(self.async_client.get_document(
             query_vector=query_vector,
             collection_name='test_collection',
-            filter=filter_expr
+            ids=[1, 2],
+            limit=5
         ))
-        
-        # Assert - Llamada correcta al método search
-        mock_async_client.search.assert_called_once_with(
-            collection_name='test_collection',
-            anns_field='vector_chunk',
-            data=[query_vector],
-            limit=5,
-            search_params={'metric_type': 'COSINE'},
-            filter=filter_expr,
-            output_fields=['text_chunk']
-        )
-        
-        # Assert - Formato y estructura del resultado
-        self.assertIsInstance(result, list)
-        self.assertEqual(len(result), 2)
-        
+
+        # Assert - Búsqueda con el filtro por pdf_id y los parámetros del perfil
+        kwargs = self.mock_client.search.await_args.kwargs
+        self.assertEqual(kwargs['filter'], 'pdf_id in [1, 2]')
+        self.assertEqual(kwargs['limit'], 5)
+        self.assertEqual(kwargs['search_params'], search_params('hnsw', limit=5))
+        self.assertEqual(result, [mock_hit1, mock_hit2])
+
         # Assert - Caso edge: sin resultados
-        mock_async_client.reset_mock()
-        mock_async_client.search = AsyncMock(return_value=[[]])
-        empty_result = asyncio.run(get_document(
-            query_vector=query_vector,
-            collection_name='test_collection',
-            filter=''
-        ))
+        self.mock_client.search = AsyncMock(return_value=[[]])
+        empty_result = asyncio.run(self.async_client.get_document(query_vector=query_vector, collection_name='test_collection'))
         self.assertEqual(empty_result, [])
-    
-    @patch('app.db.milvus.client_db')
-    def test_create_milvus_collection(self, mock_client_db):
+
+    def test_get_documents_by_pdf(self):
+        """Test: una sola búsqueda agrupada por pdf_id y búsquedas por documento si no se puede agrupar"""
+        # Arrange
+        hits = [
+            {'id': 1, 'distance': 0.9, 'entity': {'text_chunk': 'a', 'pdf_id': 10}},
+            {'id': 2, 'distance': 0.8, 'entity': {'text_chunk': 'b', 'pdf_id': 20}},
+            {'id': 3, 'distance': 0.7, 'entity': {'text_chunk': 'c', 'pdf_id': 10}},
+        ]
+        self.mock_client.search = AsyncMock(return_value=[hits])
+
+        # Act
+        grouped = asyncio.run(self.async_client.get_documents_by_pdf(
+            query_vector=[0.5] * 8, collection_name='test_collection', pdf_ids=[10, 20, 30, 10], per_document=2
+        ))
+
+        # Assert - Una búsqueda con un grupo por PDF
+        kwargs = self.mock_client.search.await_args.kwargs
+        self.mock_client.search.assert_awaited_once()
+        self.assertEqual((kwargs['group_by_field'], kwargs['group_size'], kwargs['limit']), ('pdf_id', 2, 3))
+        self.assertEqual(kwargs['filter'], 'pdf_id in [10, 20, 30]')
+        self.assertEqual({pdf_id: [hit['id'] for hit in group] for pdf_id, group in grouped.items()}, {10: [1, 3], 20: [2], 30: []})
+
+        # Arrange - El índice no soporta group_by
+        self.mock_client.search = AsyncMock(side_effect=[Exception('group by not supported'), [hits[:1]], [hits[1:2]]])
+
+        # Act
+        grouped = asyncio.run(self.async_client.get_documents_by_pdf(
+            query_vector=[0.5] * 8, collection_name='test_collection', pdf_ids=[10, 20], per_document=2
+        ))
+
+        # Assert - Una búsqueda por documento
+        self.assertEqual(self.mock_client.search.await_count, 3)
+        self.assertEqual({pdf_id: [hit['id'] for hit in group] for pdf_id, group in grouped.items()}, {10: [1], 20: [2]})
+
+    def test_get_documents_by_pdf_respects_retrieval_mode(self):
+        """Test: en modo hybrid (con query_text) o binary_rescore no se usa la búsqueda densa agrupada"""
+        # Arrange
+        self.mock_client.search = AsyncMock(return_value=[[]])
+        self.mock_client.hybrid_search = AsyncMock(return_value=[[{'id': 1, 'distance': 0.9, 'entity': {'text_chunk': 'a', 'pdf_id': 10}}]])
+        self.async_client.hybrid = True
+        self.async_client.hybrid_ranker = MagicMock()
+
+        # Act
+        hybrid = asyncio.run(self.async_client.get_documents_by_pdf(
+            query_vector=[0.5] * 8, collection_name='test_collection', pdf_ids=[10, 20], per_document=2, query_text='overview'
+        ))
+
+        self.async_client.hybrid = False
+        self.async_client.binary_rescore = True
+        self.async_client.rescore_searcher = MagicMock(search=AsyncMock(return_value=[]))
+        asyncio.run(self.async_client.get_documents_by_pdf(
+            query_vector=[0.5] * 8, collection_name='test_collection', pdf_ids=[10, 20], per_document=2
+        ))
+
+        # Assert - Una búsqueda por documento en el modo configurado, ninguna búsqueda densa agrupada
+        self.mock_client.search.assert_not_awaited()
+        self.assertEqual(self.mock_client.hybrid_search.await_count, 2)
+        self.assertEqual(hybrid[10][0]['id'], 1)
+        self.assertEqual(self.async_client.rescore_searcher.search.await_count, 2)
+        self.assertEqual(
+            [call.kwargs['filter'] for call in self.async_client.rescore_searcher.search.await_args_list], ['pdf_id in [10]', 'pdf_id in [20]']
+        )
+
+    def test_create_milvus_collection(self):
         """Test: create_milvus_collection maneja creación y existencia de colecciones"""
         # Arrange - Colección no existe
-        mock_client_db.list_collections.return_value = []
-        mock_client_db.create_collection = MagicMock()
-        mock_client_db.get_load_state = MagicMock(return_value={'state': 'Loaded'})
-        
+        sync_client = Milvus_Sync_Client.__new__(Milvus_Sync_Client)
+        sync_client.client = MagicMock()
+        sync_client.client.list_collections.return_value = []
+
         # Act
-        create_milvus_collection('new_collection')
-        
+        sync_client.create_milvus_collection('new_collection', dim=8, vector_type='FLOAT_VECTOR', binary_vector=False, partition_key=True)
+
         # Assert - Crea colección nueva
-        mock_client_db.list_collections.assert_called()
-        mock_client_db.create_collection.assert_called_once()
-        
+        sync_client.client.create_collection.assert_called_once()
+        self.assertEqual(sync_client.client.create_collection.call_args.kwargs['collection_name'], 'new_collection')
+
         # Arrange - Colección ya existe
-        mock_client_db.reset_mock()
-        mock_client_db.list_collections.return_value = ['existing_collection']
-        mock_client_db.create_collection = MagicMock()
-        
+        sync_client.client.reset_mock()
+        sync_client.client.list_collections.return_value = ['existing_collection']
+        sync_client.client.describe_collection.return_value = {'fields': []}
+
         # Act
-        result = create_milvus_collection('existing_collection')
-        
+        result = sync_client.create_milvus_collection('existing_collection', dim=8, partition_key=False)
+
         # Assert - No crea colección existente y retorna None
         self.assertIsNone(result)
-        mock_client_db.create_collection.assert_not_called()
+        sync_client.client.create_collection.assert_not_called()
+
+    def test_check_schema_reports_every_mismatch(self):
+        """Test: check_schema informa todas las diferencias con la configuración, no solo la primera"""
+        # Arrange - Colección sin partition key, sin binary_vector ni sparse_vector y con otra dimensión
+        sync_client = Milvus_Sync_Client.__new__(Milvus_Sync_Client)
+        sync_client.client = MagicMock()
+        sync_client.client.describe_collection.return_value = {'fields': [
+            {'name': 'pdf_id', 'type': MagicMock()},
+            {'name': 'vector_chunk', 'type': MagicMock(), 'params': {'dim': 4}},
+        ]}
+        sync_client.client.describe_collection.return_value['fields'][1]['type'].name = 'FLOAT_VECTOR'
+
+        # Act
+        with patch('builtins.print') as mock_print:
+            result = sync_client.check_schema('existing_collection', dim=8, vector_type='FLOAT16_VECTOR', binary_vector=True, partition_key=True, hybrid=True)
+        with patch('builtins.print'):
+            matches = sync_client.check_schema('existing_collection', dim=4, vector_type='FLOAT_VECTOR')
+
+        # Assert - Una advertencia por diferencia y True si coincide con la configuración
+        self.assertFalse(result)
+        self.assertTrue(matches)
+        warnings = [call.args[0] for call in mock_print.call_args_list]
+        self.assertEqual(len(warnings), 4)
+        self.assertTrue(all(warning.startswith('ADVERTENCIA:') for warning in warnings))
+        self.assertTrue(any('--hybrid' in warning for warning in warnings))
+        self.assertTrue(any('--partition-key' in warning for warning in warnings))
+        self.assertTrue(any('--binary' in warning for warning in warnings))
+        self.assertTrue(any('FLOAT_VECTOR/4' in warning for warning in warnings))
+
+    @patch('app.db.milvus.bootstrap_collections')
+    def test_bootstrap(self, mock_bootstrap_collections):
+        """Test: bootstrap crea el esquema fuera del event loop y precalienta las colecciones"""
+        # Arrange
+        self.mock_client.load_collection = AsyncMock()
+        self.mock_client.search = AsyncMock(return_value=[[]])
+
+        # Act
+        timings = asyncio.run(self.async_client.bootstrap(
+            documents_collection='test_collection',
+            sources_collection='test_sources',
+            warmup=True
+        ))
+
+        # Assert - Provisioning y warm-up medidos
+        mock_bootstrap_collections.assert_called_once_with('test_collection', 'test_sources')
+        self.assertEqual(set(timings), {'provision', 'warmup'})
+        loaded = {call.kwargs['collection_name'] for call in self.mock_client.load_collection.await_args_list}
+        self.assertEqual(loaded, {'test_collection', 'test_sources'})
+        self.assertEqual(self.mock_client.search.await_args.kwargs['limit'], 1)
+
+        # Assert - Sin warm-up solo se provisiona
+        self.mock_client.load_collection.reset_mock()
+        timings = asyncio.run(self.async_client.bootstrap(warmup=False))
+        self.assertEqual(set(timings), {'provision'})
+        self.mock_client.load_collection.assert_not_awaited()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,58 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch, MagicMock, AsyncMock
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.models import ModelRegistry
+from app.utils.graphs.graph import RAGGraph, GENERATOR_MODEL, JUDGE_MODEL
+from app.utils.graphs.creation_graph import CreationGraph
+
+
+class TestModelRegistry(unittest.TestCase):
+    """Tests unitarios para ModelRegistry"""
+
+    @patch('app.utils.models.init_chat_model')
+    def test_models_shared_between_graphs(self, mock_init_chat_model):
+        """Test: los dos grafos comparten un cliente por modelo y cada chain se construye una vez"""
+        # Arrange
+        mock_init_chat_model.side_effect = lambda model, **kwargs: MagicMock(name=model)
+        registry = ModelRegistry()
+
+        # Act
+        rag_graph = RAGGraph(MagicMock(), MagicMock(), MagicMock(), model_registry=registry)
+        creation_graph = CreationGraph(MagicMock(), MagicMock(), model_registry=registry)
+        other_rag_graph = RAGGraph(MagicMock(), MagicMock(), MagicMock(), model_registry=registry)
+
+        # Assert
+        self.assertEqual(sorted(call.args[0] for call in mock_init_chat_model.call_args_list), sorted([GENERATOR_MODEL, JUDGE_MODEL]))
+        self.assertIs(registry.chat_model(GENERATOR_MODEL), registry.chat_model(GENERATOR_MODEL))
+        self.assertIs(rag_graph.generator_chain, other_rag_graph.generator_chain)
+        self.assertIsNot(creation_graph.notebook_chain, creation_graph.flashcards_chain)
+        self.assertEqual(len(registry.stats()['chains']), 6)
+
+    @patch('app.utils.models.init_chat_model')
+    def test_warm_up_does_not_fail(self, mock_init_chat_model):
+        """Test: el warm-up llama una vez a cada modelo y un modelo que falla no corta el arranque"""
+        # Arrange
+        ok_model = MagicMock(ainvoke=AsyncMock(return_value='pong'))
+        failing_model = MagicMock(ainvoke=AsyncMock(side_effect=RuntimeError('404 model not found')))
+        mock_init_chat_model.side_effect = [ok_model, failing_model]
+
+        registry = ModelRegistry()
+        registry.chat_model('google_genai:ok')
+        registry.chat_model('google_genai:missing')
+
+        # Act
+        timings = asyncio.run(registry.warm_up(timeout=1.0))
+
+        # Assert
+        self.assertEqual(set(timings), {'google_genai:ok', 'google_genai:missing'})
+        ok_model.ainvoke.assert_awaited_once()
+        failing_model.ainvoke.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
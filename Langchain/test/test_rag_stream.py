@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch, MagicMock, AsyncMock
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.graphs.graph import RAGGraph
+from app.utils.aux_functions.format_sse import format_sse
+
+
+async def fake_astream(inputs):
+    for token in ['La prueba ', 'de trabajo ', 'evita el doble gasto.']:
+        yield token
+
+
+class TestRAGStream(unittest.TestCase):
+    """Tests unitarios para el modo streaming del grafo RAG"""
+
+    def setUp(self):
+        patcher = patch('app.utils.models.init_chat_model', return_value=MagicMock())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.graph = RAGGraph(MagicMock(), MagicMock(), MagicMock())
+        self.graph.retrieve_context = AsyncMock(side_effect=lambda state: {**state, 'context': "['chunk']"})
+        self.graph.generator_chain = MagicMock(astream=fake_astream)
+        self.state = {
+            'question': '¿Qué evita la prueba de trabajo?', 'query': '¿Qué evita la prueba de trabajo?', 'context': '',
+            'pdf_ids': [1], 'generation': '', 'is_valid': False, 'refinement_attempts': 0, 'retrieval_attempts': 0, 'chatHistory': []
+        }
+
+    async def collect(self):
+        return [event async for event in self.graph.stream(self.state)]
+
+    def test_stream_tokens_then_end(self):
+        """Test: los tokens salen a medida que se generan y el evento final trae la respuesta completa"""
+        # Arrange
+        self.graph.judge_answer = AsyncMock(side_effect=lambda state: {**state, 'is_valid': True})
+
+        # Act
+        events = asyncio.run(self.collect())
+
+        # Assert
+        self.assertEqual([name for name, _ in events], ['token', 'token', 'token', 'end'])
+        self.assertEqual(events[0][1], {'text': 'La prueba '})
+        self.assertEqual(events[-1][1]['generation'], 'La prueba de trabajo evita el doble gasto.')
+        self.assertEqual(events[-1][1]['context'], "['chunk']")
+        self.assertTrue(events[-1][1]['is_valid'])
+        self.assertEqual(format_sse('token', {'text': 'a\nb'}), 'event: token\ndata: {"text": "a\\nb"}\n\n')
+
+    def test_stream_retry_after_invalid_answer(self):
+        """Test: si el judge rechaza la respuesta se emite retry y se regenera con la query refinada"""
+        # Arrange
+        verdicts = iter([False, True])
+        self.graph.judge_answer = AsyncMock(side_effect=lambda state: {**state, 'is_valid': next(verdicts)})
+        self.graph.refine_query = AsyncMock(side_effect=lambda state: {**state, 'query': 'query refinada', 'refinement_attempts': 1})
+
+        # Act
+        events = asyncio.run(self.collect())
+
+        # Assert
+        names = [name for name, _ in events]
+        self.assertEqual(names.count('retry'), 1)
+        self.assertEqual(names.count('token'), 6)
+        self.assertEqual(events[-1][0], 'end')
+        self.assertEqual(events[-1][1]['refinement_attempts'], 1)
+        self.assertEqual(self.graph.retrieve_context.await_args.args[0]['query'], 'query refinada')
+
+
+if __name__ == '__main__':
+    unittest.main()
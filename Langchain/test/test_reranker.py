@@ -0,0 +1,74 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch, MagicMock, AsyncMock
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.reranker import Reranker
+
+
+def make_hits(texts):
+    return [[{'id': i, 'distance': 0.9 - i / 10, 'entity': {'text_chunk': text, 'pdf_id': 1}} for i, text in enumerate(texts)]]
+
+
+class TestReranker(unittest.TestCase):
+    """Tests unitarios para Reranker"""
+
+    def setUp(self):
+        self.mock_client = MagicMock()
+        patcher = patch('app.utils.reranker.voyageai.AsyncClient', return_value=self.mock_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rerank_cached(self):
+        """Test: el mismo rerank (consulta + chunks) se pide una sola vez al proveedor"""
+        # Arrange
+        reranker = Reranker(top_k=2, timeout=1.0)
+        response = MagicMock(results=[MagicMock(document='c'), MagicMock(document='a')])
+        self.mock_client.rerank = AsyncMock(return_value=response)
+        document = make_hits(['a', 'b', 'c'])
+
+        async def run():
+            first = await reranker.rerank(query='pregunta', document=document)
+            second = await reranker.rerank(query='pregunta', document=document)
+            other = await reranker.rerank(query='otra pregunta', document=document)
+            return first, second, other
+
+        # Act
+        first, second, other = asyncio.run(run())
+
+        # Assert
+        self.assertEqual(first, ['c', 'a'])
+        self.assertEqual(second, first)
+        self.assertEqual(self.mock_client.rerank.await_count, 2)
+        self.assertEqual(self.mock_client.rerank.await_args_list[0].kwargs['documents'], ['a', 'b', 'c'])
+        self.assertEqual(reranker.stats()['hits'], 1)
+
+    def test_rerank_fallback_to_vector_order(self):
+        """Test: si el rerank excede el timeout o falla se devuelven los chunks en el orden de la búsqueda vectorial"""
+        # Arrange
+        reranker = Reranker(top_k=2, timeout=0.05)
+
+        async def slow_rerank(**kwargs):
+            await asyncio.sleep(1)
+
+        self.mock_client.rerank = AsyncMock(side_effect=slow_rerank)
+        document = make_hits(['a', 'b', 'c'])
+
+        # Act
+        timed_out = asyncio.run(reranker.rerank(query='pregunta', document=document))
+        self.mock_client.rerank = AsyncMock(side_effect=RuntimeError('503'))
+        failed = asyncio.run(reranker.rerank(query='otra pregunta', document=document))
+
+        # Assert - Sin cachear el fallback
+        self.assertEqual(timed_out, ['a', 'b'])
+        self.assertEqual(failed, ['a', 'b'])
+        self.assertEqual(reranker.stats()['fallbacks'], 2)
+        self.assertEqual(reranker.stats()['entries'], 0)
+        self.assertEqual(asyncio.run(reranker.rerank(query='pregunta', document=[[]])), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
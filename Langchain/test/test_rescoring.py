@@ -0,0 +1,79 @@
+import unittest
+import sys
+import os
+import tempfile
+from unittest.mock import MagicMock, AsyncMock
+import asyncio
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.rescoring import BinaryRescoreSearcher, VectorFile, binary_encode
+from app.db.vector_codec import VectorCodec
+
+
+def _hit(id: int) -> dict:
+    return {'id': id, 'distance': 0, 'entity': {'text_chunk': f'chunk {id}', 'pdf_id': 1}}
+
+
+class TestBinaryRescore(unittest.TestCase):
+    """Tests unitarios para la búsqueda binaria con rescoring exacto"""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vectors = {id: rng.standard_normal(16).astype(np.float32) for id in range(1, 7)}
+        self.query = self.vectors[3] + 0.01
+
+        self.client = MagicMock()
+        # La búsqueda binaria devuelve los candidatos en un orden distinto al exacto
+        self.client.search = AsyncMock(return_value=[[_hit(id) for id in (6, 5, 4, 3, 2, 1)]])
+        self.client.get = AsyncMock(side_effect=lambda collection_name, ids, output_fields: [
+            {'id': id, 'vector_chunk': self.vectors[id].tolist()} for id in ids
+        ])
+
+    def test_binary_encode(self):
+        """Test: un bit por dimensión según el signo"""
+        self.assertEqual(binary_encode([1.0, -1.0] * 8), bytes([0b10101010, 0b10101010]))
+        self.assertEqual(len(binary_encode(np.ones(3072))), 384)
+
+    def test_rescore_orders_candidates_by_exact_similarity(self):
+        """Test: los candidatos se reordenan por coseno exacto y se devuelven los k mejores"""
+        # Arrange
+        searcher = BinaryRescoreSearcher(self.client, VectorCodec(vector_type="FLOAT_VECTOR", dim=16), candidates=50)
+
+        # Act
+        result = asyncio.run(searcher.search(self.query.tolist(), 'test_collection', filter='pdf_id in [1]', limit=2, output_fields=['text_chunk']))
+
+        # Assert
+        scores = {id: float(np.dot(v, self.query) / np.linalg.norm(v) / np.linalg.norm(self.query)) for id, v in self.vectors.items()}
+        expected = sorted(scores, key=scores.get, reverse=True)[:2]
+        self.assertEqual([hit['id'] for hit in result], expected)
+        self.assertEqual(result[0]['id'], 3)
+        self.assertEqual(result[0]['entity']['text_chunk'], 'chunk 3')
+        self.assertEqual(self.client.search.await_args.kwargs['limit'], 50)
+        self.assertEqual(self.client.search.await_args.kwargs['anns_field'], 'binary_vector')
+
+    def test_vector_file_with_milvus_fallback(self):
+        """Test: los vectores salen del archivo local y solo los que faltan se piden a Milvus"""
+        with tempfile.TemporaryDirectory() as tmp:
+            # Arrange - El archivo exportado no tiene los chunks 5 y 6
+            path = os.path.join(tmp, 'vectors')
+            written = VectorFile.write(path, rows=((id, self.vectors[id]) for id in (4, 2, 1, 3)), dim=16, count=4)
+            vector_file = VectorFile(path)
+            searcher = BinaryRescoreSearcher(self.client, VectorCodec(vector_type="FLOAT_VECTOR", dim=16), candidates=10, vector_file=vector_file)
+
+            # Act
+            result = asyncio.run(searcher.search(self.query.tolist(), 'test_collection', filter='', limit=1, output_fields=['text_chunk']))
+
+            # Assert
+            self.assertEqual(written, 4)
+            np.testing.assert_array_equal(vector_file.get([2])[2], self.vectors[2])
+            self.assertEqual(sorted(self.client.get.await_args.kwargs['ids']), [5, 6])
+            self.assertEqual(result[0]['id'], 3)
+
+            del vector_file, searcher
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import io
 import unittest
 import sys
 import os
@@ -5,8 +6,12 @@ from unittest.mock import patch, MagicMock
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from langchain_core.documents import Document
+
 from app.utils.splitter import Splitter
 
+FIXTURE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app', 'fixture', 'bitcoin_es.pdf'))
+
 
 class TestSplitter(unittest.TestCase):
     """Tests unitarios para Splitter"""
@@ -60,6 +65,76 @@ class TestSplitter(unittest.TestCase):
         empty_result = self.splitter.split_document("empty.pdf")
         self.assertIsInstance(empty_result, list)
 
+    @patch('app.utils.splitter.PyPDFLoader')
+    def test_stream_document(self, mock_loader):
+        """Test: stream_document carga páginas bajo demanda y emite chunks con la misma estructura"""
+        # Arrange
+        pages = []
+        for page in range(3):
+            mock_doc = MagicMock()
+            mock_doc.page_content = f"Página {page}. " * 200
+            mock_doc.metadata = {'page': page, 'source': 'test.pdf'}
+            pages.append(mock_doc)
+
+        mock_instance = MagicMock()
+        mock_instance.lazy_load.return_value = iter(pages)
+        mock_loader.return_value = mock_instance
+
+        # Act
+        stream = self.splitter.stream_document("test.pdf")
+
+        # Assert - Es un generador: no se carga el PDF hasta consumirlo
+        mock_instance.lazy_load.assert_not_called()
+        result = list(stream)
+        mock_instance.lazy_load.assert_called_once()
+        mock_instance.load.assert_not_called()
+
+        # Assert - Estructura y orden de páginas
+        self.assertGreater(len(result), 3)
+        for chunk in result:
+            self.assertIn('text', chunk)
+            self.assertIn('metadata', chunk)
+        self.assertEqual([c['metadata']['page'] for c in result], sorted(c['metadata']['page'] for c in result))
+
+    def test_split_document_from_memory(self):
+        """Test: un PDF en memoria (bytes o file-like) produce los mismos chunks que leído desde disco"""
+        # Arrange
+        with open(FIXTURE, 'rb') as f:
+            data = f.read()
+        expected = [chunk['text'] for chunk in self.splitter.split_document(FIXTURE)]
+
+        # Act
+        from_bytes = self.splitter.split_document(pdf=data)
+        from_stream = list(self.splitter.stream_document(pdf=io.BytesIO(data)))
+
+        # Assert
+        self.assertEqual([chunk['text'] for chunk in from_bytes], expected)
+        self.assertEqual([chunk['text'] for chunk in from_stream], expected)
+        self.assertEqual(from_bytes[0]['metadata']['page'], 0)
+
+    @patch('tiktoken.get_encoding')
+    def test_token_mode_respects_token_budget(self, mock_get_encoding):
+        """Test: en modo tokens los chunks no superan el presupuesto de tokens y se solapan en tokens"""
+        # Arrange - Tokenizer falso: una palabra = un token
+        mock_get_encoding.return_value.encode = lambda text, disallowed_special=(): text.split()
+        splitter = Splitter(mode="tokens", chunk_tokens=20, chunk_overlap_tokens=5)
+        page = Document(page_content=" ".join(f"palabra{i}" for i in range(100)), metadata={'page': 0})
+
+        # Act
+        chunks = splitter.split_pages([page])
+
+        # Assert - Chunks llenos hasta el presupuesto, con solapamiento entre consecutivos
+        tokens = [len(chunk.page_content.split()) for chunk in chunks]
+        self.assertTrue(all(t <= 20 for t in tokens))
+        self.assertEqual(tokens[0], 20)
+        self.assertEqual(chunks[0].page_content.split()[-5:], chunks[1].page_content.split()[:5])
+        self.assertEqual(chunks[0].metadata['page'], 0)
+
+    def test_invalid_mode(self):
+        """Test: un modo desconocido se rechaza"""
+        with self.assertRaises(ValueError):
+            Splitter(mode="words")
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import sys
+import os
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.vector_codec import VectorCodec, truncate_and_normalize
+
+
+class TestVectorCodec(unittest.TestCase):
+    """Tests unitarios para VectorCodec (dimensión y tipo de vector_chunk)"""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        vector = rng.standard_normal(3072).astype(np.float32)
+        self.vector = (vector / np.linalg.norm(vector)).tolist()
+
+    def test_truncate_and_normalize(self):
+        """Test: truncar a una dimensión Matryoshka conserva los primeros componentes y deja norma 1"""
+        result = truncate_and_normalize(self.vector, 768)
+
+        self.assertEqual(result.shape, (768,))
+        self.assertAlmostEqual(float(np.linalg.norm(result)), 1.0, places=5)
+        self.assertGreater(float(np.dot(result, np.asarray(self.vector[:768]))), 0)
+
+    def test_half_precision_round_trip(self):
+        """Test: FLOAT16/BFLOAT16 se envían como bytes de 2 por componente y se decodifican con poco error"""
+        for vector_type, tolerance in (("FLOAT16_VECTOR", 1e-3), ("BFLOAT16_VECTOR", 1e-2)):
+            codec = VectorCodec(vector_type=vector_type, dim=3072)
+
+            encoded = codec.encode(self.vector)
+            decoded = codec.decode(encoded)
+
+            self.assertIsInstance(encoded, bytes)
+            self.assertEqual(len(encoded), codec.bytes_per_vector)
+            self.assertEqual(codec.encode(encoded), encoded)  # Los bytes ya codificados pasan sin cambios
+            self.assertLess(float(np.max(np.abs(np.asarray(decoded) - np.asarray(self.vector)))), tolerance)
+
+        float_codec = VectorCodec(vector_type="FLOAT_VECTOR", dim=3072)
+        self.assertEqual(float_codec.encode(self.vector), self.vector)
+        self.assertEqual(float_codec.bytes_per_vector, 3072 * 4)
+
+    def test_invalid_vector_type(self):
+        """Test: un tipo de vector desconocido se rechaza"""
+        with self.assertRaises(ValueError):
+            VectorCodec(vector_type="INT8_VECTOR")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+import sys
+import os
+import tempfile
+import asyncio
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.numpy_store import NumpyVectorStore, parse_pdf_id_filter
+from app.db.vector_store import VectorStore
+
+
+def _rows(vectors: np.ndarray, pdf_id: int) -> list[dict]:
+    return [
+        {'text_chunk': f'pdf {pdf_id} chunk {i}', 'metadata': {'page': i}, 'vector_chunk': vector.tolist(), 'pdf_id': pdf_id}
+        for i, vector in enumerate(vectors)
+    ]
+
+
+class TestNumpyVectorStore(unittest.TestCase):
+    """Tests unitarios para el backend de vectores en el proceso (NumPy)"""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vectors = {pdf_id: rng.standard_normal((4, 8)).astype(np.float32) for pdf_id in (1, 2, 3)}
+
+    def _fill(self, store: NumpyVectorStore):
+        for pdf_id, vectors in self.vectors.items():
+            asyncio.run(store.upload_document(data=_rows(vectors, pdf_id), collection_name='test_collection'))
+
+    def test_search_with_pdf_id_filter(self):
+        """Test: top-k exacto por coseno, restringido a los pdf_ids del filtro"""
+        # Arrange
+        store = NumpyVectorStore(dim=8)
+        self._fill(store)
+        query = self.vectors[2][1] + 0.01
+
+        # Act
+        result = asyncio.run(store.get_document(query_vector=query.tolist(), collection_name='test_collection', ids=[2, 3], limit=3))
+        filtered = asyncio.run(store.get_document(query_vector=query.tolist(), collection_name='test_collection', filter='pdf_id == 1', limit=10))
+
+        # Assert - Mismo orden que la fuerza bruta sobre los PDFs 2 y 3
+        candidates = np.concatenate([self.vectors[2], self.vectors[3]])
+        scores = candidates @ query / np.linalg.norm(candidates, axis=1) / np.linalg.norm(query)
+        self.assertIsInstance(store, VectorStore)
+        self.assertEqual(result[0]['entity']['text_chunk'], 'pdf 2 chunk 1')
+        np.testing.assert_allclose([hit['distance'] for hit in result], np.sort(scores)[::-1][:3], rtol=1e-5)
+        self.assertEqual({hit['entity']['pdf_id'] for hit in filtered}, {1})
+        self.assertEqual(len(filtered), 4)
+
+        # Assert - Filtros que el backend no entiende
+        self.assertEqual(parse_pdf_id_filter('pdf_id in [1, 2]'), [1, 2])
+        with self.assertRaises(ValueError):
+            parse_pdf_id_filter("metadata['page'] > 5")
+
+    def test_delete_and_query_by_pdf_id(self):
+        """Test: borrar por pdf_id y por clave primaria mantiene el índice pdf_id -> filas"""
+        # Arrange
+        store = NumpyVectorStore(dim=8)
+        self._fill(store)
+
+        # Act
+        asyncio.run(store.delete_documents(collection_name='test_collection', ids=[1]))
+        chunks = asyncio.run(store.query_chunks(collection_name='test_collection', pdf_id=2, output_fields=['text_chunk', 'vector_chunk']))
+        asyncio.run(store.delete_chunks(collection_name='test_collection', ids=[chunks[0]['id']]))
+
+        # Assert
+        self.assertEqual(asyncio.run(store.query_chunks(collection_name='test_collection', pdf_id=1, output_fields=['text_chunk'])), [])
+        self.assertEqual(len(chunks), 4)
+        np.testing.assert_allclose(chunks[1]['vector_chunk'], self.vectors[2][1] / np.linalg.norm(self.vectors[2][1]), rtol=1e-5)
+        remaining = asyncio.run(store.get_document(query_vector=[1.0] * 8, collection_name='test_collection', limit=100))
+        self.assertEqual(len(remaining), 7)
+        self.assertNotIn(chunks[0]['id'], [hit['id'] for hit in remaining])
+
+    def test_memory_mapped_persistence(self):
+        """Test: con path los vectores quedan en un .npy memory-mapped y se recuperan al reabrir"""
+        with tempfile.TemporaryDirectory() as tmp:
+            # Arrange
+            store = NumpyVectorStore(path=tmp, dim=8)
+            self._fill(store)
+            asyncio.run(store.close())
+
+            # Act
+            reopened = NumpyVectorStore(path=tmp, dim=8)
+            timings = asyncio.run(reopened.bootstrap(documents_collection='test_collection'))
+            result = asyncio.run(reopened.get_document(query_vector=self.vectors[3][0].tolist(), collection_name='test_collection', limit=1))
+            asyncio.run(reopened.upload_document(data=_rows(self.vectors[1][:1], 4), collection_name='test_collection'))
+
+            # Assert
+            self.assertIn('load', timings)
+            self.assertIsInstance(reopened._collection('test_collection').vectors, np.memmap)
+            self.assertEqual(result[0]['entity']['text_chunk'], 'pdf 3 chunk 0')
+            self.assertEqual(result[0]['id'], 9)
+            chunks = asyncio.run(reopened.query_chunks(collection_name='test_collection', pdf_id=4, output_fields=['text_chunk']))
+            self.assertEqual(chunks[0]['id'], 13)
+
+    def test_journal_replay_and_compaction(self):
+        """Test: inserts y deletes solo agregan al journal; al reabrir sin close se re-aplican y close compacta"""
+        with tempfile.TemporaryDirectory() as tmp:
+            # Arrange
+            store = NumpyVectorStore(path=tmp, dim=8)
+            self._fill(store)
+            asyncio.run(store.close())
+            snapshot = os.path.join(tmp, 'test_collection.rows.json')
+            journal = os.path.join(tmp, 'test_collection.rows.log')
+            snapshot_mtime = os.stat(snapshot).st_mtime_ns
+
+            # Act - Sin close: el proceso "se cae" con las operaciones solo en el journal
+            asyncio.run(store.delete_documents(collection_name='test_collection', ids=[1]))
+            asyncio.run(store.upload_document(data=_rows(self.vectors[1][:2], 4), collection_name='test_collection'))
+            with open(journal, encoding='utf-8') as f:
+                journal_lines = len(f.readlines())
+            snapshot_untouched = os.stat(snapshot).st_mtime_ns == snapshot_mtime
+            reopened = NumpyVectorStore(path=tmp, dim=8)
+            result = asyncio.run(reopened.get_document(query_vector=self.vectors[1][1].tolist(), collection_name='test_collection', limit=1))
+            asyncio.run(reopened.close())
+
+            # Assert
+            self.assertTrue(snapshot_untouched)
+            self.assertEqual(journal_lines, 2)
+            self.assertEqual(reopened._collection('test_collection').count, 10)
+            self.assertEqual(result[0]['entity']['text_chunk'], 'pdf 4 chunk 1')
+            np.testing.assert_allclose(result[0]['distance'], 1.0, rtol=1e-5)
+            self.assertEqual(result[0]['id'], 14)
+            self.assertFalse(os.path.exists(journal))
+            self.assertEqual(NumpyVectorStore(path=tmp, dim=8)._collection('test_collection').next_id, 15)
+
+
+if __name__ == '__main__':
+    unittest.main()
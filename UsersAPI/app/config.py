@@ -23,6 +23,13 @@ class Settings(BaseSettings):
     LANGCHAIN_URI: str = Field(..., validation_alias="LANGCHAIN_URI")
     LANGCHAIN_API_KEY: str = Field(..., validation_alias="LANGCHAIN_API_KEY")
 
+    # Jobs de creación de notebooks (consulta del progreso en Langchain)
+    NOTEBOOK_JOB_POLL_SECONDS: float = Field(default=2.0, validation_alias="NOTEBOOK_JOB_POLL_SECONDS")
+    NOTEBOOK_JOB_TIMEOUT_SECONDS: int = Field(default=1800, validation_alias="NOTEBOOK_JOB_TIMEOUT_SECONDS")
+
+    # Historial que se envía al chat: mensajes posteriores al último resumido (tope por si el resumen no avanza)
+    CHAT_HISTORY_MAX_MESSAGES: int = Field(default=40, validation_alias="CHAT_HISTORY_MAX_MESSAGES")
+
     GOOGLE_CLIENT_ID: str = Field(..., validation_alias="GOOGLE_CLIENT_ID")
     GOOGLE_CLIENT_SECRET: str = Field(..., validation_alias="GOOGLE_CLIENT_SECRET")
 
@@ -0,0 +1,25 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..models.chat_summary_model import ChatSummary
+
+
+async def get_chat_summary(db: AsyncSession, notebook_id: int):
+    query = select(ChatSummary).filter(ChatSummary.notebook_id == notebook_id)
+    result = await db.execute(query)
+    return result.scalars().first()
+
+
+async def save_chat_summary(db: AsyncSession, notebook_id: int, text: str, summarized_until: int):
+    """Crea o actualiza el resumen del chat de un notebook (nunca retrocede: gana el que cubre más mensajes)."""
+    db_summary = await get_chat_summary(db, notebook_id)
+
+    if db_summary is None:
+        db_summary = ChatSummary(notebook_id=notebook_id, text=text, summarized_until=summarized_until)
+        db.add(db_summary)
+    elif summarized_until > db_summary.summarized_until:
+        db_summary.text = text
+        db_summary.summarized_until = summarized_until
+
+    await db.commit()
+    return db_summary
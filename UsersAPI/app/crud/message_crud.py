@@ -43,3 +43,15 @@ async def get_messages_by_user(db: AsyncSession, user_id: int):
     query = select(Message).filter(Message.notebook_users_id == user_id)
     result = await db.execute(query)
     return result.scalars().all()
+
+
+async def get_recent_messages_by_notebook(db: AsyncSession, notebook_id: int, after_id: int = 0, limit: int = 100):
+    """Últimos `limit` mensajes del notebook con id mayor a after_id, en orden cronológico."""
+    query = (
+        select(Message)
+        .filter(Message.notebook_id == notebook_id, Message.id > after_id)
+        .order_by(Message.id.desc())
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return list(reversed(result.scalars().all()))
@@ -8,6 +8,7 @@ from ..models.source_model import Source
 from ..models.notebook_model import Notebook
 from ..models.quiz_model import Quiz
 from ..models.message_model import Message
+from ..models.chat_summary_model import ChatSummary
 from ..models.flashcard_model import Flashcard
 from ..models.summary_model import Summary
 from ..models.questions_and_answers_model import QuestionsAndAnswers
@@ -100,10 +101,13 @@ async def delete_notebook(db: AsyncSession, notebook_id: int):
             sql_delete(QuestionsAndAnswers).where(QuestionsAndAnswers.quiz_id.in_(quiz_ids))
         )
     
-    # 2. Eliminar messages
+    # 2. Eliminar messages y el resumen del chat
     await db.execute(
         sql_delete(Message).where(Message.notebook_id == notebook_id)
     )
+    await db.execute(
+        sql_delete(ChatSummary).where(ChatSummary.notebook_id == notebook_id)
+    )
     
     # 3. Eliminar sources
     await db.execute(
@@ -0,0 +1,41 @@
+import uuid
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..models.notebook_job_model import NotebookJob
+
+
+async def create_notebook_job(db: AsyncSession, user_id: int, langchain_job_id: str, auto_commit: bool = True):
+    """Crea el registro de un job de creación de notebook."""
+    db_job = NotebookJob(
+        id=uuid.uuid4().hex,
+        status="pending",
+        user_id=user_id,
+        langchain_job_id=langchain_job_id,
+    )
+
+    db.add(db_job)
+    await db.flush()
+
+    if auto_commit:
+        await db.commit()
+    return db_job
+
+
+async def get_notebook_job(db: AsyncSession, job_id: str):
+    query = select(NotebookJob).filter(NotebookJob.id == job_id)
+    result = await db.execute(query)
+    return result.scalars().first()
+
+
+async def update_notebook_job(db: AsyncSession, job_id: str, **fields):
+    """Actualiza el estado/progreso de un job y hace commit."""
+    db_job = await get_notebook_job(db, job_id)
+
+    if db_job:
+        for key, value in fields.items():
+            setattr(db_job, key, value)
+
+        await db.commit()
+    return db_job
@@ -21,8 +21,10 @@ from .routers.quiz_router import router as quizzes_router
 from .models.user_model import User
 from .models.role_model import Role
 from .models.notebook_model import Notebook
+from .models.notebook_job_model import NotebookJob
 from .models.source_model import Source
 from .models.message_model import Message
+from .models.chat_summary_model import ChatSummary
 from .models.summary_model import Summary
 from .models.flashcard_model import Flashcard
 from .models.quiz_model import Quiz
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, func
+from sqlalchemy.orm import relationship
+from ..database import Base
+
+
+class ChatSummary(Base):
+    __tablename__ = "chat_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    text = Column(Text, nullable=False)  # Resumen de los mensajes del chat hasta summarized_until
+    summarized_until = Column(Integer, nullable=False)  # Id del último mensaje incluido en el resumen
+
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    # Clave foránea (un resumen por notebook)
+    notebook_id = Column(Integer, ForeignKey("notebooks.id"), nullable=False, unique=True, index=True)
+
+    # Relaciones
+    notebook = relationship("Notebook")
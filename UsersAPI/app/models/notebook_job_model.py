@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, Text, JSON, ForeignKey, DateTime, func
+from sqlalchemy.orm import relationship
+from ..database import Base
+
+
+class NotebookJob(Base):
+    __tablename__ = "notebook_jobs"
+
+    id = Column(String(32), primary_key=True, index=True)  # uuid4 hex
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, succeeded, failed
+    stages = Column(JSON, nullable=True)  # Progreso por etapa reportado por Langchain
+    error = Column(Text, nullable=True)
+    langchain_job_id = Column(String(64), nullable=True)
+
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    # Claves foráneas
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    notebook_id = Column(Integer, ForeignKey("notebooks.id"), nullable=True)  # Se completa al terminar el job
+
+    # Relaciones
+    user = relationship("User")
+    notebook = relationship("Notebook")
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import httpx
@@ -9,7 +10,9 @@ from ..database import get_db
 from ..schemas.message_schema import MessageCreate, MessageOut
 from ..security.auth import get_current_user
 from ..utils.validate_admin import validate_admin
+from ..utils.sse import SSEParser, format_sse
 from ..crud.notebook_crud import get_notebook
+from ..crud.chat_summary_crud import get_chat_summary, save_chat_summary
 from ..crud.message_crud import (
     create_message,
     get_all_messages,
@@ -17,6 +20,7 @@ from ..crud.message_crud import (
     delete_message,
     get_messages_by_notebook,
     get_messages_by_user,
+    get_recent_messages_by_notebook,
 )
 
 class MessageRequest(BaseModel):
@@ -69,6 +73,49 @@ async def create_user_message(message: MessageRequest, db: AsyncSession = Depend
     message = MessageCreate(**message_data)
     return await create_message(db=db, message=message)
 
+async def get_chat_history(db: AsyncSession, notebook_id: int) -> dict:
+    """
+    Historial para Langchain: resumen guardado del chat y los mensajes posteriores a él como dicts
+    serializables (sin atributos internos de SQLAlchemy). Los mensajes ya resumidos no se envían.
+    """
+    chat_summary = await get_chat_summary(db, notebook_id=notebook_id)
+    chat_history = await get_recent_messages_by_notebook(
+        db,
+        notebook_id=notebook_id,
+        after_id=chat_summary.summarized_until if chat_summary else 0,
+        limit=conf.CHAT_HISTORY_MAX_MESSAGES
+    )
+
+    chat_history_dicts = []
+    if chat_history:
+        for msg in chat_history:
+            chat_history_dicts.append({
+                "id": msg.id,
+                "text": msg.text,
+                "notebook_id": msg.notebook_id,
+                "notebook_users_id": msg.notebook_users_id,
+                "is_user_message": msg.is_user_message,
+                "created_at": msg.created_at.isoformat() if msg.created_at else None,
+                "updated_at": msg.updated_at.isoformat() if msg.updated_at else None,
+            })
+
+    return {
+        "chatHistory": chat_history_dicts,
+        "chatSummary": chat_summary.text if chat_summary else "",
+    }
+
+
+async def save_chat_history_summary(db: AsyncSession, notebook_id: int, response_data: dict):
+    """Guarda el resumen del chat si Langchain lo actualizó (agregó turnos viejos al resumen)."""
+    if response_data.get("summarized_until") is not None:
+        await save_chat_summary(
+            db,
+            notebook_id=notebook_id,
+            text=response_data.get("chat_summary") or "",
+            summarized_until=response_data["summarized_until"]
+        )
+
+
 @router.post("/llm", response_model=MessageOut, status_code=status.HTTP_201_CREATED)
 async def create_llm_message(message: MessageRequest
 , db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
@@ -87,22 +134,8 @@ async def create_llm_message(message: MessageRequest
     message_data['notebook_id'] = message.notebook_id
     message_data['notebook_users_id'] = current_user.id
     
-    # Obtener historial de mensajes del notebook
-    chat_history = await get_messages_by_notebook(db, notebook_id=message.notebook_id)
-    
-    # Convertir mensajes a dict serializable (evitar atributos internos de SQLAlchemy)
-    chat_history_dicts = []
-    if chat_history:
-        for msg in chat_history:
-            chat_history_dicts.append({
-                "id": msg.id,
-                "text": msg.text,
-                "notebook_id": msg.notebook_id,
-                "notebook_users_id": msg.notebook_users_id,
-                "is_user_message": msg.is_user_message,
-                "created_at": msg.created_at.isoformat() if msg.created_at else None,
-                "updated_at": msg.updated_at.isoformat() if msg.updated_at else None,
-            })
+    # Obtener historial de mensajes del notebook (resumen + mensajes recientes)
+    chat_history = await get_chat_history(db, notebook_id=message.notebook_id)
     
     try:
         response = await http_client.post(
@@ -110,7 +143,7 @@ async def create_llm_message(message: MessageRequest
             json={
                 "question": message.text,
                 "pdf_ids": [source.id for source in notebook.sources],
-                "chatHistory": chat_history_dicts,
+                **chat_history,
             },
             headers={"X-API-Key": conf.LANGCHAIN_API_KEY},
             timeout=60.0
@@ -127,11 +160,88 @@ async def create_llm_message(message: MessageRequest
     message_response_data = response.json()
     message_data['text'] = message_response_data.get('generation', '')
 
+    await save_chat_history_summary(db, notebook_id=message.notebook_id, response_data=message_response_data)
+
     message = MessageCreate(**message_data)
     
     return await create_message(db=db, message=message)
 
 
+@router.post("/llm/stream", status_code=status.HTTP_200_OK)
+async def stream_llm_message(message: MessageRequest, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    """
+    Versión streaming de /llm (server-sent events): reenvía al navegador los eventos de Langchain
+    a medida que llegan (token, retry, end, error) y, cuando termina la respuesta, guarda el mensaje
+    completo y lo envía en un último evento "message".
+    """
+    notebook = await get_notebook(db, notebook_id=message.notebook_id)
+    if not notebook:
+        raise HTTPException(status_code=404, detail="Notebook not found")
+
+    if not validate_admin(current_user) and notebook.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="No tienes permiso para crear este mensaje")
+
+    message_data = {
+        "text": message.text,
+        "notebook_id": message.notebook_id,
+        "notebook_users_id": current_user.id,
+        "is_user_message": False,
+    }
+
+    chat_history = await get_chat_history(db, notebook_id=message.notebook_id)
+
+    # Se abre el stream antes de responder: los errores de Langchain llegan como HTTP y no a mitad del stream
+    request = http_client.build_request(
+        "POST",
+        f"{conf.LANGCHAIN_URI}/chat/rag/stream",
+        json={
+            "question": message.text,
+            "pdf_ids": [source.id for source in notebook.sources],
+            **chat_history,
+        },
+        headers={"X-API-Key": conf.LANGCHAIN_API_KEY},
+        timeout=httpx.Timeout(60.0, read=None)  # Sin límite entre tokens: la respuesta termina con el evento end
+    )
+
+    try:
+        response = await http_client.send(request, stream=True)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error de conexión: {str(e)}")
+
+    if response.is_error:
+        await response.aclose()
+        raise HTTPException(status_code=response.status_code, detail="Error en servicio externo de Langchain")
+
+    async def relay():
+        parser = SSEParser()
+        end_data = None
+
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk  # Sin buffering: cada chunk sale apenas llega
+
+                for event, data in parser.feed(chunk):
+                    if event == "end":
+                        end_data = data
+        finally:
+            await response.aclose()
+
+        # Guardar el mensaje completo (y el resumen del chat si cambió) cuando termina el stream
+        if end_data is not None:
+            await save_chat_history_summary(db, notebook_id=message.notebook_id, response_data=end_data)
+
+            message_data["text"] = end_data.get("generation", "")
+            db_message = await create_message(db=db, message=MessageCreate(**message_data))
+            yield format_sse("message", MessageOut.model_validate(db_message).model_dump(mode="json"))
+
+    return StreamingResponse(
+        relay(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/", response_model=List[MessageOut], status_code=status.HTTP_200_OK)
 async def read_messages(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
     """Método para obtener todos los mensajes con paginación."""
@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Body
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Body, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
 from typing import List
 import httpx
+import asyncio
+import time
 import datetime as date
 
 from ..config import conf
-from ..database import get_db
+from ..database import get_db, AsyncSessionLocal
 from ..schemas.notebook_schema import NotebookOut, NotebookCreate
+from ..schemas.notebook_job_schema import NotebookJobOut
 from ..schemas.source_schema import SourceOut, SourceCreate
 from ..schemas.flashcard_schema import FlashcardCreate, FlashcardOut
 from ..schemas.quiz_schema import QuizWithQuestions, QuizCreate, QuestionCreate
@@ -22,6 +25,11 @@ from ..utils.validate_admin import validate_admin
 from ..crud.source_crud import create_source, get_source, delete_source as delete_source_crud
 from ..crud.flashcard_crud import create_flashcard
 from ..crud.quiz_crud import create_quiz
+from ..crud.notebook_job_crud import (
+    create_notebook_job as create_notebook_job_crud,
+    get_notebook_job as get_notebook_job_crud,
+    update_notebook_job as update_notebook_job_crud,
+)
 from ..crud.notebook_crud import (
     create_notebook as create_notebook_crud,
     get_notebook as get_notebook_crud,
@@ -49,9 +57,12 @@ async def shutdown_event():
     await http_client.aclose()
 
 
-@router.post("/", response_model=NotebookOut, status_code=status.HTTP_201_CREATED)
-async def create_notebook(files: List[UploadFile], db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
-    """Método para crear un nuevo notebook."""
+@router.post("/", response_model=NotebookJobOut, status_code=status.HTTP_202_ACCEPTED)
+async def create_notebook(files: List[UploadFile], background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    """
+    Método para crear un nuevo notebook en segundo plano.
+    Devuelve un job; el progreso y el notebook creado se consultan en GET /notebooks/jobs/{job_id}.
+    """
     
     try:
         # Validar tipos de archivo y crear sources en DB
@@ -84,8 +95,9 @@ async def create_notebook(files: List[UploadFile], db: AsyncSession = Depends(ge
             multipart_data.append(('source_ids', (None, str(source_id)))) # None indica que no es un archivo
 
         try:
+            # Langchain solo recibe los archivos y devuelve el id del job (202)
             response = await http_client.post(
-                f"{conf.LANGCHAIN_URI}/create-notebook",
+                f"{conf.LANGCHAIN_URI}/create-notebook/jobs",
                 files=multipart_data, # Enviamos todo aquí
                 headers={"X-API-Key": conf.LANGCHAIN_API_KEY},
                 timeout=60.0
@@ -95,62 +107,31 @@ async def create_notebook(files: List[UploadFile], db: AsyncSession = Depends(ge
 
         except httpx.HTTPStatusError as e:
             # Limpieza: eliminar sources creados si Langchain falla
-            try:
-                for source_id in source_ids:
-                    await delete_source_crud(db, source_id=source_id)
-                await db.commit()
-            except Exception:
-                await db.rollback()
+            await _delete_sources(db, source_ids)
             print(f"HTTPStatusError: {e.response.status_code} - {e.response.text}")
             raise HTTPException(status_code=e.response.status_code, detail=f"Error en servicio externo de Langchain: {e.response.text}")
         
         except Exception as e:
             # Limpieza: eliminar sources creados si hay error de conexión
-            try:
-                for source_id in source_ids:
-                    await delete_source_crud(db, source_id=source_id)
-                await db.commit()
-            except Exception:
-                await db.rollback()
+            await _delete_sources(db, source_ids)
             print(f"Connection Error: {str(e)}")
             import traceback
             traceback.print_exc()
             raise HTTPException(status_code=500, detail=f"Error de conexión: {str(e)}")
 
-        # 3. Procesar respuesta como Diccionario y normalizar longitudes para evitar truncamientos en DB
-        notebook_response = response.json()
-
-        # Enforce column length limits according to model/DB: title(60), icon(45), description(512)
-        title = str(notebook_response.get("title", ""))[:60]
-        icon = str(notebook_response.get("icon", ""))[:45]
-        description = str(notebook_response.get("description", ""))[:512]
-        
-        # 4. Crear objeto NotebookCreate con los datos de Langchain + datos del usuario
-        notebook_data = NotebookCreate(
-            title=title,
-            icon=icon,
-            description=description,
-            user_id=current_user.id
+        # Registrar el job (junto con los sources) antes de responder
+        job = await create_notebook_job_crud(
+            db=db,
+            user_id=current_user.id,
+            langchain_job_id=response.json()["job_id"],
+            auto_commit=False
         )
+        await db.commit()
 
-        # 5. Crear en base de datos local
-        new_notebook = await create_notebook_crud(db=db, notebook=notebook_data, auto_commit=False)
-
+        # El seguimiento corre después de responder, con su propia sesión de DB
+        background_tasks.add_task(track_notebook_job, job_id=job.id, source_ids=source_ids, user_id=current_user.id)
 
-        # 6. Asociar las fuentes (sources) al notebook creado
-        for source_id in source_ids:
-            query = select(Source).filter(Source.id == source_id)
-            result = await db.execute(query)
-            source = result.scalars().first()
-            if source:
-                source.notebook_id = new_notebook.id
-                db.add(source)
-        await db.commit()
-        
-        # 7. Cargar el notebook con todas sus relaciones
-        new_notebook = await _load_notebook_with_relations(db, new_notebook.id)
-        
-        return new_notebook
+        return _notebook_job_out(job)
         
     except HTTPException:
         raise
@@ -160,6 +141,147 @@ async def create_notebook(files: List[UploadFile], db: AsyncSession = Depends(ge
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error inesperado: {str(e)}")
 
+
+@router.get("/jobs/{job_id}", response_model=NotebookJobOut, status_code=status.HTTP_200_OK)
+async def read_notebook_job(job_id: str, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    """Método para consultar el estado y el progreso por etapa de la creación de un notebook."""
+    job = await get_notebook_job_crud(db, job_id=job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+
+    if job.user_id != current_user.id and not validate_admin(current_user):
+        raise HTTPException(status_code=403, detail="No tienes permiso para ver este job")
+
+    notebook = await _load_notebook_with_relations(db, job.notebook_id) if job.notebook_id else None
+
+    return _notebook_job_out(job, notebook)
+
+
+def _notebook_job_out(job, notebook=None) -> NotebookJobOut:
+    """Arma la respuesta de un job sin disparar la carga lazy de la relación con el notebook."""
+    return NotebookJobOut(
+        id=job.id,
+        status=job.status,
+        stages=job.stages,
+        error=job.error,
+        user_id=job.user_id,
+        notebook_id=job.notebook_id,
+        notebook=NotebookOut.model_validate(notebook) if notebook else None,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+    )
+
+
+async def track_notebook_job(job_id: str, source_ids: List[int], user_id: int):
+    """
+    Consulta el job en Langchain hasta que termina, guardando el progreso por etapa.
+    Al terminar crea el notebook con los metadatos generados y le asocia los sources;
+    si falla, elimina los sources (y sus vectores) y deja el error en el job.
+    """
+    async with AsyncSessionLocal() as db:
+        job = await get_notebook_job_crud(db, job_id=job_id)
+        deadline = time.monotonic() + conf.NOTEBOOK_JOB_TIMEOUT_SECONDS
+
+        try:
+            while True:
+                await asyncio.sleep(conf.NOTEBOOK_JOB_POLL_SECONDS)
+
+                if time.monotonic() > deadline:
+                    raise RuntimeError("Timeout esperando la creación del notebook")
+
+                try:
+                    response = await http_client.get(
+                        f"{conf.LANGCHAIN_URI}/jobs/{job.langchain_job_id}",
+                        headers={"X-API-Key": conf.LANGCHAIN_API_KEY},
+                        timeout=10.0
+                    )
+                    response.raise_for_status()
+
+                except httpx.HTTPStatusError as e:
+                    # 404: Langchain se reinició y perdió el job
+                    if e.response.status_code == 404:
+                        raise RuntimeError("El job ya no existe en el servicio de Langchain")
+                    print(f"HTTPStatusError polling job {job_id}: {e.response.status_code} - {e.response.text}")
+                    continue
+
+                except httpx.HTTPError as e:
+                    # Errores transitorios de conexión: se reintenta en la próxima consulta
+                    print(f"Connection Error polling job {job_id}: {str(e)}")
+                    continue
+
+                langchain_job = response.json()
+
+                if langchain_job["status"] == "failed":
+                    raise RuntimeError(langchain_job.get("error") or "Error en servicio externo de Langchain")
+
+                if langchain_job["status"] == "succeeded":
+                    new_notebook = await _create_notebook_from_metadata(db, langchain_job["result"], source_ids, user_id)
+                    await update_notebook_job_crud(db, job_id, status="succeeded", stages=langchain_job["stages"], notebook_id=new_notebook.id)
+                    return
+
+                await update_notebook_job_crud(db, job_id, status="running", stages=langchain_job["stages"])
+
+        except Exception as e:
+            print(f"Notebook job {job_id} failed: {str(e)}")
+            await db.rollback()
+
+            # Limpieza: vectores en Langchain (ingesta parcial) y sources en DB
+            try:
+                await http_client.post(
+                    f"{conf.LANGCHAIN_URI}/delete-pdfs",
+                    json={"pdf_ids": source_ids},
+                    headers={"X-API-Key": conf.LANGCHAIN_API_KEY},
+                    timeout=60.0
+                )
+            except Exception as cleanup_error:
+                print(f"Connection Error cleaning up job {job_id}: {str(cleanup_error)}")
+
+            await _delete_sources(db, source_ids)
+            await update_notebook_job_crud(db, job_id, status="failed", error=str(e))
+
+
+async def _create_notebook_from_metadata(db: AsyncSession, notebook_response: dict, source_ids: List[int], user_id: int):
+    """Crea el notebook con los metadatos generados por Langchain y le asocia los sources."""
+    # Normalizar longitudes para evitar truncamientos en DB
+    # Enforce column length limits according to model/DB: title(60), icon(45), description(512)
+    title = str(notebook_response.get("title", ""))[:60]
+    icon = str(notebook_response.get("icon", ""))[:45]
+    description = str(notebook_response.get("description", ""))[:512]
+    
+    # Crear objeto NotebookCreate con los datos de Langchain + datos del usuario
+    notebook_data = NotebookCreate(
+        title=title,
+        icon=icon,
+        description=description,
+        user_id=user_id
+    )
+
+    # Crear en base de datos local
+    new_notebook = await create_notebook_crud(db=db, notebook=notebook_data, auto_commit=False)
+
+    # Asociar las fuentes (sources) al notebook creado
+    for source_id in source_ids:
+        query = select(Source).filter(Source.id == source_id)
+        result = await db.execute(query)
+        source = result.scalars().first()
+        if source:
+            source.notebook_id = new_notebook.id
+            db.add(source)
+    await db.commit()
+
+    return new_notebook
+
+
+async def _delete_sources(db: AsyncSession, source_ids: List[int]):
+    """Elimina los sources creados para un notebook que no se pudo crear."""
+    try:
+        for source_id in source_ids:
+            await delete_source_crud(db, source_id=source_id)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+
 @router.get("/", response_model=List[NotebookOut], status_code=status.HTTP_200_OK)
 async def read_notebooks(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db)):
     """Método para obtener todos los notebooks con paginación."""
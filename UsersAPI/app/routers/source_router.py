@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Body, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import httpx
@@ -173,6 +173,62 @@ async def delete_source(
     return source
 
 
+@router.put("/{source_id}/file", response_model=SourceOut, status_code=status.HTTP_200_OK)
+async def reupload_source(
+    source_id: int,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    """Método para reemplazar el PDF de una fuente por una nueva versión (solo se re-embeben los cambios)."""
+    source = await get_source(db, source_id=source_id)
+
+    if not source:
+        raise HTTPException(status_code=404, detail="Fuente no encontrada")
+
+    notebook = await get_notebook_by_source(db, source_id=source_id)
+    if not notebook:
+        raise HTTPException(status_code=404, detail="Notebook not found for this source")
+
+    if not validate_admin(current_user) and notebook.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="No tienes permiso para modificar esta fuente")
+
+    if not file.filename.lower().endswith(('.pdf')):
+        raise HTTPException(status_code=400, detail="Invalid file type. Only PDFs are allowed.")
+
+    content = await file.read()
+
+    try:
+        response = await http_client.post(
+            f"{conf.LANGCHAIN_URI}/reupload-pdf",
+            files={"file": (file.filename, content, file.content_type)},
+            data={"source_id": str(source_id)},
+            headers={"X-API-Key": conf.LANGCHAIN_API_KEY},
+            timeout=60.0
+        )
+
+        response.raise_for_status()
+
+    except httpx.HTTPStatusError as e:
+        print(f"HTTPStatusError: {e.response.status_code} - {e.response.text}")
+        raise HTTPException(status_code=e.response.status_code, detail=f"Has occurred an error with Langchain service: {e.response.text}")
+
+    except Exception as e:
+        print(f"Connection Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Connection Error: {str(e)}")
+
+    print(f"Re-upload of source {source_id}: {response.json()}")
+
+    source.name = file.filename
+    db.add(source)
+    await db.commit()
+    await db.refresh(source)
+
+    return source
+
+
 @router.get("/{source_id}/notebook", response_model=NotebookOut, status_code=status.HTTP_200_OK)
 async def read_notebook_by_source(source_id: int, db: AsyncSession = Depends(get_db)):
     """Método para obtener el notebook asociado a una fuente (source) específica."""
@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+from .notebook_schema import NotebookOut
+
+# --- SCHEMAS DE NOTEBOOK JOB ---
+
+class NotebookJobStage(BaseModel):
+    status: str
+    done: int = 0
+    total: Optional[int] = None
+
+class NotebookJobOut(BaseModel):
+    id: str
+    status: str
+    stages: Optional[dict[str, NotebookJobStage]] = None
+    error: Optional[str] = None
+    user_id: int
+    notebook_id: Optional[int] = None
+    notebook: Optional[NotebookOut] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
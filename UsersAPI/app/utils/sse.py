@@ -0,0 +1,31 @@
+import json
+
+
+class SSEParser:
+    """Parser incremental de server-sent events: recibe bytes tal como llegan y devuelve los eventos completos."""
+
+    def __init__(self):
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> list[tuple[str, dict]]:
+        self._buffer += chunk
+        events = []
+
+        while b"\n\n" in self._buffer:
+            raw, self._buffer = self._buffer.split(b"\n\n", 1)
+            event, data = "message", []
+
+            for line in raw.decode("utf-8").split("\n"):
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data.append(line[5:].strip())
+
+            if data:
+                events.append((event, json.loads("\n".join(data))))
+
+        return events
+
+
+def format_sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
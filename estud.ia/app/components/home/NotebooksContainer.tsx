@@ -75,7 +75,10 @@ export default function NotebooksContainer ({ orderBy, viewMode, onStartUpload,
         
         onProgressUpdate?.(30);
         
-        const notebook = await createNotebook(files as unknown as File[]);
+        const notebook = await createNotebook(
+          files as unknown as File[],
+          (progress) => onProgressUpdate?.(30 + Math.round(progress * 40))
+        );
 
         onProgressUpdate?.(70);
 
@@ -51,7 +51,10 @@ export default function OptionsBanner ({ orderBy, setOrderBy, viewMode, setViewM
         
         onProgressUpdate?.(30);
         
-        const notebook = await createNotebook(files as unknown as File[]);
+        const notebook = await createNotebook(
+          files as unknown as File[],
+          (progress) => onProgressUpdate?.(30 + Math.round(progress * 40))
+        );
 
         onProgressUpdate?.(70);
 
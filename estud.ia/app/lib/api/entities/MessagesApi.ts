@@ -19,6 +19,55 @@ export async function createLLMMessage(message: { text: string; notebook_id: num
   return response.data;
 }
 
+export interface LLMStreamHandlers {
+  onToken: (text: string) => void;
+  onRetry?: () => void;
+}
+
+// Streaming version of createLLMMessage (server-sent events): tokens arrive through the handlers and
+// the promise resolves with the saved message once the answer is complete
+export async function streamLLMMessage(message: { text: string; notebook_id: number }, handlers: LLMStreamHandlers): Promise<Message> {
+  const response = await fetch(`${api.defaults.baseURL}/${entity}/llm/stream`, {
+    method: "POST",
+    credentials: "include",
+    headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+    body: JSON.stringify(message),
+  });
+
+  if (!response.ok || !response.body) {
+    throw new Error(`Error ${response.status} al generar la respuesta`);
+  }
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+
+    buffer += value;
+    let separator: number;
+
+    while ((separator = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, separator);
+      buffer = buffer.slice(separator + 2);
+
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = raw.match(/^data: (.*)$/m)?.[1];
+      if (!event || !data) continue;
+
+      const payload = JSON.parse(data);
+
+      if (event === "token") handlers.onToken(payload.text);
+      else if (event === "retry") handlers.onRetry?.();
+      else if (event === "error") throw new Error(payload.error);
+      else if (event === "message") return payload as Message;
+    }
+  }
+
+  throw new Error("El stream terminó sin la respuesta completa");
+}
+
 export async function getAllMessages(skip: number = 0, limit: number = 10): Promise<Message[]> {
   const response = await api.get<Message[]>(`/${entity}`, {
     params: { skip, limit },
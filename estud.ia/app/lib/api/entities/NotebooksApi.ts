@@ -2,18 +2,56 @@ import api from "../api"
 
 import type Notebook from "../../interfaces/entities/Notebook";
 import type Source from "../../interfaces/entities/Source";
+import type NotebookJob from "../../interfaces/entities/NotebookJob";
 import Flashcard from "../../interfaces/entities/Flashcard";
 
 const entity: string = "notebooks";
 
-export async function createNotebook(files: File[]): Promise<Notebook> {
+const JOB_POLL_INTERVAL_MS = 2000;
+
+// Progreso de un job (0 a 1) como promedio de sus etapas
+function getJobProgress(job: NotebookJob): number {
+  const stages = Object.values(job.stages ?? {});
+
+  if (stages.length === 0) return 0;
+
+  const completed = stages.reduce((acc, stage) => {
+    if (stage.status === "done") return acc + 1;
+    if (stage.total) return acc + Math.min(stage.done / stage.total, 1);
+    return acc;
+  }, 0);
+
+  return completed / stages.length;
+}
+
+export async function createNotebook(files: File[], onProgress?: (progress: number) => void): Promise<Notebook> {
   const formData = new FormData();
 
   for (const file of files) formData.append("files", file);
   
-  const response = await api.post<Notebook>(`/${entity}`, formData, {
+  // La creación corre en segundo plano: se recibe un job y se consulta su estado hasta que termine
+  const response = await api.post<NotebookJob>(`/${entity}`, formData, {
     headers: { "Content-Type": "multipart/form-data" },
   });
+
+  let job = response.data;
+
+  while (job.status === "pending" || job.status === "running") {
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+
+    job = await getNotebookJob(job.id);
+    onProgress?.(getJobProgress(job));
+  }
+
+  if (job.status === "failed" || !job.notebook) {
+    throw new Error(job.error ?? "Error al crear el cuaderno");
+  }
+
+  return job.notebook;
+}
+
+export async function getNotebookJob(jobId: string): Promise<NotebookJob> {
+  const response = await api.get<NotebookJob>(`/${entity}/jobs/${jobId}`);
   return response.data;
 }
 
@@ -43,6 +43,18 @@ export async function deleteVariousSources(sourceIds: number[]): Promise<Source[
   return response.data
 }
 
+export async function reuploadSource(sourceId: number, file: File): Promise<Source> {
+  const formData = new FormData();
+  formData.append("file", file);
+
+  // Reemplaza el PDF de la fuente: solo se procesan los fragmentos que cambiaron
+  const response = await api.put<Source>(`/${entity}/${sourceId}/file`, formData, {
+    headers: { "Content-Type": "multipart/form-data" },
+  });
+
+  return response.data;
+}
+
 export async function getNotebookBySource(sourceId: number): Promise<any> {
   const response = await api.get<any>(`/${entity}/${sourceId}/notebook`);
   return response.data;
@@ -0,0 +1,22 @@
+import Notebook from "./Notebook";
+
+export type NotebookJobStatus = "pending" | "running" | "succeeded" | "failed";
+
+export interface NotebookJobStage {
+  status: "pending" | "running" | "done" | "failed";
+  done: number;
+  total: number | null;
+}
+
+export default interface NotebookJob {
+  id: string
+  status: NotebookJobStatus
+  stages?: Record<string, NotebookJobStage> | null
+  error?: string | null
+  notebook_id?: number | null
+  notebook?: Notebook | null
+  created_at?: string | null
+  updated_at?: string | null
+
+  user_id: number
+}
@@ -125,11 +125,17 @@ export function ChatInformationProvider({ children }: { children: React.ReactNod
           };
           setMessages((prev) => [...prev, loadingMessage]);
 
-          // 3. Now send the request to the LLM
-          const llmData = await MessagesApi.createLLMMessage({
-            text: last.text,
-            notebook_id: notebook.id,
-          });
+          // 3. Now send the request to the LLM, showing the answer as it is generated
+          const updateLoadingMessage = (update: (msg: Message) => Message) =>
+            setMessages((prev) => prev.map((msg) => msg.id === loadingMessage.id ? update(msg) : msg));
+
+          const llmData = await MessagesApi.streamLLMMessage(
+            { text: last.text, notebook_id: notebook.id },
+            {
+              onToken: (text) => updateLoadingMessage((msg) => ({ ...msg, text: msg.text + text, isLoading: false })),
+              onRetry: () => updateLoadingMessage((msg) => ({ ...msg, text: "", isLoading: true })),
+            }
+          );
 
           setMessages((prev) => 
             prev.map((msg) => msg.id === loadingMessage.id ? llmData : msg)